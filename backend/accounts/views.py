@@ -11,6 +11,8 @@ from .serializers import (
     AuthTokenSerializer, ChangePasswordSerializer
 )
 from .atribuidor_serializers import AtribuidorEventualSerializer
+from search.filters import FullTextSearchFilter
+from search.index import SearchIndex
 
 
 class AuthViewSet(viewsets.GenericViewSet):
@@ -99,11 +101,15 @@ class UserViewSet(viewsets.ModelViewSet):
 
         search = self.request.query_params.get('search')
         if search:
-            queryset = queryset.filter(
-                Q(name__icontains=search) | 
-                Q(email__icontains=search) |
-                Q(username__icontains=search)
-            )
+            ids = SearchIndex.match_ids('user', search, FullTextSearchFilter.max_matches)
+            if ids is not None:
+                queryset = queryset.filter(pk__in=ids)
+            else:
+                queryset = queryset.filter(
+                    Q(name__icontains=search) | 
+                    Q(email__icontains=search) |
+                    Q(username__icontains=search)
+                )
 
         is_active = self.request.query_params.get('is_active')
         if is_active is not None:
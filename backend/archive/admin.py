@@ -0,0 +1,22 @@
+from django.contrib import admin
+from equipahub.pagination import EstimatedCountAdminMixin
+from .models import ArchivedRecord
+
+
+@admin.register(ArchivedRecord)
+class ArchivedRecordAdmin(EstimatedCountAdminMixin, admin.ModelAdmin):
+    """
+    Consulta (apenas leitura) dos registos arquivados
+    """
+    list_display = ['kind', 'original_id', 'user', 'status', 'created_at', 'closed_at', 'archived_at']
+    list_filter = ['kind', 'status', 'archived_at']
+    search_fields = ['=original_id', 'user__name', 'user__email']
+    list_select_related = ['user']
+    ordering = ['-created_at']
+    readonly_fields = [field.name for field in ArchivedRecord._meta.fields]
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
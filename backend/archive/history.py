@@ -0,0 +1,155 @@
+"""
+Leitura transparente do arquivo nos endpoints de histórico
+
+``ArchiveReadThroughMixin`` junta aos ViewSets:
+
+- ``retrieve``: um registo que já não está nas tabelas ativas é procurado no
+  arquivo e devolvido com ``archived: true``;
+- ``history_response``: listagem paginada que junta os registos ativos e os
+  arquivados, ordenados por data de criação (``?include_archived=false``
+  lista apenas os ativos);
+- ``archived_matching``: registos arquivados que correspondem aos filtros do
+  pedido, para as exportações e estatísticas que somam as duas origens.
+"""
+
+from django.db.models import TextField
+from django.db.models.fields.json import KT
+from django.db.models.functions import Cast
+from django.http import Http404
+from rest_framework.response import Response
+
+from .models import ArchivedRecord
+
+
+class ArchivedHistory:
+    """
+    Sequência (registos ativos + arquivados) por ``created_at`` decrescente,
+    no formato esperado pelo paginador: ``count()`` e fatias.
+
+    Para a fatia [início, fim) basta ler os ``fim`` primeiros de cada origem;
+    só os registos da fatia são serializados.
+    """
+
+    def __init__(self, queryset, archived, serializer_class):
+        self.queryset = queryset.order_by('-created_at', '-pk')
+        self.archived = archived.order_by('-created_at', '-original_id')
+        self.serializer_class = serializer_class
+
+    def count(self):
+        return self.queryset.count() + self.archived.count()
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        start, stop = index.start or 0, index.stop
+        hot = list(self.queryset if stop is None else self.queryset[:stop])
+        cold = list(self.archived if stop is None else self.archived[:stop])
+
+        merged = sorted(
+            [(obj.created_at, obj.pk, obj) for obj in hot]
+            + [(record.created_at, record.original_id, record) for record in cold],
+            key=lambda row: (row[0], row[1]),
+            reverse=True,
+        )[start:stop]
+
+        rows = [obj for _, _, obj in merged]
+        serialized = iter(self.serializer_class(
+            [obj for obj in rows if not isinstance(obj, ArchivedRecord)], many=True
+        ).data)
+        return [
+            obj.as_list_item() if isinstance(obj, ArchivedRecord) else next(serialized)
+            for obj in rows
+        ]
+
+
+class ArchiveReadThroughMixin:
+    """
+    Torna os registos arquivados visíveis nos endpoints de histórico
+    """
+
+    archive_kind = None
+    # Perfis que veem os registos de todos os utilizadores (como no get_queryset)
+    archive_all_roles = ['tecnico', 'coordenador']
+    # Filtros da listagem aplicáveis ao arquivo: parâmetro -> lookup em
+    # ArchivedRecord (``data__<campo>__<lookup>`` compara o texto guardado em
+    # ``data``) ou função (registos, valor) -> registos
+    archive_filters = {'status': 'status', 'user': 'user'}
+    # Parâmetros que não restringem os registos
+    ARCHIVE_NEUTRAL_PARAMS = {
+        'fmt', 'format', 'page', 'page_size', 'ordering', 'include_archived', 'created_from', 'created_to',
+    }
+
+    def archived_records(self):
+        records = ArchivedRecord.objects.filter(kind=self.archive_kind)
+        if self.request.user.role not in self.archive_all_roles:
+            records = records.filter(user=self.request.user)
+        return records
+
+    def include_archived(self):
+        return self.request.query_params.get('include_archived', 'true').lower() != 'false'
+
+    def archived_matching(self, params):
+        """
+        Registos arquivados visíveis ao utilizador que correspondem a ``params``
+        (vazio com ?include_archived=false). Levanta ValueError se algum filtro
+        não puder ser aplicado ao arquivo.
+        """
+        if not self.include_archived():
+            return ArchivedRecord.objects.none()
+        records = self.archived_records()
+        for param, value in params.items():
+            if not value or param in self.ARCHIVE_NEUTRAL_PARAMS:
+                continue
+            lookup = self.archive_filters.get(param)
+            if lookup is None:
+                raise ValueError(
+                    f'O filtro "{param}" não está disponível para registos arquivados. '
+                    'Use include_archived=false.'
+                )
+            if callable(lookup):
+                records = lookup(records, value)
+            elif lookup.startswith('data__'):
+                _, key, *rest = lookup.split('__')
+                alias = f'archived_{key}'
+                # Comparação como texto: as datas estão em ISO 8601 em ``data``
+                records = records.alias(**{alias: Cast(KT(f'data__{key}'), TextField())}).filter(
+                    **{'__'.join([alias, *rest]): value}
+                )
+            else:
+                records = records.filter(**{lookup: value})
+        return records
+
+    def retrieve(self, request, *args, **kwargs):
+        try:
+            return super().retrieve(request, *args, **kwargs)
+        except Http404:
+            lookup = kwargs.get(self.lookup_url_kwarg or self.lookup_field)
+            record = None
+            if lookup is not None and str(lookup).isdigit():
+                record = self.archived_records().filter(original_id=lookup).first()
+            if record is None:
+                raise
+            return Response(record.as_detail())
+
+    def history_response(self, queryset, serializer_class, archived=None):
+        """
+        Resposta paginada com os registos ativos de ``queryset`` e os
+        arquivados de ``archived`` (por omissão, os visíveis ao utilizador)
+        """
+        if self.include_archived():
+            if archived is None:
+                archived = self.archived_records()
+            queryset = ArchivedHistory(queryset, archived, serializer_class)
+
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            if isinstance(queryset, ArchivedHistory):
+                return self.get_paginated_response(page)
+            return self.get_paginated_response(serializer_class(page, many=True).data)
+
+        if isinstance(queryset, ArchivedHistory):
+            return Response(queryset[0:None])
+        return Response(serializer_class(queryset, many=True).data)
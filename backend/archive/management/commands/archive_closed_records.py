@@ -0,0 +1,56 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from archive.service import KINDS, ArchiveService, NotificationRetention
+
+
+class Command(BaseCommand):
+    help = (
+        'Move empréstimos, solicitações e reservas encerrados há mais de ARCHIVE_AFTER_DAYS dias '
+        'para o arquivo e apaga as notificações fora do prazo de retenção'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=None,
+                            help='Idade mínima (dias desde o encerramento) para arquivar (padrão: ARCHIVE_AFTER_DAYS)')
+        parser.add_argument('--kind', choices=sorted(KINDS), action='append',
+                            help='Arquiva apenas este tipo (pode repetir)')
+        parser.add_argument('--batch-size', type=int, default=ArchiveService.BATCH_SIZE,
+                            help=f'Registos por transação (padrão: {ArchiveService.BATCH_SIZE})')
+        parser.add_argument('--limit', type=int, default=None,
+                            help='Máximo de registos a arquivar por tipo nesta execução')
+        parser.add_argument('--notification-days', type=int, default=None,
+                            help='Retenção das notificações lidas (padrão: NOTIFICATION_RETENTION_DAYS)')
+        parser.add_argument('--skip-notifications', action='store_true',
+                            help='Não aplica a retenção das notificações')
+        parser.add_argument('--dry-run', action='store_true', help='Apenas mostra quantos registos seriam movidos')
+
+    def handle(self, *args, **options):
+        days = options['days']
+        if days is None:
+            days = ArchiveService.archive_after_days()
+        kinds = options['kind'] or list(KINDS)
+        started = time.monotonic()
+
+        self.stdout.write(f"🗄️  A arquivar registos encerrados há mais de {days} dia(s)...")
+        for kind in kinds:
+            if options['dry_run']:
+                self.stdout.write(f"   {kind}: {ArchiveService.pending(kind, days)} registo(s) a arquivar")
+                continue
+            moved = ArchiveService.archive(
+                kind, days=days, batch_size=options['batch_size'], limit=options['limit']
+            )
+            self.stdout.write(f"   {kind}: {moved} registo(s) arquivado(s)")
+
+        if not options['skip_notifications']:
+            read_days = options['notification_days']
+            if options['dry_run']:
+                expired = NotificationRetention.expired(read_days).count()
+                self.stdout.write(f"   notificações: {expired} a apagar")
+            else:
+                deleted = NotificationRetention.purge(read_days, batch_size=options['batch_size'])
+                self.stdout.write(f"   notificações: {deleted} apagada(s)")
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(f"✅ Concluído em {elapsed:.1f}s"))
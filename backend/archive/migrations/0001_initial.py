@@ -0,0 +1,44 @@
+# Generated by Django 4.2.9 on 2026-10-19 02:08
+
+from django.conf import settings
+import django.core.serializers.json
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedRecord',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('loan', 'Empréstimo'), ('loan_request', 'Solicitação'), ('reservation', 'Reserva')], max_length=20, verbose_name='Tipo')),
+                ('original_id', models.IntegerField(verbose_name='ID original')),
+                ('status', models.CharField(max_length=20, verbose_name='Status')),
+                ('created_at', models.DateTimeField(verbose_name='Criado em')),
+                ('closed_at', models.DateTimeField(verbose_name='Encerrado em')),
+                ('archived_at', models.DateTimeField(auto_now_add=True, verbose_name='Arquivado em')),
+                ('summary', models.JSONField(default=dict, encoder=django.core.serializers.json.DjangoJSONEncoder, verbose_name='Resumo')),
+                ('data', models.JSONField(default=dict, encoder=django.core.serializers.json.DjangoJSONEncoder, verbose_name='Dados')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Usuário')),
+            ],
+            options={
+                'verbose_name': 'Registo Arquivado',
+                'verbose_name_plural': 'Registos Arquivados',
+                'db_table': 'archived_records',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['kind', 'user', 'created_at'], name='archived_kind_user_created_idx'), models.Index(fields=['kind', 'created_at'], name='archived_kind_created_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='archivedrecord',
+            constraint=models.UniqueConstraint(fields=('kind', 'original_id'), name='archived_kind_original_uniq'),
+        ),
+    ]
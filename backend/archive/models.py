@@ -0,0 +1,74 @@
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models
+from django.db.models import Count
+
+
+class ArchivedRecordQuerySet(models.QuerySet):
+
+    def status_counts(self):
+        """
+        Retorna {status: número de registos arquivados}
+        """
+        rows = self.order_by().values('status').annotate(count=Count('id'))
+        return {row['status']: row['count'] for row in rows}
+
+
+class ArchivedRecord(models.Model):
+    """
+    Empréstimo, solicitação ou reserva encerrado há muito tempo, retirado das
+    tabelas ativas por ``archive_closed_records``.
+
+    ``summary`` guarda a representação de listagem (a mesma que a API devolvia
+    quando o registo foi arquivado) e ``data`` todos os campos do registo,
+    incluindo os itens associados, para consulta e auditoria.
+    """
+    KIND_CHOICES = [
+        ('loan', 'Empréstimo'),
+        ('loan_request', 'Solicitação'),
+        ('reservation', 'Reserva'),
+    ]
+
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES, verbose_name='Tipo')
+    original_id = models.IntegerField(verbose_name='ID original')
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Usuário'
+    )
+    status = models.CharField(max_length=20, verbose_name='Status')
+    created_at = models.DateTimeField(verbose_name='Criado em')
+    closed_at = models.DateTimeField(verbose_name='Encerrado em')
+    archived_at = models.DateTimeField(auto_now_add=True, verbose_name='Arquivado em')
+    summary = models.JSONField(encoder=DjangoJSONEncoder, default=dict, verbose_name='Resumo')
+    data = models.JSONField(encoder=DjangoJSONEncoder, default=dict, verbose_name='Dados')
+
+    objects = ArchivedRecordQuerySet.as_manager()
+
+    class Meta:
+        db_table = 'archived_records'
+        verbose_name = 'Registo Arquivado'
+        verbose_name_plural = 'Registos Arquivados'
+        ordering = ['-created_at']
+        constraints = [
+            models.UniqueConstraint(fields=['kind', 'original_id'], name='archived_kind_original_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['kind', 'user', 'created_at'], name='archived_kind_user_created_idx'),
+            models.Index(fields=['kind', 'created_at'], name='archived_kind_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} #{self.original_id} (arquivado)"
+
+    def as_list_item(self):
+        return {**self.summary, 'archived': True}
+
+    def as_detail(self):
+        return {
+            **self.summary,
+            **self.data,
+            'archived': True,
+            'archived_at': self.archived_at,
+        }
@@ -0,0 +1,253 @@
+"""
+Arquivo de registos encerrados (tabelas "quentes" e "frias")
+
+Empréstimos, solicitações e reservas encerrados há mais de
+``ARCHIVE_AFTER_DAYS`` dias passam para ``archived_records`` e saem das
+tabelas ativas, que ficam com o tamanho do trabalho em curso. A cópia é feita
+por blocos de chave primária, cada bloco numa transação (copia e apaga), para
+não prender a base de dados durante muito tempo.
+
+As notificações não são arquivadas: têm uma política de retenção e são
+apagadas quando lidas há mais de ``NOTIFICATION_RETENTION_DAYS`` dias (ou por
+ler há mais de ``NOTIFICATION_UNREAD_RETENTION_DAYS``).
+"""
+
+import shutil
+from datetime import timedelta
+
+from django.apps import apps
+from django.conf import settings
+from django.db import router, transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import ArchivedRecord
+
+DEFAULT_ARCHIVE_AFTER_DAYS = 180
+DEFAULT_NOTIFICATION_RETENTION_DAYS = 90
+DEFAULT_NOTIFICATION_UNREAD_RETENTION_DAYS = 365
+
+
+def _row(obj):
+    """Valores de todas as colunas do objeto, pelo nome da coluna no modelo"""
+    return {field.attname: getattr(obj, field.attname) for field in obj._meta.concrete_fields}
+
+
+class ArchiveKind:
+    """
+    Tipo arquivável: modelo, serializer de listagem e critério de encerramento
+    """
+
+    def __init__(self, kind, model, serializer, closed, select_related=(), prefetch_related=(), extra=None):
+        self.kind = kind
+        self.model_label = model
+        self.serializer_path = serializer
+        self.closed = closed
+        self.select_related = select_related
+        self.prefetch_related = prefetch_related
+        self.extra = extra
+
+    @property
+    def model(self):
+        return apps.get_model(self.model_label)
+
+    @property
+    def serializer(self):
+        return import_string(self.serializer_path)
+
+    def candidates(self, cutoff):
+        return self.model.objects.filter(self.closed(cutoff))
+
+    def snapshot(self, obj):
+        data = _row(obj)
+        if self.extra:
+            data.update(self.extra(obj))
+        return data
+
+
+def _loan_items(loan):
+    return {'loan_equipments': [_row(item) for item in loan.loan_equipments.all()]}
+
+
+def _request_items(loan_request):
+    return {'equipments': [equipment.pk for equipment in loan_request.equipments.all()]}
+
+
+KINDS = {
+    'loan': ArchiveKind(
+        'loan', 'loans.Loan', 'loans.serializers.LoanListSerializer',
+        lambda cutoff: Q(status__in=['concluido', 'cancelado'], updated_at__lt=cutoff),
+        prefetch_related=['loan_equipments'],
+        extra=_loan_items,
+    ),
+    'loan_request': ArchiveKind(
+        'loan_request', 'loans.LoanRequest', 'loans.serializers.LoanRequestListSerializer',
+        # Autorizadas e levantadas (dupla confirmação) já deram origem ao empréstimo
+        lambda cutoff: (
+            Q(status__in=['rejeitado', 'cancelado'])
+            | Q(status='autorizado', confirmado_pelo_tecnico=True, confirmado_pelo_utente=True)
+        ) & Q(updated_at__lt=cutoff),
+        select_related=['tecnico_responsavel', 'aprovado_por'],
+        prefetch_related=['equipments'],
+        extra=_request_items,
+    ),
+    'reservation': ArchiveKind(
+        'reservation', 'reservations.Reservation', 'reservations.serializers.ReservationListSerializer',
+        # Confirmadas cujo levantamento já passou também estão encerradas
+        lambda cutoff: (
+            Q(status__in=['cancelada', 'expirada'])
+            | Q(status='confirmada', expected_pickup_date__lt=cutoff.date())
+        ) & Q(updated_at__lt=cutoff),
+    ),
+}
+
+
+class ArchiveService:
+    """
+    Move registos encerrados para o arquivo, por blocos transacionais
+    """
+
+    BATCH_SIZE = 500
+
+    @staticmethod
+    def archive_after_days():
+        return getattr(settings, 'ARCHIVE_AFTER_DAYS', DEFAULT_ARCHIVE_AFTER_DAYS)
+
+    @classmethod
+    def cutoff(cls, days=None):
+        days = cls.archive_after_days() if days is None else days
+        return timezone.now() - timedelta(days=days)
+
+    @classmethod
+    def pending_queryset(cls, kind, days=None):
+        return KINDS[kind].candidates(cls.cutoff(days))
+
+    @classmethod
+    def pending(cls, kind, days=None):
+        """
+        Número de registos que seriam arquivados
+        """
+        return cls.pending_queryset(kind, days).count()
+
+    @classmethod
+    def archive(cls, kind, days=None, batch_size=None, limit=None):
+        """
+        Arquiva os registos encerrados de um tipo. Retorna o número de registos movidos.
+        """
+        spec = KINDS[kind]
+        cutoff = cls.cutoff(days)
+        batch_size = batch_size or cls.BATCH_SIZE
+        candidates = spec.candidates(cutoff).order_by('pk').values_list('pk', flat=True)
+
+        moved = 0
+        while limit is None or moved < limit:
+            size = batch_size if limit is None else min(batch_size, limit - moved)
+            ids = list(candidates[:size])
+            if not ids:
+                break
+            count = cls._move(spec, cutoff, ids)
+            if not count:
+                break
+            moved += count
+        return moved
+
+    @classmethod
+    def _move(cls, spec, cutoff, ids):
+        model = spec.model
+        with transaction.atomic(using=router.db_for_write(model)):
+            # O critério é reavaliado dentro da transação: um registo reaberto
+            # entretanto fica nas tabelas ativas
+            objs = list(
+                model.objects.filter(spec.closed(cutoff), pk__in=ids)
+                .select_related(*spec.select_related)
+                .prefetch_related(*spec.prefetch_related)
+            )
+            if not objs:
+                return 0
+            summaries = spec.serializer(objs, many=True).data
+            archived_ids = [obj.pk for obj in objs]
+            # Um registo já arquivado que voltou às tabelas ativas (ex.: restaurado
+            # de uma cópia) tem a cópia substituída pelo estado atual: a linha
+            # ativa só é apagada depois de o seu estado ficar no arquivo
+            ArchivedRecord.objects.filter(kind=spec.kind, original_id__in=archived_ids).delete()
+            ArchivedRecord.objects.bulk_create(
+                [
+                    ArchivedRecord(
+                        kind=spec.kind,
+                        original_id=obj.pk,
+                        user_id=obj.user_id,
+                        status=obj.status,
+                        created_at=obj.created_at,
+                        closed_at=obj.updated_at,
+                        summary=summary,
+                        data=spec.snapshot(obj),
+                    )
+                    for obj, summary in zip(objs, summaries)
+                ],
+            )
+            # O delete dispara os signals que limpam os índices de pesquisa e de leitura
+            model.objects.filter(pk__in=archived_ids).delete()
+            if spec.kind == 'loan_request':
+                transaction.on_commit(lambda: cls._remove_pdfs(archived_ids))
+        return len(objs)
+
+    @staticmethod
+    def _remove_pdfs(ids):
+        from loans.pdf_cache import cache_dir
+
+        directory = cache_dir()
+        for pk in ids:
+            shutil.rmtree(directory / str(pk), ignore_errors=True)
+
+    @classmethod
+    def archive_all(cls, days=None, batch_size=None):
+        """
+        Arquiva todos os tipos; retorna {tipo: registos movidos}
+        """
+        return {kind: cls.archive(kind, days=days, batch_size=batch_size) for kind in KINDS}
+
+
+class NotificationRetention:
+    """
+    Apaga notificações antigas, por blocos
+    """
+
+    BATCH_SIZE = 1000
+
+    @staticmethod
+    def _days(name, default):
+        return getattr(settings, name, default)
+
+    @classmethod
+    def expired(cls, read_days=None, unread_days=None):
+        Notification = apps.get_model('notifications', 'Notification')
+        if read_days is None:
+            read_days = cls._days('NOTIFICATION_RETENTION_DAYS', DEFAULT_NOTIFICATION_RETENTION_DAYS)
+        if unread_days is None:
+            unread_days = cls._days('NOTIFICATION_UNREAD_RETENTION_DAYS', DEFAULT_NOTIFICATION_UNREAD_RETENTION_DAYS)
+        now = timezone.now()
+        return Notification.objects.filter(
+            Q(read=True, created_at__lt=now - timedelta(days=read_days))
+            | Q(created_at__lt=now - timedelta(days=unread_days))
+        )
+
+    @classmethod
+    def purge(cls, read_days=None, unread_days=None, batch_size=None):
+        """
+        Apaga as notificações fora do prazo de retenção. Retorna o número apagado.
+        """
+        batch_size = batch_size or cls.BATCH_SIZE
+        expired = cls.expired(read_days, unread_days)
+        ids_query = expired.order_by('pk').values_list('pk', flat=True)
+        using = router.db_for_write(expired.model)
+
+        deleted = 0
+        while True:
+            ids = list(ids_query[:batch_size])
+            if not ids:
+                break
+            with transaction.atomic(using=using):
+                count, _ = expired.model.objects.filter(pk__in=ids).delete()
+            deleted += count
+        return deleted
@@ -0,0 +1,244 @@
+import csv
+import io
+from datetime import timedelta
+from unittest.mock import patch
+
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from accounts.models import User
+from equipment.models import Equipment
+from loans.models import Loan, LoanRequest
+from loans.monthly_report import MonthlyLoanReport
+from loans.serializers import LoanListSerializer
+from reservations.models import Reservation
+
+from .history import ArchivedHistory
+from .models import ArchivedRecord
+from .service import KINDS, ArchiveService
+
+
+class ArchiveTestMixin:
+
+    def setUp(self):
+        self.owner = User.objects.create(email='dono@x.com', username='dono@x.com', name='Dono', role='docente')
+        self.equipment = Equipment.objects.create(brand='HP', model='X', type='notebook', serial_number='SN1')
+        self.today = timezone.now().date()
+
+    def _loan(self, loan_status='concluido', days_ago=200, user=None):
+        loan = Loan.objects.create(
+            user=user or self.owner, equipment=self.equipment, start_date=self.today,
+            expected_return_date=self.today + timedelta(days=7), purpose='Aula', status=loan_status,
+        )
+        # update() não mexe em auto_now: simula um registo encerrado há muito tempo
+        old = timezone.now() - timedelta(days=days_ago)
+        Loan.objects.filter(pk=loan.pk).update(created_at=old, updated_at=old)
+        return loan
+
+
+class ArchiveServiceTests(ArchiveTestMixin, TestCase):
+    """
+    Cópia por blocos para o arquivo
+    """
+
+    def test_closed_loans_are_moved(self):
+        closed = self._loan()
+        recent = self._loan(days_ago=10)
+        active = self._loan(loan_status='ativo')
+
+        self.assertEqual(ArchiveService.archive('loan'), 1)
+
+        self.assertFalse(Loan.objects.filter(pk=closed.pk).exists())
+        self.assertEqual(set(Loan.objects.values_list('pk', flat=True)), {recent.pk, active.pk})
+        record = ArchivedRecord.objects.get(kind='loan', original_id=closed.pk)
+        self.assertEqual(record.summary['id'], closed.pk)
+        self.assertEqual(record.data['status'], 'concluido')
+
+    def test_closed_criterion_is_rechecked_inside_the_batch(self):
+        loan = self._loan()
+        ids = [loan.pk]
+        # Reaberto entre a seleção dos ids e a transação do bloco
+        Loan.objects.filter(pk=loan.pk).update(status='ativo')
+
+        moved = ArchiveService._move(KINDS['loan'], ArchiveService.cutoff(), ids)
+
+        self.assertEqual(moved, 0)
+        self.assertTrue(Loan.objects.filter(pk=loan.pk).exists())
+        self.assertFalse(ArchivedRecord.objects.exists())
+
+    def test_existing_archive_row_is_replaced_by_live_data(self):
+        loan = self._loan()
+        Loan.objects.filter(pk=loan.pk).update(notes='Estado atual')
+        ArchivedRecord.objects.create(
+            kind='loan', original_id=loan.pk, user=self.owner, status='cancelado',
+            created_at=timezone.now(), closed_at=timezone.now(), summary={'id': loan.pk, 'stale': True},
+        )
+
+        self.assertEqual(ArchiveService.archive('loan'), 1)
+
+        # A linha ativa sai das tabelas só com o seu estado atual no arquivo
+        self.assertFalse(Loan.objects.filter(pk=loan.pk).exists())
+        record = ArchivedRecord.objects.get(kind='loan', original_id=loan.pk)
+        self.assertNotIn('stale', record.summary)
+        self.assertEqual(record.status, 'concluido')
+        self.assertEqual(record.data['notes'], 'Estado atual')
+
+
+class ArchiveReadThroughTests(ArchiveTestMixin, TestCase):
+    """
+    Registos arquivados nos endpoints de histórico
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.loan = self._loan()
+        ArchiveService.archive('loan')
+        self.url = f'/api/v1/loans/{self.loan.pk}/'
+
+    def _client(self, user):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client
+
+    def test_owner_retrieves_archived_loan(self):
+        response = self._client(self.owner).get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.data['archived'])
+        self.assertEqual(response.data['id'], self.loan.pk)
+
+    def test_other_user_cannot_retrieve_archived_loan(self):
+        other = User.objects.create(email='outro@x.com', username='outro@x.com', name='Outro', role='docente')
+        self.assertEqual(self._client(other).get(self.url).status_code, 404)
+
+    def test_technician_retrieves_any_archived_loan(self):
+        tecnico = User.objects.create(email='tec@x.com', username='tec@x.com', name='Tec', role='tecnico')
+        self.assertEqual(self._client(tecnico).get(self.url).status_code, 200)
+
+
+class ArchivedHistoryTests(ArchiveTestMixin, TestCase):
+    """
+    Páginas da sequência ativos + arquivados
+    """
+
+    def setUp(self):
+        super().setUp()
+        # Criados há 201..207 dias; os de índice ímpar ficam arquivados
+        self.loans = [self._loan(days_ago=201 + n) for n in range(7)]
+        for n, loan in enumerate(self.loans):
+            if n % 2 == 0:
+                Loan.objects.filter(pk=loan.pk).update(status='ativo')
+        ArchiveService.archive('loan')
+        self.history = ArchivedHistory(
+            Loan.objects.all(), ArchivedRecord.objects.filter(kind='loan'), LoanListSerializer
+        )
+
+    def test_pages_cover_the_sequence_without_gaps_or_repeats(self):
+        expected = [loan.pk for loan in self.loans]
+        self.assertEqual(self.history.count(), 7)
+
+        pages = [self.history[start:start + 3] for start in range(0, 7, 3)]
+        self.assertEqual([len(page) for page in pages], [3, 3, 1])
+        self.assertEqual([item['id'] for page in pages for item in page], expected)
+        self.assertEqual(
+            [item.get('archived', False) for page in pages for item in page],
+            [n % 2 == 1 for n in range(7)],
+        )
+
+    def test_slice_past_the_end_is_empty(self):
+        self.assertEqual(self.history[7:10], [])
+        self.assertEqual(self.history[6]['id'], self.loans[6].pk)
+
+
+class ArchivedReadersTests(ArchiveTestMixin, TestCase):
+    """
+    Exportações, estatísticas e relatório mensal incluem os registos arquivados
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.coordenador = User.objects.create(
+            email='coord@x.com', username='coord@x.com', name='Coord', role='coordenador'
+        )
+        self.archived_loan = self._loan()
+        self.live_loan = self._loan(loan_status='ativo')
+        ArchiveService.archive('loan')
+
+    def _client(self, user):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client
+
+    def _export(self, url, params=None):
+        response = self._client(self.coordenador).get(url, params or {})
+        self.assertEqual(response.status_code, 200)
+        content = b''.join(response.streaming_content).decode('utf-8-sig')
+        return list(csv.DictReader(io.StringIO(content)))
+
+    def test_loan_export_includes_archived_rows(self):
+        rows = self._export('/api/v1/loans/export/')
+        self.assertEqual(
+            [(row['id'], row['arquivado']) for row in rows],
+            [(str(self.archived_loan.pk), 'True'), (str(self.live_loan.pk), 'False')],
+        )
+        self.assertEqual(rows[0]['utente'], 'Dono')
+        self.assertEqual(rows[0]['equipamento_serie'], 'SN1')
+
+        rows = self._export('/api/v1/loans/export/', {'status': 'concluido'})
+        self.assertEqual([row['id'] for row in rows], [str(self.archived_loan.pk)])
+        rows = self._export('/api/v1/loans/export/', {'include_archived': 'false'})
+        self.assertEqual([row['id'] for row in rows], [str(self.live_loan.pk)])
+
+    def test_export_refuses_filters_the_archive_cannot_apply(self):
+        response = self._client(self.coordenador).get('/api/v1/loans/export/', {'equipment__type': 'notebook'})
+        self.assertEqual(response.status_code, 400)
+        response = self._client(self.coordenador).get(
+            '/api/v1/loans/export/', {'equipment__type': 'notebook', 'include_archived': 'false'}
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def test_reservation_export_includes_archived_rows(self):
+        reservation = Reservation.objects.create(
+            user=self.owner, equipment=self.equipment, expected_pickup_date=self.today,
+            purpose='Aula', status='cancelada',
+        )
+        old = timezone.now() - timedelta(days=200)
+        Reservation.objects.filter(pk=reservation.pk).update(created_at=old, updated_at=old)
+        ArchiveService.archive('reservation')
+
+        rows = self._export('/api/v1/reservations/export/', {'equipment': self.equipment.pk})
+        self.assertEqual([(row['id'], row['arquivado']) for row in rows], [(str(reservation.pk), 'True')])
+        self.assertEqual(rows[0]['equipamento_marca'], 'HP')
+
+    def test_loan_request_export_includes_archived_rows(self):
+        loan_request = LoanRequest.objects.create(
+            user=self.owner, quantity=2, purpose='Aula', expected_return_date=self.today, status='rejeitado',
+        )
+        loan_request.equipments.add(self.equipment)
+        old = timezone.now() - timedelta(days=200)
+        LoanRequest.objects.filter(pk=loan_request.pk).update(created_at=old, updated_at=old)
+        ArchiveService.archive('loan_request')
+
+        rows = self._export('/api/v1/loan-requests/export/')
+        self.assertEqual([(row['id'], row['arquivado']) for row in rows], [(str(loan_request.pk), 'True')])
+        self.assertEqual(rows[0]['equipamentos'], 'SN1')
+
+    def test_stats_count_archived_loans(self):
+        response = self._client(self.coordenador).get('/api/v1/loans/stats/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['total_loans'], 2)
+        self.assertEqual(response.data['completed_loans'], 1)
+        self.assertEqual(response.data['active_loans'], 1)
+        self.assertEqual(response.data['top_borrowers'], [{'user__name': 'Dono', 'loan_count': 2}])
+        self.assertEqual(
+            response.data['most_borrowed_equipment'],
+            [{'equipment__brand': 'HP', 'equipment__model': 'X', 'loan_count': 2}],
+        )
+
+    def test_monthly_report_counts_archived_loans(self):
+        report = MonthlyLoanReport(self.today.year, self.today.month)
+        self.assertEqual(report.summary()[0], ['Empréstimos iniciados', '2'])
+        started = list(report._loan_rows(report.loans_started(), report.archived_loans_started(), 'start_date'))
+        self.assertEqual([row[0] for row in started], [str(self.archived_loan.pk), str(self.live_loan.pk)])
+        with patch('loans.monthly_report.CHUNK_ROWS', 1):
+            self.assertGreater(len(report.generate().getvalue()), 0)
@@ -0,0 +1,268 @@
+"""
+Cópias de segurança da base de dados com o serviço em funcionamento
+
+Copiar o ficheiro ``db.sqlite3`` com a aplicação a escrever pode produzir uma
+cópia inconsistente. ``SQLiteOnlineBackup`` usa a API de backup do SQLite em
+passos de ``pages_per_step`` páginas, com uma pausa entre passos: o bloqueio
+de leitura só é mantido durante cada passo, pelo que os empréstimos e
+devoluções continuam a ser gravados durante a cópia. A cópia é verificada com
+``PRAGMA integrity_check`` e comprimida com gzip.
+
+O backend é escolhido pelo ``vendor`` da base de dados
+(``DATABASE_BACKUP_BACKENDS``); ``PostgreSQLDumpBackup`` usa ``pg_dump``.
+Um backend implementa ``available``, ``suffix`` e ``run``.
+"""
+
+import gzip
+import os
+import shutil
+import sqlite3
+import subprocess
+import tempfile
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connections
+from django.utils.module_loading import import_string
+
+DEFAULT_BACKENDS = {
+    'sqlite': 'equipahub.backup.SQLiteOnlineBackup',
+    'postgresql': 'equipahub.backup.PostgreSQLDumpBackup',
+}
+COPY_CHUNK_SIZE = 1024 * 1024
+
+
+class BackupError(Exception):
+    pass
+
+
+class _TooManyRestarts(Exception):
+    pass
+
+
+class BackupResult:
+    """
+    Resultado de uma cópia: ficheiro final, tamanhos e tempos de cada fase
+    """
+
+    def __init__(self, path, source_size, size, copy_seconds, verify_seconds=0.0,
+                 compress_seconds=0.0, restarts=0, verified=False):
+        self.path = path
+        self.source_size = source_size
+        self.size = size
+        self.copy_seconds = copy_seconds
+        self.verify_seconds = verify_seconds
+        self.compress_seconds = compress_seconds
+        self.restarts = restarts
+        self.verified = verified
+
+    @property
+    def elapsed(self):
+        return self.copy_seconds + self.verify_seconds + self.compress_seconds
+
+    @property
+    def throughput(self):
+        """MB/s da cópia (tamanho da base de dados / tempo de cópia)"""
+        return self.source_size / (1024 * 1024) / max(self.copy_seconds, 1e-6)
+
+    @property
+    def ratio(self):
+        return self.size / self.source_size if self.source_size else 1.0
+
+
+def get_backup_backend(alias='default', **options):
+    """
+    Instancia o backend de cópia adequado à base de dados ``alias``
+    """
+    vendor = connections[alias].vendor
+    backends = {**DEFAULT_BACKENDS, **getattr(settings, 'DATABASE_BACKUP_BACKENDS', {})}
+    if vendor not in backends:
+        raise BackupError(f"Sem backend de cópia para a base de dados '{vendor}'.")
+    return import_string(backends[vendor])(settings.DATABASES[alias], **options)
+
+
+def _gzip(source, destination, level):
+    with open(source, 'rb') as src, gzip.open(destination, 'wb', compresslevel=level) as dst:
+        shutil.copyfileobj(src, dst, COPY_CHUNK_SIZE)
+
+
+class SQLiteOnlineBackup:
+    """
+    Cópia incremental com a API de backup do SQLite.
+
+    Se outra ligação escrever na base de dados durante a cópia, o SQLite
+    recomeça-a. Ao fim de ``max_restarts`` recomeços as páginas em falta são
+    copiadas num único passo (em WAL os leitores não bloqueiam os escritores).
+    """
+
+    extension = '.sqlite3'
+
+    def __init__(self, settings_dict, pages_per_step=256, sleep=0.05, verify=True,
+                 compress=True, compress_level=6, max_restarts=20, timeout=30):
+        self.name = str(settings_dict['NAME'])
+        self.pages_per_step = pages_per_step
+        self.sleep = sleep
+        self.verify = verify
+        self.compress = compress
+        self.compress_level = compress_level
+        self.max_restarts = max_restarts
+        self.timeout = timeout
+
+    def available(self):
+        return self.name != ':memory:' and os.path.exists(self.name)
+
+    @property
+    def suffix(self):
+        return self.extension + ('.gz' if self.compress else '')
+
+    def _copy(self, target, progress=None):
+        """
+        Copia a base de dados para ``target``; retorna o número de recomeços
+        """
+        state = {'remaining': None, 'restarts': 0}
+
+        def on_step(status, remaining, total):
+            # Cada passo copia páginas: se o que falta não diminuiu, a cópia recomeçou
+            if state['remaining'] is not None and remaining >= state['remaining']:
+                state['restarts'] += 1
+            state['remaining'] = remaining
+            if progress:
+                progress(total - remaining, total)
+            if state['restarts'] > self.max_restarts:
+                raise _TooManyRestarts()
+
+        source = sqlite3.connect(self.name, timeout=self.timeout)
+        try:
+            destination = sqlite3.connect(str(target))
+            try:
+                try:
+                    source.backup(destination, pages=self.pages_per_step, progress=on_step, sleep=self.sleep)
+                except _TooManyRestarts:
+                    source.backup(destination, pages=-1)
+            finally:
+                destination.close()
+        finally:
+            source.close()
+        return state['restarts']
+
+    @staticmethod
+    def integrity_check(path):
+        connection = sqlite3.connect(str(path))
+        try:
+            rows = [row[0] for row in connection.execute('PRAGMA integrity_check')]
+        except sqlite3.DatabaseError as e:
+            # Ficheiros muito danificados nem chegam a ser verificados
+            rows = [str(e)]
+        finally:
+            connection.close()
+        if rows != ['ok']:
+            raise BackupError(f"A cópia falhou a verificação de integridade: {'; '.join(rows[:5])}")
+
+    def run(self, destination, progress=None):
+        """
+        Cria a cópia em ``destination`` e retorna um ``BackupResult``
+        """
+        if not self.available():
+            raise BackupError(f"Base de dados SQLite não encontrada: {self.name}")
+        destination = Path(destination)
+        destination.parent.mkdir(parents=True, exist_ok=True)
+
+        # A cópia não comprimida fica ao lado do destino (mesmo disco) até ser verificada
+        fd, raw_path = tempfile.mkstemp(suffix=self.extension, dir=destination.parent)
+        os.close(fd)
+        raw_path = Path(raw_path)
+        partial = destination.with_name(destination.name + '.part')
+        try:
+            started = time.monotonic()
+            restarts = self._copy(raw_path, progress)
+            copy_seconds = time.monotonic() - started
+            source_size = raw_path.stat().st_size
+
+            verify_seconds = 0.0
+            if self.verify:
+                started = time.monotonic()
+                self.integrity_check(raw_path)
+                verify_seconds = time.monotonic() - started
+
+            compress_seconds = 0.0
+            if self.compress:
+                started = time.monotonic()
+                _gzip(raw_path, partial, self.compress_level)
+                os.replace(partial, destination)
+                compress_seconds = time.monotonic() - started
+            else:
+                os.replace(raw_path, destination)
+        finally:
+            raw_path.unlink(missing_ok=True)
+            partial.unlink(missing_ok=True)
+
+        return BackupResult(
+            destination, source_size, destination.stat().st_size, copy_seconds,
+            verify_seconds=verify_seconds, compress_seconds=compress_seconds,
+            restarts=restarts, verified=self.verify,
+        )
+
+
+class PostgreSQLDumpBackup:
+    """
+    Cópia com ``pg_dump`` no formato custom (já comprimido), verificada com
+    ``pg_restore --list``. Não bloqueia escritas: o pg_dump lê um snapshot.
+    """
+
+    extension = '.dump'
+
+    def __init__(self, settings_dict, verify=True, compress=True, compress_level=6, **options):
+        self.settings_dict = settings_dict
+        self.verify = verify
+        self.compress_level = compress_level if compress else 0
+
+    @property
+    def suffix(self):
+        return self.extension
+
+    def available(self):
+        return shutil.which('pg_dump') is not None
+
+    def _command(self, destination):
+        db = self.settings_dict
+        command = ['pg_dump', '--format=custom', f'--compress={self.compress_level}', f'--file={destination}']
+        if db.get('HOST'):
+            command.append(f"--host={db['HOST']}")
+        if db.get('PORT'):
+            command.append(f"--port={db['PORT']}")
+        if db.get('USER'):
+            command.append(f"--username={db['USER']}")
+        command.append(db['NAME'])
+        return command
+
+    def run(self, destination, progress=None):
+        if not self.available():
+            raise BackupError('pg_dump não encontrado no PATH.')
+        destination = Path(destination)
+        destination.parent.mkdir(parents=True, exist_ok=True)
+        env = {**os.environ}
+        if self.settings_dict.get('PASSWORD'):
+            env['PGPASSWORD'] = self.settings_dict['PASSWORD']
+
+        partial = destination.with_name(destination.name + '.part')
+        started = time.monotonic()
+        try:
+            subprocess.run(self._command(partial), env=env, check=True, capture_output=True)
+            copy_seconds = time.monotonic() - started
+
+            verify_seconds = 0.0
+            if self.verify:
+                started = time.monotonic()
+                subprocess.run(['pg_restore', '--list', str(partial)], check=True, capture_output=True)
+                verify_seconds = time.monotonic() - started
+            os.replace(partial, destination)
+        except subprocess.CalledProcessError as e:
+            raise BackupError(e.stderr.decode(errors='replace').strip() or str(e))
+        finally:
+            partial.unlink(missing_ok=True)
+
+        size = destination.stat().st_size
+        return BackupResult(
+            destination, size, size, copy_seconds, verify_seconds=verify_seconds, verified=self.verify,
+        )
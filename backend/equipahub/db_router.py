@@ -0,0 +1,213 @@
+"""
+Encaminhamento entre bases de dados
+
+- ``notifications``: se o alias existir, a app de notificações (muitas
+  escritas, sem transações partilhadas com empréstimos) vive na sua própria
+  base de dados.
+- ``replica``: se o alias existir, as leituras de pedidos só de leitura
+  (GET/HEAD/OPTIONS) e dos comandos de relatórios (``use_replica()``) vão para
+  a réplica. Ficam sempre na base principal:
+
+  - utilizadores, sessões e permissões (``PRIMARY_ONLY_APPS``): a autenticação
+    não pode falhar para um utilizador criado depois da última sincronização;
+  - as leituras depois de uma escrita no mesmo pedido (read-your-writes) e os
+    pedidos de um utilizador que escreveu há menos de
+    ``REPLICA_STICKY_SECONDS`` segundos (marca na cache por ``user.pk``; com
+    vários processos a cache tem de ser partilhada);
+  - todas as leituras enquanto o atraso da réplica for superior a
+    ``REPLICA_MAX_LAG_SECONDS`` (SQLite: idade do ficheiro copiado por
+    ``sync_replica``; PostgreSQL: ``pg_last_xact_replay_timestamp()``).
+
+Sem estes aliases tudo vai para ``default``, como antes.
+"""
+
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from django.utils.functional import SimpleLazyObject, empty
+
+NOTIFICATIONS_DB = 'notifications'
+REPLICA_DB = 'replica'
+NOTIFICATION_APPS = {'notifications'}
+# Autenticação e permissões: nunca lidas da réplica
+PRIMARY_ONLY_APPS = {'accounts', 'auth', 'contenttypes', 'sessions', 'admin'}
+STICKY_KEY = 'db_primary_pin:{}'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+LAG_CHECK_SECONDS = 1
+
+# Estado do pedido/comando atual: {'replica': pode ler da réplica?, 'wrote': já escreveu?,
+# 'request': pedido HTTP (para saber o utilizador), 'user_checked': marca já consultada?}
+_routing = ContextVar('db_routing', default=None)
+# (instante da medição, atraso em segundos ou None)
+_lag = [0.0, None]
+
+
+def _has(alias):
+    return alias in settings.DATABASES
+
+
+@contextmanager
+def use_replica():
+    """
+    Encaminha as leituras do bloco para a réplica (comandos de relatórios)
+    """
+    token = _routing.set({'replica': True, 'wrote': False})
+    try:
+        yield
+    finally:
+        _routing.reset(token)
+
+
+def _measure_lag():
+    replica = settings.DATABASES[REPLICA_DB]
+    if 'sqlite' in replica['ENGINE']:
+        try:
+            return time.time() - os.path.getmtime(replica['NAME'])
+        except OSError:
+            return None
+    if 'postgresql' in replica['ENGINE']:
+        with connections[REPLICA_DB].cursor() as cursor:
+            cursor.execute(
+                'SELECT COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)'
+            )
+            return float(cursor.fetchone()[0])
+    return 0.0
+
+
+def replica_lag():
+    """
+    Atraso da réplica em segundos (None se desconhecido), medido no máximo
+    uma vez por segundo
+    """
+    now = time.monotonic()
+    if now - _lag[0] >= LAG_CHECK_SECONDS:
+        _lag[0], _lag[1] = now, _measure_lag()
+    return _lag[1]
+
+
+def replica_fresh():
+    lag = replica_lag()
+    return lag is not None and lag <= getattr(settings, 'REPLICA_MAX_LAG_SECONDS', 60)
+
+
+def _request_user_id(request):
+    """
+    ``pk`` do utilizador já autenticado no pedido, sem forçar a autenticação
+    (um ``request.user`` preguiçoso ainda por avaliar é ignorado)
+    """
+    user = request.__dict__.get('user') if request is not None else None
+    if isinstance(user, SimpleLazyObject):
+        user = None if user._wrapped is empty else user._wrapped
+    if user is None or not getattr(user, 'is_authenticated', False):
+        return None
+    return user.pk
+
+
+def pin_to_primary(user_id):
+    """
+    Mantém o utilizador na base principal durante ``REPLICA_STICKY_SECONDS``
+    """
+    cache.set(STICKY_KEY.format(user_id), True, getattr(settings, 'REPLICA_STICKY_SECONDS', 5))
+
+
+def _pinned(state):
+    if state.get('user_checked'):
+        return False
+    user_id = _request_user_id(state.get('request'))
+    if user_id is None:
+        return False
+    state['user_checked'] = True
+    if cache.get(STICKY_KEY.format(user_id)):
+        state['replica'] = False
+        return True
+    return False
+
+
+class DatabaseRouter:
+    """
+    Router para as bases ``default``, ``notifications`` e ``replica``
+    """
+
+    @staticmethod
+    def _is_notification(model):
+        return model._meta.app_label in NOTIFICATION_APPS
+
+    def db_for_read(self, model, **hints):
+        if self._is_notification(model):
+            return NOTIFICATIONS_DB if _has(NOTIFICATIONS_DB) else 'default'
+        if model._meta.app_label in PRIMARY_ONLY_APPS:
+            return 'default'
+        state = _routing.get()
+        if (
+            state and state['replica'] and not state['wrote'] and _has(REPLICA_DB)
+            and not connections['default'].in_atomic_block
+            and not _pinned(state) and replica_fresh()
+        ):
+            return REPLICA_DB
+        return 'default'
+
+    def db_for_write(self, model, **hints):
+        if self._is_notification(model):
+            return NOTIFICATIONS_DB if _has(NOTIFICATIONS_DB) else 'default'
+        state = _routing.get()
+        if state is not None:
+            state['wrote'] = True
+        # Explícito: objetos lidos da réplica são gravados na base principal
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # A réplica tem os mesmos dados da base principal; as notificações
+        # referem utilizadores noutra base (chave sem restrição na BD)
+        if {obj1._state.db, obj2._state.db} <= {'default', REPLICA_DB, None}:
+            return True
+        if self._is_notification(obj1) or self._is_notification(obj2):
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db == REPLICA_DB:
+            return False
+        if _has(NOTIFICATIONS_DB):
+            if app_label in NOTIFICATION_APPS:
+                return db == NOTIFICATIONS_DB
+            if db == NOTIFICATIONS_DB:
+                return False
+        return None
+
+
+class DatabaseRoutingMiddleware:
+    """
+    Marca os pedidos só de leitura como elegíveis para a réplica e fixa o
+    utilizador na base principal depois de um pedido que escreveu
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not _has(REPLICA_DB):
+            return self.get_response(request)
+
+        state = {
+            'replica': request.method in SAFE_METHODS,
+            'wrote': False,
+            'request': request,
+            'user_checked': False,
+        }
+        token = _routing.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _routing.reset(token)
+
+        # O utilizador só é conhecido depois da autenticação (DRF atribui
+        # request.user na view), por isso a marca é gravada no fim do pedido
+        user_id = _request_user_id(request)
+        if state['wrote'] and user_id is not None:
+            pin_to_primary(user_id)
+        return response
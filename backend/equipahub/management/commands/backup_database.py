@@ -0,0 +1,81 @@
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from equipahub.backup import BackupError, get_backup_backend
+
+
+class Command(BaseCommand):
+    help = (
+        'Cria uma cópia de segurança da base de dados sem parar o serviço '
+        '(API de backup do SQLite por passos, verificada e comprimida)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default='default', help='Alias da base de dados (padrão: default)')
+        parser.add_argument('--output', help='Ficheiro ou diretório de destino (padrão: BACKUP_DIR)')
+        parser.add_argument('--pages-per-step', type=int, default=settings.BACKUP_PAGES_PER_STEP,
+                            help=f'Páginas copiadas por passo (padrão: {settings.BACKUP_PAGES_PER_STEP})')
+        parser.add_argument('--sleep-ms', type=int, default=settings.BACKUP_STEP_SLEEP_MS,
+                            help=f'Pausa entre passos, em ms (padrão: {settings.BACKUP_STEP_SLEEP_MS})')
+        parser.add_argument('--compress-level', type=int, default=6, choices=range(1, 10),
+                            help='Nível de compressão gzip (padrão: 6)')
+        parser.add_argument('--no-compress', action='store_true', help='Guarda a cópia sem compressão')
+        parser.add_argument('--no-verify', action='store_true', help='Não corre a verificação de integridade')
+
+    def _destination(self, output, alias, suffix):
+        name = f"{alias}-{timezone.now().strftime('%Y%m%d-%H%M%S')}{suffix}"
+        if not output:
+            return Path(settings.BACKUP_DIR) / name
+        output = Path(output)
+        return output / name if output.is_dir() or not output.suffix else output
+
+    def handle(self, *args, **options):
+        alias = options['database']
+        if alias not in settings.DATABASES:
+            raise CommandError(f"Base de dados desconhecida: {alias}")
+
+        try:
+            backend = get_backup_backend(
+                alias,
+                pages_per_step=options['pages_per_step'],
+                sleep=options['sleep_ms'] / 1000,
+                verify=not options['no_verify'],
+                compress=not options['no_compress'],
+                compress_level=options['compress_level'],
+            )
+        except BackupError as e:
+            raise CommandError(str(e))
+
+        destination = self._destination(options['output'], alias, backend.suffix)
+        self.stdout.write(f"💾 A copiar '{alias}' para {destination}...")
+
+        reported = {'step': -1}
+
+        def progress(done, total):
+            step = done * 10 // max(total, 1)
+            if step != reported['step']:
+                reported['step'] = step
+                self.stdout.write(f"   {done}/{total} páginas ({step * 10}%)")
+
+        try:
+            result = backend.run(destination, progress=progress)
+        except BackupError as e:
+            raise CommandError(str(e))
+
+        mb = 1024 * 1024
+        self.stdout.write(
+            f"   cópia: {result.source_size / mb:.1f} MB em {result.copy_seconds:.2f}s "
+            f"({result.throughput:.1f} MB/s, {result.restarts} recomeço(s))"
+        )
+        if result.verified:
+            self.stdout.write(f"   verificação de integridade: ok ({result.verify_seconds:.2f}s)")
+        if result.compress_seconds:
+            self.stdout.write(
+                f"   compressão: {result.size / mb:.1f} MB ({result.ratio:.0%}) em {result.compress_seconds:.2f}s"
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Cópia concluída em {result.elapsed:.2f}s: {result.path}"
+        ))
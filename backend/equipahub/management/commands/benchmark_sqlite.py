@@ -0,0 +1,117 @@
+import multiprocessing
+import os
+import sqlite3
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand
+
+from equipahub.sqlite_backend.base import DEFAULT_PRAGMAS, apply_pragmas
+
+# Perfis comparados: o SQLite tal como o Django o abre por omissão (ligação
+# nova por pedido, journal DELETE, transações DEFERRED, timeout de 5s) e o
+# perfil de produção (ligação persistente, PRAGMAs e BEGIN IMMEDIATE)
+PROFILES = {
+    'padrao': {'pragmas': {}, 'begin': 'BEGIN', 'reuse': False, 'timeout': 5.0},
+    'producao': {
+        'pragmas': DEFAULT_PRAGMAS, 'begin': 'BEGIN IMMEDIATE', 'reuse': True,
+        'timeout': DEFAULT_PRAGMAS['busy_timeout'] / 1000,
+    },
+}
+
+
+def _connect(path, profile):
+    conn = sqlite3.connect(path, timeout=profile['timeout'], isolation_level=None)
+    if profile['pragmas']:
+        apply_pragmas(conn, profile['pragmas'])
+    return conn
+
+
+def _worker(args):
+    """
+    Executa ``transactions`` transações curtas de leitura+escrita, como um
+    pedido que confirma um empréstimo. Retorna (latências em s, nº de erros).
+    """
+    path, profile_name, worker_id, transactions = args
+    profile = PROFILES[profile_name]
+    conn = _connect(path, profile) if profile['reuse'] else None
+    latencies = []
+    errors = 0
+    for i in range(transactions):
+        started = time.perf_counter()
+        if not profile['reuse']:
+            conn = _connect(path, profile)
+        try:
+            conn.execute(profile['begin'])
+            row_id = (worker_id * transactions + i) % 100 + 1
+            (counter,) = conn.execute('SELECT counter FROM bench WHERE id = ?', (row_id,)).fetchone()
+            conn.execute('UPDATE bench SET counter = ? WHERE id = ?', (counter + 1, row_id))
+            conn.execute('INSERT INTO bench_log (bench_id, payload) VALUES (?, ?)', (row_id, 'x' * 200))
+            conn.execute('COMMIT')
+            latencies.append(time.perf_counter() - started)
+        except sqlite3.OperationalError:
+            errors += 1
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+        finally:
+            if not profile['reuse']:
+                conn.close()
+    if profile['reuse']:
+        conn.close()
+    return latencies, errors
+
+
+class Command(BaseCommand):
+    help = 'Mede o débito de escritas concorrentes no SQLite com o perfil padrão e o de produção'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4, help='Processos escritores em paralelo (padrão: 4)')
+        parser.add_argument('--transactions', type=int, default=300, help='Transações por processo (padrão: 300)')
+
+    def _run(self, profile_name, workers, transactions):
+        directory = tempfile.mkdtemp(prefix='sqlite-bench-')
+        path = os.path.join(directory, 'bench.sqlite3')
+        setup = _connect(path, PROFILES[profile_name])
+        setup.execute('CREATE TABLE bench (id INTEGER PRIMARY KEY, counter INTEGER NOT NULL)')
+        setup.execute('CREATE TABLE bench_log (id INTEGER PRIMARY KEY, bench_id INTEGER, payload TEXT)')
+        setup.executemany('INSERT INTO bench (id, counter) VALUES (?, 0)', [(i,) for i in range(1, 101)])
+        setup.close()
+
+        context = multiprocessing.get_context('spawn')
+        jobs = [(path, profile_name, worker_id, transactions) for worker_id in range(workers)]
+        with context.Pool(workers) as pool:
+            started = time.perf_counter()
+            results = pool.map(_worker, jobs)
+            elapsed = time.perf_counter() - started
+
+        latencies = sorted(latency for worker_latencies, _ in results for latency in worker_latencies)
+        errors = sum(worker_errors for _, worker_errors in results)
+        for name in os.listdir(directory):
+            os.unlink(os.path.join(directory, name))
+        os.rmdir(directory)
+
+        def percentile(p):
+            return latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000 if latencies else 0
+
+        return {
+            'committed': len(latencies),
+            'errors': errors,
+            'throughput': len(latencies) / elapsed,
+            'p50': percentile(0.50),
+            'p95': percentile(0.95),
+        }
+
+    def handle(self, *args, **options):
+        workers = options['workers']
+        transactions = options['transactions']
+        self.stdout.write(
+            f"⏱️  {workers} processo(s) x {transactions} transação(ões) de leitura+escrita por perfil"
+        )
+        for profile_name in PROFILES:
+            result = self._run(profile_name, workers, transactions)
+            self.stdout.write(
+                f"  {profile_name:<9} {result['throughput']:8.0f} tx/s   "
+                f"confirmadas {result['committed']:>6}   erros {result['errors']:>5}   "
+                f"p50 {result['p50']:6.2f} ms   p95 {result['p95']:7.2f} ms"
+            )
+        self.stdout.write(self.style.SUCCESS('✅ Benchmark concluído.'))
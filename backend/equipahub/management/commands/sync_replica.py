@@ -0,0 +1,31 @@
+import sqlite3
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = 'Copia a base de dados principal para a réplica de leitura (SQLite, para testes locais)'
+
+    def handle(self, *args, **options):
+        if 'replica' not in settings.DATABASES:
+            raise CommandError('Configure READ_REPLICA_DATABASE para usar a réplica.')
+        source = settings.DATABASES['default']
+        target = settings.DATABASES['replica']
+        if 'sqlite' not in source['ENGINE'] or 'sqlite' not in target['ENGINE']:
+            raise CommandError('A sincronização local só está disponível com SQLite; use a replicação da base de dados.')
+
+        started = time.monotonic()
+        # API de backup do SQLite: cópia consistente com a base principal em uso
+        src = sqlite3.connect(str(source['NAME']))
+        dst = sqlite3.connect(str(target['NAME']))
+        try:
+            src.backup(dst, pages=1024)
+        finally:
+            dst.close()
+            src.close()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Réplica atualizada em {time.monotonic() - started:.2f}s ({target['NAME']})"
+        ))
@@ -0,0 +1,233 @@
+"""
+Paginação com contagem estimada para tabelas grandes
+
+Cada página da API e cada listagem do admin fazem um ``COUNT(*)`` exato com
+os filtros atuais, que nas tabelas grandes (empréstimos, notificações) custa
+mais do que a própria página. ``EstimatedCountPaginator`` conta no máximo
+``PAGINATION_COUNT_THRESHOLD`` linhas (``COUNT`` sobre um ``LIMIT``); abaixo
+desse limite a contagem é exata. Acima dele usa, por esta ordem:
+
+- a estimativa do número de linhas da tabela, quando a consulta não tem
+  filtros (``sqlite_stat1`` depois de ``ANALYZE``; ``reltuples`` no PostgreSQL);
+- a contagem exata mais recente da mesma consulta, guardada durante
+  ``PAGINATION_COUNT_CACHE_SECONDS`` segundos.
+
+``?exact_count=true`` pede sempre a contagem exata. As respostas com
+contagem aproximada indicam ``count_estimated: true``.
+"""
+
+import hashlib
+import time
+from functools import partial
+
+from django.conf import settings
+from django.core.paginator import EmptyPage, PageNotAnInteger, Paginator
+from django.db import connections
+from django.db.models.query import QuerySet
+from django.utils.functional import cached_property
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+
+from equipment.scan_service import LRUCache
+
+DEFAULT_COUNT_THRESHOLD = 10000
+DEFAULT_COUNT_CACHE_SECONDS = 300
+EXACT_COUNT_PARAM = 'exact_count'
+
+
+def _truthy(value):
+    return (value or '').lower() in ('1', 'true', 'yes')
+
+
+def _sqlite_table_rows(connection, table):
+    """
+    Linhas da tabela segundo as estatísticas de ANALYZE (primeiro número de
+    ``sqlite_stat1.stat``); None se a tabela ainda não foi analisada
+    """
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'sqlite_stat1'")
+        if cursor.fetchone() is None:
+            return None
+        cursor.execute('SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1', [table])
+        row = cursor.fetchone()
+    return int(row[0].split()[0]) if row else None
+
+
+def _postgresql_table_rows(connection, table):
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(%s)', [table])
+        row = cursor.fetchone()
+    return row[0] if row and row[0] is not None and row[0] >= 0 else None
+
+
+TABLE_ESTIMATORS = {
+    'sqlite': _sqlite_table_rows,
+    'postgresql': _postgresql_table_rows,
+}
+
+
+class CountEstimator:
+    """
+    Contagens limitadas, estimadas e em cache para querysets
+    """
+
+    cache = LRUCache(maxsize=1024)
+
+    @staticmethod
+    def threshold():
+        return getattr(settings, 'PAGINATION_COUNT_THRESHOLD', DEFAULT_COUNT_THRESHOLD)
+
+    @staticmethod
+    def cache_seconds():
+        return getattr(settings, 'PAGINATION_COUNT_CACHE_SECONDS', DEFAULT_COUNT_CACHE_SECONDS)
+
+    @staticmethod
+    def _key(queryset):
+        sql, params = queryset.order_by().query.sql_with_params()
+        raw = f"{queryset.db}|{sql}|{params!r}"
+        return hashlib.sha1(raw.encode()).hexdigest()
+
+    @staticmethod
+    def _unfiltered(queryset):
+        query = queryset.query
+        return not query.where and not query.distinct and not query.combinator and len(query.alias_map) <= 1
+
+    @classmethod
+    def table_rows(cls, queryset):
+        connection = connections[queryset.db]
+        estimator = TABLE_ESTIMATORS.get(connection.vendor)
+        if estimator is None:
+            return None
+        return estimator(connection, queryset.model._meta.db_table)
+
+    @classmethod
+    def exact(cls, queryset):
+        count = queryset.count()
+        cls.cache.put(cls._key(queryset), (count, time.monotonic() + cls.cache_seconds()))
+        return count
+
+    @classmethod
+    def cached(cls, queryset):
+        hit = cls.cache.get(cls._key(queryset))
+        if hit is None or hit[1] < time.monotonic():
+            return None
+        return hit[0]
+
+    @classmethod
+    def count(cls, queryset, threshold=None):
+        """
+        Retorna (contagem, é_estimativa)
+        """
+        threshold = cls.threshold() if threshold is None else threshold
+        bounded = queryset.order_by()[:threshold + 1].count()
+        if bounded <= threshold:
+            return bounded, False
+
+        estimate = cls.table_rows(queryset) if cls._unfiltered(queryset) else None
+        if estimate is None:
+            estimate = cls.cached(queryset)
+        if estimate is None:
+            return cls.exact(queryset), False
+        # A estimativa nunca fica abaixo do que já foi contado
+        return max(estimate, bounded), True
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator do Django com contagem estimada acima do limite
+    """
+
+    def __init__(self, object_list, per_page, orphans=0, allow_empty_first_page=True, exact=False, threshold=None):
+        super().__init__(object_list, per_page, orphans, allow_empty_first_page)
+        self.exact = exact
+        self.threshold = threshold
+        self.count_is_estimate = False
+
+    @cached_property
+    def count(self):
+        if not isinstance(self.object_list, QuerySet):
+            return super().count
+        if self.exact:
+            return CountEstimator.exact(self.object_list)
+        count, self.count_is_estimate = CountEstimator.count(self.object_list, self.threshold)
+        return count
+
+    def validate_number(self, number):
+        self.count  # calcula a contagem e count_is_estimate
+        if not self.count_is_estimate:
+            return super().validate_number(number)
+        # Com contagem aproximada não se rejeitam páginas para lá da estimativa
+        try:
+            number = int(number)
+        except (TypeError, ValueError):
+            raise PageNotAnInteger('Número de página inválido')
+        if number < 1:
+            raise EmptyPage('Página inferior a 1')
+        return number
+
+    def page(self, number):
+        page = super().page(number)
+        if self.count_is_estimate and len(page.object_list) < self.per_page:
+            if not page.object_list and page.number > 1:
+                raise EmptyPage('Essa página não contém resultados')
+            # Última página: a contagem real passa a ser conhecida
+            self.count = (page.number - 1) * self.per_page + len(page.object_list)
+            self.count_is_estimate = False
+            self.__dict__.pop('num_pages', None)
+        return page
+
+
+class EstimatedCountPagination(PageNumberPagination):
+    """
+    ``PageNumberPagination`` com contagem estimada; ``?exact_count=true`` pede a exata
+    """
+
+    exact_count_query_param = EXACT_COUNT_PARAM
+
+    @property
+    def django_paginator_class(self):
+        return partial(EstimatedCountPaginator, exact=getattr(self, 'exact_count', False))
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.exact_count = _truthy(request.query_params.get(self.exact_count_query_param))
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        paginator = self.page.paginator
+        return Response({
+            'count': paginator.count,
+            'count_estimated': getattr(paginator, 'count_is_estimate', False),
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        response = super().get_paginated_response_schema(schema)
+        response['properties']['count_estimated'] = {'type': 'boolean', 'example': False}
+        return response
+
+
+class EstimatedCountAdminMixin:
+    """
+    Listagens do admin com contagem estimada. ``?exact_count=1`` no URL da
+    listagem pede a contagem exata (o parâmetro é retirado antes dos filtros).
+    """
+
+    paginator = EstimatedCountPaginator
+    # Evita o segundo COUNT(*) sem filtros ("N resultados (M no total)")
+    show_full_result_count = False
+
+    def changelist_view(self, request, extra_context=None):
+        request._exact_count = False
+        if EXACT_COUNT_PARAM in request.GET:
+            query = request.GET.copy()
+            request._exact_count = _truthy(query.pop(EXACT_COUNT_PARAM)[0])
+            request.GET = query
+        return super().changelist_view(request, extra_context)
+
+    def get_paginator(self, request, queryset, per_page, orphans=0, allow_empty_first_page=True):
+        return self.paginator(
+            queryset, per_page, orphans, allow_empty_first_page,
+            exact=getattr(request, '_exact_count', False),
+        )
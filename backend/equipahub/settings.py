@@ -46,16 +46,20 @@ INSTALLED_APPS = [
     'django_filters',
     
     # Local apps
+    'equipahub',  # comandos de infraestrutura (base de dados, réplica, cópias)
     'accounts',
     'equipment',
     'loans',
     'reservations',
     'notifications',
+    'search',
+    'archive',
 ]
 
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'equipahub.db_router.DatabaseRoutingMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -96,6 +100,49 @@ DATABASES = {
     }
 }
 
+# Perfil SQLite de produção (WAL, busy timeout, PRAGMAs e ligações persistentes).
+# Ver equipahub/sqlite_backend/base.py e o comando benchmark_sqlite.
+SQLITE_PRODUCTION_MODE = config('SQLITE_PRODUCTION_MODE', default=not DEBUG, cast=bool)
+
+if SQLITE_PRODUCTION_MODE:
+    DATABASES['default'].update({
+        'ENGINE': 'equipahub.sqlite_backend',
+        'CONN_MAX_AGE': config('DB_CONN_MAX_AGE', default=600, cast=int),
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'pragmas': {
+                'busy_timeout': config('SQLITE_BUSY_TIMEOUT_MS', default=5000, cast=int),
+                'mmap_size': config('SQLITE_MMAP_SIZE', default=256 * 1024 * 1024, cast=int),
+                'cache_size': -config('SQLITE_CACHE_SIZE_KB', default=64 * 1024, cast=int),
+            },
+        },
+    })
+
+# Base de dados própria para notificações e réplica de leitura (opcionais).
+# Com SQLite basta indicar o caminho de cada ficheiro; ver equipahub/db_router.py
+# e o comando sync_replica.
+NOTIFICATIONS_DATABASE = config('NOTIFICATIONS_DATABASE', default='')
+READ_REPLICA_DATABASE = config('READ_REPLICA_DATABASE', default='')
+REPLICA_STICKY_SECONDS = config('REPLICA_STICKY_SECONDS', default=5, cast=int)
+# Acima deste atraso (segundos desde a última sincronização) as leituras voltam à base principal
+REPLICA_MAX_LAG_SECONDS = config('REPLICA_MAX_LAG_SECONDS', default=60, cast=int)
+
+if NOTIFICATIONS_DATABASE:
+    DATABASES['notifications'] = {**DATABASES['default'], 'NAME': NOTIFICATIONS_DATABASE}
+if READ_REPLICA_DATABASE:
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'NAME': READ_REPLICA_DATABASE,
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['equipahub.db_router.DatabaseRouter']
+
+# Cópias de segurança (comando backup_database; ver equipahub/backup.py)
+BACKUP_DIR = config('BACKUP_DIR', default=str(BASE_DIR / 'backups'))
+BACKUP_PAGES_PER_STEP = config('BACKUP_PAGES_PER_STEP', default=256, cast=int)
+BACKUP_STEP_SLEEP_MS = config('BACKUP_STEP_SLEEP_MS', default=50, cast=int)
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -137,6 +184,29 @@ STATIC_ROOT = BASE_DIR / 'staticfiles'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# QR Codes gerados localmente (cache em disco endereçada pelo conteúdo)
+QRCODE_CACHE_DIR = config('QRCODE_CACHE_DIR', default=str(MEDIA_ROOT / 'qrcodes'))
+# URL base codificado nos QR Codes; vazio = host do pedido
+QRCODE_BASE_URL = config('QRCODE_BASE_URL', default='')
+# Validade (segundos) dos URLs assinados das imagens de QR Code
+QRCODE_IMAGE_URL_MAX_AGE = config('QRCODE_IMAGE_URL_MAX_AGE', default=3600, cast=int)
+# QR Codes assinados (HMAC), verificáveis offline. A chave é distribuída aos
+# tablets do balcão: tem de ser própria (nunca a SECRET_KEY ou a JWT_SECRET_KEY).
+# Sem ela os tokens assinados e o manifesto de leitura ficam desativados.
+QRCODE_SIGNED_PAYLOADS = config('QRCODE_SIGNED_PAYLOADS', default=False, cast=bool)
+QRCODE_SIGNING_KEY = config('QRCODE_SIGNING_KEY', default='')
+QRCODE_SIGNING_VERSION = config('QRCODE_SIGNING_VERSION', default=1, cast=int)
+
+# PDFs de solicitações em cache, indexados por (id, updated_at, versão do template)
+LOAN_REQUEST_PDF_CACHE_DIR = config('LOAN_REQUEST_PDF_CACHE_DIR', default=str(MEDIA_ROOT / 'loan_request_pdfs'))
+# Pool de processos para gerar PDFs (0 = gerar na thread do pedido)
+PDF_RENDER_WORKERS = config('PDF_RENDER_WORKERS', default=2, cast=int)
+PDF_RENDER_MAX_QUEUE = config('PDF_RENDER_MAX_QUEUE', default=8, cast=int)
+PDF_RENDER_TIMEOUT = config('PDF_RENDER_TIMEOUT', default=10, cast=float)
+
+# Pesquisa de texto integral (SQLite FTS5); noutras bases de dados volta ao icontains
+SEARCH_BACKEND = config('SEARCH_BACKEND', default='search.backends.SQLiteFTS5Backend')
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
@@ -159,13 +229,19 @@ REST_FRAMEWORK = {
         'rest_framework.filters.SearchFilter',
         'rest_framework.filters.OrderingFilter',
     ],
-    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
+    'DEFAULT_PAGINATION_CLASS': 'equipahub.pagination.EstimatedCountPagination',
     'PAGE_SIZE': 20,
     'DEFAULT_RENDERER_CLASSES': [
         'rest_framework.renderers.JSONRenderer',
     ],
 }
 
+# Paginação (API e admin): acima deste número de linhas a contagem passa a ser
+# estimada ou reaproveitada da cache; ?exact_count=true pede a contagem exata.
+# Ver equipahub/pagination.py
+PAGINATION_COUNT_THRESHOLD = config('PAGINATION_COUNT_THRESHOLD', default=10000, cast=int)
+PAGINATION_COUNT_CACHE_SECONDS = config('PAGINATION_COUNT_CACHE_SECONDS', default=300, cast=int)
+
 # CORS settings
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:5173",  # Vite dev server
@@ -218,6 +294,14 @@ LOAN_REQUEST_LIMITS = {
 # Requests pending for more than this many days without full confirmation will be auto-cancelled
 AUTO_CANCEL_DAYS = config('AUTO_CANCEL_DAYS', default=3, cast=int)
 
+# Hot/cold archival (archive_closed_records)
+# Closed loans, requests and reservations older than this many days move to the archive table
+ARCHIVE_AFTER_DAYS = config('ARCHIVE_AFTER_DAYS', default=180, cast=int)
+# Notification retention: read notifications older than this many days are deleted
+NOTIFICATION_RETENTION_DAYS = config('NOTIFICATION_RETENTION_DAYS', default=90, cast=int)
+# Unread notifications are kept longer, but not forever
+NOTIFICATION_UNREAD_RETENTION_DAYS = config('NOTIFICATION_UNREAD_RETENTION_DAYS', default=365, cast=int)
+
 # External Person API configuration
 # Used to validate/fetch docente, secretario, coordenador data
 EXTERNAL_PERSON_API = {
@@ -0,0 +1,64 @@
+"""
+Backend SQLite para produção
+
+Igual ao backend ``django.db.backends.sqlite3``, mas cada ligação nova é
+configurada com os PRAGMAs adequados a vários workers do gunicorn:
+
+- ``journal_mode=WAL``: leitores não bloqueiam o escritor e vice-versa;
+- ``synchronous=NORMAL``: seguro em WAL, sem fsync a cada commit;
+- ``busy_timeout``: espera pelo lock em vez de falhar com 'database is locked';
+- ``mmap_size`` e ``cache_size``: leituras servidas da memória;
+- ``temp_store=MEMORY``: ordenações temporárias sem ficheiros.
+
+As transações (``atomic``) começam com ``BEGIN IMMEDIATE``: o lock de escrita
+é pedido logo no início e a espera do busy timeout aplica-se, em vez de a
+transação falhar ao passar de leitura para escrita.
+
+Os valores podem ser alterados em ``DATABASES['default']['OPTIONS']``
+(``pragmas`` e ``transaction_mode``).
+"""
+
+from django.db.backends.sqlite3 import base
+
+DEFAULT_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -64 * 1024,
+    'temp_store': 'MEMORY',
+}
+
+
+def apply_pragmas(conn, pragmas=None):
+    """
+    Aplica os PRAGMAs a uma ligação sqlite3 (também usado pelo benchmark)
+    """
+    for name, value in (pragmas or DEFAULT_PRAGMAS).items():
+        conn.execute(f'PRAGMA {name}={value}')
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+
+    def get_connection_params(self):
+        options = self.settings_dict['OPTIONS']
+        self.pragmas = {**DEFAULT_PRAGMAS, **options.get('pragmas', {})}
+        self.transaction_mode = options.get('transaction_mode', 'IMMEDIATE')
+
+        params = super().get_connection_params()
+        params.pop('pragmas', None)
+        params.pop('transaction_mode', None)
+        # O busy timeout do módulo sqlite3 está em segundos
+        params['timeout'] = self.pragmas['busy_timeout'] / 1000
+        return params
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        apply_pragmas(conn, self.pragmas)
+        return conn
+
+    def _start_transaction_under_autocommit(self):
+        if self.transaction_mode:
+            self.cursor().execute(f'BEGIN {self.transaction_mode}')
+        else:
+            super()._start_transaction_under_autocommit()
@@ -0,0 +1,239 @@
+import gzip
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+from pathlib import Path
+from unittest.mock import patch
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.core.paginator import EmptyPage
+from django.db import connection
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from rest_framework.test import APIClient
+
+from accounts.models import User
+from equipment.models import Equipment
+
+from . import db_router
+from .backup import BackupError, SQLiteOnlineBackup
+from .db_router import DatabaseRouter, DatabaseRoutingMiddleware, use_replica
+from .pagination import CountEstimator, EstimatedCountPagination, EstimatedCountPaginator
+
+
+class DatabaseRouterTests(SimpleTestCase):
+    """
+    Encaminhamento para a réplica: autenticação, read-your-writes por
+    utilizador e atraso máximo
+    """
+
+    def setUp(self):
+        handle, self.replica_path = tempfile.mkstemp(suffix='.sqlite3')
+        os.close(handle)
+        self.addCleanup(os.remove, self.replica_path)
+        replica = patch.dict(settings.DATABASES, {
+            'replica': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': self.replica_path},
+        })
+        replica.start()
+        self.addCleanup(replica.stop)
+        override = override_settings(REPLICA_MAX_LAG_SECONDS=60, REPLICA_STICKY_SECONDS=5)
+        override.enable()
+        self.addCleanup(override.disable)
+        db_router._lag[:] = [0.0, None]
+        cache.clear()
+        self.router = DatabaseRouter()
+        self.factory = RequestFactory()
+
+    def _run(self, request, view):
+        middleware = DatabaseRoutingMiddleware(lambda req: view(req) or HttpResponse())
+        return middleware(request)
+
+    def test_get_reads_from_replica(self):
+        seen = []
+        self._run(self.factory.get('/'), lambda req: seen.append(self.router.db_for_read(Equipment)))
+        self.assertEqual(seen, ['replica'])
+
+    def test_user_lookup_always_reads_primary(self):
+        seen = []
+        self._run(self.factory.get('/'), lambda req: seen.append(self.router.db_for_read(User)))
+        self.assertEqual(seen, ['default'])
+
+    def test_reads_after_write_in_same_request_use_primary(self):
+        seen = []
+
+        def view(req):
+            self.router.db_for_write(Equipment)
+            seen.append(self.router.db_for_read(Equipment))
+
+        self._run(self.factory.post('/'), view)
+        self.assertEqual(seen, ['default'])
+
+    def test_user_stays_on_primary_after_writing(self):
+        user = User(pk=42, email='u@x.com')
+
+        def write(req):
+            req.user = user
+            self.router.db_for_write(Equipment)
+
+        self._run(self.factory.post('/'), write)
+
+        # Pedido seguinte sem cookie (cliente com token Bearer): o utilizador é o mesmo
+        seen = []
+
+        def read(req):
+            req.user = user
+            seen.append(self.router.db_for_read(Equipment))
+
+        self._run(self.factory.get('/'), read)
+        self.assertEqual(seen, ['default'])
+
+        other = []
+
+        def read_other(req):
+            req.user = User(pk=43, email='v@x.com')
+            other.append(self.router.db_for_read(Equipment))
+
+        self._run(self.factory.get('/'), read_other)
+        self.assertEqual(other, ['replica'])
+
+    def test_stale_replica_is_not_used(self):
+        old = time.time() - 120
+        os.utime(self.replica_path, (old, old))
+        with use_replica():
+            self.assertEqual(self.router.db_for_read(Equipment), 'default')
+
+    def test_missing_replica_file_is_not_used(self):
+        os.remove(self.replica_path)
+        with use_replica():
+            self.assertEqual(self.router.db_for_read(Equipment), 'default')
+        open(self.replica_path, 'w').close()
+
+
+class SQLiteOnlineBackupTests(SimpleTestCase):
+    """
+    Cópia em funcionamento: recomeços após escritas e verificação da cópia
+    """
+
+    def setUp(self):
+        self.directory = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        self.source = self.directory / 'origem.sqlite3'
+        self.connection = sqlite3.connect(self.source)
+        self.addCleanup(self.connection.close)
+        self.connection.execute('CREATE TABLE items (id INTEGER PRIMARY KEY, value TEXT)')
+        self.connection.executemany('INSERT INTO items (value) VALUES (?)', [('x' * 500,)] * 200)
+        self.connection.commit()
+
+    def _backup(self, **options):
+        return SQLiteOnlineBackup({'NAME': self.source}, pages_per_step=5, sleep=0, **options)
+
+    def _rows(self, result):
+        raw = self.directory / 'copia.sqlite3'
+        with gzip.open(result.path) as compressed:
+            raw.write_bytes(compressed.read())
+        connection = sqlite3.connect(raw)
+        try:
+            return connection.execute('SELECT COUNT(*) FROM items').fetchone()[0]
+        finally:
+            connection.close()
+
+    def test_compressed_copy_is_verified(self):
+        result = self._backup().run(self.directory / 'copia.sqlite3.gz')
+        self.assertTrue(result.verified)
+        self.assertEqual(result.restarts, 0)
+        self.assertEqual(self._rows(result), 200)
+
+    def test_writes_during_copy_restart_it_until_the_limit(self):
+        writes = []
+
+        def write_between_steps(done, total):
+            # Sem o limite de recomeços a cópia nunca terminaria
+            if len(writes) < 50:
+                self.connection.execute("INSERT INTO items (value) VALUES ('y')")
+                self.connection.commit()
+                writes.append(done)
+
+        result = self._backup(max_restarts=2).run(self.directory / 'copia.sqlite3.gz', progress=write_between_steps)
+
+        self.assertEqual(result.restarts, 3)
+        self.assertLess(len(writes), 50)
+        # O passo final copia tudo o que foi gravado até então
+        self.assertEqual(self._rows(result), 200 + len(writes))
+
+    def test_corrupted_copy_fails_integrity_check(self):
+        corrupted = self.directory / 'corrompida.sqlite3'
+        data = bytearray(self.source.read_bytes())
+        data[4096:8192] = b'\xff' * 4096
+        corrupted.write_bytes(bytes(data))
+        with self.assertRaises(BackupError):
+            SQLiteOnlineBackup.integrity_check(corrupted)
+
+    def test_missing_database_is_reported(self):
+        backup = SQLiteOnlineBackup({'NAME': self.directory / 'inexistente.sqlite3'})
+        self.assertFalse(backup.available())
+        with self.assertRaises(BackupError):
+            backup.run(self.directory / 'copia.sqlite3.gz')
+
+
+class EstimatedCountPaginatorTests(TestCase):
+    """
+    Contagem limitada, estimada pelas estatísticas ou reaproveitada da cache
+    """
+
+    def setUp(self):
+        CountEstimator.cache.clear()
+        self.addCleanup(CountEstimator.cache.clear)
+        Equipment.objects.bulk_create([
+            Equipment(brand='HP', model='X', type='notebook', serial_number=f'SN{n}', qrcode_hash=f'hash{n}',
+                      status='manutencao' if n % 2 else 'disponivel')
+            for n in range(10)
+        ])
+
+    def test_count_below_threshold_is_exact(self):
+        self.assertEqual(CountEstimator.count(Equipment.objects.all(), threshold=10), (10, False))
+
+    def test_filtered_count_above_threshold_is_reused_from_cache(self):
+        queryset = Equipment.objects.filter(status='disponivel')
+        self.assertEqual(CountEstimator.count(queryset, threshold=2), (5, False))
+
+        Equipment.objects.filter(serial_number='SN0').delete()
+        # A contagem exata anterior é reaproveitada, nunca abaixo do que já foi contado
+        self.assertEqual(CountEstimator.count(queryset, threshold=2), (5, True))
+
+    def test_unfiltered_count_uses_table_statistics(self):
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        Equipment.objects.filter(serial_number__in=['SN0', 'SN1']).delete()
+        self.assertEqual(CountEstimator.count(Equipment.objects.all(), threshold=2), (10, True))
+
+    def test_estimated_pages_are_corrected_on_the_last_page(self):
+        CountEstimator.exact(Equipment.objects.order_by('pk'))
+        Equipment.objects.filter(serial_number__in=['SN8', 'SN9']).delete()
+        paginator = EstimatedCountPaginator(Equipment.objects.order_by('pk'), 3, threshold=2)
+
+        self.assertEqual((paginator.count, paginator.count_is_estimate), (10, True))
+        # Página para lá da contagem real mas dentro da estimativa
+        with self.assertRaises(EmptyPage):
+            paginator.page(4)
+        page = paginator.page(3)
+        self.assertEqual(len(page.object_list), 2)
+        self.assertEqual((paginator.count, paginator.count_is_estimate, paginator.num_pages), (8, False, 3))
+
+    @override_settings(PAGINATION_COUNT_THRESHOLD=2)
+    @patch.object(EstimatedCountPagination, 'page_size', 2)
+    def test_api_reports_estimated_count(self):
+        client = APIClient()
+        client.force_authenticate(User.objects.create(email='t@x.com', username='t@x.com', name='T', role='tecnico'))
+        params = {'status': 'disponivel'}
+        first = client.get('/api/v1/equipment/', params).data
+        Equipment.objects.filter(serial_number='SN0').delete()
+
+        cached = client.get('/api/v1/equipment/', params).data
+        exact = client.get('/api/v1/equipment/', {**params, 'exact_count': 'true'}).data
+
+        self.assertEqual((first['count'], first['count_estimated']), (5, False))
+        self.assertEqual((cached['count'], cached['count_estimated']), (5, True))
+        self.assertEqual((exact['count'], exact['count_estimated']), (4, False))
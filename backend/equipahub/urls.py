@@ -42,6 +42,7 @@ urlpatterns = [
     path('api/v1/atribuidores/<int:pk>/ativar/', UserViewSet.as_view({'post': 'atribuidores_activate'}), name='atribuidores-activate'),
     path('api/v1/atribuidores/<int:pk>/desativar/', UserViewSet.as_view({'post': 'atribuidores_deactivate'}), name='atribuidores-deactivate'),
     path('api/v1/', include('notifications.urls')),
+    path('api/v1/', include('search.urls')),
     path('api/v1/dashboard/stats/', dashboard_stats, name='dashboard-stats'),
 ]
 
@@ -1,9 +1,10 @@
 from django.contrib import admin
-from .models import Equipment
+from equipahub.pagination import EstimatedCountAdminMixin
+from .models import Equipment, Location
 
 
 @admin.register(Equipment)
-class EquipmentAdmin(admin.ModelAdmin):
+class EquipmentAdmin(EstimatedCountAdminMixin, admin.ModelAdmin):
     """
     Configuração do admin para o modelo Equipment
     """
@@ -25,7 +26,7 @@ class EquipmentAdmin(admin.ModelAdmin):
             'fields': ('brand', 'model', 'type', 'serial_number')
         }),
         ('Status e Localização', {
-            'fields': ('status', 'location')
+            'fields': ('status', 'location', 'place')
         }),
         ('Detalhes', {
             'fields': ('description', 'acquisition_date')
@@ -98,6 +99,18 @@ class EquipmentAdmin(admin.ModelAdmin):
     mark_as_inactive.short_description = "Marcar como inativo"
 
 
+@admin.register(Location)
+class LocationAdmin(admin.ModelAdmin):
+    """
+    Configuração do admin para localizações
+    """
+    list_display = ['campus', 'building', 'room', 'path', 'created_at']
+    list_filter = ['campus', 'building']
+    search_fields = ['campus', 'building', 'room', 'path']
+    readonly_fields = ['path', 'created_at']
+    ordering = ['path']
+
+
 # Importar modelos de pacotes
 from .package_models import EquipmentPackage, PackageItem
 
@@ -4,3 +4,12 @@ from django.apps import AppConfig
 class EquipmentConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'equipment'
+
+    def ready(self):
+        from django.core.checks import Tags, register
+
+        from . import autocomplete, facets, qr_signing, scan_service
+        register(qr_signing.check_signing_key, Tags.security)
+        scan_service.connect_signals()
+        autocomplete.connect_signals()
+        facets.connect_signals()
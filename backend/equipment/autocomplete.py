@@ -0,0 +1,218 @@
+"""
+Índice de prefixos em memória para autocompletar no balcão
+
+Quando a etiqueta QR está danificada, o técnico escreve parte do número de
+série, do hash ou da marca/modelo. Este índice mantém, por processo, uma lista
+ordenada de chaves (série, série só com letras e dígitos, hash, marca+modelo,
+modelo) e encontra os candidatos com ``bisect`` em tempo logarítmico.
+
+O índice é construído no primeiro uso e atualizado pelos signals de gravação
+e remoção do equipamento; cada entrada guarda o ``updated_at`` e só é
+substituída por uma versão mais recente. As alterações feitas noutros
+processos ou por ``.update()`` em lote são apanhadas por uma verificação de
+versão (maior ``updated_at`` e número de equipamentos) feita no máximo a cada
+``REFRESH_SECONDS``.
+"""
+
+import re
+import threading
+import time
+from bisect import bisect_left, insort
+
+from django.db.models import Count, Max
+from django.db.models.signals import post_save, post_delete
+
+from .models import Equipment
+
+_NON_ALNUM = re.compile(r'[^0-9a-z]+')
+
+
+def _compact(text):
+    return _NON_ALNUM.sub('', text)
+
+
+class PrefixIndex:
+    """
+    Lista ordenada de (chave, id) com os dados compactos de cada equipamento
+    """
+
+    REFRESH_SECONDS = 5
+    FIELDS = ['id', 'serial_number', 'qrcode_hash', 'brand', 'model', 'status', 'type', 'updated_at']
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._keys = []
+        self._ids = []
+        self._items = {}
+        self._keys_by_id = {}
+        self._built = False
+        self._version = None
+        self._checked_at = 0.0
+
+    @staticmethod
+    def keys_for(row):
+        serial = (row['serial_number'] or '').lower()
+        keys = {serial, _compact(serial), (row['qrcode_hash'] or '').lower()}
+        brand = (row['brand'] or '').lower()
+        model = (row['model'] or '').lower()
+        keys.update({f"{brand} {model}", model})
+        keys.discard('')
+        return keys
+
+    def _insert(self, row):
+        pk = row['id']
+        keys = self.keys_for(row)
+        for key in keys:
+            position = bisect_left(self._keys, key)
+            self._keys.insert(position, key)
+            self._ids.insert(position, pk)
+        self._keys_by_id[pk] = keys
+        self._items[pk] = row
+
+    def _remove(self, pk):
+        for key in self._keys_by_id.pop(pk, ()):
+            position = bisect_left(self._keys, key)
+            while position < len(self._keys) and self._keys[position] == key:
+                if self._ids[position] == pk:
+                    del self._keys[position]
+                    del self._ids[position]
+                    break
+                position += 1
+        self._items.pop(pk, None)
+
+    @staticmethod
+    def _current_version():
+        return tuple(Equipment.objects.aggregate(latest=Max('updated_at'), total=Count('id')).values())
+
+    def build(self):
+        """
+        Constrói o índice a partir da base de dados
+        """
+        version = self._current_version()
+        pairs = []
+        items = {}
+        keys_by_id = {}
+        for row in Equipment.objects.order_by().values(*self.FIELDS).iterator(chunk_size=5000):
+            keys = self.keys_for(row)
+            keys_by_id[row['id']] = keys
+            items[row['id']] = row
+            pairs.extend((key, row['id']) for key in keys)
+        pairs.sort()
+        with self._lock:
+            self._keys = [key for key, _ in pairs]
+            self._ids = [pk for _, pk in pairs]
+            self._items = items
+            self._keys_by_id = keys_by_id
+            self._version = version
+            self._built = True
+            self._checked_at = time.monotonic()
+
+    def _refresh(self):
+        """
+        Aplica as alterações feitas fora deste processo desde a última versão
+        """
+        version = self._current_version()
+        if version == self._version:
+            return
+        latest, total = version
+        since = self._version[0] if self._version else None
+        changed = Equipment.objects.order_by().values(*self.FIELDS)
+        if since is not None:
+            changed = changed.filter(updated_at__gt=since)
+        with self._lock:
+            for row in changed:
+                self.apply(row)
+            self._version = version
+        if len(self._items) != total:
+            # Houve remoções noutro processo: reconstrói
+            self.build()
+
+    def ensure_fresh(self):
+        if not self._built:
+            self.build()
+            return
+        if time.monotonic() - self._checked_at >= self.REFRESH_SECONDS:
+            self._checked_at = time.monotonic()
+            self._refresh()
+
+    def apply(self, row):
+        """
+        Insere ou atualiza um equipamento, ignorando versões mais antigas
+        do que a que já está no índice
+        """
+        with self._lock:
+            current = self._items.get(row['id'])
+            if current is not None and current['updated_at'] and row['updated_at'] \
+                    and current['updated_at'] > row['updated_at']:
+                return
+            self._remove(row['id'])
+            self._insert(row)
+
+    def invalidate(self):
+        """
+        Força a verificação de versão no próximo uso (após escritas em lote)
+        """
+        self._checked_at = 0.0
+
+    def discard(self, pk):
+        with self._lock:
+            self._remove(pk)
+
+    def search(self, query, limit=10):
+        """
+        Retorna até ``limit`` equipamentos cujas chaves começam pelo texto indicado
+        """
+        query = (query or '').strip().lower()
+        if not query:
+            return []
+        prefixes = {query, _compact(query)}
+        prefixes.discard('')
+
+        found = []
+        seen = set()
+        with self._lock:
+            for prefix in sorted(prefixes, key=len, reverse=True):
+                position = bisect_left(self._keys, prefix)
+                while position < len(self._keys) and len(found) < limit:
+                    key = self._keys[position]
+                    if not key.startswith(prefix):
+                        break
+                    pk = self._ids[position]
+                    if pk not in seen:
+                        seen.add(pk)
+                        found.append((self._items[pk], key))
+                    position += 1
+        return [
+            {
+                'id': row['id'],
+                'serial_number': row['serial_number'],
+                'qrcode_hash': row['qrcode_hash'],
+                'full_name': f"{row['brand']} {row['model']}",
+                'status': row['status'],
+                'type': row['type'],
+                'matched': key,
+            }
+            for row, key in found
+        ]
+
+    def __len__(self):
+        return len(self._items)
+
+
+prefix_index = PrefixIndex()
+
+
+def _on_save(sender, instance, **kwargs):
+    if not prefix_index._built:
+        return
+    prefix_index.apply({field: getattr(instance, field) for field in PrefixIndex.FIELDS})
+
+
+def _on_delete(sender, instance, **kwargs):
+    if prefix_index._built:
+        prefix_index.discard(instance.pk)
+
+
+def connect_signals():
+    post_save.connect(_on_save, sender=Equipment, dispatch_uid='equipment_autocomplete_save')
+    post_delete.connect(_on_delete, sender=Equipment, dispatch_uid='equipment_autocomplete_delete')
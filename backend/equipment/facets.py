@@ -0,0 +1,152 @@
+"""
+Contagens por faceta para os filtros da listagem de equipamentos
+
+Para cada dimensão (tipo, status, marca, localização, categoria) conta os
+equipamentos com uma consulta agrupada, aplicando todos os filtros ativos
+exceto o da própria dimensão, para que o utilizador veja quantos resultados
+teria ao escolher outro valor. Valores múltiplos podem ser indicados
+separados por vírgula (``?status=disponivel,reservado``).
+
+A localização é agrupada e filtrada pela localização normalizada
+(``?place=<id>,<id>``) e cada valor leva o rótulo (``label``). Os filtros de
+texto da listagem (``location``, ``location_path``) restringem a base.
+
+Os resultados ficam numa cache LRU por processo, indexada pela assinatura dos
+filtros. A cache é limpa pelos signals de gravação e remoção do equipamento
+e quando o carimbo de versão (maior ``updated_at`` e número de equipamentos)
+muda, o que cobre as escritas em lote e as feitas noutros processos.
+"""
+
+import threading
+import time
+
+from django.db.models import Count, Max, Q
+from django.db.models.signals import post_save, post_delete
+
+from .models import Equipment, Location
+from .scan_service import LRUCache
+
+
+class EquipmentFacets:
+    """
+    Calcula e guarda em cache as contagens por faceta
+    """
+
+    DIMENSIONS = ['type', 'status', 'brand', 'location', 'category']
+    # Dimensões agrupadas por outro campo, que é também o parâmetro do filtro
+    DIMENSION_FIELDS = {'location': 'place'}
+    # Parâmetros que, além das dimensões, alteram o conjunto filtrado
+    EXTRA_PARAMS = ['search', 'available_only', 'location', 'location_path']
+    VERSION_CHECK_SECONDS = 5
+
+    cache = LRUCache(maxsize=256)
+    _lock = threading.Lock()
+    _version = None
+    _checked_at = 0.0
+
+    @classmethod
+    def field(cls, name):
+        return cls.DIMENSION_FIELDS.get(name, name)
+
+    @classmethod
+    def signature(cls, params):
+        """
+        Chave de cache: parâmetros relevantes, normalizados e ordenados
+        """
+        items = []
+        for name in cls.DIMENSIONS:
+            values = cls._values(params.get(cls.field(name)) or '')
+            if values:
+                items.append((cls.field(name), ','.join(sorted(values))))
+        for name in cls.EXTRA_PARAMS:
+            value = (params.get(name) or '').strip()
+            if value:
+                items.append((name, value))
+        return tuple(items)
+
+    @staticmethod
+    def _values(raw):
+        return [value.strip() for value in raw.split(',') if value.strip()]
+
+    @classmethod
+    def _dimension_q(cls, name, raw):
+        values = cls._values(raw)
+        if name == 'location':
+            return Q(place_id__in=[value for value in values if value.isdigit()])
+        return Q(**{f'{name}__in': values})
+
+    @classmethod
+    def compute(cls, base_queryset, params):
+        """
+        Executa uma consulta agrupada por dimensão sobre ``base_queryset``
+        (já filtrado pela pesquisa, pela disponibilidade e pelo texto da localização)
+        """
+        filters = {
+            name: cls._dimension_q(name, params[cls.field(name)])
+            for name in cls.DIMENSIONS if (params.get(cls.field(name)) or '').strip()
+        }
+
+        facets = {}
+        for name in cls.DIMENSIONS:
+            field = cls.field(name)
+            queryset = base_queryset
+            for other, q in filters.items():
+                if other != name:
+                    queryset = queryset.filter(q)
+            rows = queryset.order_by().values(field).annotate(count=Count('id')).order_by('-count', field)
+            facets[name] = [
+                {'value': row[field], 'count': row['count']}
+                for row in rows if row[field] not in (None, '')
+            ]
+
+        labels = {
+            place.pk: place.label
+            for place in Location.objects.filter(pk__in=[item['value'] for item in facets['location']])
+        }
+        for item in facets['location']:
+            item['label'] = labels.get(item['value'], '')
+
+        total = base_queryset
+        for q in filters.values():
+            total = total.filter(q)
+        return {'total': total.count(), 'facets': facets}
+
+    @classmethod
+    def _check_version(cls):
+        now = time.monotonic()
+        if now - cls._checked_at < cls.VERSION_CHECK_SECONDS:
+            return
+        with cls._lock:
+            cls._checked_at = now
+            version = tuple(Equipment.objects.aggregate(latest=Max('updated_at'), total=Count('id')).values())
+            if version != cls._version:
+                cls._version = version
+                cls.cache.clear()
+
+    @classmethod
+    def get(cls, base_queryset, params):
+        """
+        Retorna as facetas para os parâmetros indicados, usando a cache
+        """
+        cls._check_version()
+        key = cls.signature(params)
+        data = cls.cache.get(key)
+        if data is None:
+            data = cls.compute(base_queryset, params)
+            cls.cache.put(key, data)
+        return data
+
+    @classmethod
+    def invalidate(cls):
+        cls.cache.clear()
+
+
+def _invalidate(sender, **kwargs):
+    EquipmentFacets.invalidate()
+
+
+def connect_signals():
+    post_save.connect(_invalidate, sender=Equipment, dispatch_uid='equipment_facets_save')
+    post_delete.connect(_invalidate, sender=Equipment, dispatch_uid='equipment_facets_delete')
+    # Os rótulos das localizações ficam na cache
+    post_save.connect(_invalidate, sender=Location, dispatch_uid='equipment_facets_location_save')
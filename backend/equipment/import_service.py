@@ -0,0 +1,266 @@
+"""
+Importação em lote de equipamentos a partir de CSV
+
+O ficheiro é lido em fluxo com ``csv.DictReader`` e processado em blocos de
+``BATCH_SIZE`` linhas: cada bloco é validado em memória, os números de série
+repetidos são detetados com uma única consulta por bloco e as linhas válidas
+são gravadas com ``bulk_create`` (hash do QR Code já calculado). Os erros são
+reportados por linha sem interromper a importação.
+"""
+
+import csv
+import time
+import unicodedata
+from datetime import datetime
+
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .models import Equipment, Location
+from .autocomplete import prefix_index
+from .facets import EquipmentFacets
+from .scan_service import ScanIndex
+from search.index import SearchIndex
+
+
+def _normalize(text):
+    text = unicodedata.normalize('NFKD', text or '').encode('ascii', 'ignore').decode()
+    return '_'.join(text.strip().lower().replace('-', ' ').split())
+
+
+class EquipmentImporter:
+    """
+    Valida e importa equipamentos de um CSV
+    """
+
+    BATCH_SIZE = 1000
+    MAX_REPORTED_ERRORS = 1000
+    REQUIRED = ['brand', 'model', 'type', 'serial_number']
+    OPTIONAL = ['status', 'acquisition_date', 'description', 'location', 'color', 'category']
+    # Cabeçalhos aceites em português (normalizados: minúsculas, sem acentos)
+    HEADER_ALIASES = {
+        'marca': 'brand',
+        'modelo': 'model',
+        'tipo': 'type',
+        'numero_de_serie': 'serial_number',
+        'numero_serie': 'serial_number',
+        'n_serie': 'serial_number',
+        'serial': 'serial_number',
+        'estado': 'status',
+        'data_de_aquisicao': 'acquisition_date',
+        'data_aquisicao': 'acquisition_date',
+        'descricao': 'description',
+        'localizacao': 'location',
+        'cor': 'color',
+        'categoria': 'category',
+    }
+    # Status derivados de empréstimos e reservas não podem ser importados
+    IMPORTABLE_STATUSES = ['disponivel', 'manutencao', 'inativo']
+    DATE_FORMATS = ['%Y-%m-%d', '%d/%m/%Y', '%d-%m-%Y']
+
+    def __init__(self, dry_run=False, batch_size=None):
+        self.dry_run = dry_run
+        self.batch_size = batch_size or self.BATCH_SIZE
+        self.max_lengths = {
+            field.name: field.max_length
+            for field in Equipment._meta.fields if getattr(field, 'max_length', None)
+        }
+        self.types = self._choice_lookup(Equipment.EQUIPMENT_TYPE_CHOICES)
+        self.statuses = self._choice_lookup(
+            [c for c in Equipment.EQUIPMENT_STATUS_CHOICES if c[0] in self.IMPORTABLE_STATUSES]
+        )
+        self.seen_serials = set()
+        self.result = {
+            'total_rows': 0,
+            'created': 0,
+            'failed': 0,
+            'dry_run': dry_run,
+            'errors': [],
+        }
+
+    @staticmethod
+    def _choice_lookup(choices):
+        """Aceita tanto o valor ('projetor') como o rótulo ('Projetor')"""
+        lookup = {}
+        for value, label in choices:
+            lookup[_normalize(value)] = value
+            lookup[_normalize(label)] = value
+        return lookup
+
+    def _map_header(self, fieldnames):
+        mapping = {}
+        for name in fieldnames or []:
+            key = _normalize(name)
+            key = self.HEADER_ALIASES.get(key, key)
+            if key in self.REQUIRED or key in self.OPTIONAL:
+                mapping[name] = key
+        missing = [field for field in self.REQUIRED if field not in mapping.values()]
+        return mapping, missing
+
+    def _parse_date(self, value):
+        for fmt in self.DATE_FORMATS:
+            try:
+                return datetime.strptime(value, fmt).date()
+            except ValueError:
+                continue
+        return None
+
+    def _clean_row(self, raw, mapping):
+        """
+        Retorna (dados, erros) para uma linha do CSV
+        """
+        data = {}
+        for column, field in mapping.items():
+            value = (raw.get(column) or '').strip()
+            if value:
+                data[field] = value
+
+        errors = []
+        for field in self.REQUIRED:
+            if not data.get(field):
+                errors.append(f'{field}: campo obrigatório.')
+
+        for field, value in data.items():
+            max_length = self.max_lengths.get(field)
+            if max_length and len(value) > max_length:
+                errors.append(f'{field}: máximo de {max_length} caracteres.')
+
+        if 'type' in data:
+            value = self.types.get(_normalize(data['type']))
+            if value is None:
+                errors.append(f"type: tipo inválido '{data['type']}'.")
+            data['type'] = value
+
+        if 'status' in data:
+            value = self.statuses.get(_normalize(data['status']))
+            if value is None:
+                errors.append(f"status: use um de {', '.join(self.IMPORTABLE_STATUSES)}.")
+            data['status'] = value
+
+        if 'acquisition_date' in data:
+            value = self._parse_date(data['acquisition_date'])
+            if value is None:
+                errors.append('acquisition_date: data inválida (use AAAA-MM-DD ou DD/MM/AAAA).')
+            data['acquisition_date'] = value
+
+        return data, errors
+
+    def _error(self, line, serial_number, errors):
+        self.result['failed'] += 1
+        if len(self.result['errors']) < self.MAX_REPORTED_ERRORS:
+            self.result['errors'].append({
+                'row': line,
+                'serial_number': serial_number,
+                'errors': errors,
+            })
+
+    def _flush(self, batch):
+        """
+        Valida os números de série do bloco contra a base de dados (uma
+        consulta) e grava as linhas válidas
+        """
+        if not batch:
+            return
+        existing = set(
+            Equipment.objects.filter(
+                serial_number__in=[data['serial_number'] for _, data in batch]
+            ).values_list('serial_number', flat=True)
+        )
+
+        today = timezone.now().date()
+        places = {}
+        if not self.dry_run:
+            places = Location.resolve_many([data.get('location') for _, data in batch])
+        to_create = []
+        for line, data in batch:
+            if data['serial_number'] in existing:
+                self._error(line, data['serial_number'], ['serial_number: já existe um equipamento com este número de série.'])
+                continue
+            data.setdefault('acquisition_date', today)
+            data.setdefault('status', 'disponivel')
+            # bulk_create não chama save(): associa aqui a localização normalizada
+            place = places.get(data.get('location'))
+            if place is not None:
+                data['place'] = place
+            to_create.append(Equipment(
+                qrcode_hash=Equipment.generate_qrcode_hash(data['serial_number']),
+                **data
+            ))
+
+        if self.dry_run or not to_create:
+            self.result['created'] += len(to_create)
+            return
+
+        try:
+            with transaction.atomic():
+                Equipment.objects.bulk_create(to_create)
+                # bulk_create não dispara signals nem retorna ids em todos os backends
+                ids = Equipment.objects.filter(
+                    serial_number__in=[eq.serial_number for eq in to_create]
+                ).values_list('id', flat=True)
+                ids = list(ids)
+                # Índices e caches só veem o bloco depois de gravado
+                transaction.on_commit(lambda: self._sync_indexes(ids))
+        except IntegrityError as e:
+            # Inserção concorrente com o mesmo número de série: o bloco é rejeitado
+            print(f"Erro ao gravar bloco da importação de equipamentos: {e}")
+            lines = {data['serial_number']: line for line, data in batch}
+            for eq in to_create:
+                self._error(lines[eq.serial_number], eq.serial_number,
+                            ['Conflito ao gravar o bloco; volte a importar esta linha.'])
+            return
+        self.result['created'] += len(to_create)
+
+    @staticmethod
+    def _sync_indexes(ids):
+        ScanIndex.sync_many('equipment', ids)
+        SearchIndex.index_ids('equipment', ids)
+        prefix_index.invalidate()
+        EquipmentFacets.invalidate()
+
+    def run(self, stream, delimiter=None):
+        """
+        Importa o CSV de ``stream`` (ficheiro de texto). Retorna o resumo
+        com o número de linhas, criados, falhados e os erros por linha.
+        """
+        started = time.monotonic()
+        if delimiter is None:
+            sample = stream.readline()
+            delimiter = ';' if sample.count(';') > sample.count(',') else ','
+            rows = csv.DictReader([sample], delimiter=delimiter)
+            header = rows.fieldnames
+            reader = csv.DictReader(stream, fieldnames=header, delimiter=delimiter)
+            # O cabeçalho já foi lido: o reader conta as linhas a partir da seguinte
+            offset = 1
+        else:
+            reader = csv.DictReader(stream, delimiter=delimiter)
+            header = reader.fieldnames
+            offset = 0
+
+        mapping, missing = self._map_header(header)
+        if missing:
+            raise ValueError(f"Colunas obrigatórias em falta: {', '.join(missing)}.")
+
+        batch = []
+        for raw in reader:
+            # Número da última linha do ficheiro lida (campos entre aspas podem ocupar várias)
+            line = reader.line_num + offset
+            if not any((value or '').strip() for value in raw.values() if isinstance(value, str)):
+                continue
+            self.result['total_rows'] += 1
+            data, errors = self._clean_row(raw, mapping)
+            serial = data.get('serial_number')
+            if serial and serial in self.seen_serials:
+                errors.append('serial_number: repetido no ficheiro.')
+            if errors:
+                self._error(line, serial, errors)
+                continue
+            self.seen_serials.add(serial)
+            batch.append((line, data))
+            if len(batch) >= self.batch_size:
+                self._flush(batch)
+                batch = []
+        self._flush(batch)
+
+        self.result['duration_seconds'] = round(time.monotonic() - started, 2)
+        return self.result
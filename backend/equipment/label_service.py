@@ -0,0 +1,106 @@
+"""
+Folhas de etiquetas com QR Code
+
+Gera um PDF A4 com N etiquetas por página (marca/modelo, número de série e
+QR Code) para um conjunto de equipamentos. Os equipamentos são lidos com
+``.iterator()`` e desenhados página a página; as imagens dos QR Codes vêm da
+cache em disco de ``qrcode_service`` em vez de serem geradas de novo.
+"""
+
+import tempfile
+
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.units import mm
+from reportlab.pdfbase.pdfmetrics import stringWidth
+from reportlab.pdfgen import canvas as pdf_canvas
+
+from . import qr_signing, qrcode_service
+
+# Acima deste tamanho o PDF em construção passa da memória para disco
+SPOOL_MAX_SIZE = 8 * 1024 * 1024
+
+
+class QRLabelSheet:
+    """
+    Desenha etiquetas de QR Code numa grelha de ``columns`` x ``rows`` por página A4
+    """
+
+    def __init__(self, base_url, columns=3, rows=8, margin=10 * mm):
+        self.base_url = base_url
+        self.columns = columns
+        self.rows = rows
+        self.margin = margin
+        self.page_width, self.page_height = A4
+        self.cell_width = (self.page_width - 2 * margin) / columns
+        self.cell_height = (self.page_height - 2 * margin) / rows
+
+    @property
+    def per_page(self):
+        return self.columns * self.rows
+
+    @staticmethod
+    def _fit(text, font, size, width):
+        """Corta o texto com reticências para caber na largura indicada"""
+        if stringWidth(text, font, size) <= width:
+            return text
+        while text and stringWidth(text + '…', font, size) > width:
+            text = text[:-1]
+        return text + '…'
+
+    def _draw_label(self, canvas, equipment, x, y):
+        padding = 2 * mm
+        qr_size = self.cell_height - 2 * padding
+        token = qr_signing.scan_token('equipment', equipment.pk, equipment.qrcode_hash)
+        payload = qrcode_service.consult_url(token, self.base_url)
+        image_path, _ = qrcode_service.render_to_cache(equipment.qrcode_hash, payload, 'png')
+        canvas.drawImage(str(image_path), x + padding, y + padding, qr_size, qr_size)
+
+        text_x = x + qr_size + 2 * padding
+        text_width = self.cell_width - qr_size - 3 * padding
+        top = y + self.cell_height - padding - 4 * mm
+
+        canvas.setFont('Helvetica-Bold', 9)
+        canvas.drawString(text_x, top, self._fit(equipment.full_name, 'Helvetica-Bold', 9, text_width))
+        canvas.setFont('Helvetica', 8)
+        canvas.drawString(text_x, top - 5 * mm,
+                          self._fit(f"S/N: {equipment.serial_number}", 'Helvetica', 8, text_width))
+        canvas.setFont('Helvetica', 7)
+        canvas.drawString(text_x, top - 9 * mm, equipment.qrcode_hash)
+
+    def write(self, equipments, output):
+        """
+        Desenha as etiquetas para ``equipments`` (queryset ou iterável) em ``output``.
+        Retorna o número de etiquetas desenhadas.
+        """
+        canvas = pdf_canvas.Canvas(output, pagesize=A4, pageCompression=1)
+        canvas.setTitle('Etiquetas QR Code - EquipaHub')
+
+        if hasattr(equipments, 'iterator'):
+            equipments = equipments.exclude(qrcode_hash__isnull=True).iterator(chunk_size=self.per_page * 4)
+
+        count = 0
+        for equipment in equipments:
+            slot = count % self.per_page
+            if count and slot == 0:
+                canvas.showPage()
+            column = slot % self.columns
+            row = slot // self.columns
+            x = self.margin + column * self.cell_width
+            y = self.page_height - self.margin - (row + 1) * self.cell_height
+            self._draw_label(canvas, equipment, x, y)
+            count += 1
+
+        canvas.showPage()
+        canvas.save()
+        return count
+
+    def render(self, equipments):
+        """
+        Gera o PDF num ficheiro temporário em spool (memória até SPOOL_MAX_SIZE,
+        depois disco) e retorna-o posicionado no início, pronto a ser
+        transmitido em blocos.
+        """
+        spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+        self.write(equipments, spool)
+        spool.seek(0)
+        return spool
@@ -0,0 +1,222 @@
+import re
+import unicodedata
+
+from django.conf import settings
+from django.db import models
+
+
+DEFAULT_CAMPUS = 'Principal'
+# Tamanho das colunas: o texto livre do equipamento tem até 255 caracteres
+LEVEL_MAX_LENGTH = 100
+PATH_MAX_LENGTH = 255
+# Abreviaturas frequentes, expandidas para agrupar variantes de escrita
+WORD_ALIASES = {
+    'lab': 'laboratorio',
+    'labs': 'laboratorio',
+    'sl': 'sala',
+    'bl': 'bloco',
+    'aud': 'auditorio',
+    'ed': 'edificio',
+    'predio': 'edificio',
+}
+CAMPUS_WORDS = ('campus',)
+BUILDING_WORDS = ('bloco', 'edificio')
+_SEPARATORS = re.compile(r'\s*(?:/|>|\||,|;|\s-\s|\s—\s)\s*')
+_BUILDING_INLINE = re.compile(
+    r'^((?:bloco|bl\.?|edif[ií]cio|ed\.?|pr[eé]dio)(?:\s+|(?<=\.))\S+)\s+(.+)$', re.IGNORECASE
+)
+_NON_ALNUM = re.compile(r'[^0-9a-z]+')
+
+
+def default_campus():
+    return getattr(settings, 'EQUIPMENT_DEFAULT_CAMPUS', DEFAULT_CAMPUS)
+
+
+def slug(text):
+    """
+    Forma normalizada de um nível (sem acentos, minúsculas, abreviaturas expandidas)
+    """
+    text = unicodedata.normalize('NFKD', text or '').encode('ascii', 'ignore').decode().lower()
+    # Palavras separadas por qualquer pontuação: 'Bl.B', 'Bl. B' e 'bl-b' são 'bloco b'
+    words = [WORD_ALIASES.get(word, word) for word in _NON_ALNUM.split(text) if word]
+    return '-'.join(words)
+
+
+def level_slug(text, keywords):
+    """
+    Forma normalizada de um nível sem a palavra que o identifica:
+    'Campus Principal' = 'Principal', 'Bloco B' = 'Bl. B' = 'Edifício B'
+    """
+    normalized = slug(text)
+    head, _, rest = normalized.partition('-')
+    return rest if head in keywords and rest else normalized
+
+
+def campus_slug(text):
+    return level_slug(text, CAMPUS_WORDS)
+
+
+def building_slug(text):
+    return level_slug(text, BUILDING_WORDS)
+
+
+def parse_location(text):
+    """
+    Divide o texto livre em (campus, edifício, sala).
+
+    Aceita separadores ('Campus Norte / Bloco B / Sala 12', 'Bloco B - Sala 12')
+    e o edifício no início sem separador ('Bloco B Sala 12'). Os níveis são
+    identificados pelas palavras 'campus', 'bloco'/'edifício'/'prédio'; os
+    restantes são atribuídos da sala para o campus.
+    """
+    text = ' '.join((text or '').split())
+    parts = [part for part in _SEPARATORS.split(text) if part]
+    if len(parts) == 1:
+        inline = _BUILDING_INLINE.match(parts[0])
+        if inline:
+            parts = [inline.group(1), inline.group(2)]
+
+    campus = building = room = ''
+    remaining = []
+    for part in parts:
+        first = slug(part).split('-')[0]
+        if first == 'campus' and not campus:
+            campus = part
+        elif first in BUILDING_WORDS and not building:
+            building = part
+        else:
+            remaining.append(part)
+
+    if remaining:
+        room = remaining.pop()
+    if remaining and not building:
+        building = remaining.pop()
+    if remaining and not campus:
+        campus = remaining.pop()
+    return tuple(level[:LEVEL_MAX_LENGTH].strip() for level in (campus or default_campus(), building, room))
+
+
+def location_path(campus, building='', room=''):
+    return f"{campus_slug(campus)}/{building_slug(building)}/{slug(room)}"[:PATH_MAX_LENGTH]
+
+
+def location_label(campus, building='', room=''):
+    """
+    Texto apresentado (o campus por omissão não é mostrado)
+    """
+    levels = [building, room]
+    if campus_slug(campus) != campus_slug(default_campus()):
+        levels.insert(0, campus)
+    return ' / '.join(level for level in levels if level) or campus
+
+
+def subtree_range(prefix):
+    """
+    Limites [início, fim) dos caminhos que começam por ``prefix``: a
+    comparação por intervalo usa o índice de ``path`` (LIKE não usa)
+    """
+    return prefix, prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+class Location(models.Model):
+    """
+    Local normalizado de um equipamento (campus, edifício, sala).
+    ``path`` é a forma normalizada 'campus/edificio/sala' e permite filtrar
+    uma subárvore ('tudo no bloco B') com um intervalo sobre o índice.
+    """
+    campus = models.CharField(max_length=LEVEL_MAX_LENGTH, verbose_name='Campus')
+    building = models.CharField(max_length=LEVEL_MAX_LENGTH, blank=True, verbose_name='Edifício')
+    room = models.CharField(max_length=LEVEL_MAX_LENGTH, blank=True, verbose_name='Sala')
+    path = models.CharField(max_length=PATH_MAX_LENGTH, unique=True, verbose_name='Caminho')
+
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'locations'
+        verbose_name = 'Localização'
+        verbose_name_plural = 'Localizações'
+        ordering = ['path']
+
+    def __str__(self):
+        return self.label
+
+    @property
+    def label(self):
+        return location_label(self.campus, self.building, self.room)
+
+    def save(self, *args, **kwargs):
+        self.path = location_path(self.campus, self.building, self.room)
+        super().save(*args, **kwargs)
+
+    @classmethod
+    def for_text(cls, text):
+        """
+        Retorna (criando se necessário) a localização correspondente ao texto
+        """
+        return cls.resolve_many([text])[text]
+
+    @classmethod
+    def resolve_many(cls, texts):
+        """
+        Resolve vários textos com uma consulta (e um bulk_create para os novos).
+        Retorna {texto: Location}.
+        """
+        parsed = {text: parse_location(text) for text in set(texts) if text and text.strip()}
+        paths = {text: location_path(*levels) for text, levels in parsed.items()}
+        existing = {loc.path: loc for loc in cls.objects.filter(path__in=set(paths.values()))}
+
+        missing = {}
+        for text, path in paths.items():
+            if path not in existing and path not in missing:
+                campus, building, room = parsed[text]
+                missing[path] = cls(campus=campus, building=building, room=room, path=path)
+        if missing:
+            cls.objects.bulk_create(missing.values(), ignore_conflicts=True)
+            existing.update({loc.path: loc for loc in cls.objects.filter(path__in=list(missing))})
+        return {text: existing[path] for text, path in paths.items()}
+
+    @classmethod
+    def subtree(cls, prefix):
+        """
+        Localizações sob o caminho indicado ('principal/bloco-b'), por intervalo
+        """
+        parts = [level for level in prefix.strip('/').split('/') if level.strip()]
+        levels = [normalize(level) for normalize, level in zip((campus_slug, building_slug, slug), parts)]
+        if not levels:
+            return cls.objects.all()
+        if len(levels) < 3:
+            prefix = '/'.join(levels) + '/'
+        else:
+            return cls.objects.filter(path='/'.join(levels[:3]))
+        start, end = subtree_range(prefix)
+        return cls.objects.filter(path__gte=start, path__lt=end)
+
+    @classmethod
+    def matching(cls, text):
+        """
+        Localizações cujo campus, edifício ou sala contém o texto. A tabela é
+        pequena; os equipamentos são depois filtrados pela chave estrangeira.
+        """
+        q = (
+            models.Q(campus__icontains=text) | models.Q(building__icontains=text)
+            | models.Q(room__icontains=text)
+        )
+        normalized = slug(text)
+        if normalized:
+            # Também apanha variantes ('lab 1' encontra 'Laboratório 1')
+            q |= models.Q(path__contains=normalized)
+            head = normalized.split('-')[0]
+            if head in CAMPUS_WORDS:
+                q |= models.Q(path__startswith=f"{campus_slug(text)}/")
+            elif head in BUILDING_WORDS:
+                # 'Bl. B' encontra o nível de edifício 'b' ('Bloco B')
+                q |= models.Q(path__contains=f"/{building_slug(text)}/")
+        campus, building, room = parse_location(text)
+        if building and room:
+            # Texto com vários níveis ('Bloco B / Sala 1', o próprio rótulo):
+            # compara o caminho normalizado; sem campus explícito, em qualquer campus
+            path = location_path(campus, building, room)
+            if campus_slug(campus) == campus_slug(default_campus()):
+                path = path[path.index('/'):]
+            q |= models.Q(path__contains=path)
+        return cls.objects.filter(q)
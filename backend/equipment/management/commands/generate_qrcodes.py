@@ -1,14 +1,75 @@
-from django.core.management.base import BaseCommand
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
 from equipment.models import Equipment
+from equipment import qr_signing, qrcode_service
+from equipment.scan_service import ScanIndex
 
 
 class Command(BaseCommand):
-    help = 'Gera QR Code hashes para equipamentos que ainda não têm'
+    help = 'Gera QR Code hashes para equipamentos que ainda não têm e pré-gera as imagens na cache'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--base-url', help='URL base codificado nos QR Codes (padrão: QRCODE_BASE_URL)')
+        parser.add_argument('--formats', nargs='+', default=['png'], choices=sorted(qrcode_service.FORMATS),
+                            help='Formatos a pré-gerar (padrão: png)')
+        parser.add_argument('--workers', type=int, default=None, help='Processos em paralelo (padrão: nº de CPUs)')
+        parser.add_argument('--batch-size', type=int, default=200, help='Equipamentos por lote (padrão: 200)')
+        parser.add_argument('--skip-images', action='store_true', help='Apenas atribui os hashes em falta')
 
     def handle(self, *args, **options):
+        batch_size = options['batch_size']
+
+        # Atribui os hashes em falta com bulk_update, lote a lote
         qtd = 0
-        for eq in Equipment.objects.filter(qrcode_hash__isnull=True):
-            eq.save()  # save() gera qrcode_hash automaticamente
-            qtd += 1
-            self.stdout.write(f'  QR gerado para {eq} — {eq.qrcode_hash}')
+        updated_ids = []
+        missing = Equipment.objects.filter(qrcode_hash__isnull=True).only('id', 'serial_number')
+        batch = []
+        for eq in missing.iterator(chunk_size=batch_size):
+            eq.qrcode_hash = Equipment.generate_qrcode_hash(eq.serial_number)
+            batch.append(eq)
+            updated_ids.append(eq.pk)
+            if len(batch) >= batch_size:
+                Equipment.objects.bulk_update(batch, ['qrcode_hash'])
+                qtd += len(batch)
+                batch = []
+        if batch:
+            Equipment.objects.bulk_update(batch, ['qrcode_hash'])
+            qtd += len(batch)
+        # bulk_update não dispara signals: sincroniza o índice de leitura
+        if updated_ids:
+            ScanIndex.sync_many('equipment', updated_ids)
         self.stdout.write(self.style.SUCCESS(f'{qtd} QR Code(s) gerados.'))
+
+        if options['skip_images']:
+            return
+
+        base_url = options['base_url'] or settings.QRCODE_BASE_URL
+        if not base_url:
+            raise CommandError('Indique --base-url ou configure QRCODE_BASE_URL para pré-gerar as imagens.')
+
+        directory = str(qrcode_service.cache_dir())
+        rows = list(
+            Equipment.objects.exclude(qrcode_hash__isnull=True).values_list('id', 'qrcode_hash')
+        )
+        jobs = [
+            (
+                qrcode_hash,
+                qrcode_service.consult_url(qr_signing.scan_token('equipment', pk, qrcode_hash), base_url),
+                fmt,
+                qrcode_service.DEFAULT_SCALE,
+            )
+            for pk, qrcode_hash in rows for fmt in options['formats']
+        ]
+        batches = [jobs[i:i + batch_size] for i in range(0, len(jobs), batch_size)]
+
+        rendered = 0
+        with ProcessPoolExecutor(max_workers=options['workers']) as pool:
+            futures = [pool.submit(qrcode_service.render_batch, chunk, directory) for chunk in batches]
+            for future in futures:
+                rendered += future.result()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{rendered} imagem(ns) gerada(s), {len(jobs) - rendered} já em cache ({directory}).'
+        ))
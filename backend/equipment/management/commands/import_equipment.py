@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from equipment.import_service import EquipmentImporter
+
+
+class Command(BaseCommand):
+    help = 'Importa equipamentos em lote a partir de um ficheiro CSV'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Caminho do ficheiro CSV')
+        parser.add_argument('--delimiter', help='Separador de colunas (padrão: deteta , ou ;)')
+        parser.add_argument('--encoding', default='utf-8-sig', help='Codificação do ficheiro (padrão: utf-8)')
+        parser.add_argument('--batch-size', type=int, default=EquipmentImporter.BATCH_SIZE,
+                            help=f'Linhas por bloco (padrão: {EquipmentImporter.BATCH_SIZE})')
+        parser.add_argument('--dry-run', action='store_true', help='Apenas valida, sem gravar')
+        parser.add_argument('--verbose', action='store_true', help='Mostra todos os erros por linha')
+
+    def handle(self, *args, **options):
+        importer = EquipmentImporter(dry_run=options['dry_run'], batch_size=options['batch_size'])
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING('🔍 Modo dry-run: nada será gravado'))
+
+        try:
+            with open(options['path'], encoding=options['encoding'], newline='') as f:
+                result = importer.run(f, delimiter=options['delimiter'])
+        except (OSError, ValueError, UnicodeDecodeError) as e:
+            raise CommandError(str(e))
+
+        errors = result['errors'] if options['verbose'] else result['errors'][:20]
+        for error in errors:
+            self.stdout.write(self.style.ERROR(
+                f"  ❌ Linha {error['row']} ({error['serial_number'] or 'sem série'}): {' '.join(error['errors'])}"
+            ))
+        if len(errors) < result['failed']:
+            self.stdout.write(f"  ... e mais {result['failed'] - len(errors)} erro(s) (use --verbose)")
+
+        verb = 'validado(s)' if options['dry_run'] else 'importado(s)'
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {result['created']} equipamento(s) {verb}, {result['failed']} com erro, "
+            f"{result['total_rows']} linha(s) em {result['duration_seconds']}s"
+        ))
@@ -0,0 +1,42 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from equipment.models import Equipment, Location
+from equipment.label_service import QRLabelSheet
+
+
+class Command(BaseCommand):
+    help = 'Gera um PDF com folhas de etiquetas de QR Code para um conjunto de equipamentos'
+
+    def add_arguments(self, parser):
+        parser.add_argument('output', help='Caminho do ficheiro PDF a gerar')
+        parser.add_argument('--ids', nargs='+', type=int, help='Ids dos equipamentos')
+        parser.add_argument('--type', help='Filtra por tipo')
+        parser.add_argument('--status', help='Filtra por status')
+        parser.add_argument('--brand', help='Filtra por marca')
+        parser.add_argument('--location', help='Filtra por localização (campus, edifício ou sala que contém o texto)')
+        parser.add_argument('--columns', type=int, default=3, help='Etiquetas por linha (padrão: 3)')
+        parser.add_argument('--rows', type=int, default=8, help='Linhas por página (padrão: 8)')
+        parser.add_argument('--base-url', help='URL base codificado nos QR Codes (padrão: QRCODE_BASE_URL)')
+
+    def handle(self, *args, **options):
+        base_url = options['base_url'] or settings.QRCODE_BASE_URL
+        if not base_url:
+            raise CommandError('Indique --base-url ou configure QRCODE_BASE_URL.')
+
+        queryset = Equipment.objects.order_by('brand', 'model', 'id')
+        if options['ids']:
+            queryset = queryset.filter(id__in=options['ids'])
+        for field in ['type', 'status', 'brand']:
+            if options[field]:
+                queryset = queryset.filter(**{field: options[field]})
+        if options['location']:
+            queryset = queryset.filter(place__in=Location.matching(options['location']))
+
+        sheet = QRLabelSheet(base_url, columns=options['columns'], rows=options['rows'])
+        with open(options['output'], 'wb') as f:
+            count = sheet.write(queryset, f)
+
+        pages = -(-count // sheet.per_page) if count else 0
+        self.stdout.write(self.style.SUCCESS(
+            f'{count} etiqueta(s) em {pages} página(s) gravadas em {options["output"]}'
+        ))
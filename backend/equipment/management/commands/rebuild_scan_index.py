@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from equipment.scan_models import ScanToken
+from equipment.scan_service import ScanIndex
+
+
+class Command(BaseCommand):
+    help = 'Reconstrói o índice de resolução de QR Codes (equipamentos e solicitações)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--kind', choices=sorted(ScanIndex.SOURCES),
+                            help='Sincroniza apenas um tipo, sem apagar o resto do índice')
+
+    def handle(self, *args, **options):
+        if options['kind']:
+            counts = {options['kind']: ScanIndex.sync_many(options['kind'])}
+        else:
+            counts = ScanIndex.rebuild()
+
+        for kind, count in counts.items():
+            self.stdout.write(f'  🔖 {kind}: {count} token(s)')
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ Índice de leitura atualizado: {ScanToken.objects.count()} token(s) no total.'
+        ))
@@ -0,0 +1,41 @@
+import time
+from collections import Counter
+
+from django.core.management.base import BaseCommand
+
+from equipment.status_reconciler import EquipmentStatusReconciler
+
+
+class Command(BaseCommand):
+    help = 'Recalcula o status dos equipamentos a partir de empréstimos e reservas e corrige as divergências'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Apenas mostra as divergências, sem corrigir')
+        parser.add_argument('--verbose', action='store_true', help='Lista cada equipamento divergente')
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        started = time.perf_counter()
+
+        self.stdout.write("🔍 Reconciliação do status dos equipamentos")
+        if dry_run:
+            self.stdout.write(self.style.WARNING("   Modo DRY-RUN — sem alterações"))
+
+        differences, updated = EquipmentStatusReconciler().run(dry_run=dry_run)
+
+        if options['verbose'] or dry_run:
+            for equipment_id, current, expected in differences:
+                self.stdout.write(f"  Equipamento #{equipment_id}: {current} → {expected}")
+
+        for (current, expected), count in sorted(Counter((c, e) for _, c, e in differences).items()):
+            self.stdout.write(f"📊 {current} → {expected}: {count}")
+
+        elapsed = time.perf_counter() - started
+        if not differences:
+            self.stdout.write(self.style.SUCCESS(f"✨ Nenhuma divergência encontrada ({elapsed:.2f}s)"))
+        elif dry_run:
+            self.stdout.write(self.style.SUCCESS(f"✅ {len(differences)} divergência(s) encontradas ({elapsed:.2f}s)"))
+        else:
+            self.stdout.write(self.style.SUCCESS(
+                f"✅ {updated} de {len(differences)} equipamento(s) corrigidos ({elapsed:.2f}s)"
+            ))
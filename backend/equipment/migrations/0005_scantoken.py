@@ -0,0 +1,46 @@
+# Generated by Django 4.2.9 on 2026-10-19 01:43
+
+from django.db import migrations, models
+
+
+def backfill_scan_tokens(apps, schema_editor):
+    ScanToken = apps.get_model('equipment', 'ScanToken')
+    sources = [
+        ('equipment', apps.get_model('equipment', 'Equipment')),
+        ('loan_request', apps.get_model('loans', 'LoanRequest')),
+    ]
+    for kind, model in sources:
+        rows = model.objects.exclude(qrcode_hash__isnull=True).values_list('pk', 'qrcode_hash')
+        ScanToken.objects.bulk_create(
+            [ScanToken(token=token, kind=kind, object_id=pk) for pk, token in rows.iterator()],
+            batch_size=500,
+            ignore_conflicts=True,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('equipment', '0004_equipment_qrcode_hash_alter_equipment_type'),
+        ('loans', '0011_add_qrcode_to_loanrequest'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScanToken',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('token', models.CharField(max_length=128, unique=True, verbose_name='Token')),
+                ('kind', models.CharField(choices=[('equipment', 'Equipamento'), ('loan_request', 'Solicitação de Empréstimo'), ('loan', 'Empréstimo'), ('package', 'Pacote')], max_length=20, verbose_name='Tipo')),
+                ('object_id', models.IntegerField(verbose_name='Id do objeto')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Token de Leitura',
+                'verbose_name_plural': 'Tokens de Leitura',
+                'db_table': 'scan_tokens',
+                'indexes': [models.Index(fields=['kind', 'object_id'], name='scan_token_kind_object_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_scan_tokens, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,142 @@
+# Generated by Django 4.2.9 on 2026-10-19 01:58
+
+import re
+import unicodedata
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import Count
+
+# Cópia das regras de normalização de equipment.location_models na data desta
+# migração: a migração não pode depender de código que venha a mudar.
+WORD_ALIASES = {
+    'lab': 'laboratorio',
+    'labs': 'laboratorio',
+    'sl': 'sala',
+    'bl': 'bloco',
+    'aud': 'auditorio',
+    'ed': 'edificio',
+    'predio': 'edificio',
+}
+CAMPUS_WORDS = ('campus',)
+BUILDING_WORDS = ('bloco', 'edificio')
+SEPARATORS = re.compile(r'\s*(?:/|>|\||,|;|\s-\s|\s—\s)\s*')
+BUILDING_INLINE = re.compile(
+    r'^((?:bloco|bl\.?|edif[ií]cio|ed\.?|pr[eé]dio)(?:\s+|(?<=\.))\S+)\s+(.+)$', re.IGNORECASE
+)
+NON_ALNUM = re.compile(r'[^0-9a-z]+')
+
+
+def slug(text):
+    text = unicodedata.normalize('NFKD', text or '').encode('ascii', 'ignore').decode().lower()
+    words = [WORD_ALIASES.get(word, word) for word in NON_ALNUM.split(text) if word]
+    return '-'.join(words)
+
+
+def level_slug(text, keywords):
+    normalized = slug(text)
+    head, _, rest = normalized.partition('-')
+    return rest if head in keywords and rest else normalized
+
+
+def parse_location(text):
+    text = ' '.join((text or '').split())
+    parts = [part for part in SEPARATORS.split(text) if part]
+    if len(parts) == 1:
+        inline = BUILDING_INLINE.match(parts[0])
+        if inline:
+            parts = [inline.group(1), inline.group(2)]
+
+    campus = building = room = ''
+    remaining = []
+    for part in parts:
+        first = slug(part).split('-')[0]
+        if first in CAMPUS_WORDS and not campus:
+            campus = part
+        elif first in BUILDING_WORDS and not building:
+            building = part
+        else:
+            remaining.append(part)
+
+    if remaining:
+        room = remaining.pop()
+    if remaining and not building:
+        building = remaining.pop()
+    if remaining and not campus:
+        campus = remaining.pop()
+    campus = campus or getattr(settings, 'EQUIPMENT_DEFAULT_CAMPUS', 'Principal')
+    return tuple(level[:100].strip() for level in (campus, building, room))
+
+
+def location_path(campus, building='', room=''):
+    return f"{level_slug(campus, CAMPUS_WORDS)}/{level_slug(building, BUILDING_WORDS)}/{slug(room)}"[:255]
+
+
+def cluster_locations(apps, schema_editor):
+    """
+    Agrupa os textos livres existentes por forma normalizada, cria uma
+    localização por grupo (com a grafia mais frequente) e associa-a.
+    O texto original de ``location`` não é alterado, pelo que a migração
+    pode ser revertida sem perdas.
+    """
+    Equipment = apps.get_model('equipment', 'Equipment')
+    Location = apps.get_model('equipment', 'Location')
+
+    texts = (
+        Equipment.objects.exclude(location__isnull=True).exclude(location='')
+        .order_by().values('location').annotate(total=Count('id'))
+    )
+    # Grafia mais frequente primeiro; em empate, a mais longa (sem abreviaturas)
+    texts = sorted(texts, key=lambda row: (-row['total'], -len(row['location']), row['location']))
+    groups = {}
+    for row in texts:
+        levels = parse_location(row['location'])
+        path = location_path(*levels)
+        groups.setdefault(path, (levels, []))[1].append(row['location'])
+
+    for path, ((campus, building, room), spellings) in groups.items():
+        location = Location.objects.create(campus=campus, building=building, room=room, path=path)
+        Equipment.objects.filter(location__in=spellings).update(place=location)
+
+
+def unlink_locations(apps, schema_editor):
+    """
+    Reverso: o texto de ``location`` mantém a grafia original; basta
+    desassociar as localizações antes de a tabela ser removida
+    """
+    Equipment = apps.get_model('equipment', 'Equipment')
+    Equipment.objects.exclude(place__isnull=True).update(place=None)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('equipment', '0005_scantoken'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Location',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('campus', models.CharField(max_length=100, verbose_name='Campus')),
+                ('building', models.CharField(blank=True, max_length=100, verbose_name='Edifício')),
+                ('room', models.CharField(blank=True, max_length=100, verbose_name='Sala')),
+                ('path', models.CharField(max_length=255, unique=True, verbose_name='Caminho')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Localização',
+                'verbose_name_plural': 'Localizações',
+                'db_table': 'locations',
+                'ordering': ['path'],
+            },
+        ),
+        migrations.AddField(
+            model_name='equipment',
+            name='place',
+            field=models.ForeignKey(blank=True, help_text='Localização normalizada; o texto de location é mantido em sincronia', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='equipments', to='equipment.location', verbose_name='Local'),
+        ),
+        migrations.RunPython(cluster_locations, unlink_locations),
+    ]
@@ -60,6 +60,15 @@ class Equipment(models.Model):
         null=True,
         verbose_name='Localização'
     )
+    place = models.ForeignKey(
+        'Location',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='equipments',
+        verbose_name='Local',
+        help_text='Localização normalizada; o texto de location é mantido em sincronia'
+    )
     color = models.CharField(
         max_length=50,
         blank=True,
@@ -90,6 +99,10 @@ class Equipment(models.Model):
         verbose_name = 'Equipamento'
         verbose_name_plural = 'Equipamentos'
         ordering = ['brand', 'model']
+        indexes = [
+            models.Index(fields=['status', 'type'], name='equipment_status_type_idx'),
+            models.Index(fields=['updated_at'], name='equipment_updated_idx'),
+        ]
         
     def __str__(self):
         return f"{self.brand} {self.model} ({self.serial_number})"
@@ -110,8 +123,48 @@ class Equipment(models.Model):
             return f"/api/v1/equipment/qrcode/{self.qrcode_hash}/"
         return None
     
+    @staticmethod
+    def generate_qrcode_hash(serial_number):
+        raw = f"{serial_number}-{uuid.uuid4().hex[:8]}"
+        return hashlib.sha256(raw.encode()).hexdigest()[:16]
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Valores lidos: a localização só é resolvida quando o texto muda
+        instance._loaded_location = instance.__dict__.get('location')
+        instance._loaded_place_id = instance.__dict__.get('place_id')
+        return instance
+
+    def sync_place(self):
+        """
+        Associa a localização normalizada ao texto de ``location`` quando este
+        muda. O texto escrito pelo utilizador é mantido; as variantes de
+        escrita agrupam-se pela localização (``place``).
+        """
+        text = (self.location or '').strip()
+        if self.location != getattr(self, '_loaded_location', None):
+            self.place = Location.for_text(text) if text else None
+        elif self.place_id != getattr(self, '_loaded_place_id', None) or (not text and self.place_id):
+            # Localização escolhida diretamente: o texto passa a ser o rótulo
+            self.location = self.place.label if self.place_id else ''
+        elif text and self.place_id is None:
+            self.place = Location.for_text(text)
+
     def save(self, *args, **kwargs):
         if not self.qrcode_hash:
-            raw = f"{self.serial_number}-{uuid.uuid4().hex[:8]}"
-            self.qrcode_hash = hashlib.sha256(raw.encode()).hexdigest()[:16]
+            self.qrcode_hash = self.generate_qrcode_hash(self.serial_number)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or {'location', 'place'} & set(update_fields):
+            self.sync_place()
+            if update_fields is not None:
+                kwargs['update_fields'] = set(update_fields) | {'location', 'place'}
         super().save(*args, **kwargs)
+        self._loaded_location = self.location
+        self._loaded_place_id = self.place_id
+
+
+# Índice de resolução de QR Codes
+from .scan_models import ScanToken  # noqa: E402,F401
+# Localizações normalizadas
+from .location_models import Location, location_path, parse_location  # noqa: E402,F401
@@ -0,0 +1,173 @@
+"""
+QR Codes assinados (verificáveis sem consulta à base de dados)
+
+Além do ``qrcode_hash`` aleatório, um QR Code pode codificar um token
+assinado com HMAC-SHA256 sobre (tipo, id, versão) com a chave
+``QRCODE_SIGNING_KEY``. O backend — ou um tablet do balcão com a mesma chave —
+valida o token sem ir à base de dados. Incrementar
+``QRCODE_SIGNING_VERSION`` invalida todas as etiquetas impressas antes.
+
+A chave fica guardada nos tablets, por isso tem de ser própria: não pode ser
+a ``SECRET_KEY`` nem a ``JWT_SECRET_KEY`` (quem tivesse um tablet poderia
+forjar sessões e tokens). Sem chave dedicada não se assinam nem verificam
+tokens e o manifesto não é gerado.
+
+Formato: ``EH<versão>-<tipo>-<id em base 36>-<assinatura>``, por exemplo
+``EH1-e-2s-Q0x3b9fGk1cPa2Zt``.
+"""
+
+import base64
+import hashlib
+import hmac
+import json
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.utils import timezone
+
+PREFIX = 'EH'
+SIGNATURE_LENGTH = 16
+KIND_CODES = {
+    'equipment': 'e',
+    'loan_request': 'r',
+    'loan': 'l',
+    'package': 'p',
+}
+KINDS_BY_CODE = {code: kind for kind, code in KIND_CODES.items()}
+MANIFEST_FIELDS = ['id', 'token', 'qrcode_hash', 'name', 'serial_number', 'status']
+
+
+def signing_configured():
+    """
+    Há uma chave de assinatura dedicada (diferente das chaves de sessão e JWT)?
+    """
+    key = getattr(settings, 'QRCODE_SIGNING_KEY', '')
+    shared = {settings.SECRET_KEY, getattr(settings, 'JWT_SECRET_KEY', settings.SECRET_KEY)}
+    return bool(key) and key not in shared
+
+
+def _key():
+    if not signing_configured():
+        raise ImproperlyConfigured(
+            'Configure QRCODE_SIGNING_KEY com uma chave própria (diferente de SECRET_KEY e JWT_SECRET_KEY).'
+        )
+    return settings.QRCODE_SIGNING_KEY.encode()
+
+
+def current_version():
+    return int(getattr(settings, 'QRCODE_SIGNING_VERSION', 1))
+
+
+def signed_payloads_enabled():
+    return bool(getattr(settings, 'QRCODE_SIGNED_PAYLOADS', False))
+
+
+def _digest(message):
+    return hmac.new(_key(), message.encode(), hashlib.sha256).digest()
+
+
+def _signature(kind, object_id, version):
+    digest = _digest(f"{kind}:{object_id}:{version}")
+    return base64.urlsafe_b64encode(digest).decode()[:SIGNATURE_LENGTH]
+
+
+def _base36(number):
+    digits = '0123456789abcdefghijklmnopqrstuvwxyz'
+    result = ''
+    while True:
+        number, remainder = divmod(number, 36)
+        result = digits[remainder] + result
+        if not number:
+            return result
+
+
+def sign(kind, object_id, version=None):
+    """
+    Retorna o token assinado para o objeto
+    """
+    version = current_version() if version is None else version
+    return f"{PREFIX}{version}-{KIND_CODES[kind]}-{_base36(object_id)}-{_signature(kind, object_id, version)}"
+
+
+def is_signed(token):
+    return bool(token) and token.startswith(PREFIX) and token.count('-') >= 3
+
+
+def verify(token):
+    """
+    Valida o token e retorna (tipo, id), ou None se for inválido,
+    adulterado ou de uma versão de chave anterior
+    """
+    if not is_signed(token):
+        return None
+    head, code, encoded_id, signature = token.split('-', 3)
+    try:
+        version = int(head[len(PREFIX):])
+        object_id = int(encoded_id, 36)
+    except ValueError:
+        return None
+    kind = KINDS_BY_CODE.get(code)
+    if kind is None or version != current_version() or not signing_configured():
+        return None
+    if not hmac.compare_digest(signature, _signature(kind, object_id, version)):
+        return None
+    return kind, object_id
+
+
+def scan_token(kind, object_id, qrcode_hash):
+    """
+    Conteúdo a codificar no QR Code: token assinado quando
+    QRCODE_SIGNED_PAYLOADS está ativo, caso contrário o qrcode_hash.
+    Com QRCODE_SIGNED_PAYLOADS ativo e sem chave dedicada lança
+    ImproperlyConfigured (nunca assina com a SECRET_KEY).
+    """
+    if signed_payloads_enabled():
+        return sign(kind, object_id)
+    return qrcode_hash
+
+
+def build_manifest(queryset, since=None):
+    """
+    Manifesto compacto de equipamentos para cache offline no tablet.
+    Cada item é uma lista com os campos de ``MANIFEST_FIELDS``; o
+    manifesto inteiro é assinado para o tablet detetar adulterações.
+    Sem chave dedicada lança ImproperlyConfigured.
+    """
+    _key()
+    generated_at = timezone.now()
+    if since is not None:
+        queryset = queryset.filter(updated_at__gt=since)
+    rows = (
+        queryset.order_by('id')
+        .exclude(qrcode_hash__isnull=True)
+        .values_list('id', 'qrcode_hash', 'brand', 'model', 'serial_number', 'status')
+    )
+    items = [
+        [pk, sign('equipment', pk), qrcode_hash, f"{brand} {model}", serial_number, status]
+        for pk, qrcode_hash, brand, model, serial_number, status in rows.iterator(chunk_size=2000)
+    ]
+    manifest = {
+        'version': current_version(),
+        'generated_at': generated_at.isoformat(),
+        'incremental': since is not None,
+        'fields': MANIFEST_FIELDS,
+        'items': items,
+    }
+    body = json.dumps(manifest, separators=(',', ':'), sort_keys=True, default=str)
+    manifest['signature'] = base64.urlsafe_b64encode(_digest(body)).decode().rstrip('=')
+    return manifest
+
+
+def check_signing_key(app_configs=None, **kwargs):
+    """
+    System check: QRCODE_SIGNED_PAYLOADS exige uma chave de assinatura dedicada
+    """
+    from django.core.checks import Error
+
+    if signed_payloads_enabled() and not signing_configured():
+        return [Error(
+            'QRCODE_SIGNED_PAYLOADS está ativo sem uma QRCODE_SIGNING_KEY dedicada.',
+            hint='Defina QRCODE_SIGNING_KEY com uma chave própria, diferente de SECRET_KEY e JWT_SECRET_KEY.',
+            id='equipment.E001',
+        )]
+    return []
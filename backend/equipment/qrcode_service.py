@@ -0,0 +1,185 @@
+"""
+Geração local de imagens de QR Code
+
+As imagens são geradas no servidor (matriz com o codificador QR do reportlab,
+PNG com Pillow, SVG em texto) e guardadas numa cache em disco endereçada pelo
+conteúdo: o nome do ficheiro deriva do ``qrcode_hash`` e de um resumo do
+conteúdo codificado, pelo que uma imagem gerada nunca muda. O URL da imagem
+leva o mesmo resumo (``?v=``): enquanto corresponder ao conteúdo atual a
+resposta é ``immutable``; sem ele (ou desatualizado) é servida com um
+``max-age`` curto e ``ETag``.
+
+Um ``<img>`` não envia o token Bearer: a página do QR Code usa um URL
+assinado (``signed_image_url``) com validade de
+``QRCODE_IMAGE_URL_MAX_AGE`` segundos, que dispensa autenticação. A
+assinatura é a mesma durante metade da validade, para que o URL se repita
+entre visitas e a imagem venha da cache do navegador. Os clientes da API
+autenticados podem pedir a imagem diretamente (como blob).
+"""
+
+import hashlib
+import os
+import tempfile
+import time
+from io import BytesIO
+from pathlib import Path
+
+from django.conf import settings
+from django.core import signing
+from django.utils.crypto import constant_time_compare
+from PIL import Image
+from reportlab.graphics.barcode import qrencoder
+
+# Incrementar quando o aspeto das imagens mudar, para invalidar a cache
+RENDER_VERSION = 1
+FORMATS = {
+    'png': 'image/png',
+    'svg': 'image/svg+xml',
+}
+DEFAULT_SCALE = 8
+DEFAULT_BORDER = 4
+DEFAULT_IMAGE_URL_MAX_AGE = 3600
+# max-age das respostas com a imagem (revalidadas com ETag)
+IMAGE_CACHE_SECONDS = 300
+# Respostas pedidas com o resumo atual do conteúdo (?v=) nunca mudam
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+IMAGE_URL_SALT = 'equipment.qrcode_image'
+
+
+def cache_dir():
+    return Path(getattr(settings, 'QRCODE_CACHE_DIR', Path(settings.MEDIA_ROOT) / 'qrcodes'))
+
+
+def consult_url(qrcode_hash, base_url=''):
+    """
+    URL codificado no QR Code (página de consulta do equipamento)
+    """
+    base_url = (base_url or getattr(settings, 'QRCODE_BASE_URL', '')).rstrip('/')
+    return f"{base_url}/consulta/{qrcode_hash}/"
+
+
+def image_url_max_age():
+    return getattr(settings, 'QRCODE_IMAGE_URL_MAX_AGE', DEFAULT_IMAGE_URL_MAX_AGE)
+
+
+def _image_signature(qrcode_hash, version, period):
+    return signing.Signer(salt=IMAGE_URL_SALT).signature(f"{qrcode_hash}:{version}:{period}")
+
+
+def sign_image(qrcode_hash, version=''):
+    """
+    Assinatura ('<início do período>:<assinatura>') para o URL da imagem.
+    O período tem metade da validade: o URL é estável durante esse tempo.
+    """
+    window = max(image_url_max_age() // 2, 1)
+    period = int(time.time()) // window * window
+    return f"{period}:{_image_signature(qrcode_hash, version, period)}"
+
+
+def image_signature_valid(qrcode_hash, signature, version=''):
+    period, _, value = (signature or '').partition(':')
+    if not period.isdigit() or not constant_time_compare(value, _image_signature(qrcode_hash, version, period)):
+        return False
+    return time.time() - int(period) <= image_url_max_age()
+
+
+def signed_image_url(qrcode_hash, fmt='png', base_url='', version=''):
+    """
+    URL da imagem utilizável num ``<img>`` sem autenticação; ``version`` é o
+    resumo do conteúdo (``cache_key``)
+    """
+    url = f"{base_url.rstrip('/')}/api/v1/equipment/qrcode/{qrcode_hash}/{fmt}/?"
+    if version:
+        url += f"v={version}&"
+    return f"{url}sig={sign_image(qrcode_hash, version)}"
+
+
+def qr_matrix(data):
+    """
+    Retorna a matriz de módulos (True = escuro) para o texto indicado
+    """
+    qr = qrencoder.QRCode(None, qrencoder.QRErrorCorrectLevel.M)
+    qr.addData(data)
+    qr.make()
+    size = qr.getModuleCount()
+    return [[qr.isDark(row, col) for col in range(size)] for row in range(size)]
+
+
+def render_png(data, scale=DEFAULT_SCALE, border=DEFAULT_BORDER):
+    matrix = qr_matrix(data)
+    size = len(matrix) + 2 * border
+    image = Image.new('1', (size, size), 1)
+    pixels = image.load()
+    for row, modules in enumerate(matrix):
+        for col, dark in enumerate(modules):
+            if dark:
+                pixels[col + border, row + border] = 0
+    image = image.resize((size * scale, size * scale), Image.NEAREST)
+
+    buffer = BytesIO()
+    image.save(buffer, format='PNG', optimize=True)
+    return buffer.getvalue()
+
+
+def render_svg(data, scale=DEFAULT_SCALE, border=DEFAULT_BORDER):
+    matrix = qr_matrix(data)
+    size = len(matrix) + 2 * border
+    path = ''.join(
+        f"M{col + border} {row + border}h1v1h-1z"
+        for row, modules in enumerate(matrix)
+        for col, dark in enumerate(modules) if dark
+    )
+    return (
+        f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 {size} {size}" '
+        f'width="{size * scale}" height="{size * scale}" shape-rendering="crispEdges">'
+        f'<rect width="100%" height="100%" fill="#fff"/><path d="{path}" fill="#000"/></svg>'
+    ).encode()
+
+
+def cache_key(qrcode_hash, payload, fmt, scale=DEFAULT_SCALE):
+    raw = f"{qrcode_hash}|{payload}|{fmt}|{scale}|{DEFAULT_BORDER}|v{RENDER_VERSION}"
+    return hashlib.sha256(raw.encode()).hexdigest()[:20]
+
+
+def cache_path(qrcode_hash, payload, fmt, scale=DEFAULT_SCALE, directory=None):
+    directory = Path(directory) if directory else cache_dir()
+    key = cache_key(qrcode_hash, payload, fmt, scale)
+    return directory / qrcode_hash[:2] / f"{qrcode_hash}.{key}.{fmt}"
+
+
+def render_to_cache(qrcode_hash, payload, fmt='png', scale=DEFAULT_SCALE, directory=None):
+    """
+    Garante a imagem na cache e retorna (caminho, gerada agora?).
+    A escrita é atómica (ficheiro temporário + rename) para ser segura com
+    vários processos a gerar a mesma imagem.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Formato de QR Code não suportado: {fmt}")
+
+    path = cache_path(qrcode_hash, payload, fmt, scale, directory)
+    if path.exists():
+        return path, False
+
+    content = render_png(payload, scale) if fmt == 'png' else render_svg(payload, scale)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(content)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
+    return path, True
+
+
+def render_batch(jobs, directory):
+    """
+    Gera um lote de imagens; usado pelos processos do pool em generate_qrcodes.
+    ``jobs`` é uma lista de (qrcode_hash, payload, fmt, scale).
+    """
+    return sum(
+        1 for qrcode_hash, payload, fmt, scale in jobs
+        if render_to_cache(qrcode_hash, payload, fmt, scale, directory)[1]
+    )
@@ -0,0 +1,39 @@
+from django.db import models
+
+
+class ScanToken(models.Model):
+    """
+    Índice de resolução de QR Codes: mapeia cada token lido no balcão
+    para o objeto correspondente (tipo + id)
+    """
+    KIND_CHOICES = [
+        ('equipment', 'Equipamento'),
+        ('loan_request', 'Solicitação de Empréstimo'),
+        ('loan', 'Empréstimo'),
+        ('package', 'Pacote'),
+    ]
+
+    token = models.CharField(
+        max_length=128,
+        unique=True,
+        verbose_name='Token'
+    )
+    kind = models.CharField(
+        max_length=20,
+        choices=KIND_CHOICES,
+        verbose_name='Tipo'
+    )
+    object_id = models.IntegerField(verbose_name='Id do objeto')
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'scan_tokens'
+        verbose_name = 'Token de Leitura'
+        verbose_name_plural = 'Tokens de Leitura'
+        indexes = [
+            models.Index(fields=['kind', 'object_id'], name='scan_token_kind_object_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.token} → {self.kind} #{self.object_id}"
@@ -0,0 +1,218 @@
+"""
+Resolução unificada de QR Codes lidos no balcão
+
+Todos os tokens legíveis (equipamentos, solicitações de empréstimo e, no
+futuro, empréstimos e pacotes) estão na tabela ``scan_tokens``, indexada pelo
+token. Tokens assinados (ver ``qr_signing``) são resolvidos só pela assinatura.
+Uma cache LRU em memória por processo guarda as resoluções recentes,
+pelo que uma sequência de leituras custa uma consulta indexada cada.
+A cache é invalidada quando o objeto é gravado ou apagado.
+"""
+
+from collections import OrderedDict
+from threading import Lock
+
+from django.apps import apps
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+
+from . import qr_signing
+from .scan_models import ScanToken
+
+
+class LRUCache:
+    """
+    Cache LRU simples e thread-safe
+    """
+
+    def __init__(self, maxsize=2048):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._data:
+                return None
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class ScanIndex:
+    """
+    Mantém e consulta o índice de tokens de leitura
+    """
+
+    # tipo -> (app_label, modelo, campo com o token)
+    SOURCES = {
+        'equipment': ('equipment', 'Equipment', 'qrcode_hash'),
+        'loan_request': ('loans', 'LoanRequest', 'qrcode_hash'),
+    }
+    BATCH_SIZE = 500
+
+    cache = LRUCache()
+
+    @classmethod
+    def model_for(cls, kind):
+        app_label, model_name, _ = cls.SOURCES[kind]
+        return apps.get_model(app_label, model_name)
+
+    @classmethod
+    def resolve(cls, token):
+        """
+        Retorna (tipo, id) para o token ou None se não existir
+        """
+        if not token:
+            return None
+        if qr_signing.is_signed(token):
+            # Tokens assinados são verificados sem consulta à base de dados
+            return qr_signing.verify(token)
+        hit = cls.cache.get(token)
+        if hit is not None:
+            return hit
+
+        row = ScanToken.objects.filter(token=token).values_list('kind', 'object_id').first()
+        if row is None:
+            # Objetos criados por escritas em lote podem ainda não estar no índice
+            row = cls._lookup_sources(token)
+        if row is not None:
+            cls.cache.put(token, row)
+        return row
+
+    @classmethod
+    def _lookup_sources(cls, token):
+        for kind, (_, _, field) in cls.SOURCES.items():
+            pk = cls.model_for(kind).objects.filter(**{field: token}).values_list('pk', flat=True).first()
+            if pk is not None:
+                ScanToken.objects.update_or_create(token=token, defaults={'kind': kind, 'object_id': pk})
+                return kind, pk
+        return None
+
+    @classmethod
+    def forget(cls, token):
+        cls.cache.pop(token)
+
+    @classmethod
+    def sync_object(cls, kind, instance):
+        """
+        Garante que o token atual do objeto está no índice e remove tokens antigos
+        """
+        token = getattr(instance, cls.SOURCES[kind][2])
+        stale = ScanToken.objects.filter(kind=kind, object_id=instance.pk)
+        if token:
+            if stale.filter(token=token).exists():
+                return
+            stale = stale.exclude(token=token)
+        for old in stale.values_list('token', flat=True):
+            cls.forget(old)
+        stale.delete()
+        if token:
+            ScanToken.objects.update_or_create(
+                token=token, defaults={'kind': kind, 'object_id': instance.pk}
+            )
+            cls.forget(token)
+
+    @classmethod
+    def remove_object(cls, kind, pk):
+        tokens = ScanToken.objects.filter(kind=kind, object_id=pk)
+        for token in tokens.values_list('token', flat=True):
+            cls.forget(token)
+        tokens.delete()
+
+    @classmethod
+    def sync_many(cls, kind, ids=None):
+        """
+        Sincroniza em lote os tokens de vários objetos (para escritas em lote
+        que não disparam signals, como bulk_create e bulk_update).
+        Retorna o número de tokens criados.
+        """
+        if ids is not None:
+            ids = list(ids)
+            return sum(
+                cls._sync_rows(kind, ids[start:start + cls.BATCH_SIZE])
+                for start in range(0, len(ids), cls.BATCH_SIZE)
+            )
+        return cls._sync_rows(kind)
+
+    @classmethod
+    def _sync_rows(cls, kind, ids=None):
+        model = cls.model_for(kind)
+        field = cls.SOURCES[kind][2]
+        queryset = model.objects.exclude(**{f'{field}__isnull': True}).order_by('pk')
+        if ids is not None:
+            queryset = queryset.filter(pk__in=ids)
+
+        created = 0
+        batch = []
+        for pk, token in queryset.values_list('pk', field).iterator(chunk_size=cls.BATCH_SIZE):
+            batch.append((pk, token))
+            if len(batch) >= cls.BATCH_SIZE:
+                created += cls._sync_batch(kind, batch)
+                batch = []
+        if batch:
+            created += cls._sync_batch(kind, batch)
+        return created
+
+    @classmethod
+    def _sync_batch(cls, kind, batch):
+        with transaction.atomic():
+            ScanToken.objects.filter(kind=kind, object_id__in=[pk for pk, _ in batch]).delete()
+            ScanToken.objects.filter(token__in=[token for _, token in batch]).delete()
+            ScanToken.objects.bulk_create([
+                ScanToken(token=token, kind=kind, object_id=pk) for pk, token in batch
+            ])
+        for _, token in batch:
+            cls.forget(token)
+        return len(batch)
+
+    @classmethod
+    def rebuild(cls):
+        """
+        Reconstrói todo o índice a partir das tabelas de origem
+        """
+        counts = {}
+        with transaction.atomic():
+            ScanToken.objects.all().delete()
+            cls.cache.clear()
+            for kind in cls.SOURCES:
+                counts[kind] = cls.sync_many(kind)
+        return counts
+
+
+def _connect(kind):
+    model = ScanIndex.model_for(kind)
+    field = ScanIndex.SOURCES[kind][2]
+
+    def on_save(sender, instance, update_fields=None, **kwargs):
+        if update_fields is not None and field not in update_fields:
+            return
+        ScanIndex.sync_object(kind, instance)
+
+    def on_delete(sender, instance, **kwargs):
+        ScanIndex.remove_object(kind, instance.pk)
+
+    post_save.connect(on_save, sender=model, weak=False, dispatch_uid=f'scan_index_save_{kind}')
+    post_delete.connect(on_delete, sender=model, weak=False, dispatch_uid=f'scan_index_delete_{kind}')
+
+
+def connect_signals():
+    for kind in ScanIndex.SOURCES:
+        _connect(kind)
@@ -13,7 +13,7 @@ class EquipmentSerializer(serializers.ModelSerializer):
         model = Equipment
         fields = [
             'id', 'brand', 'model', 'type', 'status', 'serial_number',
-            'acquisition_date', 'description', 'location', 'color', 'category',
+            'acquisition_date', 'description', 'location', 'place', 'color', 'category',
             'qrcode_hash', 'qrcode_url',
             'full_name', 'created_at', 'updated_at'
         ]
@@ -35,6 +35,12 @@ class EquipmentSerializer(serializers.ModelSerializer):
             )
         return value
 
+    def validate(self, attrs):
+        # Local escolhido sem texto: o texto passa a ser o da localização
+        if attrs.get('place') is not None and 'location' not in attrs:
+            attrs['location'] = attrs['place'].label
+        return attrs
+
 
 class EquipmentListSerializer(serializers.ModelSerializer):
     """
@@ -61,6 +67,21 @@ class EquipmentSummarySerializer(serializers.ModelSerializer):
         fields = ['id', 'full_name', 'serial_number', 'status', 'type']
 
 
+class ScanEquipmentSerializer(serializers.ModelSerializer):
+    """
+    Serializer compacto para a resposta de leitura de QR Code
+    """
+    full_name = serializers.ReadOnlyField()
+
+    class Meta:
+        model = Equipment
+        fields = [
+            'id', 'brand', 'model', 'type', 'status', 'serial_number',
+            'acquisition_date', 'description', 'location', 'color', 'category',
+            'qrcode_hash', 'full_name'
+        ]
+
+
 class PackageSummarySerializer(serializers.Serializer):
     """
     Serializer resumido para pacotes referenciados em empréstimos
@@ -0,0 +1,126 @@
+"""
+Reconciliação do status dos equipamentos
+
+O status do equipamento é alterado em vários pontos (ativação e devolução de
+empréstimos, reservas, ações do admin) e pode divergir da realidade. Este
+serviço recalcula o status esperado de todo o inventário a partir dos
+empréstimos, itens de empréstimo, pacotes e reservas com poucas consultas
+agrupadas e grava apenas as diferenças, em lote.
+
+Os empréstimos que ocupam o equipamento são os de ``Loan.HOLDING_STATUSES``
+(a mesma definição usada na conversão de reservas): os em curso deixam-no
+emprestado e os pendentes (à espera de levantamento) deixam-no reservado.
+"""
+
+from collections import defaultdict
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Equipment
+from .package_models import PackageItem
+
+
+class EquipmentStatusReconciler:
+    """
+    Deriva o status esperado de cada equipamento e corrige as divergências
+    """
+
+    HOLDING_RESERVATION_STATUSES = ['ativa', 'confirmada']
+    # Status definidos manualmente pelo técnico; não são derivados
+    MANUAL_STATUSES = ['manutencao', 'inativo']
+    BATCH_SIZE = 500
+
+    def __init__(self, today=None):
+        self.today = today or timezone.now().date()
+
+    @staticmethod
+    def _loan_equipment_ids(statuses):
+        from loans.models import Loan, LoanEquipment
+
+        equipment_ids = set(
+            Loan.objects.filter(
+                status__in=statuses, equipment__isnull=False
+            ).values_list('equipment_id', flat=True)
+        )
+        equipment_ids.update(
+            LoanEquipment.objects.filter(
+                loan__status__in=statuses, returned=False
+            ).values_list('equipment_id', flat=True)
+        )
+        equipment_ids.update(
+            PackageItem.objects.filter(
+                package__loans__status__in=statuses
+            ).values_list('equipment_id', flat=True)
+        )
+        return equipment_ids
+
+    def _loaned_ids(self):
+        """
+        Retorna (emprestados, pendentes de levantamento)
+        """
+        from loans.models import Loan
+
+        loaned = self._loan_equipment_ids(Loan.ACTIVE_STATUSES)
+        pending = [status for status in Loan.HOLDING_STATUSES if status not in Loan.ACTIVE_STATUSES]
+        return loaned, self._loan_equipment_ids(pending) - loaned
+
+    def _reserved_ids(self):
+        from reservations.models import Reservation
+
+        return set(
+            Reservation.objects.filter(
+                status__in=self.HOLDING_RESERVATION_STATUSES,
+                expected_pickup_date__gte=Reservation.expiry_cutoff(self.today),
+            ).values_list('equipment_id', flat=True)
+        )
+
+    def diff(self):
+        """
+        Retorna a lista de divergências (id, status atual, status esperado)
+        """
+        loaned, pending = self._loaned_ids()
+        reserved = self._reserved_ids() | pending
+
+        differences = []
+        rows = Equipment.objects.order_by().values_list('id', 'status').iterator(chunk_size=2000)
+        for equipment_id, current in rows:
+            if current in self.MANUAL_STATUSES:
+                continue
+            if equipment_id in loaned:
+                expected = 'emprestado'
+            elif equipment_id in reserved:
+                expected = 'reservado'
+            else:
+                expected = 'disponivel'
+            if expected != current:
+                differences.append((equipment_id, current, expected))
+        return differences
+
+    def apply(self, differences):
+        """
+        Grava as divergências com um UPDATE por (status atual, esperado) e lote.
+        O status atual entra no filtro para não sobrescrever alterações
+        concorrentes feitas depois do cálculo.
+        """
+        grouped = defaultdict(list)
+        for equipment_id, current, expected in differences:
+            grouped[(current, expected)].append(equipment_id)
+
+        now = timezone.now()
+        updated = 0
+        with transaction.atomic():
+            for (current, expected), ids in grouped.items():
+                for start in range(0, len(ids), self.BATCH_SIZE):
+                    updated += Equipment.objects.filter(
+                        id__in=ids[start:start + self.BATCH_SIZE], status=current
+                    ).update(status=expected, updated_at=now)
+        return updated
+
+    def run(self, dry_run=False):
+        """
+        Calcula as divergências e, fora do modo dry-run, corrige-as
+        """
+        differences = self.diff()
+        updated = 0 if dry_run else self.apply(differences)
+        return differences, updated
@@ -1,3 +1,468 @@
-from django.test import TestCase
+import io
+import re
+import shutil
+import tempfile
+from datetime import timedelta
+from urllib.parse import parse_qs, urlsplit
 
-# Create your tests here.
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from accounts.models import User
+from loans.models import Loan
+
+from . import qrcode_service
+from .autocomplete import PrefixIndex
+from .facets import EquipmentFacets
+from .import_service import EquipmentImporter
+from .label_service import QRLabelSheet
+from .location_models import location_label, location_path, parse_location
+from .models import Equipment, Location
+from .scan_models import ScanToken
+from .scan_service import LRUCache, ScanIndex
+from .status_reconciler import EquipmentStatusReconciler
+
+
+class QRCodeImageTests(TestCase):
+    """
+    Imagem do QR Code: URL assinado para o <img>, endereçado pelo conteúdo
+    """
+
+    def setUp(self):
+        cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, cache_dir, ignore_errors=True)
+        override = override_settings(QRCODE_CACHE_DIR=cache_dir)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.equipment = Equipment.objects.create(brand='HP', model='X', type='notebook', serial_number='SN1')
+        self.url = f'/api/v1/equipment/qrcode/{self.equipment.qrcode_hash}/png/'
+        self.anonymous = APIClient()
+
+    def test_signed_url_does_not_need_authentication(self):
+        url = qrcode_service.signed_image_url(self.equipment.qrcode_hash)
+        response = self.anonymous.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'image/png')
+        self.assertNotIn('immutable', response['Cache-Control'])
+        self.assertIn(f'max-age={qrcode_service.IMAGE_CACHE_SECONDS}', response['Cache-Control'])
+
+        etag = response['ETag']
+        response = self.anonymous.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_page_links_content_keyed_immutable_image(self):
+        client = APIClient()
+        client.force_authenticate(User.objects.create(email='t@x.com', username='t@x.com', name='T', role='tecnico'))
+        page = client.get(f'/api/v1/equipment/qrcode/{self.equipment.qrcode_hash}/').content.decode()
+        image_url = re.search(r'<img src="([^"]+)"', page).group(1).replace('&amp;', '&')
+        self.assertIn('v=', image_url)
+        # A assinatura é estável: a página gera o mesmo URL na visita seguinte
+        page = client.get(f'/api/v1/equipment/qrcode/{self.equipment.qrcode_hash}/').content.decode()
+        self.assertIn(image_url, page.replace('&amp;', '&'))
+
+        response = self.anonymous.get(image_url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Cache-Control'], qrcode_service.IMMUTABLE_CACHE_CONTROL)
+        self.assertEqual(response['ETag'], f'"{parse_qs(urlsplit(image_url).query)["v"][0]}"')
+
+    def test_stale_content_key_is_not_immutable(self):
+        url = qrcode_service.signed_image_url(self.equipment.qrcode_hash, version='antigo')
+        response = self.anonymous.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('immutable', response['Cache-Control'])
+
+    def test_unsigned_or_tampered_url_is_rejected(self):
+        self.assertEqual(self.anonymous.get(self.url).status_code, 401)
+        self.assertEqual(self.anonymous.get(self.url, {'sig': '1:abc'}).status_code, 401)
+
+        other = Equipment.objects.create(brand='HP', model='Y', type='notebook', serial_number='SN2')
+        signature = qrcode_service.sign_image(other.qrcode_hash)
+        self.assertEqual(self.anonymous.get(self.url, {'sig': signature}).status_code, 401)
+
+    @override_settings(QRCODE_IMAGE_URL_MAX_AGE=-1)
+    def test_expired_signature_is_rejected(self):
+        response = self.anonymous.get(qrcode_service.signed_image_url(self.equipment.qrcode_hash))
+        self.assertEqual(response.status_code, 401)
+
+    def test_authenticated_client_fetches_image_directly(self):
+        client = APIClient()
+        client.force_authenticate(User.objects.create(email='t@x.com', username='t@x.com', name='T', role='tecnico'))
+        response = client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+
+
+class QRLabelSheetTests(TestCase):
+    """
+    Folhas de etiquetas: grelha por página e validação dos parâmetros
+    """
+
+    url = '/api/v1/equipment/labels/'
+
+    def setUp(self):
+        cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, cache_dir, ignore_errors=True)
+        override = override_settings(QRCODE_CACHE_DIR=cache_dir)
+        override.enable()
+        self.addCleanup(override.disable)
+        for n in range(5):
+            Equipment.objects.create(brand='HP', model='X', type='notebook', serial_number=f'SN{n}')
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create(email='t@x.com', username='t@x.com', name='T', role='tecnico'))
+
+    @staticmethod
+    def _pages(content):
+        return len(re.findall(rb'/Type /Page\b(?!s)', content))
+
+    def test_labels_fill_pages_of_the_grid(self):
+        output = io.BytesIO()
+        count = QRLabelSheet('http://testserver', columns=2, rows=1).write(Equipment.objects.all(), output)
+        self.assertEqual(count, 5)
+        self.assertEqual(self._pages(output.getvalue()), 3)
+
+    def test_endpoint_streams_selected_ids(self):
+        ids = ','.join(str(pk) for pk in Equipment.objects.values_list('pk', flat=True)[:2])
+        response = self.client.get(self.url, {'ids': ids, 'columns': 1, 'rows': 1})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        self.assertEqual(self._pages(b''.join(response.streaming_content)), 2)
+
+    def test_grid_and_ids_are_validated(self):
+        for params in ({'columns': 7}, {'rows': 0}, {'rows': 'x'}, {'ids': '1,a'}):
+            self.assertEqual(self.client.get(self.url, params).status_code, 400)
+
+    def test_labels_are_restricted_to_staff(self):
+        client = APIClient()
+        client.force_authenticate(User.objects.create(email='u@x.com', username='u@x.com', name='U', role='docente'))
+        self.assertEqual(client.get(self.url).status_code, 403)
+
+
+class LRUCacheTests(SimpleTestCase):
+    """
+    Cache LRU das resoluções de QR Code
+    """
+
+    def test_least_recently_used_entry_is_evicted(self):
+        cache = LRUCache(maxsize=2)
+        cache.put('a', 1)
+        cache.put('b', 2)
+        cache.get('a')
+        cache.put('c', 3)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual((cache.get('a'), cache.get('c'), len(cache)), (1, 3, 2))
+
+
+class ScanIndexTests(TestCase):
+    """
+    Resolução de tokens pelo índice e invalidação da cache
+    """
+
+    def setUp(self):
+        ScanIndex.cache.clear()
+        self.addCleanup(ScanIndex.cache.clear)
+        self.equipment = Equipment.objects.create(brand='HP', model='X', type='notebook', serial_number='SN1')
+
+    def test_repeated_scan_is_served_from_cache(self):
+        token = self.equipment.qrcode_hash
+        self.assertEqual(ScanIndex.resolve(token), ('equipment', self.equipment.pk))
+        with self.assertNumQueries(0):
+            self.assertEqual(ScanIndex.resolve(token), ('equipment', self.equipment.pk))
+
+    def test_changed_token_invalidates_the_old_one(self):
+        old = self.equipment.qrcode_hash
+        ScanIndex.resolve(old)
+
+        self.equipment.qrcode_hash = 'novo-token'
+        self.equipment.save()
+
+        self.assertIsNone(ScanIndex.resolve(old))
+        self.assertEqual(ScanIndex.resolve('novo-token'), ('equipment', self.equipment.pk))
+
+    def test_deleted_object_is_forgotten(self):
+        token = self.equipment.qrcode_hash
+        ScanIndex.resolve(token)
+        self.equipment.delete()
+        self.assertIsNone(ScanIndex.resolve(token))
+
+    def test_bulk_created_object_is_found_and_indexed(self):
+        Equipment.objects.bulk_create([
+            Equipment(brand='HP', model='Y', type='notebook', serial_number='SN2', qrcode_hash='em-lote'),
+        ])
+        self.assertFalse(ScanToken.objects.filter(token='em-lote').exists())
+
+        kind, pk = ScanIndex.resolve('em-lote')
+
+        self.assertEqual((kind, pk), ('equipment', Equipment.objects.get(serial_number='SN2').pk))
+        self.assertTrue(ScanToken.objects.filter(token='em-lote').exists())
+
+
+class EquipmentImporterTests(TestCase):
+    """
+    Importação de CSV: validação por bloco e números de série repetidos
+    """
+
+    def _run(self, content, delimiter=None, **kwargs):
+        return EquipmentImporter(**kwargs).run(io.StringIO(content), delimiter=delimiter)
+
+    def test_valid_rows_are_created_and_indexed_after_commit(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            result = self._run(
+                'Marca;Modelo;Tipo;Número de série;Estado\n'
+                'HP;ProBook;Notebook;SN1;manutencao\n'
+                'Epson;EB-X;projetor;SN2;\n'
+            )
+        self.assertFalse(ScanToken.objects.exists())
+        for callback in callbacks:
+            callback()
+
+
+        self.assertEqual((result['total_rows'], result['created'], result['failed']), (2, 2, 0))
+        equipment = Equipment.objects.get(serial_number='SN1')
+        self.assertEqual((equipment.type, equipment.status), ('notebook', 'manutencao'))
+        self.assertEqual(Equipment.objects.get(serial_number='SN2').status, 'disponivel')
+        self.assertTrue(ScanToken.objects.filter(token=equipment.qrcode_hash, object_id=equipment.pk).exists())
+
+    def test_invalid_rows_are_reported_by_line(self):
+        result = self._run(
+            'brand,model,type,serial_number,status,acquisition_date\n'
+            'HP,ProBook,notebook,SN1,emprestado,\n'
+            ',ProBook,planeta,SN2,,31/02/2024\n'
+            'HP,ProBook,notebook,SN3,,01/02/2024\n'
+        )
+
+        self.assertEqual((result['created'], result['failed']), (1, 2))
+        self.assertEqual([error['row'] for error in result['errors']], [2, 3])
+        self.assertEqual(len(result['errors'][0]['errors']), 1)
+        self.assertEqual(len(result['errors'][1]['errors']), 3)
+        self.assertEqual(list(Equipment.objects.values_list('serial_number', flat=True)), ['SN3'])
+
+    def test_reported_lines_count_blank_and_multiline_rows(self):
+        result = self._run(
+            'brand,model,type,serial_number,description\n'
+            'HP,X,notebook,SN1,"Linha um\nlinha dois"\n'
+            '\n'
+            'HP,X,planeta,SN2,\n',
+            delimiter=',',
+        )
+        self.assertEqual([error['row'] for error in result['errors']], [5])
+
+        result = self._run(
+            'brand,model,type,serial_number,description\n'
+            'HP,X,notebook,SN3,"Linha um\nlinha dois"\n'
+            'HP,X,planeta,SN4,\n'
+        )
+        self.assertEqual([error['row'] for error in result['errors']], [4])
+
+    def test_duplicates_in_file_and_database_across_chunks(self):
+        Equipment.objects.create(brand='HP', model='X', type='notebook', serial_number='SN0')
+
+        result = self._run(
+            'brand,model,type,serial_number\n'
+            'HP,X,notebook,SN0\n'
+            'HP,X,notebook,SN1\n'
+            'HP,X,notebook,SN1\n'
+            'HP,X,notebook,SN2\n',
+            batch_size=1,
+        )
+
+        self.assertEqual((result['created'], result['failed']), (2, 2))
+        self.assertEqual(
+            [(error['row'], error['errors']) for error in result['errors']],
+            [
+                (2, ['serial_number: já existe um equipamento com este número de série.']),
+                (4, ['serial_number: repetido no ficheiro.']),
+            ],
+        )
+
+    def test_dry_run_validates_without_writing(self):
+        result = self._run('brand,model,type,serial_number\nHP,X,notebook,SN1\n', dry_run=True)
+        self.assertEqual(result['created'], 1)
+        self.assertFalse(Equipment.objects.exists())
+
+    def test_missing_required_columns_are_rejected(self):
+        with self.assertRaises(ValueError):
+            self._run('brand,model\nHP,X\n')
+
+
+class PrefixIndexTests(TestCase):
+    """
+    Índice de prefixos do autocompletar
+    """
+
+    def setUp(self):
+        self.latitude = Equipment.objects.create(brand='Dell', model='Latitude', type='notebook', serial_number='AB-1234')
+        self.probook = Equipment.objects.create(brand='HP', model='ProBook', type='notebook', serial_number='CD-5678')
+        self.index = PrefixIndex()
+        self.index.build()
+
+    def _ids(self, query, limit=10):
+        return [item['id'] for item in self.index.search(query, limit=limit)]
+
+    def test_prefixes_of_serial_hash_and_name(self):
+        self.assertEqual(self._ids('ab-12'), [self.latitude.pk])
+        # Série sem separadores
+        self.assertEqual(self._ids('cd56'), [self.probook.pk])
+        self.assertEqual(self._ids(self.probook.qrcode_hash[:8]), [self.probook.pk])
+        self.assertEqual(self._ids('DELL LAT'), [self.latitude.pk])
+        self.assertEqual(self._ids('pro'), [self.probook.pk])
+        self.assertEqual(self._ids('xyz'), [])
+        self.assertEqual(self._ids(''), [])
+
+    def test_older_version_does_not_replace_newer(self):
+        row = dict(self.index._items[self.latitude.pk])
+        newer = {**row, 'model': 'Precision', 'updated_at': row['updated_at'] + timedelta(seconds=1)}
+        self.index.apply(newer)
+        self.index.apply(row)
+
+        self.assertEqual(self._ids('precision'), [self.latitude.pk])
+        self.assertEqual(self._ids('latitude'), [])
+
+    def test_refresh_picks_up_bulk_updates_and_deletions(self):
+        Equipment.objects.filter(pk=self.latitude.pk).update(
+            model='Vostro', updated_at=timezone.now() + timedelta(seconds=1)
+        )
+        Equipment.objects.filter(pk=self.probook.pk).delete()
+
+        # update() e delete() em lote não disparam signals: só a verificação de versão os apanha
+        self.assertEqual(self._ids('vostro'), [])
+        self.index.invalidate()
+        self.index.ensure_fresh()
+
+        self.assertEqual(self._ids('vostro'), [self.latitude.pk])
+        self.assertEqual(self._ids('pro'), [])
+        self.assertEqual(len(self.index), 1)
+
+
+class LocationParsingTests(SimpleTestCase):
+    """
+    Variantes de escrita da mesma localização têm o mesmo caminho
+    """
+
+    def path(self, text):
+        return location_path(*parse_location(text))
+
+    def test_campus_keyword_matches_default_campus(self):
+        self.assertEqual(self.path('Campus Principal / Bloco B / Sala 12'), self.path('Bloco B / Sala 12'))
+        self.assertEqual(location_label(*parse_location('Campus Principal / Bloco B')), 'Bloco B')
+
+    def test_building_abbreviations(self):
+        expected = self.path('Bloco B / Sala 12')
+        for text in ('Bl. B / Sala 12', 'Bl.B Sala 12', 'bloco b - sala 12', 'Edifício B, Sala 12'):
+            self.assertEqual(self.path(text), expected, text)
+
+    def test_other_campus_is_kept(self):
+        self.assertEqual(self.path('Campus Norte / Bloco B / Sala 12'), 'norte/b/sala-12')
+
+
+class LocationLookupTests(TestCase):
+
+    def setUp(self):
+        self.equipment = Equipment.objects.create(
+            brand='HP', model='X', type='notebook', serial_number='SN1', location='Campus Principal / Bl. B / Sala 12',
+        )
+
+    def test_variants_share_one_location(self):
+        other = Equipment.objects.create(
+            brand='HP', model='Y', type='notebook', serial_number='SN2', location='Bloco B - Sala 12',
+        )
+        self.assertEqual(other.place_id, self.equipment.place_id)
+        self.assertEqual(Location.objects.count(), 1)
+
+    def test_subtree_and_matching_accept_keywords(self):
+        for prefix in ('principal/bloco-b', 'campus-principal/b', 'principal/bl-b'):
+            self.assertEqual(list(Location.subtree(prefix)), [self.equipment.place], prefix)
+        self.assertIn(self.equipment.place, Location.matching('Bl. B'))
+
+    def test_typed_text_is_kept_and_resolved_only_when_changed(self):
+        equipment = Equipment.objects.get(pk=self.equipment.pk)
+        self.assertEqual(equipment.location, 'Campus Principal / Bl. B / Sala 12')
+
+        equipment.status = 'manutencao'
+        with CaptureQueriesContext(connection) as captured:
+            equipment.save()
+        self.assertFalse([query for query in captured.captured_queries if '"locations"' in query['sql']])
+
+        equipment.location = 'Bloco C / Sala 3'
+        equipment.save()
+        self.assertEqual(equipment.place.path, 'principal/c/sala-3')
+        self.assertEqual(Equipment.objects.get(pk=equipment.pk).location, 'Bloco C / Sala 3')
+
+    def test_long_levels_are_clipped_to_the_columns(self):
+        equipment = Equipment.objects.create(
+            brand='HP', model='Y', type='notebook', serial_number='SN2', location='Bloco B / Sala ' + 'x' * 200,
+        )
+        self.assertEqual(len(equipment.place.room), 100)
+        self.assertEqual(len(equipment.location), 215)
+
+    def test_multi_level_label_round_trips(self):
+        place = self.equipment.place
+        for text in (place.label, 'Bloco B / Sala 12', 'Campus Principal > Bl. B > Sala 12'):
+            self.assertEqual(list(Location.matching(text)), [place], text)
+        self.assertFalse(Location.matching('Campus Norte / Bloco B / Sala 12').exists())
+
+
+class EquipmentFacetTests(TestCase):
+    """
+    Faceta de localização: agrupada pela localização normalizada, com rótulo
+    """
+
+    url = '/api/v1/equipment/facets/'
+
+    def setUp(self):
+        EquipmentFacets.invalidate()
+        self.addCleanup(EquipmentFacets.invalidate)
+        self.user = User.objects.create(email='u@x.com', username='u@x.com', name='U', role='tecnico')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.room_a = Equipment.objects.create(
+            brand='HP', model='X', type='notebook', serial_number='SN1', location='Bloco B / Sala 1',
+        )
+        self.room_b = Equipment.objects.create(
+            brand='HP', model='Y', type='notebook', serial_number='SN2', location='Bl. B - Sala 2',
+        )
+        Equipment.objects.create(brand='HP', model='Z', type='notebook', serial_number='SN3', location='Bloco C')
+
+    def _location_facet(self, response):
+        return {item['value']: (item['label'], item['count']) for item in response.data['facets']['location']}
+
+    def test_location_facet_is_grouped_by_place(self):
+        response = self.client.get(self.url, {'location_path': 'principal/bloco-b'})
+        self.assertEqual(response.data['total'], 2)
+        self.assertEqual(self._location_facet(response), {
+            self.room_a.place_id: ('Bloco B / Sala 1', 1),
+            self.room_b.place_id: ('Bl. B / Sala 2', 1),
+        })
+
+    def test_place_filter_ignores_its_own_dimension(self):
+        response = self.client.get(self.url, {'place': str(self.room_a.place_id)})
+        self.assertEqual(response.data['total'], 1)
+        self.assertEqual(len(self._location_facet(response)), 3)
+        self.assertEqual(response.data['facets']['brand'], [{'value': 'HP', 'count': 1}])
+
+
+class StatusReconcilerTests(TestCase):
+    """
+    Empréstimos pendentes ocupam o equipamento (reservado), como na conversão de reservas
+    """
+
+    def _loan(self, equipment, loan_status):
+        today = timezone.now().date()
+        return Loan.objects.create(
+            user=self.user, equipment=equipment, start_date=today,
+            expected_return_date=today + timedelta(days=7), purpose='Aula', status=loan_status,
+        )
+
+    def test_pending_loan_keeps_equipment_reserved(self):
+        self.user = User.objects.create(email='u@x.com', username='u@x.com', name='U', role='docente')
+        pending = Equipment.objects.create(brand='HP', model='X', type='notebook', serial_number='SN1', status='reservado')
+        active = Equipment.objects.create(brand='HP', model='Y', type='notebook', serial_number='SN2')
+        self._loan(pending, 'pendente')
+        self._loan(active, 'ativo')
+
+        differences, _ = EquipmentStatusReconciler().run()
+
+        self.assertEqual(differences, [(active.pk, 'disponivel', 'emprestado')])
+        pending.refresh_from_db()
+        self.assertEqual(pending.status, 'reservado')
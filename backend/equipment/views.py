@@ -1,16 +1,27 @@
+import io
 from django.shortcuts import render, get_object_or_404
 from rest_framework import viewsets, status, permissions
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from django.db.models import Q, Count
-from django.http import HttpResponse
+from django.conf import settings
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.http import HttpResponse, FileResponse, HttpResponseNotModified, Http404
 from django_filters.rest_framework import DjangoFilterBackend
-from rest_framework.filters import SearchFilter, OrderingFilter
-from .models import Equipment
+from rest_framework.filters import OrderingFilter
+from search.filters import FullTextSearchFilter
+from .models import Equipment, Location
 from .serializers import (
     EquipmentSerializer, EquipmentListSerializer, 
-    EquipmentStatsSerializer
+    EquipmentStatsSerializer, ScanEquipmentSerializer
 )
+from . import qr_signing, qrcode_service
+from .scan_service import ScanIndex
+from .label_service import QRLabelSheet
+from .import_service import EquipmentImporter
+from .autocomplete import prefix_index
+from .facets import EquipmentFacets
 
 
 class EquipmentViewSet(viewsets.ModelViewSet):
@@ -20,9 +31,10 @@ class EquipmentViewSet(viewsets.ModelViewSet):
     queryset = Equipment.objects.all()
     serializer_class = EquipmentSerializer
     permission_classes = [permissions.IsAuthenticated]
-    filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
+    filter_backends = [DjangoFilterBackend, OrderingFilter, FullTextSearchFilter]
     filterset_fields = ['type', 'status', 'brand']
     search_fields = ['brand', 'model', 'serial_number', 'description', 'location', 'qrcode_hash']
+    search_kind = 'equipment'
     ordering_fields = ['brand', 'model', 'acquisition_date', 'created_at']
     ordering = ['brand', 'model']
     
@@ -45,10 +57,24 @@ class EquipmentViewSet(viewsets.ModelViewSet):
         if available_only and available_only.lower() == 'true':
             queryset = queryset.filter(status='disponivel')
         
-        # Filtro por localização
+        # Filtro por localização: o texto é procurado na tabela (pequena) de
+        # localizações e os equipamentos filtrados pela chave estrangeira
         location = self.request.query_params.get('location')
         if location:
-            queryset = queryset.filter(location__icontains=location)
+            queryset = queryset.filter(place__in=Location.matching(location))
+
+        # Subárvore de localizações (?location_path=principal/bloco-b), por intervalo no índice
+        location_path = self.request.query_params.get('location_path')
+        if location_path:
+            queryset = queryset.filter(place__in=Location.subtree(location_path))
+
+        # Na ação facets o local é a dimensão 'location', que ignora o próprio filtro
+        place_ids = [
+            value.strip() for value in self.request.query_params.get('place', '').split(',')
+            if value.strip().isdigit()
+        ]
+        if place_ids and self.action != 'facets':
+            queryset = queryset.filter(place_id__in=place_ids)
         
         return queryset
     
@@ -121,6 +147,17 @@ class EquipmentViewSet(viewsets.ModelViewSet):
         serializer = EquipmentStatsSerializer(stats_data)
         return Response(serializer.data)
     
+    @action(detail=False, methods=['get'])
+    def facets(self, request):
+        """
+        Contagens por tipo, status, marca, localização (?place=<id>) e categoria
+        sob os filtros atuais (cada dimensão ignora o próprio filtro)
+        """
+        # Mesma base da listagem: disponibilidade, localização e subárvore
+        queryset = FullTextSearchFilter().filter_queryset(request, self.get_queryset(), self)
+
+        return Response(EquipmentFacets.get(queryset, request.query_params))
+
     TECH_ROLES_LIST = ['admin', 'tecnico']
 
     @action(detail=False, methods=['get'])
@@ -129,19 +166,97 @@ class EquipmentViewSet(viewsets.ModelViewSet):
         if not hash:
             return Response({'error': 'hash obrigatório'}, status=status.HTTP_400_BAD_REQUEST)
 
-        from loans.models import LoanRequest
-        from loans.serializers import LoanRequestSerializer
-
-        eq = Equipment.objects.filter(qrcode_hash=hash).first()
-        if eq:
-            return Response({'type': 'equipment', 'data': EquipmentSerializer(eq).data})
+        resolved = ScanIndex.resolve(hash)
+        if resolved is None and qr_signing.is_signed(hash):
+            return Response({'error': 'QR Code assinado inválido ou de uma versão anterior.'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if resolved is not None:
+            kind, object_id = resolved
+            if kind == 'equipment':
+                eq = Equipment.objects.filter(pk=object_id).first()
+                if eq:
+                    return Response({'type': 'equipment', 'data': ScanEquipmentSerializer(eq).data})
+            elif kind == 'loan_request':
+                from loans.models import LoanRequest
+                from loans.serializers import ScanLoanRequestSerializer
 
-        lr = LoanRequest.objects.filter(qrcode_hash=hash).first()
-        if lr:
-            return Response({'type': 'loan_request', 'data': LoanRequestSerializer(lr).data})
+                lr = (
+                    LoanRequest.objects.select_related('user', 'tecnico_responsavel', 'pacote')
+                    .prefetch_related('equipments')
+                    .filter(pk=object_id)
+                    .first()
+                )
+                if lr:
+                    return Response({'type': 'loan_request', 'data': ScanLoanRequestSerializer(lr).data})
+            # Entrada desatualizada: o objeto já não existe
+            ScanIndex.forget(hash)
 
         return Response({'error': 'Nada encontrado para este QR Code'}, status=status.HTTP_404_NOT_FOUND)
 
+    @action(detail=False, methods=['get'])
+    def autocomplete(self, request):
+        """
+        Sugestões por prefixo de número de série, hash do QR Code ou marca/modelo
+        (?q=&limit=, máx. 50), servidas a partir do índice em memória
+        """
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return Response([])
+        try:
+            limit = min(int(request.query_params.get('limit', 10)), 50)
+        except ValueError:
+            limit = 10
+
+        prefix_index.ensure_fresh()
+        return Response(prefix_index.search(query, limit=limit))
+
+    @action(detail=False, methods=['get'])
+    def scan_manifest(self, request):
+        """
+        Manifesto assinado de equipamentos para os tablets do balcão resolverem
+        leituras offline. Com ?since=<generated_at anterior> só traz as alterações.
+        """
+        if request.user.role not in self.TECH_ROLES_LIST:
+            return Response({'error': 'Sem permissão.'}, status=status.HTTP_403_FORBIDDEN)
+        if not qr_signing.signing_configured():
+            return Response({'error': 'Manifesto indisponível: configure QRCODE_SIGNING_KEY.'},
+                            status=status.HTTP_503_SERVICE_UNAVAILABLE)
+
+        since = request.query_params.get('since')
+        if since:
+            since = parse_datetime(since)
+            if since is None:
+                return Response({'error': 'since inválido. Use o valor "generated_at" do manifesto anterior.'},
+                                status=status.HTTP_400_BAD_REQUEST)
+            if timezone.is_naive(since):
+                since = timezone.make_aware(since)
+
+        return Response(qr_signing.build_manifest(Equipment.objects.all(), since=since or None))
+
+    @action(detail=False, methods=['post'], url_path='import')
+    def import_csv(self, request):
+        """
+        Importação em lote a partir de um CSV enviado no campo 'file'.
+        Com ?dry_run=true apenas valida e reporta os erros por linha.
+        """
+        if request.user.role not in self.TECH_ROLES_LIST:
+            return Response({'error': 'Sem permissão.'}, status=status.HTTP_403_FORBIDDEN)
+
+        upload = request.FILES.get('file')
+        if not upload:
+            return Response({'error': 'Envie o ficheiro CSV no campo "file".'}, status=status.HTTP_400_BAD_REQUEST)
+
+        dry_run = request.query_params.get('dry_run', '').lower() == 'true'
+        stream = io.TextIOWrapper(upload.file, encoding='utf-8-sig', newline='')
+        try:
+            result = EquipmentImporter(dry_run=dry_run).run(stream)
+        except (ValueError, UnicodeDecodeError) as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        finally:
+            stream.detach()
+
+        return Response(result, status=status.HTTP_200_OK if dry_run or not result['created'] else status.HTTP_201_CREATED)
+
     @action(detail=True, methods=['post'])
     def set_maintenance(self, request, pk=None):
         if request.user.role not in self.TECH_ROLES_LIST:
@@ -173,31 +288,106 @@ class EquipmentViewSet(viewsets.ModelViewSet):
         equipment.save()
         return Response({'message': f'{equipment} desativado.'})
 
-    @action(detail=False, methods=['get'])
-    def qrcode(self, request):
-        hash = request.query_params.get('hash')
-        if not hash:
-            return Response({'error': 'Parâmetro hash é obrigatório.'}, status=status.HTTP_400_BAD_REQUEST)
-        equipment = get_object_or_404(Equipment, qrcode_hash=hash)
-        base_url = request.build_absolute_uri('/')[:-1]
-        consult_url = f"{base_url}/consulta/{equipment.qrcode_hash}/"
+    def _qrcode_base_url(self, request):
+        return settings.QRCODE_BASE_URL or request.build_absolute_uri('/')[:-1]
+
+    def _qrcode_page(self, request, equipment):
+        base_url = self._qrcode_base_url(request)
+        token = qr_signing.scan_token('equipment', equipment.pk, equipment.qrcode_hash)
+        consult_url = qrcode_service.consult_url(token, base_url)
+        image_url = qrcode_service.signed_image_url(
+            equipment.qrcode_hash, 'png', request.build_absolute_uri('/'),
+            version=qrcode_service.cache_key(equipment.qrcode_hash, consult_url, 'png'),
+        )
         return HttpResponse(
             f'<html><body style="font-family:sans-serif;text-align:center;padding:40px">'
             f'<h2>{equipment.full_name}</h2>'
             f'<p>Serial: {equipment.serial_number} | Status: {equipment.get_status_display()}</p>'
-            f'<img src="https://api.qrserver.com/v1/create-qr-code/?size=250x250&data={consult_url}" alt="QR Code"/>'
+            f'<img src="{image_url}" width="250" height="250" alt="QR Code"/>'
             f'<p><a href="{consult_url}">Ver detalhes no sistema</a></p></body></html>'
         )
 
+    @action(detail=False, methods=['get'])
+    def qrcode(self, request):
+        hash = request.query_params.get('hash')
+        if not hash:
+            return Response({'error': 'Parâmetro hash é obrigatório.'}, status=status.HTTP_400_BAD_REQUEST)
+        equipment = get_object_or_404(Equipment, qrcode_hash=hash)
+        return self._qrcode_page(request, equipment)
+
     @action(detail=False, methods=['get'], url_path='qrcode/(?P<hash>[^/.]+)')
     def qrcode_detail(self, request, hash=None):
         equipment = get_object_or_404(Equipment, qrcode_hash=hash)
-        base_url = request.build_absolute_uri('/')[:-1]
-        consult_url = f"{base_url}/consulta/{equipment.qrcode_hash}/"
-        return HttpResponse(
-            f'<html><body style="font-family:sans-serif;text-align:center;padding:40px">'
-            f'<h2>{equipment.full_name}</h2>'
-            f'<p>Serial: {equipment.serial_number} | Status: {equipment.get_status_display()}</p>'
-            f'<img src="https://api.qrserver.com/v1/create-qr-code/?size=250x250&data={consult_url}" alt="QR Code"/>'
-            f'<p><a href="{consult_url}">Ver detalhes no sistema</a></p></body></html>'
+        return self._qrcode_page(request, equipment)
+
+    @action(detail=False, methods=['get'], url_path='qrcode/(?P<hash>[^/.]+)/(?P<fmt>png|svg)',
+            permission_classes=[permissions.AllowAny])
+    def qrcode_image(self, request, hash=None, fmt='png'):
+        """
+        Imagem do QR Code gerada localmente e servida a partir da cache em disco.
+        Exige autenticação (pedido da API, lido como blob) ou um URL assinado
+        (?sig=, gerado pela página do QR Code para o <img>). Com ?v= igual ao
+        resumo do conteúdo atual, a resposta pode ficar em cache para sempre.
+        """
+        version = request.query_params.get('v', '')
+        if not (request.user.is_authenticated
+                or qrcode_service.image_signature_valid(hash, request.query_params.get('sig'), version)):
+            return Response({'error': 'Autenticação ou URL assinado necessário.'},
+                            status=status.HTTP_401_UNAUTHORIZED)
+        pk = Equipment.objects.filter(qrcode_hash=hash).values_list('pk', flat=True).first()
+        if pk is None:
+            raise Http404
+        token = qr_signing.scan_token('equipment', pk, hash)
+        payload = qrcode_service.consult_url(token, self._qrcode_base_url(request))
+        path, _ = qrcode_service.render_to_cache(hash, payload, fmt)
+
+        key = path.stem.split(".")[-1]
+        etag = f'"{key}"'
+        if request.META.get('HTTP_IF_NONE_MATCH') == etag:
+            response = HttpResponseNotModified()
+        else:
+            response = FileResponse(open(path, 'rb'), content_type=qrcode_service.FORMATS[fmt])
+        response['ETag'] = etag
+        if version == key:
+            response['Cache-Control'] = qrcode_service.IMMUTABLE_CACHE_CONTROL
+        else:
+            # Sem o resumo no URL o conteúdo pode mudar (ex.: QR Codes assinados): cache curta, revalidada pelo ETag
+            response['Cache-Control'] = f'private, max-age={qrcode_service.IMAGE_CACHE_SECONDS}'
+        return response
+
+    @action(detail=False, methods=['get'])
+    def labels(self, request):
+        """
+        PDF com folhas de etiquetas de QR Code.
+        Usa ?ids=1,2,3 ou os mesmos filtros da listagem (type, status, brand, location, search).
+        """
+        if request.user.role not in self.TECH_ROLES_LIST:
+            return Response({'error': 'Sem permissão.'}, status=status.HTTP_403_FORBIDDEN)
+
+        ids = request.query_params.get('ids')
+        if ids:
+            try:
+                ids = [int(pk) for pk in ids.split(',') if pk.strip()]
+            except ValueError:
+                return Response({'error': 'ids deve ser uma lista de números separados por vírgula.'},
+                                status=status.HTTP_400_BAD_REQUEST)
+            queryset = Equipment.objects.filter(id__in=ids).order_by('brand', 'model', 'id')
+        else:
+            queryset = self.filter_queryset(self.get_queryset())
+
+        try:
+            columns = int(request.query_params.get('columns', 3))
+            rows = int(request.query_params.get('rows', 8))
+        except ValueError:
+            return Response({'error': 'columns e rows devem ser números.'}, status=status.HTTP_400_BAD_REQUEST)
+        if not (1 <= columns <= 6 and 1 <= rows <= 14):
+            return Response({'error': 'Use entre 1 e 6 colunas e entre 1 e 14 linhas.'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        sheet = QRLabelSheet(self._qrcode_base_url(request), columns=columns, rows=rows)
+        return FileResponse(
+            sheet.render(queryset),
+            as_attachment=True,
+            filename='etiquetas_qrcode.pdf',
+            content_type='application/pdf',
         )
@@ -1,15 +1,16 @@
 from django.contrib import admin
+from equipahub.pagination import EstimatedCountAdminMixin
 from django.utils import timezone
 from .models import Loan, LoanRequest
 
 
 @admin.register(Loan)
-class LoanAdmin(admin.ModelAdmin):
+class LoanAdmin(EstimatedCountAdminMixin, admin.ModelAdmin):
     """
     Configuração do admin para o modelo Loan
     """
     list_display = [
-        'equipment_or_package', 'user', 'start_date', 'expected_return_date',
+        'equipment_or_package', 'user_name', 'item_count', 'start_date', 'expected_return_date',
         'actual_return_date', 'status', 'is_overdue', 'created_at'
     ]
     list_filter = [
@@ -56,11 +57,9 @@ class LoanAdmin(admin.ModelAdmin):
     )
 
     def equipment_or_package(self, obj):
-        if obj.equipment:
-            return str(obj.equipment)
-        if obj.pacote:
-            return f"Pacote: {obj.pacote.name}"
-        return '—'
+        if obj.pacote_id and not obj.equipment_id:
+            return f"Pacote: {obj.equipment_name}"
+        return obj.equipment_name
     equipment_or_package.short_description = 'Equipamento/Pacote'
     
     actions = ['mark_as_returned', 'mark_as_overdue', 'mark_as_cancelled']
@@ -127,12 +126,12 @@ class LoanAdmin(admin.ModelAdmin):
 
 
 @admin.register(LoanRequest)
-class LoanRequestAdmin(admin.ModelAdmin):
+class LoanRequestAdmin(EstimatedCountAdminMixin, admin.ModelAdmin):
     """
     Configuração do admin para o modelo LoanRequest
     """
     list_display = [
-        'id', 'user', 'status', 'tecnico_responsavel',
+        'id', 'user_name', 'item_label', 'status', 'tecnico_responsavel',
         'aprovado_por', 'confirmado_pelo_tecnico', 'confirmado_pelo_utente',
         'confirmacao_completa', 'created_at'
     ]
@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class LoansConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'loans'
+
+    def ready(self):
+        from .display import connect_signals
+        connect_signals()
+        # Regista o relatório mensal no pool de PDFs (também nos processos trabalhadores)
+        from . import monthly_report  # noqa: F401
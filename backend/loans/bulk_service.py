@@ -0,0 +1,257 @@
+"""
+Operações em lote do balcão de empréstimos
+
+Confirmação técnica, devolução e cancelamento de vários empréstimos numa
+única chamada. Cada operação resolve todo o conjunto numa consulta, aplica
+as transições com UPDATEs por conjunto dentro de uma transação e devolve
+o resultado item a item.
+"""
+
+from django.db import transaction
+from django.db.models import Q, F, Case, When, Value, TextField, CharField
+from django.db.models.functions import Concat
+from django.utils import timezone
+
+from equipment.models import Equipment
+from equipment.package_models import PackageItem
+from notifications.models import Notification
+from search.index import SearchIndex
+from .models import Loan, LoanEquipment
+from .services import LoanNotificationService
+
+
+class LoanBulkService:
+    """
+    Aplica transições de estado a vários empréstimos de uma só vez
+    """
+
+    MAX_ITEMS = 200
+    CANCEL_ROLES = ['tecnico', 'coordenador']
+
+    @staticmethod
+    def _append_note(label, text):
+        """
+        Expressão SQL que acrescenta "label: text" às observações existentes
+        """
+        if not text:
+            return {}
+        suffix = f"{label}: {text}"
+        return {
+            'notes': Case(
+                When(Q(notes__isnull=True) | Q(notes=''), then=Value(suffix)),
+                default=Concat(F('notes'), Value(f"\n\n{suffix}"), output_field=TextField()),
+                output_field=TextField(),
+            )
+        }
+
+    @classmethod
+    def _resolve(cls, queryset, ids, qrcode_hashes, open_statuses, check):
+        """
+        Resolve ids e hashes de QR Code para empréstimos numa única consulta.
+
+        Hashes de QR Code identificam o equipamento; é escolhido o empréstimo
+        mais recente desse equipamento com status em ``open_statuses``.
+        Retorna (empréstimos elegíveis, resultados por item).
+        """
+        ids = list(dict.fromkeys(ids or []))
+        qrcode_hashes = list(dict.fromkeys(qrcode_hashes or []))
+
+        lookup = Q(id__in=ids)
+        if qrcode_hashes:
+            lookup |= Q(equipment__qrcode_hash__in=qrcode_hashes, status__in=open_statuses)
+
+        rows = list(
+            queryset.filter(lookup)
+            .select_related('user', 'equipment', 'pacote')
+            .order_by('-created_at')
+        )
+        by_id = {loan.id: loan for loan in rows}
+        by_hash = {}
+        for loan in rows:
+            if loan.equipment and loan.status in open_statuses:
+                by_hash.setdefault(loan.equipment.qrcode_hash, loan)
+
+        refs = [('id', ref, by_id.get(ref)) for ref in ids]
+        refs += [('qrcode_hash', ref, by_hash.get(ref)) for ref in qrcode_hashes]
+
+        eligible = {}
+        results = []
+        for kind, ref, loan in refs:
+            item = {kind: ref, 'loan_id': loan.id if loan else None, 'success': False}
+            if loan is None:
+                item['error'] = 'Empréstimo não encontrado.'
+            elif loan.id in eligible:
+                item['success'] = True
+            else:
+                error = check(loan)
+                if error:
+                    item['error'] = error
+                else:
+                    eligible[loan.id] = loan
+                    item['success'] = True
+            results.append(item)
+
+        return list(eligible.values()), results
+
+    @staticmethod
+    def _equipment_ids(loans):
+        """
+        Ids de todos os equipamentos envolvidos (principal, pacote e acessórios)
+        """
+        equipment_ids = {loan.equipment_id for loan in loans if loan.equipment_id}
+        package_ids = {loan.pacote_id for loan in loans if loan.pacote_id}
+        if package_ids:
+            equipment_ids.update(
+                PackageItem.objects.filter(package_id__in=package_ids)
+                .values_list('equipment_id', flat=True)
+            )
+        equipment_ids.update(
+            LoanEquipment.objects.filter(loan__in=[loan.id for loan in loans])
+            .values_list('equipment_id', flat=True)
+        )
+        return equipment_ids
+
+    @staticmethod
+    def _notify(notifications):
+        try:
+            Notification.objects.bulk_create(notifications)
+        except Exception as e:
+            print(f"Erro ao enviar notificações em lote: {e}")
+
+    @staticmethod
+    def _summary(results):
+        succeeded = sum(1 for item in results if item['success'])
+        return {
+            'succeeded': succeeded,
+            'failed': len(results) - succeeded,
+            'results': results,
+        }
+
+    @classmethod
+    def confirmar_tecnico(cls, user, queryset=None, ids=(), qrcode_hashes=(), notes=''):
+        """
+        Técnico confirma o levantamento de vários empréstimos pendentes.
+        Os que já tinham a confirmação do utente são ativados.
+        """
+        queryset = Loan.objects.all() if queryset is None else queryset
+        now = timezone.now()
+        today = now.date()
+
+        def check(loan):
+            if loan.status != 'pendente':
+                return 'Este empréstimo não está pendente.'
+            if loan.confirmado_tecnico:
+                return 'O técnico já confirmou este levantamento.'
+            return None
+
+        with transaction.atomic():
+            loans, results = cls._resolve(queryset, ids, qrcode_hashes, ['pendente'], check)
+            activated = [loan for loan in loans if loan.confirmado_utente]
+
+            if loans:
+                Loan.objects.filter(
+                    id__in=[loan.id for loan in loans], status='pendente', confirmado_tecnico=False
+                ).update(
+                    confirmado_tecnico=True,
+                    tecnico_entrega=user,
+                    data_confirmacao_tecnico=now,
+                    status=Case(
+                        When(confirmado_utente=True, expected_return_date__lt=today, then=Value('atrasado')),
+                        When(confirmado_utente=True, then=Value('ativo')),
+                        default=F('status'),
+                        output_field=CharField(),
+                    ),
+                    updated_at=now,
+                    **cls._append_note('Confirmação técnica', notes),
+                )
+                SearchIndex.index_ids('loan', [loan.id for loan in loans])
+            if activated:
+                Equipment.objects.filter(id__in=cls._equipment_ids(activated)).update(
+                    status='emprestado', updated_at=now
+                )
+
+        for loan in activated:
+            loan.confirmado_tecnico = True
+            loan.tecnico_entrega = user
+            loan.status = 'atrasado' if loan.expected_return_date < today else 'ativo'
+        cls._notify([
+            LoanNotificationService.build_pickup_confirmed_notification(loan) for loan in activated
+        ])
+
+        summary = cls._summary(results)
+        summary['activated'] = [loan.id for loan in activated]
+        return summary
+
+    @classmethod
+    def return_equipment(cls, user, queryset=None, ids=(), qrcode_hashes=(), return_date=None, notes=''):
+        """
+        Devolve vários empréstimos ativos/atrasados e liberta os equipamentos
+        """
+        queryset = Loan.objects.all() if queryset is None else queryset
+        now = timezone.now()
+        return_date = return_date or now.date()
+
+        def check(loan):
+            if user.role == 'docente' and loan.user_id != user.id:
+                return 'Você só pode devolver seus próprios empréstimos.'
+            if loan.status not in ['ativo', 'atrasado']:
+                return 'Este empréstimo não está ativo.'
+            if return_date < loan.start_date:
+                return 'Data de devolução não pode ser anterior à data de início do empréstimo.'
+            return None
+
+        with transaction.atomic():
+            loans, results = cls._resolve(queryset, ids, qrcode_hashes, ['ativo', 'atrasado'], check)
+
+            if loans:
+                loan_ids = [loan.id for loan in loans]
+                Loan.objects.filter(id__in=loan_ids, status__in=['ativo', 'atrasado']).update(
+                    status='concluido',
+                    actual_return_date=return_date,
+                    updated_at=now,
+                    **cls._append_note('Devolução', notes),
+                )
+                SearchIndex.index_ids('loan', loan_ids)
+                LoanEquipment.objects.filter(loan__in=loan_ids, returned=False).update(
+                    returned=True, return_date=now
+                )
+                Equipment.objects.filter(id__in=cls._equipment_ids(loans)).update(
+                    status='disponivel', updated_at=now
+                )
+
+        for loan in loans:
+            loan.status = 'concluido'
+            loan.actual_return_date = return_date
+        cls._notify([
+            LoanNotificationService.build_loan_returned_notification(loan) for loan in loans
+        ])
+
+        return cls._summary(results)
+
+    @classmethod
+    def cancelar(cls, user, queryset=None, ids=(), qrcode_hashes=(), motivo=''):
+        """
+        Cancela vários empréstimos pendentes
+        """
+        queryset = Loan.objects.all() if queryset is None else queryset
+        now = timezone.now()
+
+        def check(loan):
+            if loan.status != 'pendente':
+                return 'Apenas empréstimos pendentes podem ser cancelados.'
+            if user.id != loan.user_id and user.role not in cls.CANCEL_ROLES:
+                return 'Apenas o utente, técnico ou coordenador pode cancelar.'
+            return None
+
+        with transaction.atomic():
+            loans, results = cls._resolve(queryset, ids, qrcode_hashes, ['pendente'], check)
+
+            if loans:
+                Loan.objects.filter(id__in=[loan.id for loan in loans], status='pendente').update(
+                    status='cancelado',
+                    updated_at=now,
+                    **cls._append_note('Cancelado', motivo),
+                )
+                SearchIndex.index_ids('loan', [loan.id for loan in loans])
+
+        return cls._summary(results)
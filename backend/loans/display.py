@@ -0,0 +1,318 @@
+"""
+Textos de apresentação desnormalizados
+
+Empréstimos, solicitações e reservas guardam uma cópia compacta do que as
+listagens, o admin e as notificações mostram: nome do utente
+(``user_label``), equipamento ou pacote (``item_label``) e, nos empréstimos e
+solicitações, o número de equipamentos (``item_count``). Assim uma linha é
+apresentada sem joins nem consultas por linha.
+
+As cópias são calculadas no ``save()`` quando as chaves estrangeiras mudam e
+mantidas em sincronia por signals quando o utente, o equipamento, o pacote ou
+os itens mudam (com ``UPDATE`` em lote). O texto lido da base de dados é
+guardado no ``post_init``, pelo que um save que não muda o nome nem a
+identificação do equipamento não faz consultas extra. ``backfill_display_labels`` recalcula
+tudo.
+"""
+
+from django.apps import apps
+from django.db.models import Count, F, Q
+from django.db.models.signals import post_init, post_save, post_delete, m2m_changed
+
+LABEL_MAX_LENGTH = 255
+DISPLAY_FIELDS = {'user_label', 'item_label', 'item_count'}
+
+
+def _clip(text):
+    return (text or '')[:LABEL_MAX_LENGTH]
+
+
+def request_item_label(pacote_name, count):
+    if pacote_name:
+        return _clip(f"Pacote: {pacote_name}")
+    return f"{count} equipamentos"
+
+
+class DisplaySnapshotMixin:
+    """
+    Recalcula os textos de apresentação no ``save()`` quando alguma das
+    chaves estrangeiras em ``DISPLAY_SOURCES`` muda (ou ainda não há cópia).
+    Cada modelo define ``build_display_snapshot()``, que retorna
+    {campo: valor} com os textos atuais.
+    """
+
+    DISPLAY_SOURCES = ()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._display_key = instance._current_display_key()
+        return instance
+
+    def _current_display_key(self):
+        return tuple(self.__dict__.get(attname) for attname in self.DISPLAY_SOURCES)
+
+    def prepare_display_snapshot(self, kwargs):
+        update_fields = kwargs.get('update_fields')
+        sources = {attname[:-3] for attname in self.DISPLAY_SOURCES}
+        if update_fields is not None and not (sources | DISPLAY_FIELDS) & set(update_fields):
+            return
+        if self.user_label and self._current_display_key() == getattr(self, '_display_key', None):
+            return
+
+        for field, value in self.build_display_snapshot().items():
+            setattr(self, field, value)
+        self._display_key = self._current_display_key()
+        if update_fields is not None:
+            kwargs['update_fields'] = set(update_fields) | {
+                field for field in DISPLAY_FIELDS if hasattr(self, field)
+            }
+
+
+class DisplayLabels:
+    """
+    Recalcula em lote os textos de apresentação
+    """
+
+    BATCH_SIZE = 500
+
+    @staticmethod
+    def _models():
+        return (
+            apps.get_model('loans', 'Loan'),
+            apps.get_model('loans', 'LoanRequest'),
+            apps.get_model('reservations', 'Reservation'),
+        )
+
+    @classmethod
+    def _save(cls, model, objs, fields):
+        changed = [obj for obj in objs if obj._display_changed]
+        if changed:
+            model.objects.bulk_update(changed, fields, batch_size=cls.BATCH_SIZE)
+        return len(changed)
+
+    @staticmethod
+    def _assign(obj, **values):
+        obj._display_changed = any(getattr(obj, field) != value for field, value in values.items())
+        for field, value in values.items():
+            setattr(obj, field, value)
+
+    @classmethod
+    def refresh_loans(cls, queryset):
+        Loan, _, _ = cls._models()
+        rows = (
+            queryset.select_related('user', 'equipment', 'pacote')
+            .annotate(
+                package_items=Count('pacote__items', distinct=True),
+                extra_items=Count(
+                    'loan_equipments',
+                    filter=~Q(loan_equipments__equipment=F('equipment')),
+                    distinct=True,
+                ),
+            )
+        )
+        updated = 0
+        batch = []
+        for loan in rows.iterator(chunk_size=cls.BATCH_SIZE):
+            cls._assign(
+                loan,
+                user_label=_clip(loan.user.name),
+                item_label=Loan.item_label_for(loan.equipment, loan.pacote),
+                item_count=(1 if loan.equipment_id else 0) + loan.package_items + loan.extra_items,
+            )
+            batch.append(loan)
+            if len(batch) >= cls.BATCH_SIZE:
+                updated += cls._save(Loan, batch, ['user_label', 'item_label', 'item_count'])
+                batch = []
+        return updated + cls._save(Loan, batch, ['user_label', 'item_label', 'item_count'])
+
+    @classmethod
+    def refresh_loan_requests(cls, queryset):
+        _, LoanRequest, _ = cls._models()
+        rows = (
+            queryset.select_related('user', 'pacote')
+            .annotate(
+                package_items=Count('pacote__items', distinct=True),
+                equipment_count=Count('equipments', distinct=True),
+            )
+        )
+        updated = 0
+        batch = []
+        for lr in rows.iterator(chunk_size=cls.BATCH_SIZE):
+            if lr.pacote_id:
+                count = lr.package_items
+            else:
+                count = lr.equipment_count or lr.quantity or 0
+            cls._assign(
+                lr,
+                user_label=_clip(lr.user.name),
+                item_label=request_item_label(lr.pacote.name if lr.pacote_id else None, count),
+                item_count=count,
+            )
+            batch.append(lr)
+            if len(batch) >= cls.BATCH_SIZE:
+                updated += cls._save(LoanRequest, batch, ['user_label', 'item_label', 'item_count'])
+                batch = []
+        return updated + cls._save(LoanRequest, batch, ['user_label', 'item_label', 'item_count'])
+
+    @classmethod
+    def refresh_reservations(cls, queryset):
+        _, _, Reservation = cls._models()
+        updated = 0
+        batch = []
+        for reservation in queryset.select_related('user', 'equipment').iterator(chunk_size=cls.BATCH_SIZE):
+            cls._assign(
+                reservation,
+                user_label=_clip(reservation.user.name),
+                item_label=_clip(str(reservation.equipment)),
+            )
+            batch.append(reservation)
+            if len(batch) >= cls.BATCH_SIZE:
+                updated += cls._save(Reservation, batch, ['user_label', 'item_label'])
+                batch = []
+        return updated + cls._save(Reservation, batch, ['user_label', 'item_label'])
+
+    @classmethod
+    def refresh_all(cls):
+        """
+        Recalcula todas as cópias; retorna {modelo: linhas alteradas}
+        """
+        Loan, LoanRequest, Reservation = cls._models()
+        return {
+            'loans': cls.refresh_loans(Loan.objects.order_by('pk')),
+            'loan_requests': cls.refresh_loan_requests(LoanRequest.objects.order_by('pk')),
+            'reservations': cls.refresh_reservations(Reservation.objects.order_by('pk')),
+        }
+
+
+def _touches(kwargs, fields):
+    update_fields = kwargs.get('update_fields')
+    return update_fields is None or bool(set(fields) & set(update_fields))
+
+
+def _user_label(user):
+    return _clip(user.name)
+
+
+def _equipment_label(equipment):
+    return apps.get_model('loans', 'Loan').item_label_for(equipment, None)
+
+
+def _package_label(package):
+    return apps.get_model('loans', 'Loan').item_label_for(None, package)
+
+
+# Campos de origem e texto de apresentação de cada modelo referenciado
+LABEL_SOURCES = {
+    'user': (('name',), _user_label),
+    'equipment': (('brand', 'model', 'serial_number'), _equipment_label),
+    'package': (('name',), _package_label),
+}
+
+
+def _source_label(kind, instance):
+    """
+    Texto de apresentação a partir dos campos já carregados; None se algum
+    campo de origem estiver diferido (não se faz consulta para o obter)
+    """
+    fields, label = LABEL_SOURCES[kind]
+    if instance.pk is None or any(field not in instance.__dict__ for field in fields):
+        return None
+    return label(instance)
+
+
+def _remember_label(kind):
+    def handler(sender, instance, **kwargs):
+        instance._display_source = _source_label(kind, instance)
+    return handler
+
+
+def _label_changed(kind, instance, created, kwargs):
+    """
+    Retorna o novo texto se o save alterou os campos de origem, senão None.
+    O texto lido da base de dados fica em ``_display_source`` (post_init):
+    um save que não muda o texto não faz nenhum UPDATE.
+    """
+    fields, label = LABEL_SOURCES[kind]
+    if created or not _touches(kwargs, fields):
+        return None
+    current = label(instance)
+    if current == getattr(instance, '_display_source', None):
+        return None
+    instance._display_source = current
+    return current
+
+
+def _user_saved(sender, instance, created, **kwargs):
+    label = _label_changed('user', instance, created, kwargs)
+    if label is None:
+        return
+    for model in DisplayLabels._models():
+        model.objects.filter(user=instance).exclude(user_label=label).update(user_label=label)
+
+
+def _equipment_saved(sender, instance, created, **kwargs):
+    label = _label_changed('equipment', instance, created, kwargs)
+    if label is None:
+        return
+    Loan, _, Reservation = DisplayLabels._models()
+    for model in (Loan, Reservation):
+        model.objects.filter(equipment=instance).exclude(item_label=label).update(item_label=label)
+
+
+def _package_saved(sender, instance, created, **kwargs):
+    label = _label_changed('package', instance, created, kwargs)
+    if label is None:
+        return
+    Loan, LoanRequest, _ = DisplayLabels._models()
+    Loan.objects.filter(pacote=instance, equipment__isnull=True).exclude(item_label=label).update(item_label=label)
+    DisplayLabels.refresh_loan_requests(LoanRequest.objects.filter(pacote=instance))
+
+
+def _package_items_changed(sender, instance, **kwargs):
+    Loan, LoanRequest, _ = DisplayLabels._models()
+    DisplayLabels.refresh_loans(Loan.objects.filter(pacote_id=instance.package_id))
+    DisplayLabels.refresh_loan_requests(LoanRequest.objects.filter(pacote_id=instance.package_id))
+
+
+def _loan_items_changed(sender, instance, **kwargs):
+    Loan, _, _ = DisplayLabels._models()
+    DisplayLabels.refresh_loans(Loan.objects.filter(pk=instance.loan_id))
+
+
+def _request_equipments_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    _, LoanRequest, _ = DisplayLabels._models()
+    if reverse:
+        # Alteração feita a partir do equipamento (equipment.loanrequest_set)
+        queryset = LoanRequest.objects.filter(pk__in=pk_set or [])
+    else:
+        queryset = LoanRequest.objects.filter(pk=instance.pk)
+    DisplayLabels.refresh_loan_requests(queryset)
+
+
+def connect_signals():
+    from django.conf import settings
+
+    Loan, LoanRequest, _ = DisplayLabels._models()
+    PackageItem = apps.get_model('equipment', 'PackageItem')
+    LoanEquipment = apps.get_model('loans', 'LoanEquipment')
+
+    for kind, sender in (
+        ('user', settings.AUTH_USER_MODEL),
+        ('equipment', 'equipment.Equipment'),
+        ('package', 'equipment.EquipmentPackage'),
+    ):
+        post_init.connect(_remember_label(kind), sender=sender, weak=False, dispatch_uid=f'display_labels_{kind}_init')
+    post_save.connect(_user_saved, sender=settings.AUTH_USER_MODEL, dispatch_uid='display_labels_user')
+    post_save.connect(_equipment_saved, sender='equipment.Equipment', dispatch_uid='display_labels_equipment')
+    post_save.connect(_package_saved, sender='equipment.EquipmentPackage', dispatch_uid='display_labels_package')
+    post_save.connect(_package_items_changed, sender=PackageItem, dispatch_uid='display_labels_package_item_save')
+    post_delete.connect(_package_items_changed, sender=PackageItem, dispatch_uid='display_labels_package_item_delete')
+    post_save.connect(_loan_items_changed, sender=LoanEquipment, dispatch_uid='display_labels_loan_item_save')
+    post_delete.connect(_loan_items_changed, sender=LoanEquipment, dispatch_uid='display_labels_loan_item_delete')
+    m2m_changed.connect(
+        _request_equipments_changed, sender=LoanRequest.equipments.through,
+        dispatch_uid='display_labels_request_equipments',
+    )
@@ -0,0 +1,280 @@
+"""
+Exportações para auditoria (CSV / JSONL em streaming)
+
+Empréstimos, solicitações e reservas são exportados com os dados do utente e
+do equipamento. As linhas são lidas em blocos por paginação pela chave
+primária (``pk > último``), o que mantém a memória constante em qualquer
+backend — o MySQL não suporta cursores do lado do servidor e ``.iterator()``
+carregaria o resultado inteiro. Cada bloco só é consultado quando o cliente
+já leu o anterior (StreamingHttpResponse).
+
+Os registos arquivados (``ArchivedRecord``) que correspondem aos filtros entram
+na mesma exportação, intercalados por id e marcados na coluna ``arquivado``.
+"""
+
+import csv
+import heapq
+import json
+from collections import defaultdict
+
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+
+
+class _Echo:
+    """Objeto tipo ficheiro que devolve o que lhe é escrito (para o csv.writer)"""
+
+    def write(self, value):
+        return value
+
+
+class StreamingExport:
+    """
+    Exporta um queryset em CSV ou JSONL, bloco a bloco
+    """
+
+    CHUNK_SIZE = 2000
+    FORMATS = {
+        'csv': 'text/csv; charset=utf-8',
+        'jsonl': 'application/x-ndjson; charset=utf-8',
+    }
+
+    def __init__(self, queryset, columns, fmt='csv', extra=None, archived=None, archived_extra=None):
+        """
+        ``columns`` é uma lista de (cabeçalho, lookup do ORM); ``extra`` é uma
+        função opcional que recebe cada bloco de linhas e acrescenta colunas
+        calculadas (ex.: relações muitos-para-muitos) com uma consulta por bloco.
+
+        ``archived`` é um queryset opcional de ``ArchivedRecord`` do mesmo
+        tipo; as colunas são lidas de ``data`` e ``archived_extra`` faz o papel
+        de ``extra`` para esses blocos.
+        """
+        if fmt not in self.FORMATS:
+            raise ValueError(f"Formato inválido: {fmt}. Use {' ou '.join(self.FORMATS)}.")
+        self.queryset = queryset
+        self.columns = columns
+        self.fmt = fmt
+        self.extra = extra
+        self.archived = archived
+        self.archived_extra = archived_extra
+
+    def _chunks(self, queryset, key):
+        """Blocos de ``queryset`` por ordem crescente de ``key`` (paginação pela chave)"""
+        queryset = queryset.order_by(key)
+        last = None
+        while True:
+            page = queryset if last is None else queryset.filter(**{f'{key}__gt': last})
+            chunk = list(page[:self.CHUNK_SIZE])
+            if not chunk:
+                return
+            yield chunk
+            if len(chunk) < self.CHUNK_SIZE:
+                return
+            last = chunk[-1][key] if isinstance(chunk[-1], dict) else getattr(chunk[-1], key)
+
+    def live_rows(self):
+        lookups = [lookup for _, lookup in self.columns if lookup]
+        for chunk in self._chunks(self.queryset.values('pk', *lookups), 'pk'):
+            for row in chunk:
+                row['arquivado'] = False
+            if self.extra:
+                self.extra(chunk)
+            yield from chunk
+
+    def _archived_chunk(self, records):
+        """
+        Linhas de um bloco de registos arquivados, no formato de ``live_rows``:
+        os campos próprios vêm de ``data`` e os ``relação__campo`` são resolvidos
+        com uma consulta por relação
+        """
+        rows = [
+            {'pk': record.original_id, 'arquivado': True, '_data': record.data}
+            for record in records
+        ]
+        related = defaultdict(list)
+        for _, lookup in self.columns:
+            if not lookup:
+                continue
+            if '__' in lookup:
+                prefix, field = lookup.split('__', 1)
+                related[prefix].append(field)
+            else:
+                for row in rows:
+                    row[lookup] = row['_data'].get(lookup)
+        for prefix, fields in related.items():
+            relation = self.queryset.model._meta.get_field(prefix)
+            ids = {row['_data'].get(relation.attname) for row in rows} - {None}
+            values = {
+                item['pk']: item
+                for item in relation.related_model.objects.filter(pk__in=ids).values('pk', *fields)
+            }
+            for row in rows:
+                item = values.get(row['_data'].get(relation.attname), {})
+                for field in fields:
+                    row[f'{prefix}__{field}'] = item.get(field)
+        if self.archived_extra:
+            self.archived_extra(rows)
+        return rows
+
+    def archived_rows(self):
+        if self.archived is None:
+            return
+        for chunk in self._chunks(self.archived, 'original_id'):
+            yield from self._archived_chunk(chunk)
+
+    def rows(self):
+        # Os ids arquivados deixaram de existir nas tabelas ativas: a intercalação não repete linhas
+        return heapq.merge(self.live_rows(), self.archived_rows(), key=lambda row: row['pk'])
+
+    @staticmethod
+    def _value(value):
+        if value is None:
+            return ''
+        if hasattr(value, 'isoformat'):
+            return value.isoformat()
+        return value
+
+    def lines(self):
+        headers = [header for header, _ in self.columns]
+        keys = [lookup or header for header, lookup in self.columns]
+        if self.fmt == 'csv':
+            writer = csv.writer(_Echo())
+            # BOM para o Excel abrir o UTF-8 corretamente
+            yield '\ufeff' + writer.writerow(headers)
+            for row in self.rows():
+                yield writer.writerow([self._value(row.get(key)) for key in keys])
+        else:
+            for row in self.rows():
+                yield json.dumps(
+                    {header: row.get(key) for header, key in zip(headers, keys)},
+                    ensure_ascii=False, default=str,
+                ) + '\n'
+
+    def response(self, name):
+        filename = f"{name}_{timezone.localtime().strftime('%Y%m%d_%H%M')}.{self.fmt}"
+        response = StreamingHttpResponse(self.lines(), content_type=self.FORMATS[self.fmt])
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        response['Cache-Control'] = 'no-store'
+        return response
+
+
+LOAN_COLUMNS = [
+    ('id', 'id'),
+    ('status', 'status'),
+    ('utente', 'user__name'),
+    ('utente_email', 'user__email'),
+    ('equipamento_id', 'equipment_id'),
+    ('equipamento_marca', 'equipment__brand'),
+    ('equipamento_modelo', 'equipment__model'),
+    ('equipamento_serie', 'equipment__serial_number'),
+    ('pacote', 'pacote__name'),
+    ('data_inicio', 'start_date'),
+    ('hora_inicio', 'start_time'),
+    ('devolucao_prevista', 'expected_return_date'),
+    ('hora_devolucao_prevista', 'expected_return_time'),
+    ('devolvido_em', 'actual_return_date'),
+    ('finalidade', 'purpose'),
+    ('observacoes', 'notes'),
+    ('confirmado_tecnico', 'confirmado_tecnico'),
+    ('tecnico_entrega', 'tecnico_entrega__name'),
+    ('confirmado_utente', 'confirmado_utente'),
+    ('criado_por', 'created_by__name'),
+    ('criado_em', 'created_at'),
+    ('atualizado_em', 'updated_at'),
+    ('arquivado', None),
+]
+
+LOAN_REQUEST_COLUMNS = [
+    ('id', 'id'),
+    ('status', 'status'),
+    ('utente', 'user__name'),
+    ('utente_email', 'user__email'),
+    ('quantidade', 'quantity'),
+    ('pacote', 'pacote__name'),
+    ('equipamentos', None),
+    ('finalidade', 'purpose'),
+    ('devolucao_prevista', 'expected_return_date'),
+    ('hora_devolucao_prevista', 'expected_return_time'),
+    ('aprovado_por', 'aprovado_por__name'),
+    ('data_decisao', 'data_decisao'),
+    ('motivo_decisao', 'motivo_decisao'),
+    ('tecnico_responsavel', 'tecnico_responsavel__name'),
+    ('confirmado_pelo_tecnico', 'confirmado_pelo_tecnico'),
+    ('confirmado_pelo_utente', 'confirmado_pelo_utente'),
+    ('cancelado_por', 'cancelado_por__name'),
+    ('data_cancelamento', 'data_cancelamento'),
+    ('motivo_cancelamento', 'motivo_cancelamento'),
+    ('qrcode_hash', 'qrcode_hash'),
+    ('criado_em', 'created_at'),
+    ('atualizado_em', 'updated_at'),
+    ('arquivado', None),
+]
+
+RESERVATION_COLUMNS = [
+    ('id', 'id'),
+    ('status', 'status'),
+    ('utente', 'user__name'),
+    ('utente_email', 'user__email'),
+    ('equipamento_id', 'equipment_id'),
+    ('equipamento_marca', 'equipment__brand'),
+    ('equipamento_modelo', 'equipment__model'),
+    ('equipamento_serie', 'equipment__serial_number'),
+    ('data_reserva', 'reservation_date'),
+    ('levantamento_previsto', 'expected_pickup_date'),
+    ('finalidade', 'purpose'),
+    ('observacoes', 'notes'),
+    ('criado_por', 'created_by__name'),
+    ('confirmada_em', 'confirmed_at'),
+    ('criado_em', 'created_at'),
+    ('atualizado_em', 'updated_at'),
+    ('arquivado', None),
+]
+
+
+def add_request_equipments(chunk):
+    """
+    Acrescenta os números de série dos equipamentos de cada solicitação
+    do bloco (uma consulta por bloco)
+    """
+    from .models import LoanRequest
+
+    serials = defaultdict(list)
+    through = LoanRequest.equipments.through.objects.filter(
+        loanrequest_id__in=[row['pk'] for row in chunk]
+    ).order_by('id').values_list('loanrequest_id', 'equipment__serial_number')
+    for request_id, serial in through:
+        serials[request_id].append(serial)
+    for row in chunk:
+        row['equipamentos'] = '|'.join(serials.get(row['pk'], []))
+
+
+def add_archived_request_equipments(chunk):
+    """
+    Como ``add_request_equipments``, para solicitações arquivadas (os ids dos
+    equipamentos estão em ``data``)
+    """
+    from equipment.models import Equipment
+
+    ids = {pk for row in chunk for pk in row['_data'].get('equipments', [])}
+    serials = dict(Equipment.objects.filter(pk__in=ids).values_list('pk', 'serial_number'))
+    for row in chunk:
+        row['equipamentos'] = '|'.join(
+            serials[pk] for pk in row['_data'].get('equipments', []) if pk in serials
+        )
+
+
+def filter_created_range(queryset, params):
+    """
+    Aplica ?created_from=AAAA-MM-DD e ?created_to=AAAA-MM-DD (datas de criação);
+    levanta ValueError se alguma data for inválida
+    """
+    from datetime import datetime
+
+    for param, lookup in (('created_from', 'created_at__date__gte'), ('created_to', 'created_at__date__lte')):
+        value = params.get(param)
+        if value:
+            try:
+                queryset = queryset.filter(**{lookup: datetime.strptime(value, '%Y-%m-%d').date()})
+            except ValueError:
+                raise ValueError(f'{param} deve estar no formato AAAA-MM-DD.')
+    return queryset
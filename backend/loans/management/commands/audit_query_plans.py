@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from loans.query_plans import audit
+
+
+class Command(BaseCommand):
+    help = 'Corre EXPLAIN QUERY PLAN sobre o catálogo de consultas críticas e assinala varrimentos completos de tabela'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--only', nargs='+', help='Apenas entradas com estes prefixos (ex.: loans. equipment.)')
+        parser.add_argument('--verbose', action='store_true', help='Mostra o plano completo de cada consulta')
+        parser.add_argument('--no-fail', action='store_true', help='Não termina com erro quando há varrimentos completos')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('A auditoria usa EXPLAIN QUERY PLAN e só está disponível com SQLite.')
+
+        self.stdout.write("🔍 Auditoria de planos de execução")
+        results = audit(options['only'])
+        flagged = 0
+        for result in results:
+            notes = []
+            if result['index_scans']:
+                notes.append(f"percorre índice de {', '.join(result['index_scans'])}")
+            if result['temp_sort']:
+                notes.append('ordenação temporária')
+            suffix = f" ({'; '.join(notes)})" if notes else ''
+
+            if result['flagged']:
+                flagged += 1
+                self.stdout.write(self.style.ERROR(
+                    f"  ❌ {result['name']}: varrimento completo de {', '.join(result['full_scans'])}{suffix}"
+                ))
+                self.stdout.write(f"     origem: {result['source']}")
+            elif result['full_scans']:
+                self.stdout.write(self.style.WARNING(
+                    f"  ⚠️  {result['name']}: varrimento completo esperado{suffix}"
+                ))
+            else:
+                self.stdout.write(f"  ✅ {result['name']}{suffix}")
+
+            if options['verbose'] or result['flagged']:
+                for detail in result['plan']:
+                    self.stdout.write(f"       {detail}")
+
+        if flagged and not options['no_fail']:
+            raise CommandError(f'{flagged} consulta(s) com varrimento completo de tabela.')
+        self.stdout.write(self.style.SUCCESS(f"✅ {len(results)} consulta(s) auditada(s), {flagged} com problemas."))
@@ -0,0 +1,25 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from loans.display import DisplayLabels
+
+
+class Command(BaseCommand):
+    help = 'Recalcula os textos de apresentação (utente, equipamento/pacote, nº de itens) de empréstimos, solicitações e reservas'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=DisplayLabels.BATCH_SIZE,
+                            help=f'Linhas por lote (padrão: {DisplayLabels.BATCH_SIZE})')
+
+    def handle(self, *args, **options):
+        DisplayLabels.BATCH_SIZE = options['batch_size']
+        started = time.monotonic()
+
+        self.stdout.write("🔄 A recalcular textos de apresentação...")
+        updated = DisplayLabels.refresh_all()
+        elapsed = time.monotonic() - started
+
+        for name, count in updated.items():
+            self.stdout.write(f"   {name}: {count} linha(s) atualizada(s)")
+        self.stdout.write(self.style.SUCCESS(f"✅ Concluído em {elapsed:.1f}s"))
@@ -0,0 +1,36 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from equipahub.db_router import use_replica
+from loans.monthly_report import MonthlyLoanReport
+
+
+class Command(BaseCommand):
+    help = 'Gera o relatório mensal de atividade de empréstimos em PDF'
+
+    def add_arguments(self, parser):
+        parser.add_argument('output', help='Caminho do ficheiro PDF a gerar')
+        parser.add_argument('--month', help='Mês no formato AAAA-MM (padrão: mês anterior)')
+
+    def handle(self, *args, **options):
+        if options['month']:
+            try:
+                year, month = MonthlyLoanReport.parse_month(options['month'])
+            except ValueError:
+                raise CommandError('Use --month no formato AAAA-MM.')
+        else:
+            first = date.today().replace(day=1)
+            year, month = (first.year - 1, 12) if first.month == 1 else (first.year, first.month - 1)
+
+        report = MonthlyLoanReport(year, month)
+        self.stdout.write(f'📊 A gerar relatório de {report.title}...')
+        # Só leituras: vão para a réplica, se configurada
+        with use_replica():
+            for label, count in report.summary():
+                self.stdout.write(f'  • {label}: {count}')
+
+            pages = report.write(options['output'])
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ Relatório com {pages} página(s) gravado em {options["output"]}'
+        ))
@@ -0,0 +1,43 @@
+# Generated by Django 4.2.9 on 2026-10-19 02:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('loans', '0011_add_qrcode_to_loanrequest'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='loan',
+            name='item_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Nº de equipamentos'),
+        ),
+        migrations.AddField(
+            model_name='loan',
+            name='item_label',
+            field=models.CharField(blank=True, default='', editable=False, max_length=255, verbose_name='Equipamento/Pacote (apresentação)'),
+        ),
+        migrations.AddField(
+            model_name='loan',
+            name='user_label',
+            field=models.CharField(blank=True, default='', editable=False, max_length=255, verbose_name='Utente (apresentação)'),
+        ),
+        migrations.AddField(
+            model_name='loanrequest',
+            name='item_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Nº de equipamentos'),
+        ),
+        migrations.AddField(
+            model_name='loanrequest',
+            name='item_label',
+            field=models.CharField(blank=True, default='', editable=False, max_length=255, verbose_name='Equipamento/Pacote (apresentação)'),
+        ),
+        migrations.AddField(
+            model_name='loanrequest',
+            name='user_label',
+            field=models.CharField(blank=True, default='', editable=False, max_length=255, verbose_name='Utente (apresentação)'),
+        ),
+    ]
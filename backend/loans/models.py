@@ -3,6 +3,8 @@ from django.db import models
 from django.utils import timezone
 from django.conf import settings
 
+from .display import DisplaySnapshotMixin, LABEL_MAX_LENGTH, request_item_label
+
 
 def get_current_date():
     """Retorna a data atual (sem hora) para usar como default"""
@@ -14,7 +16,7 @@ def get_current_time():
     return timezone.now().time()
 
 
-class Loan(models.Model):
+class Loan(DisplaySnapshotMixin, models.Model):
     """
     Modelo de empréstimo baseado no interface TypeScript Loan
     """
@@ -25,6 +27,10 @@ class Loan(models.Model):
         ('concluido', 'Concluído'),
         ('cancelado', 'Cancelado'),
     ]
+    # Empréstimos em curso (equipamento levantado)
+    ACTIVE_STATUSES = ['ativo', 'atrasado']
+    # Empréstimos que ocupam o equipamento: em curso ou à espera de levantamento
+    HOLDING_STATUSES = ['pendente', 'ativo', 'atrasado']
     
     id = models.AutoField(primary_key=True)
     user = models.ForeignKey(
@@ -132,18 +138,38 @@ class Loan(models.Model):
         verbose_name='Data prevista de devolução'
     )
 
+    # Textos de apresentação desnormalizados (ver loans/display.py)
+    user_label = models.CharField(
+        max_length=LABEL_MAX_LENGTH, blank=True, default='', editable=False,
+        verbose_name='Utente (apresentação)'
+    )
+    item_label = models.CharField(
+        max_length=LABEL_MAX_LENGTH, blank=True, default='', editable=False,
+        verbose_name='Equipamento/Pacote (apresentação)'
+    )
+    item_count = models.PositiveIntegerField(
+        default=0, editable=False,
+        verbose_name='Nº de equipamentos'
+    )
+
+    DISPLAY_SOURCES = ('user_id', 'equipment_id', 'pacote_id')
+
     class Meta:
         db_table = 'loans'
         verbose_name = 'Empréstimo'
         verbose_name_plural = 'Empréstimos'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'expected_return_date'], name='loan_status_return_idx'),
+            models.Index(fields=['user', 'created_at'], name='loan_user_created_idx'),
+            models.Index(fields=['start_date'], name='loan_start_date_idx'),
+            models.Index(fields=['actual_return_date'], name='loan_actual_return_idx'),
+        ]
     
     def __str__(self):
-        if self.equipment:
-            return f"Empréstimo: {self.equipment} para {self.user.name}"
-        if self.pacote:
-            return f"Empréstimo: {self.pacote} para {self.user.name}"
-        return f"Empréstimo #{self.id} - {self.user.name}"
+        if self.equipment_id or self.pacote_id:
+            return f"Empréstimo: {self.equipment_name} para {self.user_name}"
+        return f"Empréstimo #{self.id} - {self.user_name}"
     
     @property
     def confirmado_levantamento(self):
@@ -161,15 +187,31 @@ class Loan(models.Model):
     
     @property
     def user_name(self):
-        return self.user.name
+        return self.user_label or self.user.name
     
     @property
     def equipment_name(self):
-        if self.equipment:
-            return str(self.equipment)
-        if self.pacote:
-            return str(self.pacote)
+        return self.item_label or self.item_label_for(self.equipment, self.pacote)
+
+    @staticmethod
+    def item_label_for(equipment, pacote):
+        if equipment:
+            return str(equipment)[:LABEL_MAX_LENGTH]
+        if pacote:
+            return str(pacote)[:LABEL_MAX_LENGTH]
         return '—'
+
+    def build_display_snapshot(self):
+        item_count = 1 if self.equipment_id else 0
+        if self.pacote_id:
+            item_count += self.pacote.items.count()
+        if self.pk:
+            item_count += self.loan_equipments.exclude(equipment_id=self.equipment_id).count()
+        return {
+            'user_label': self.user.name[:LABEL_MAX_LENGTH],
+            'item_label': self.item_label_for(self.equipment, self.pacote),
+            'item_count': item_count,
+        }
     
     def get_all_equipments(self):
         equipments = []
@@ -272,6 +314,7 @@ class Loan(models.Model):
     def save(self, *args, **kwargs):
         if self.status == 'ativo' and self.is_overdue:
             self.status = 'atrasado'
+        self.prepare_display_snapshot(kwargs)
         super().save(*args, **kwargs)
 
 
@@ -322,7 +365,7 @@ class LoanEquipment(models.Model):
         return f"{tipo}: {self.equipment} (Empréstimo #{self.loan.id})"
 
 
-class LoanRequest(models.Model):
+class LoanRequest(DisplaySnapshotMixin, models.Model):
     """
     Modelo de solicitação de empréstimo (>5 equipamentos ou pacote único)
     Requer aprovação da reitoria e dupla confirmação (técnico + utente)
@@ -468,22 +511,51 @@ class LoanRequest(models.Model):
     # Campos de auditoria
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
-    
+
+    # Textos de apresentação desnormalizados (ver loans/display.py)
+    user_label = models.CharField(
+        max_length=LABEL_MAX_LENGTH, blank=True, default='', editable=False,
+        verbose_name='Utente (apresentação)'
+    )
+    item_label = models.CharField(
+        max_length=LABEL_MAX_LENGTH, blank=True, default='', editable=False,
+        verbose_name='Equipamento/Pacote (apresentação)'
+    )
+    item_count = models.PositiveIntegerField(
+        default=0, editable=False,
+        verbose_name='Nº de equipamentos'
+    )
+
+    DISPLAY_SOURCES = ('user_id', 'pacote_id')
+
     class Meta:
         db_table = 'loan_requests'
         verbose_name = 'Solicitação de Empréstimo'
         verbose_name_plural = 'Solicitações de Empréstimos'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at'], name='loanreq_status_created_idx'),
+            models.Index(fields=['user', 'created_at'], name='loanreq_user_created_idx'),
+        ]
     
     def __str__(self):
-        if self.pacote:
-            return f"Solicitação #{self.id} - {self.user.name} (Pacote: {self.pacote.name})"
-        count = self.equipments.count()
-        return f"Solicitação #{self.id} - {self.user.name} ({count} equipamentos)"
+        label = self.item_label or self.build_display_snapshot()['item_label']
+        return f"Solicitação #{self.id} - {self.user_name} ({label})"
     
     @property
     def user_name(self):
-        return self.user.name
+        return self.user_label or self.user.name
+
+    def build_display_snapshot(self):
+        if self.pacote_id:
+            count = self.pacote.items.count()
+        else:
+            count = (self.equipments.count() if self.pk else 0) or self.quantity or 0
+        return {
+            'user_label': self.user.name[:LABEL_MAX_LENGTH],
+            'item_label': request_item_label(self.pacote.name if self.pacote_id else None, count),
+            'item_count': count,
+        }
     
     @property
     def tecnico_name(self):
@@ -510,6 +582,7 @@ class LoanRequest(models.Model):
         if not self.qrcode_hash:
             raw = f"LR{self.id or ''}-{uuid.uuid4().hex[:8]}"
             self.qrcode_hash = hashlib.sha256(raw.encode()).hexdigest()[:16]
+        self.prepare_display_snapshot(kwargs)
         super().save(*args, **kwargs)
 
     def aprovar(self, aprovador, motivo=''):
@@ -0,0 +1,403 @@
+"""
+Relatório mensal de atividade de empréstimos (PDF)
+
+Lista os empréstimos iniciados, as devoluções, os atrasos e as solicitações
+especiais de um mês. As linhas são lidas com ``.iterator()`` e convertidas em
+tabelas de ``CHUNK_ROWS`` linhas à medida que o reportlab as consome, pelo que
+só algumas tabelas existem em memória de cada vez, independentemente do
+número de empréstimos do mês. O PDF é escrito num ficheiro temporário em spool.
+
+O relatório está registado como documento ``monthly_report`` do pool de
+geração de PDFs (``render_pool``): a view gera-o num processo do pool e
+guarda-o na cache em disco, com uma chave que muda sempre que algum registo
+do mês é alterado, removido ou arquivado (e a cada dia, por causa dos atrasos).
+
+Os empréstimos e solicitações já arquivados (``ArchivedRecord``) entram nas
+mesmas secções, intercalados com os ativos pela data de cada secção.
+"""
+
+import calendar
+import heapq
+import tempfile
+from datetime import date, datetime, time
+from io import BytesIO
+
+from django.db.models import Count, F, Max, Q, Sum, Value, CharField, IntegerField, TextField
+from django.db.models.fields.json import KT
+from django.db.models.functions import Cast, Coalesce, Concat
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from django.utils.functional import cached_property
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4, landscape
+from reportlab.lib.units import cm
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+
+from archive.models import ArchivedRecord
+
+from .models import Loan, LoanRequest
+from .pdf_service import _get_styles, draw_page_header, register_document
+
+# Linhas por tabela; cada bloco é paginado pelo reportlab
+CHUNK_ROWS = 40
+# Acima deste tamanho o PDF em construção passa da memória para disco
+SPOOL_MAX_SIZE = 8 * 1024 * 1024
+# Anos aceites em ?month=AAAA-MM
+MIN_YEAR = 2000
+MAX_YEAR = 2100
+REPORT_VERSION = 1
+
+MONTH_NAMES = [
+    '', 'Janeiro', 'Fevereiro', 'Março', 'Abril', 'Maio', 'Junho',
+    'Julho', 'Agosto', 'Setembro', 'Outubro', 'Novembro', 'Dezembro',
+]
+
+TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#1e40af')),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+    ('FONTSIZE', (0, 0), (-1, -1), 8),
+    ('GRID', (0, 0), (-1, -1), 0.25, colors.grey),
+    ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+    ('PADDING', (0, 0), (-1, -1), 3),
+    ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#f9fafb')]),
+])
+
+
+class _StreamingStory(list):
+    """
+    Lista de flowables que se vai reabastecendo a partir de um gerador.
+    O reportlab consome a lista pela frente e consulta ``len()`` a cada
+    passo; é nesse momento que os próximos flowables são produzidos.
+    """
+
+    LOW_WATER = 4
+
+    def __init__(self, source):
+        super().__init__()
+        self._source = iter(source)
+        self._exhausted = False
+
+    def __len__(self):
+        while not self._exhausted and list.__len__(self) < self.LOW_WATER:
+            try:
+                self.append(next(self._source))
+            except StopIteration:
+                self._exhausted = True
+        return list.__len__(self)
+
+
+def _clip(value, size):
+    text = '' if value is None else str(value)
+    return text if len(text) <= size else text[:size - 1] + '…'
+
+
+def _fmt_date(value):
+    return value.strftime('%d/%m/%Y') if value else '—'
+
+
+class MonthlyLoanReport:
+    """
+    Gera o relatório de atividade de empréstimos de um mês
+    """
+
+    LOAN_HEADER = ['#', 'Utente', 'Equipamento / Pacote', 'Início', 'Devolução prevista', 'Devolvido em', 'Status']
+    LOAN_WIDTHS = [1.6*cm, 6*cm, 8*cm, 2.4*cm, 3*cm, 2.6*cm, 2.4*cm]
+    REQUEST_HEADER = ['#', 'Utente', 'Quantidade', 'Finalidade', 'Criada em', 'Devolução prevista', 'Status']
+    REQUEST_WIDTHS = [1.6*cm, 6*cm, 2.4*cm, 8.6*cm, 2.4*cm, 3*cm, 2*cm]
+    # Posição da data de cada secção nas linhas de empréstimo (ordenação)
+    LOAN_DATE_INDEX = {'start_date': 3, 'expected_return_date': 4, 'actual_return_date': 5}
+
+    def __init__(self, year, month, today=None):
+        self.year = year
+        self.month = month
+        self.start = date(year, month, 1)
+        self.end = date(year, month, calendar.monthrange(year, month)[1])
+        self.today = today or timezone.now().date()
+        self.loan_status = dict(Loan.LOAN_STATUS_CHOICES)
+        self.request_status = dict(LoanRequest.REQUEST_STATUS_CHOICES)
+
+    @staticmethod
+    def parse_month(value):
+        """
+        Converte 'AAAA-MM' em (ano, mês); levanta ValueError se inválido
+        """
+        year, month = (int(part) for part in value.split('-'))
+        if not 1 <= month <= 12:
+            raise ValueError(f"Mês inválido: {value}")
+        if not MIN_YEAR <= year <= MAX_YEAR:
+            raise ValueError(f"Ano fora do intervalo {MIN_YEAR}-{MAX_YEAR}: {value}")
+        return year, month
+
+    @classmethod
+    def from_key(cls, pk):
+        """Relatório a partir da chave 'AAAA-MM' (carregamento no pool de PDFs)"""
+        return cls(*cls.parse_month(pk))
+
+    @property
+    def pk(self):
+        return f"{self.year}-{self.month:02d}"
+
+    @cached_property
+    def updated_at(self):
+        """
+        Versão dos dados do relatório para a chave da cache: a alteração mais
+        recente dos registos do mês, nunca anterior ao início do dia de hoje
+        """
+        loans = (self.loans_started() | self.returns() | self.overdue()).aggregate(latest=Max('updated_at'))
+        requests = self.special_requests().aggregate(latest=Max('updated_at'))
+        today = timezone.make_aware(datetime.combine(self.today, time.min))
+        return max(stamp for stamp in (loans['latest'], requests['latest'], today) if stamp is not None)
+
+    @cached_property
+    def cache_fingerprint(self):
+        """
+        Número e soma dos ids dos registos de cada secção (ativos e
+        arquivados), para a chave da cache: remover ou arquivar um registo
+        não muda ``updated_at``
+        """
+        sections = [
+            (self.loans_started(), 'id'), (self.returns(), 'id'), (self.overdue(), 'id'),
+            (self.special_requests(), 'id'), (self.archived_loans_started(), 'original_id'),
+            (self.archived_returns(), 'original_id'), (self.archived_overdue(), 'original_id'),
+            (self.archived_special_requests(), 'original_id'),
+        ]
+        parts = []
+        for queryset, field in sections:
+            totals = queryset.aggregate(count=Count(field), ids=Sum(field))
+            parts.append(f"{totals['count']}:{totals['ids'] or 0}")
+        return ','.join(parts)
+
+    @property
+    def title(self):
+        return f"{MONTH_NAMES[self.month]} de {self.year}"
+
+    # Consultas
+
+    def loans_started(self):
+        return Loan.objects.filter(start_date__range=(self.start, self.end))
+
+    def returns(self):
+        return Loan.objects.filter(actual_return_date__range=(self.start, self.end))
+
+    def overdue(self):
+        """
+        Empréstimos com devolução prevista no mês que ficaram em atraso:
+        ainda por devolver ou devolvidos depois da data prevista
+        """
+        return Loan.objects.filter(
+            expected_return_date__range=(self.start, self.end),
+            expected_return_date__lt=self.today,
+        ).filter(
+            Q(actual_return_date__isnull=True, status__in=['ativo', 'atrasado'])
+            | Q(actual_return_date__gt=F('expected_return_date'))
+        )
+
+    def special_requests(self):
+        return LoanRequest.objects.filter(
+            quantity__gt=0, created_at__date__range=(self.start, self.end)
+        )
+
+    # Arquivo: os registos guardam as datas em ``data`` (texto ISO 8601)
+
+    def _archived_loans(self, field):
+        """Empréstimos arquivados com a data ``field`` no mês"""
+        return ArchivedRecord.objects.filter(kind='loan').alias(
+            day=Cast(KT(f'data__{field}'), TextField())
+        ).filter(day__range=(self.start.isoformat(), self.end.isoformat()))
+
+    def archived_loans_started(self):
+        return self._archived_loans('start_date')
+
+    def archived_returns(self):
+        return self._archived_loans('actual_return_date')
+
+    def archived_overdue(self):
+        """Arquivados estão encerrados: só os devolvidos depois da data prevista"""
+        return self._archived_loans('expected_return_date').alias(
+            returned=Cast(KT('data__actual_return_date'), TextField())
+        ).filter(day__lt=self.today.isoformat(), returned__gt=F('day'))
+
+    def archived_special_requests(self):
+        return ArchivedRecord.objects.filter(
+            kind='loan_request', created_at__date__range=(self.start, self.end)
+        ).alias(quantity=Cast(KT('data__quantity'), IntegerField())).filter(quantity__gt=0)
+
+    def summary(self):
+        return [
+            ['Empréstimos iniciados', str(self.loans_started().count() + self.archived_loans_started().count())],
+            ['Devoluções', str(self.returns().count() + self.archived_returns().count())],
+            ['Em atraso', str(self.overdue().count() + self.archived_overdue().count())],
+            ['Solicitações especiais', str(
+                self.special_requests().count() + self.archived_special_requests().count()
+            )],
+        ]
+
+    # Linhas
+
+    def _loan_rows(self, queryset, archived, field):
+        """
+        Linhas de ``queryset`` e dos arquivados ``archived`` intercaladas por
+        (``field``, id)
+        """
+        live = queryset.order_by(field, 'id').annotate(
+            label=Coalesce(
+                Concat('equipment__brand', Value(' '), 'equipment__model', output_field=CharField()),
+                'pacote__name',
+                Value('—'),
+                output_field=CharField(),
+            ),
+        ).values_list(
+            'id', 'user__name', 'label', 'start_date', 'expected_return_date',
+            'actual_return_date', 'status',
+        ).iterator(chunk_size=500)
+        cold = (
+            (
+                pk, user, data.get('item_label') or '—', parse_date(data['start_date']),
+                parse_date(data['expected_return_date']), parse_date(data.get('actual_return_date') or ''),
+                data['status'],
+            )
+            for pk, user, data in archived.order_by('day', 'original_id').values_list(
+                'original_id', 'user__name', 'data'
+            ).iterator(chunk_size=500)
+        )
+        index = self.LOAN_DATE_INDEX[field]
+        rows = heapq.merge(live, cold, key=lambda row: (row[index], row[0]))
+        for pk, user, label, start, expected, returned, loan_status in rows:
+            yield [
+                str(pk), _clip(user, 38), _clip(label, 52), _fmt_date(start),
+                _fmt_date(expected), _fmt_date(returned), self.loan_status.get(loan_status, loan_status),
+            ]
+
+    def _request_rows(self):
+        live = self.special_requests().order_by('created_at', 'id').values_list(
+            'id', 'user__name', 'quantity', 'purpose', 'created_at', 'expected_return_date', 'status',
+        ).iterator(chunk_size=500)
+        cold = (
+            (
+                pk, user, data['quantity'], data['purpose'], created,
+                parse_date(data['expected_return_date']), data['status'],
+            )
+            for pk, user, data, created in self.archived_special_requests().order_by(
+                'created_at', 'original_id'
+            ).values_list('original_id', 'user__name', 'data', 'created_at').iterator(chunk_size=500)
+        )
+        rows = heapq.merge(live, cold, key=lambda row: (row[4], row[0]))
+        for pk, user, quantity, purpose, created, expected, request_status in rows:
+            yield [
+                str(pk), _clip(user, 38), str(quantity), _clip(' '.join((purpose or '').split()), 56),
+                _fmt_date(timezone.localtime(created).date()), _fmt_date(expected),
+                self.request_status.get(request_status, request_status),
+            ]
+
+    @staticmethod
+    def _tables(header, widths, rows):
+        """
+        Agrupa as linhas em tabelas de CHUNK_ROWS linhas com cabeçalho repetido
+        """
+        chunk = []
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) >= CHUNK_ROWS:
+                yield Table([header] + chunk, colWidths=widths, repeatRows=1, style=TABLE_STYLE)
+                chunk = []
+        if chunk:
+            yield Table([header] + chunk, colWidths=widths, repeatRows=1, style=TABLE_STYLE)
+
+    def _section(self, number, heading, header, widths, rows):
+        styles, _, heading_style = _get_styles()
+        yield Paragraph(f"{number}. {heading}", heading_style)
+        empty = True
+        for table in self._tables(header, widths, rows):
+            empty = False
+            yield table
+        if empty:
+            yield Paragraph('Sem registos neste período.', styles['BodyText'])
+        yield Spacer(1, 0.5*cm)
+
+    def _story(self):
+        styles, title_style, heading_style = _get_styles()
+        yield Paragraph(f"RELATÓRIO MENSAL DE EMPRÉSTIMOS — {self.title.upper()}", title_style)
+        yield Paragraph(
+            f"Período: {_fmt_date(self.start)} a {_fmt_date(self.end)}. "
+            f"Gerado em {timezone.localtime().strftime('%d/%m/%Y às %H:%M')}.",
+            styles['BodyText'],
+        )
+        yield Spacer(1, 0.5*cm)
+
+        yield Paragraph("RESUMO", heading_style)
+        yield Table(self.summary(), colWidths=[7*cm, 4*cm], style=TableStyle([
+            ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#e0e7ff')),
+            ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, -1), 10),
+            ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
+            ('PADDING', (0, 0), (-1, -1), 6),
+        ]), hAlign='LEFT')
+        yield Spacer(1, 0.5*cm)
+
+        yield from self._section(
+            1, 'EMPRÉSTIMOS INICIADOS', self.LOAN_HEADER, self.LOAN_WIDTHS,
+            self._loan_rows(self.loans_started(), self.archived_loans_started(), 'start_date'),
+        )
+        yield from self._section(
+            2, 'DEVOLUÇÕES', self.LOAN_HEADER, self.LOAN_WIDTHS,
+            self._loan_rows(self.returns(), self.archived_returns(), 'actual_return_date'),
+        )
+        yield from self._section(
+            3, 'EM ATRASO', self.LOAN_HEADER, self.LOAN_WIDTHS,
+            self._loan_rows(self.overdue(), self.archived_overdue(), 'expected_return_date'),
+        )
+        yield from self._section(
+            4, 'SOLICITAÇÕES ESPECIAIS', self.REQUEST_HEADER, self.REQUEST_WIDTHS,
+            self._request_rows(),
+        )
+
+    @staticmethod
+    def _draw_page(canvas, doc):
+        draw_page_header(canvas, doc)
+        canvas.saveState()
+        canvas.setFont('Helvetica', 8)
+        canvas.drawRightString(doc.pagesize[0] - 2*cm, 1.2*cm, f"Página {doc.page}")
+        canvas.restoreState()
+
+    def write(self, output):
+        """
+        Escreve o relatório em ``output`` (caminho ou ficheiro).
+        Retorna o número de páginas.
+        """
+        doc = SimpleDocTemplate(
+            output,
+            pagesize=landscape(A4),
+            rightMargin=1.5*cm,
+            leftMargin=1.5*cm,
+            topMargin=3.5*cm,
+            bottomMargin=2*cm,
+            title=f"Relatório mensal de empréstimos - {self.title}",
+            pageCompression=1,
+        )
+        doc.build(_StreamingStory(self._story()), onFirstPage=self._draw_page, onLaterPages=self._draw_page)
+        return doc.page
+
+    def render(self):
+        """
+        Gera o PDF num ficheiro temporário em spool e retorna-o posicionado
+        no início, pronto a ser transmitido em blocos
+        """
+        spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+        self.write(spool)
+        spool.seek(0)
+        return spool
+
+    def generate(self):
+        """
+        Gera o PDF em memória (BytesIO), para o registo de documentos
+        """
+        buffer = BytesIO()
+        self.write(buffer)
+        return buffer
+
+
+register_document(
+    'monthly_report', None, MonthlyLoanReport.generate, REPORT_VERSION, load=MonthlyLoanReport.from_key,
+)
@@ -0,0 +1,100 @@
+"""
+Cache em disco dos PDFs gerados
+
+O PDF de um documento registado em ``pdf_service.DOCUMENTS`` é guardado com
+um nome derivado de (tipo, id, updated_at, versão do template): qualquer
+alteração ao objeto muda a chave, pelo que um ficheiro em cache nunca fica
+desatualizado. As transferências repetidas custam apenas a leitura do ficheiro.
+"""
+
+import hashlib
+import os
+import tempfile
+from pathlib import Path
+
+from django.conf import settings
+
+from .pdf_service import DOCUMENTS, render_document
+
+DEFAULT_KIND = 'loan_request'
+
+
+def cache_dir():
+    return Path(getattr(settings, 'LOAN_REQUEST_PDF_CACHE_DIR', Path(settings.MEDIA_ROOT) / 'loan_request_pdfs'))
+
+
+def cache_key(obj, kind=DEFAULT_KIND):
+    version = DOCUMENTS[kind]['version']
+    raw = f"{kind}|{obj.pk}|{obj.updated_at.isoformat()}|v{version}"
+    # Documentos de vários registos: remoções não mudam ``updated_at``
+    fingerprint = getattr(obj, 'cache_fingerprint', None)
+    if fingerprint:
+        raw += f"|{fingerprint}"
+    return hashlib.sha256(raw.encode()).hexdigest()[:20]
+
+
+def cache_path(obj, kind=DEFAULT_KIND, directory=None):
+    directory = Path(directory) if directory else cache_dir()
+    if kind != DEFAULT_KIND:
+        directory = directory / kind
+    return directory / str(obj.pk) / f"{cache_key(obj, kind)}.pdf"
+
+
+def cached(obj, kind=DEFAULT_KIND):
+    """
+    Caminho do PDF em cache ou None se ainda não foi gerado
+    """
+    path = cache_path(obj, kind)
+    return path if path.exists() else None
+
+
+def _remove_stale(path):
+    """
+    Apaga as versões anteriores do PDF do mesmo objeto
+    """
+    for old in path.parent.glob('*.pdf'):
+        if old != path:
+            try:
+                old.unlink()
+            except FileNotFoundError:
+                pass
+
+
+def get_or_render(obj, kind=DEFAULT_KIND, directory=None):
+    """
+    Garante o PDF na cache e retorna (caminho, gerado agora?).
+    A escrita é atómica (ficheiro temporário + rename).
+    """
+    path = cache_path(obj, kind, directory)
+    if path.exists():
+        return path, False
+
+    content = render_document(kind, obj)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(content)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
+    _remove_stale(path)
+    return path, True
+
+
+def prerender(obj, kind=DEFAULT_KIND):
+    """
+    Pede a geração antecipada do PDF (criação e aprovação) ao pool de
+    renderização, sem bloquear o pedido. Falhas não interrompem o pedido;
+    o PDF volta a ser pedido na transferência.
+    """
+    from .render_pool import PDFRenderPool, PoolSaturated
+
+    try:
+        PDFRenderPool.submit(obj, kind)
+    except PoolSaturated:
+        pass
+    except Exception as e:
+        print(f"Erro ao pré-gerar PDF ({kind} #{obj.pk}): {e}")
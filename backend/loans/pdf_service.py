@@ -4,6 +4,7 @@ Loan Request PDF Generation Service
 Generates PDF documents for special loan requests that exceed the configured limits.
 """
 
+from functools import lru_cache
 from io import BytesIO
 from datetime import datetime
 from django.conf import settings
@@ -15,6 +16,57 @@ from reportlab.lib.units import cm
 from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, Image
 from reportlab.lib.enums import TA_CENTER, TA_LEFT, TA_RIGHT
 
+# Increment whenever the document layout changes, to invalidate cached PDFs
+TEMPLATE_VERSION = 1
+
+
+@lru_cache(maxsize=1)
+def _get_styles():
+    """
+    Build the stylesheet once per process instead of on every document
+    """
+    styles = getSampleStyleSheet()
+    title_style = ParagraphStyle(
+        'CustomTitle',
+        parent=styles['Heading1'],
+        fontSize=18,
+        textColor=colors.HexColor('#1e40af'),
+        spaceAfter=20,
+        alignment=TA_CENTER
+    )
+    heading_style = ParagraphStyle(
+        'CustomHeading',
+        parent=styles['Heading2'],
+        fontSize=14,
+        textColor=colors.HexColor('#1e40af'),
+        spaceAfter=12,
+        spaceBefore=12
+    )
+    return styles, title_style, heading_style
+
+
+def draw_page_header(canvas, doc):
+    """
+    Institutional header drawn at the top of every page.
+    Shared by all documents generated by the system.
+    """
+    page_width, page_height = doc.pagesize
+    canvas.saveState()
+    canvas.setFont('Helvetica-Bold', 16)
+    canvas.drawCentredString(
+        page_width / 2.0,
+        page_height - 2*cm,
+        "UNIVERSIDADE METODISTA DE ANGOLA"
+    )
+    canvas.setFont('Helvetica', 12)
+    canvas.drawCentredString(
+        page_width / 2.0,
+        page_height - 2.5*cm,
+        "Sistema de Gestão de Equipamentos - EquipaHub"
+    )
+    canvas.line(2*cm, page_height - 3*cm, page_width - 2*cm, page_height - 3*cm)
+    canvas.restoreState()
+
 
 class LoanRequestPDFGenerator:
     """
@@ -35,21 +87,7 @@ class LoanRequestPDFGenerator:
         
     def _create_header(self, canvas, doc):
         """Create header for each page"""
-        canvas.saveState()
-        canvas.setFont('Helvetica-Bold', 16)
-        canvas.drawCentredString(
-            self.page_width / 2.0,
-            self.page_height - 2*cm,
-            "UNIVERSIDADE METODISTA DE ANGOLA"
-        )
-        canvas.setFont('Helvetica', 12)
-        canvas.drawCentredString(
-            self.page_width / 2.0,
-            self.page_height - 2.5*cm,
-            "Sistema de Gestão de Equipamentos - EquipaHub"
-        )
-        canvas.line(2*cm, self.page_height - 3*cm, self.page_width - 2*cm, self.page_height - 3*cm)
-        canvas.restoreState()
+        draw_page_header(canvas, doc)
         
     def _create_footer(self, canvas, doc):
         """Create footer for each page"""
@@ -86,26 +124,7 @@ class LoanRequestPDFGenerator:
         
         # Build story (content)
         story = []
-        styles = getSampleStyleSheet()
-        
-        # Custom styles
-        title_style = ParagraphStyle(
-            'CustomTitle',
-            parent=styles['Heading1'],
-            fontSize=18,
-            textColor=colors.HexColor('#1e40af'),
-            spaceAfter=20,
-            alignment=TA_CENTER
-        )
-        
-        heading_style = ParagraphStyle(
-            'CustomHeading',
-            parent=styles['Heading2'],
-            fontSize=14,
-            textColor=colors.HexColor('#1e40af'),
-            spaceAfter=12,
-            spaceBefore=12
-        )
+        styles, title_style, heading_style = _get_styles()
         
         # Title
         story.append(Paragraph("SOLICITAÇÃO ESPECIAL DE EMPRÉSTIMO", title_style))
@@ -113,6 +132,8 @@ class LoanRequestPDFGenerator:
         
         # Request number and status
         req = self.loan_request
+        # Load the equipment list once and reuse it below
+        equipments = list(req.equipments.all())
         request_info = [
             ['Número da Solicitação:', f'#{req.id}'],
             ['Status:', req.get_status_display().upper()],
@@ -126,10 +147,10 @@ class LoanRequestPDFGenerator:
             label = ''
             if req.pacote:
                 label = f'Pacote: {req.pacote.name}'
-            elif req.equipments.exists():
-                label = ', '.join([str(eq) for eq in req.equipments.all()[:3]])
-                if req.equipments.count() > 3:
-                    label += f' (+{req.equipments.count()-3})'
+            elif equipments:
+                label = ', '.join([str(eq) for eq in equipments[:3]])
+                if len(equipments) > 3:
+                    label += f' (+{len(equipments)-3})'
             if label:
                 request_info.append(['Equipamento:', label])
         if req.devolucao_mesmo_dia:
@@ -224,7 +245,6 @@ class LoanRequestPDFGenerator:
         story.append(Spacer(1, 0.7*cm))
         
         # Equipment list (if available)
-        equipments = list(self.loan_request.equipments.all())
         if equipments:
             story.append(Paragraph("3. EQUIPAMENTOS SOLICITADOS", heading_style))
             
@@ -233,8 +253,8 @@ class LoanRequestPDFGenerator:
             for idx, eq in enumerate(equipments, 1):
                 equipment_data.append([
                     str(idx),
-                    eq.name,
-                    eq.type,
+                    eq.full_name,
+                    eq.get_type_display(),
                     eq.location or 'N/A'
                 ])
             
@@ -391,3 +411,45 @@ def generate_loan_request_pdf(loan_request):
     """
     generator = LoanRequestPDFGenerator(loan_request)
     return generator.generate()
+
+
+# Document registry: kind -> (model label, render function, template version).
+# Any document registered here can use the on-disk cache (pdf_cache) and the
+# bounded render pool (render_pool).
+DOCUMENTS = {}
+
+
+def register_document(kind, model_label, render, version=1, load=None):
+    """
+    Register a PDF document type
+
+    Args:
+        kind (str): Document identifier (e.g. 'loan_request')
+        model_label (str): 'app_label.ModelName' of the source object
+        render (callable): Receives the model instance and returns a BytesIO
+        version (int): Template version, part of the cache key
+        load (callable): Optional; receives the pk and returns the source
+            object, for documents that are not model instances
+    """
+    DOCUMENTS[kind] = {'model': model_label, 'render': render, 'version': version, 'load': load}
+
+
+def load_document_object(kind, pk):
+    from django.apps import apps
+
+    if DOCUMENTS[kind]['load'] is not None:
+        return DOCUMENTS[kind]['load'](pk)
+    return apps.get_model(DOCUMENTS[kind]['model']).objects.get(pk=pk)
+
+
+def render_document(kind, obj):
+    """
+    Render a registered document for the given instance
+
+    Returns:
+        bytes: PDF data
+    """
+    return DOCUMENTS[kind]['render'](obj).getvalue()
+
+
+register_document('loan_request', 'loans.LoanRequest', generate_loan_request_pdf, TEMPLATE_VERSION)
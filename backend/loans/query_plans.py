@@ -0,0 +1,232 @@
+"""
+Catálogo de consultas críticas para auditoria de planos de execução
+
+Cada entrada reconstrói uma consulta real do projeto (ViewSets, serviços e
+comandos) com valores de exemplo. O comando ``audit_query_plans`` corre
+``EXPLAIN QUERY PLAN`` sobre cada uma e assinala os varrimentos completos de
+tabela, para apanhar regressões de índices antes de chegarem a produção.
+Entradas com ``allow_scan`` percorrem a tabela por natureza (ex.: a
+reconciliação de status) e só são reportadas.
+"""
+
+import re
+from datetime import timedelta
+
+from django.db import connection
+from django.db.models import Count
+from django.utils import timezone
+
+_FULL_SCAN = re.compile(r'^SCAN (?:TABLE )?(\w+)$')
+_INDEX_SCAN = re.compile(r'^SCAN (?:TABLE )?(\w+) USING (?:COVERING )?INDEX')
+
+
+class CatalogueEntry:
+    """
+    Consulta do catálogo: nome, origem no código e função que a constrói
+    """
+
+    def __init__(self, name, source, build, allow_scan=False):
+        self.name = name
+        self.source = source
+        self.build = build
+        self.allow_scan = allow_scan
+
+
+def _today():
+    return timezone.now().date()
+
+
+def _catalogue():
+    from archive.models import ArchivedRecord
+    from archive.service import ArchiveService, NotificationRetention
+    from equipment.models import Equipment, Location
+    from equipment.scan_models import ScanToken
+    from notifications.models import Notification
+    from reservations.models import Reservation
+
+    from .models import Loan, LoanRequest
+    from .monthly_report import MonthlyLoanReport
+    from .work_queue import TechnicianWorkQueue
+
+    today = _today()
+    since = timezone.now() - timedelta(minutes=5)
+    report = MonthlyLoanReport(today.year, today.month)
+
+    return [
+        # Empréstimos
+        CatalogueEntry(
+            'loans.overdue', 'LoanViewSet ?overdue_only=true / check_loan_notifications',
+            lambda: Loan.objects.filter(status__in=['ativo', 'atrasado'], expected_return_date__lt=today),
+        ),
+        CatalogueEntry(
+            'loans.by_user', 'LoanViewSet.list (docente)',
+            lambda: Loan.objects.filter(user_id=1).order_by('-created_at')[:20],
+        ),
+        CatalogueEntry(
+            'loans.pending_pickup', 'auto_cancel_requests',
+            lambda: Loan.objects.filter(status='pendente'),
+        ),
+        CatalogueEntry(
+            'loans.period', 'LoanViewSet ?start_date=&end_date= / relatório mensal',
+            lambda: report.loans_started(),
+        ),
+        CatalogueEntry(
+            'loans.returns_in_month', 'MonthlyLoanReport.returns',
+            lambda: report.returns(),
+        ),
+        CatalogueEntry(
+            'loans.work_queue', 'TechnicianWorkQueue',
+            lambda: TechnicianWorkQueue(today).queryset(),
+        ),
+        CatalogueEntry(
+            'loans.export_page', 'StreamingExport (keyset)',
+            lambda: Loan.objects.filter(pk__gt=1000).order_by('pk')[:2000],
+        ),
+        # Solicitações
+        CatalogueEntry(
+            'loan_requests.pending', 'auto_cancel_requests / LoanRequestViewSet',
+            lambda: LoanRequest.objects.filter(status__in=['pendente', 'autorizado']).order_by('-created_at'),
+        ),
+        CatalogueEntry(
+            'loan_requests.by_user', 'LoanRequestViewSet.list (docente)',
+            lambda: LoanRequest.objects.filter(user_id=1).order_by('-created_at')[:20],
+        ),
+        CatalogueEntry(
+            'loan_requests.by_qrcode', 'ScanIndex (fallback)',
+            lambda: LoanRequest.objects.filter(qrcode_hash='0' * 16),
+        ),
+        CatalogueEntry(
+            'loans.archivable', 'ArchiveService (archive_closed_records)',
+            lambda: ArchiveService.pending_queryset('loan').values_list('pk', flat=True),
+        ),
+        # Reservas
+        CatalogueEntry(
+            'reservations.expiring', 'ReservationViewSet ?expiring_soon=true',
+            lambda: Reservation.objects.filter(status='ativa', expected_pickup_date__lte=today + timedelta(days=1)),
+        ),
+        CatalogueEntry(
+            'reservations.equipment_date', 'ReservationSerializer.validate',
+            lambda: Reservation.objects.filter(
+                equipment_id=1, expected_pickup_date=today, status__in=['ativa', 'confirmada']
+            ),
+        ),
+        CatalogueEntry(
+            'reservations.by_user', 'ReservationViewSet.list (docente)',
+            lambda: Reservation.objects.filter(user_id=1).order_by('-created_at')[:20],
+        ),
+        # Notificações
+        CatalogueEntry(
+            'notifications.unread', 'NotificationViewSet.mark_all_read',
+            lambda: Notification.objects.filter(user_id=1, read=False),
+        ),
+        CatalogueEntry(
+            'notifications.list', 'NotificationViewSet.list',
+            lambda: Notification.objects.filter(user_id=1).order_by('-created_at')[:20],
+        ),
+        CatalogueEntry(
+            'notifications.recent_reminder', 'LoanNotificationService._has_recent_reminder',
+            lambda: Notification.objects.filter(
+                user_id=1, title__icontains='atraso', message__contains='Empréstimo #1', created_at__gt=since
+            ),
+        ),
+        CatalogueEntry(
+            'notifications.expired', 'NotificationRetention.purge',
+            lambda: NotificationRetention.expired().values_list('pk', flat=True),
+            allow_scan=True,
+        ),
+        # Arquivo
+        CatalogueEntry(
+            'archive.history', 'ArchiveReadThroughMixin (my_loans / my_reservations)',
+            lambda: ArchivedRecord.objects.filter(kind='loan', user_id=1).order_by('-created_at')[:20],
+        ),
+        CatalogueEntry(
+            'archive.retrieve', 'ArchiveReadThroughMixin.retrieve',
+            lambda: ArchivedRecord.objects.filter(kind='loan', original_id=1),
+        ),
+        # Equipamentos
+        CatalogueEntry(
+            'equipment.available_by_type', 'EquipmentViewSet.available ?type=',
+            lambda: Equipment.objects.filter(status='disponivel', type='notebook'),
+        ),
+        CatalogueEntry(
+            'equipment.by_qrcode', 'EquipmentViewSet.by_qrcode / consulta pública',
+            lambda: Equipment.objects.filter(qrcode_hash='0' * 16),
+        ),
+        CatalogueEntry(
+            'equipment.by_serial', 'EquipmentImporter / EquipmentSerializer.validate_serial_number',
+            lambda: Equipment.objects.filter(serial_number__in=['SN-1', 'SN-2']),
+        ),
+        CatalogueEntry(
+            'equipment.changed_since', 'autocomplete / facets (verificação de versão)',
+            lambda: Equipment.objects.filter(updated_at__gt=since),
+        ),
+        CatalogueEntry(
+            'equipment.location_subtree', 'EquipmentViewSet ?location_path=',
+            lambda: Equipment.objects.filter(place__in=Location.subtree('principal/bloco-b')),
+        ),
+        CatalogueEntry(
+            'scan_tokens.resolve', 'ScanIndex.resolve',
+            lambda: ScanToken.objects.filter(token='0' * 16),
+        ),
+        CatalogueEntry(
+            'equipment.reconcile', 'EquipmentStatusReconciler.diff',
+            lambda: Equipment.objects.order_by().values_list('id', 'status'),
+            allow_scan=True,
+        ),
+        CatalogueEntry(
+            'equipment.stats', 'EquipmentViewSet.stats',
+            lambda: Equipment.objects.order_by().values('status').annotate(count=Count('id')),
+            allow_scan=True,
+        ),
+    ]
+
+
+def explain(queryset):
+    """
+    Retorna as linhas de detalhe do EXPLAIN QUERY PLAN da consulta
+    """
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+        return [row[-1] for row in cursor.fetchall()]
+
+
+def analyse(plan):
+    """
+    Classifica o plano: (tabelas percorridas por completo, tabelas percorridas
+    por índice, usa ordenação temporária?)
+    """
+    full_scans, index_scans = [], []
+    for detail in plan:
+        match = _FULL_SCAN.match(detail)
+        if match:
+            full_scans.append(match.group(1))
+            continue
+        match = _INDEX_SCAN.match(detail)
+        if match:
+            index_scans.append(match.group(1))
+    temp_sort = any('USE TEMP B-TREE' in detail for detail in plan)
+    return full_scans, index_scans, temp_sort
+
+
+def audit(only=None):
+    """
+    Corre o catálogo e retorna uma lista de dicionários com o resultado de cada entrada
+    """
+    results = []
+    for entry in _catalogue():
+        if only and not any(entry.name.startswith(prefix) for prefix in only):
+            continue
+        plan = explain(entry.build())
+        full_scans, index_scans, temp_sort = analyse(plan)
+        results.append({
+            'name': entry.name,
+            'source': entry.source,
+            'plan': plan,
+            'full_scans': full_scans,
+            'index_scans': index_scans,
+            'temp_sort': temp_sort,
+            'allow_scan': entry.allow_scan,
+            'flagged': bool(full_scans) and not entry.allow_scan,
+        })
+    return results
@@ -0,0 +1,201 @@
+"""
+Pool limitado de processos para gerar PDFs
+
+A geração com reportlab é intensiva em CPU. Em vez de correr na thread do
+pedido, cada documento é gerado num processo do pool, com um limite de
+concorrência (``PDF_RENDER_WORKERS``) e de fila (``PDF_RENDER_MAX_QUEUE``).
+O pedido espera no máximo ``PDF_RENDER_TIMEOUT`` segundos; se o pool estiver
+cheio ou o tempo esgotar, a view responde 202 e o cliente volta a pedir mais
+tarde (o trabalho em curso continua e o resultado fica na cache em disco).
+
+Os processos trabalhadores arrancam com ``spawn`` e fazem o seu próprio
+``django.setup()``, sem herdar ligações à base de dados. O pool é criado
+por processo do servidor, pelo que o limite total é workers × processos.
+"""
+
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FuturesTimeout
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+from multiprocessing import get_context
+from pathlib import Path
+
+from django.conf import settings
+
+from . import pdf_cache
+
+
+class PoolSaturated(Exception):
+    """O pool atingiu o limite de trabalhos em curso e em fila"""
+
+
+def _init_worker(settings_module):
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', settings_module)
+    import django
+    django.setup()
+
+
+def _render_job(kind, pk):
+    """
+    Executado no processo trabalhador: carrega o objeto, grava o PDF na
+    cache e retorna (caminho, segundos de geração)
+    """
+    from .pdf_service import load_document_object
+
+    started = time.monotonic()
+    obj = load_document_object(kind, pk)
+    path, _ = pdf_cache.get_or_render(obj, kind)
+    return str(path), time.monotonic() - started
+
+
+class PDFRenderPool:
+    """
+    Submete e acompanha a geração de PDFs no pool de processos
+    """
+
+    _executor = None
+    _lock = threading.RLock()
+    _inflight = {}
+    _stats = {
+        'submitted': 0,
+        'rendered': 0,
+        'failed': 0,
+        'rejected': 0,
+        'timeouts': 0,
+        'cache_hits': 0,
+        'render_seconds_total': 0.0,
+        'render_seconds_max': 0.0,
+        'render_seconds_last': None,
+        'wait_seconds_max': 0.0,
+    }
+
+    @staticmethod
+    def max_workers():
+        return getattr(settings, 'PDF_RENDER_WORKERS', 2)
+
+    @staticmethod
+    def max_queue():
+        return getattr(settings, 'PDF_RENDER_MAX_QUEUE', 8)
+
+    @staticmethod
+    def timeout():
+        return getattr(settings, 'PDF_RENDER_TIMEOUT', 10)
+
+    @classmethod
+    def _get_executor(cls):
+        if cls._executor is None:
+            cls._executor = ProcessPoolExecutor(
+                max_workers=cls.max_workers(),
+                mp_context=get_context('spawn'),
+                initializer=_init_worker,
+                initargs=(os.environ.get('DJANGO_SETTINGS_MODULE', 'equipahub.settings'),),
+            )
+        return cls._executor
+
+    @classmethod
+    def _reset_executor(cls):
+        with cls._lock:
+            executor, cls._executor = cls._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    @classmethod
+    def _done(cls, key, submitted_at, future):
+        with cls._lock:
+            cls._inflight.pop(key, None)
+            try:
+                _, seconds = future.result()
+            except BrokenProcessPool as e:
+                cls._stats['failed'] += 1
+                print(f"Erro no pool de PDFs (processo terminou inesperadamente): {e}")
+                broken = True
+            except Exception as e:
+                cls._stats['failed'] += 1
+                print(f"Erro ao gerar PDF: {e}")
+                broken = False
+            else:
+                broken = False
+                stats = cls._stats
+                stats['rendered'] += 1
+                stats['render_seconds_total'] += seconds
+                stats['render_seconds_max'] = max(stats['render_seconds_max'], seconds)
+                stats['render_seconds_last'] = round(seconds, 3)
+                waited = time.monotonic() - submitted_at - seconds
+                stats['wait_seconds_max'] = max(stats['wait_seconds_max'], waited)
+        if broken:
+            cls._reset_executor()
+
+    @classmethod
+    def submit(cls, obj, kind=pdf_cache.DEFAULT_KIND):
+        """
+        Agenda a geração do PDF e retorna o Future. Pedidos repetidos para a
+        mesma versão do documento partilham o mesmo trabalho.
+        Levanta PoolSaturated quando o limite de trabalhos foi atingido.
+        """
+        key = pdf_cache.cache_key(obj, kind)
+        with cls._lock:
+            future = cls._inflight.get(key)
+            if future is not None:
+                return future
+            if len(cls._inflight) >= cls.max_workers() + cls.max_queue():
+                cls._stats['rejected'] += 1
+                raise PoolSaturated()
+
+            submitted_at = time.monotonic()
+            future = cls._get_executor().submit(_render_job, kind, obj.pk)
+            cls._stats['submitted'] += 1
+            cls._inflight[key] = future
+        future.add_done_callback(partial(cls._done, key, submitted_at))
+        return future
+
+    @classmethod
+    def render(cls, obj, kind=pdf_cache.DEFAULT_KIND, timeout=None):
+        """
+        Retorna o caminho do PDF, esperando no máximo ``timeout`` segundos.
+        Retorna None se a geração ainda não terminou (o trabalho continua).
+        Com PDF_RENDER_WORKERS = 0 o PDF é gerado na própria thread.
+        """
+        path = pdf_cache.cached(obj, kind)
+        if path is not None:
+            with cls._lock:
+                cls._stats['cache_hits'] += 1
+            return path
+
+        if cls.max_workers() <= 0:
+            return pdf_cache.get_or_render(obj, kind)[0]
+
+        future = cls.submit(obj, kind)
+        try:
+            path, _ = future.result(timeout=cls.timeout() if timeout is None else timeout)
+        except FuturesTimeout:
+            with cls._lock:
+                cls._stats['timeouts'] += 1
+            return None
+        return Path(path)
+
+    @classmethod
+    def metrics(cls):
+        """
+        Profundidade da fila, trabalhos em curso e tempos de geração
+        """
+        with cls._lock:
+            inflight = list(cls._inflight.values())
+            stats = dict(cls._stats)
+        running = sum(1 for future in inflight if future.running())
+        rendered = stats['rendered']
+        stats['render_seconds_avg'] = round(stats['render_seconds_total'] / rendered, 3) if rendered else None
+        stats['render_seconds_total'] = round(stats['render_seconds_total'], 3)
+        stats['render_seconds_max'] = round(stats['render_seconds_max'], 3)
+        stats['wait_seconds_max'] = round(stats['wait_seconds_max'], 3)
+        return {
+            'pid': os.getpid(),
+            'workers': cls.max_workers(),
+            'max_queue': cls.max_queue(),
+            'timeout': cls.timeout(),
+            'in_flight': len(inflight),
+            'running': running,
+            'queue_depth': len(inflight) - running,
+            **stats,
+        }
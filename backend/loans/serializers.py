@@ -91,7 +91,7 @@ class LoanListSerializer(serializers.ModelSerializer):
     class Meta:
         model = Loan
         fields = [
-            'id', 'user_name', 'equipment_name', 'start_date', 'start_time',
+            'id', 'user_name', 'equipment_name', 'item_count', 'start_date', 'start_time',
             'expected_return_date', 'expected_return_time', 'status', 'is_overdue', 'days_overdue',
             'confirmado_levantamento', 'confirmado_tecnico', 'confirmado_utente',
             'devolucao_mesmo_dia', 'data_prevista_devolucao',
@@ -159,6 +159,31 @@ class LoanStatsSerializer(serializers.Serializer):
     most_borrowed_equipment = serializers.ListField()
 
 
+class ScanLoanRequestSerializer(serializers.ModelSerializer):
+    """
+    Serializer compacto de LoanRequest para a resposta de leitura de QR Code
+    """
+    user_name = serializers.ReadOnlyField()
+    tecnico_name = serializers.ReadOnlyField()
+    equipments_detail = EquipmentSummarySerializer(source='equipments', many=True, read_only=True)
+    pacote_detail = serializers.SerializerMethodField()
+
+    class Meta:
+        model = LoanRequest
+        fields = [
+            'id', 'status', 'quantity', 'purpose',
+            'expected_return_date', 'expected_return_time', 'devolucao_mesmo_dia',
+            'motivo_decisao', 'confirmado_pelo_tecnico', 'confirmado_pelo_utente',
+            'qrcode_hash', 'created_at',
+            'user_name', 'tecnico_name', 'equipments_detail', 'pacote_detail',
+        ]
+
+    def get_pacote_detail(self, obj):
+        if not obj.pacote_id:
+            return None
+        return {'id': obj.pacote_id, 'name': obj.pacote.name}
+
+
 class LoanRequestSerializer(serializers.ModelSerializer):
     """
     Serializer completo para o modelo LoanRequest
@@ -260,7 +285,7 @@ class LoanRequestListSerializer(serializers.ModelSerializer):
     class Meta:
         model = LoanRequest
         fields = [
-            'id', 'user_name', 'purpose', 'expected_return_date',
+            'id', 'user_name', 'item_label', 'item_count', 'purpose', 'expected_return_date',
             'status', 'tecnico_name', 'aprovador_name',
             'confirmado_pelo_tecnico', 'confirmado_pelo_utente', 'confirmacao_completa',
             'qrcode_hash', 'devolucao_mesmo_dia', 'created_at'
@@ -325,3 +350,45 @@ class LoanCancelSerializer(serializers.Serializer):
     Serializer para cancelamento
     """
     motivo = serializers.CharField(required=False, allow_blank=True)
+
+
+class LoanBulkActionSerializer(serializers.Serializer):
+    """
+    Serializer base para operações em lote (ids de empréstimo e/ou hashes de QR Code)
+    """
+    ids = serializers.ListField(child=serializers.IntegerField(), required=False, default=list)
+    qrcode_hashes = serializers.ListField(child=serializers.CharField(), required=False, default=list)
+
+    def validate(self, data):
+        from .bulk_service import LoanBulkService
+
+        total = len(data.get('ids', [])) + len(data.get('qrcode_hashes', []))
+        if total == 0:
+            raise serializers.ValidationError('Informe pelo menos um id de empréstimo ou hash de QR Code.')
+        if total > LoanBulkService.MAX_ITEMS:
+            raise serializers.ValidationError(
+                f'Máximo de {LoanBulkService.MAX_ITEMS} itens por operação em lote.'
+            )
+        return data
+
+
+class LoanBulkConfirmTecnicoSerializer(LoanBulkActionSerializer):
+    """
+    Serializer para confirmação técnica em lote
+    """
+    notes = serializers.CharField(required=False, allow_blank=True)
+
+
+class LoanBulkReturnSerializer(LoanBulkActionSerializer):
+    """
+    Serializer para devolução em lote
+    """
+    return_date = serializers.DateField(required=False)
+    notes = serializers.CharField(required=False, allow_blank=True)
+
+
+class LoanBulkCancelSerializer(LoanBulkActionSerializer):
+    """
+    Serializer para cancelamento em lote
+    """
+    motivo = serializers.CharField(required=False, allow_blank=True)
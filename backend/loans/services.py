@@ -11,11 +11,11 @@ class LoanNotificationService:
     """
     
     @staticmethod
-    def create_notification(user, notification_type: str, title: str, message: str, action_required: bool = False):
+    def build_notification(user, notification_type: str, title: str, message: str, action_required: bool = False):
         """
-        Cria uma nova notificação para um usuário
+        Monta uma notificação sem gravar (para uso com bulk_create)
         """
-        return Notification.objects.create(
+        return Notification(
             user=user,
             type=notification_type,
             title=title,
@@ -23,6 +23,15 @@ class LoanNotificationService:
             action_required=action_required
         )
     
+    @classmethod
+    def create_notification(cls, user, notification_type: str, title: str, message: str, action_required: bool = False):
+        """
+        Cria uma nova notificação para um usuário
+        """
+        notification = cls.build_notification(user, notification_type, title, message, action_required)
+        notification.save()
+        return notification
+    
     @classmethod
     def check_upcoming_returns(cls, hours_before: int = 2) -> int:
         """
@@ -226,6 +235,15 @@ Lembre-se de devolver o equipamento no prazo.
         """
         Envia notificação quando empréstimo é devolvido
         """
+        notification = cls.build_loan_returned_notification(loan)
+        notification.save()
+        return notification
+    
+    @classmethod
+    def build_loan_returned_notification(cls, loan: Loan) -> Notification:
+        """
+        Monta (sem gravar) a notificação de devolução
+        """
         equipment_name = loan.equipment_name
         return_date = loan.actual_return_date.strftime('%d/%m/%Y') if loan.actual_return_date else 'Hoje'
         
@@ -238,7 +256,7 @@ Data de devolução: {return_date}
 Obrigado por devolver no prazo!
         """.strip()
         
-        cls.create_notification(
+        return cls.build_notification(
             user=loan.user,
             notification_type='success',
             title=title,
@@ -248,6 +266,15 @@ Obrigado por devolver no prazo!
     
     @classmethod
     def send_pickup_confirmed_notification(cls, loan: Loan):
+        notification = cls.build_pickup_confirmed_notification(loan)
+        notification.save()
+        return notification
+
+    @classmethod
+    def build_pickup_confirmed_notification(cls, loan: Loan) -> Notification:
+        """
+        Monta (sem gravar) a notificação de levantamento confirmado
+        """
         equipment_name = loan.equipment_name
         tecnico_name = loan.tecnico_entrega.name if loan.tecnico_entrega else 'Técnico'
         return_datetime = cls._get_loan_return_datetime(loan)
@@ -264,7 +291,7 @@ O técnico {tecnico_name} confirmou que você levantou o equipamento.
 Lembre-se de devolvê-lo no prazo estabelecido.
         """.strip()
 
-        cls.create_notification(
+        return cls.build_notification(
             user=loan.user,
             notification_type='info',
             title=title,
@@ -1,3 +1,531 @@
-from django.test import TestCase
+import io
+import shutil
+import tempfile
+from datetime import timedelta
+from unittest.mock import patch
 
-# Create your tests here.
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from accounts.models import User
+from equipment.models import Equipment
+from reservations.bulk_service import ReservationBulkService
+from reservations.models import Reservation
+
+from . import pdf_cache, query_plans
+from .bulk_service import LoanBulkService
+from .export_service import StreamingExport, filter_created_range
+from .models import Loan, LoanRequest
+from .monthly_report import MonthlyLoanReport
+from .pdf_service import DOCUMENTS
+from .render_pool import PDFRenderPool, PoolSaturated
+from .work_queue import TechnicianWorkQueue
+
+LABEL_TABLES = ('"loans"', '"loan_requests"', '"reservations"')
+
+
+def _label_queries(captured):
+    """UPDATEs dos textos de apresentação (o índice de pesquisa tem os seus próprios signals)"""
+    return [
+        query['sql'] for query in captured.captured_queries
+        if query['sql'].startswith(tuple(f'UPDATE {table}' for table in LABEL_TABLES))
+    ]
+
+
+class DisplayLabelSignalTests(TestCase):
+    """
+    Textos de apresentação: só há UPDATE quando o texto muda
+    """
+
+    def setUp(self):
+        self.user = User.objects.create(email='utente@x.com', username='utente@x.com', name='Utente', role='docente')
+        self.equipment = Equipment.objects.create(brand='HP', model='X', type='notebook', serial_number='SN1')
+        today = timezone.now().date()
+        self.loan = Loan.objects.create(
+            user=self.user, equipment=self.equipment, start_date=today,
+            expected_return_date=today + timedelta(days=7), purpose='Aula',
+        )
+
+    def test_equipment_save_without_label_change_skips_label_updates(self):
+        equipment = Equipment.objects.get(pk=self.equipment.pk)
+        equipment.status = 'manutencao'
+        with CaptureQueriesContext(connection) as captured:
+            equipment.save()
+        self.assertEqual(_label_queries(captured), [])
+
+    def test_user_save_without_rename_skips_label_updates(self):
+        user = User.objects.get(pk=self.user.pk)
+        user.department = 'Informática'
+        with CaptureQueriesContext(connection) as captured:
+            user.save()
+        self.assertEqual(_label_queries(captured), [])
+
+    def test_user_rename_updates_labels_once_per_table(self):
+        user = User.objects.get(pk=self.user.pk)
+        user.name = 'Novo Nome'
+        with CaptureQueriesContext(connection) as captured:
+            user.save()
+        self.assertEqual(len(_label_queries(captured)), 3)
+        self.assertEqual(Loan.objects.get(pk=self.loan.pk).user_label, 'Novo Nome')
+
+        # Um segundo save com o mesmo nome já não toca nas tabelas
+        with CaptureQueriesContext(connection) as captured:
+            user.save()
+        self.assertEqual(_label_queries(captured), [])
+
+    def test_equipment_rename_updates_item_label(self):
+        equipment = Equipment.objects.get(pk=self.equipment.pk)
+        equipment.model = 'Y'
+        equipment.save(update_fields=['model'])
+        self.assertEqual(Loan.objects.get(pk=self.loan.pk).item_label, str(equipment))
+
+
+class BulkConversionLabelTests(TestCase):
+    """
+    Empréstimos criados em lote a partir de reservas levam os textos de apresentação
+    """
+
+    def test_converted_loans_have_display_labels(self):
+        user = User.objects.create(email='utente@x.com', username='utente@x.com', name='Utente', role='docente')
+        equipment = Equipment.objects.create(brand='HP', model='X', type='notebook', serial_number='SN1')
+        today = timezone.now().date()
+        reservation = Reservation.objects.create(
+            user=user, equipment=equipment, expected_pickup_date=today, purpose='Aula',
+        )
+
+        result = ReservationBulkService.convert_to_loans(today + timedelta(days=7), ids=[reservation.pk])
+
+        self.assertEqual(result['succeeded'], 1)
+        loan = Loan.objects.get(pk=result['results'][0]['loan_id'])
+        self.assertEqual(loan.user_label, 'Utente')
+        self.assertEqual(loan.item_label, str(equipment))
+        self.assertEqual(loan.item_count, 1)
+
+
+class MonthlyReportViewTests(TestCase):
+    """
+    Relatório mensal: validação do mês e geração no pool de PDFs
+    """
+
+    url = '/api/v1/loans/monthly_report/'
+
+    def setUp(self):
+        self.admin = User.objects.create(email='admin@x.com', username='admin@x.com', name='Admin', role='admin')
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def test_parse_month_rejects_years_out_of_range(self):
+        for value in ('0000-05', '1999-12', '2101-01', '2024-13', '2024'):
+            with self.assertRaises(ValueError):
+                MonthlyLoanReport.parse_month(value)
+        self.assertEqual(MonthlyLoanReport.parse_month('2024-05'), (2024, 5))
+
+    def test_invalid_year_returns_400(self):
+        response = self.client.get(self.url, {'month': '0000-05'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_saturated_pool_returns_202(self):
+        with patch.object(PDFRenderPool, 'render', side_effect=PoolSaturated()):
+            response = self.client.get(self.url, {'month': '2024-05'})
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response['Retry-After'], '5')
+
+    def test_cache_key_changes_when_a_loan_is_deleted(self):
+        user = User.objects.create(email='utente@x.com', username='utente@x.com', name='Utente', role='docente')
+        equipment = Equipment.objects.create(brand='HP', model='X', type='notebook', serial_number='SN1')
+        today = timezone.now().date()
+        loans = [
+            Loan.objects.create(
+                user=user, equipment=equipment, start_date=today,
+                expected_return_date=today + timedelta(days=7), purpose='Aula',
+            )
+            for _ in range(2)
+        ]
+        # O mais antigo é removido: o maior updated_at do mês não muda
+        Loan.objects.filter(pk=loans[0].pk).update(updated_at=timezone.now() - timedelta(days=1))
+
+        before = pdf_cache.cache_key(MonthlyLoanReport(today.year, today.month), 'monthly_report')
+        Loan.objects.filter(pk=loans[0].pk).delete()
+        after = pdf_cache.cache_key(MonthlyLoanReport(today.year, today.month), 'monthly_report')
+
+        self.assertNotEqual(before, after)
+
+    def test_report_is_rendered_through_pool(self):
+        with patch.object(PDFRenderPool, 'render', return_value=None) as render:
+            response = self.client.get(self.url, {'month': '2024-05'})
+        self.assertEqual(response.status_code, 202)
+        report, kind = render.call_args[0]
+        self.assertEqual((report.pk, kind), ('2024-05', 'monthly_report'))
+
+
+class WorkQueueViewTests(TestCase):
+    """
+    Fila de trabalho do técnico: cursor do polling incremental
+    """
+
+    url = '/api/v1/loans/work_queue/'
+
+    def setUp(self):
+        self.tecnico = User.objects.create(email='tec@x.com', username='tec@x.com', name='Tec', role='tecnico')
+        self.user = User.objects.create(email='utente@x.com', username='utente@x.com', name='Utente', role='docente')
+        self.client = APIClient()
+        self.client.force_authenticate(self.tecnico)
+        self.today = timezone.now().date()
+
+    def _loan(self, serial, **kwargs):
+        equipment = Equipment.objects.create(brand='HP', model='X', type='notebook', serial_number=serial)
+        fields = {
+            'start_date': self.today, 'expected_return_date': self.today + timedelta(days=7),
+            'status': 'pendente', **kwargs,
+        }
+        return Loan.objects.create(user=self.user, equipment=equipment, purpose='Aula', **fields)
+
+    def test_truncated_poll_resumes_after_last_delivered_item(self):
+        loans = [self._loan(f'SN{n}') for n in range(3)]
+        cursor = self.client.get(self.url).data['cursor']
+        # Mesmo instante de alteração: o desempate é feito por (tipo, id)
+        Loan.objects.update(updated_at=timezone.now() + timedelta(seconds=1))
+
+        first = self.client.get(self.url, {'since': cursor, 'limit': 2}).data
+        self.assertTrue(first['truncated'])
+        second = self.client.get(self.url, {'since': first['cursor'], 'limit': 2}).data
+        self.assertFalse(second['truncated'])
+
+        delivered = [item['item_id'] for item in first['items'] + second['items']]
+        self.assertEqual(delivered, [loan.pk for loan in loans])
+
+    def test_truncated_full_snapshot_has_no_cursor(self):
+        for n in range(3):
+            self._loan(f'SN{n}')
+        data = self.client.get(self.url, {'limit': 2}).data
+        self.assertTrue(data['truncated'])
+        self.assertIsNone(data['cursor'])
+        self.assertEqual(len(data['items']), 2)
+
+    def test_incremental_poll_skips_unchanged_items(self):
+        loan = self._loan('SN1', status='ativo', expected_return_date=self.today)
+        cursor = self.client.get(self.url).data['cursor']
+
+        data = self.client.get(self.url, {'since': cursor}).data
+        self.assertTrue(data['incremental'])
+        self.assertEqual(data['items'], [])
+
+        Loan.objects.filter(pk=loan.pk).update(status='concluido', updated_at=timezone.now() + timedelta(seconds=1))
+        data = self.client.get(self.url, {'since': cursor}).data
+        self.assertEqual(data['resolved'], [{'kind': 'loan', 'item_id': loan.pk}])
+
+    def test_cursor_from_previous_day_returns_full_queue(self):
+        yesterday = timezone.now() - timedelta(days=1)
+        # Devolução prevista para hoje, sem alterações desde ontem
+        loan = self._loan('SN1', status='ativo', expected_return_date=self.today)
+        Loan.objects.filter(pk=loan.pk).update(updated_at=yesterday - timedelta(hours=1))
+
+        data = self.client.get(self.url, {'since': yesterday.isoformat()}).data
+
+        self.assertFalse(data['incremental'])
+        self.assertNotIn('resolved', data)
+        self.assertEqual(
+            [(item['item_id'], item['urgency']) for item in data['items']],
+            [(loan.pk, TechnicianWorkQueue.URGENCY_DUE_TODAY)],
+        )
+
+    def test_work_queue_is_restricted_to_staff(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        self.assertEqual(client.get(self.url).status_code, 403)
+
+    def test_invalid_cursor_returns_400(self):
+        for cursor in ('ontem', '2024-05-01T10:00:00|loan|x'):
+            self.assertEqual(self.client.get(self.url, {'since': cursor}).status_code, 400)
+
+
+class LoanBulkServiceTests(TestCase):
+    """
+    Operações em lote do balcão: transições de estado e resultado item a item
+    """
+
+    def setUp(self):
+        self.tecnico = User.objects.create(email='tec@x.com', username='tec@x.com', name='Tec', role='tecnico')
+        self.user = User.objects.create(email='utente@x.com', username='utente@x.com', name='Utente', role='docente')
+        self.today = timezone.now().date()
+
+    def _loan(self, serial, **kwargs):
+        equipment = Equipment.objects.create(brand='HP', model='X', type='notebook', serial_number=serial)
+        fields = {
+            'start_date': self.today, 'expected_return_date': self.today + timedelta(days=7),
+            'status': 'pendente', **kwargs,
+        }
+        return Loan.objects.create(user=self.user, equipment=equipment, purpose='Aula', **fields)
+
+    def test_technician_confirmation_activates_only_loans_confirmed_by_the_user(self):
+        waiting = self._loan('SN1')
+        ready = self._loan('SN2', confirmado_utente=True)
+        late = self._loan(
+            'SN3', confirmado_utente=True,
+            start_date=self.today - timedelta(days=7), expected_return_date=self.today - timedelta(days=1),
+        )
+
+        result = LoanBulkService.confirmar_tecnico(
+            self.tecnico, ids=[waiting.pk, ready.pk], qrcode_hashes=[late.equipment.qrcode_hash], notes='Balcão',
+        )
+
+        self.assertEqual((result['succeeded'], result['failed']), (3, 0))
+        self.assertEqual(sorted(result['activated']), [ready.pk, late.pk])
+        statuses = dict(Loan.objects.values_list('pk', 'status'))
+        self.assertEqual(statuses, {waiting.pk: 'pendente', ready.pk: 'ativo', late.pk: 'atrasado'})
+        self.assertEqual(Equipment.objects.get(pk=ready.equipment_id).status, 'emprestado')
+        self.assertEqual(Equipment.objects.get(pk=waiting.equipment_id).status, 'disponivel')
+        self.assertEqual(Loan.objects.get(pk=waiting.pk).notes, 'Confirmação técnica: Balcão')
+
+    def test_ineligible_and_unknown_items_fail_individually(self):
+        confirmed = self._loan('SN1', confirmado_tecnico=True)
+        active = self._loan('SN2', status='ativo')
+
+        result = LoanBulkService.confirmar_tecnico(self.tecnico, ids=[confirmed.pk, active.pk, 999999])
+
+        self.assertEqual((result['succeeded'], result['failed']), (0, 3))
+        self.assertEqual(
+            [item['error'] for item in result['results']],
+            [
+                'O técnico já confirmou este levantamento.',
+                'Este empréstimo não está pendente.',
+                'Empréstimo não encontrado.',
+            ],
+        )
+
+    def test_return_closes_loans_and_frees_equipment(self):
+        active = self._loan('SN1', status='ativo')
+        pending = self._loan('SN2')
+        Equipment.objects.filter(pk=active.equipment_id).update(status='emprestado')
+
+        result = LoanBulkService.return_equipment(self.tecnico, ids=[active.pk, pending.pk])
+
+        self.assertEqual((result['succeeded'], result['failed']), (1, 1))
+        active.refresh_from_db()
+        self.assertEqual((active.status, active.actual_return_date), ('concluido', self.today))
+        self.assertEqual(Equipment.objects.get(pk=active.equipment_id).status, 'disponivel')
+        self.assertEqual(Loan.objects.get(pk=pending.pk).status, 'pendente')
+
+    def test_user_returns_only_own_loans(self):
+        other = User.objects.create(email='outro@x.com', username='outro@x.com', name='Outro', role='docente')
+        loan = self._loan('SN1', status='ativo')
+
+        result = LoanBulkService.return_equipment(other, ids=[loan.pk])
+
+        self.assertEqual(result['results'][0]['error'], 'Você só pode devolver seus próprios empréstimos.')
+        self.assertEqual(Loan.objects.get(pk=loan.pk).status, 'ativo')
+
+    def test_cancel_appends_reason_and_skips_non_pending(self):
+        pending = self._loan('SN1', notes='Pedido urgente')
+        active = self._loan('SN2', status='ativo')
+
+        result = LoanBulkService.cancelar(self.user, ids=[pending.pk, pending.pk, active.pk], motivo='Aula adiada')
+
+        self.assertEqual([item['success'] for item in result['results']], [True, False])
+        pending.refresh_from_db()
+        self.assertEqual(pending.status, 'cancelado')
+        self.assertEqual(pending.notes, 'Pedido urgente\n\nCancelado: Aula adiada')
+        self.assertEqual(Loan.objects.get(pk=active.pk).status, 'ativo')
+
+    def test_bulk_endpoint_checks_role(self):
+        loan = self._loan('SN1')
+        client = APIClient()
+        client.force_authenticate(self.user)
+        response = client.post('/api/v1/loans/bulk_confirmar_tecnico/', {'ids': [loan.pk]}, format='json')
+        self.assertEqual(response.status_code, 403)
+
+        client.force_authenticate(self.tecnico)
+        response = client.post('/api/v1/loans/bulk_confirmar_tecnico/', {'ids': [loan.pk]}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['succeeded'], 1)
+
+
+class LoanRequestPDFCacheTests(TestCase):
+    """
+    Cache em disco dos PDFs: a chave muda com a solicitação e com o template
+    """
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        override = override_settings(LOAN_REQUEST_PDF_CACHE_DIR=directory)
+        override.enable()
+        self.addCleanup(override.disable)
+        user = User.objects.create(email='utente@x.com', username='utente@x.com', name='Utente', role='docente')
+        self.loan_request = LoanRequest.objects.create(
+            user=user, quantity=6, purpose='Aula', expected_return_date=timezone.now().date(),
+        )
+
+    def test_key_changes_with_updated_at_and_template_version(self):
+        key = pdf_cache.cache_key(self.loan_request)
+        self.assertEqual(pdf_cache.cache_key(LoanRequest.objects.get(pk=self.loan_request.pk)), key)
+
+        with patch.dict(DOCUMENTS['loan_request'], version=DOCUMENTS['loan_request']['version'] + 1):
+            self.assertNotEqual(pdf_cache.cache_key(self.loan_request), key)
+
+        self.loan_request.purpose = 'Exame'
+        self.loan_request.save()
+        self.assertNotEqual(pdf_cache.cache_key(self.loan_request), key)
+
+    @patch('loans.pdf_cache.render_document', return_value=b'%PDF-1.4')
+    def test_pdf_is_rendered_once_per_version(self, render):
+        path, rendered = pdf_cache.get_or_render(self.loan_request)
+        self.assertTrue(rendered)
+        self.assertEqual(pdf_cache.get_or_render(self.loan_request), (path, False))
+        self.assertEqual(render.call_count, 1)
+
+        self.loan_request.purpose = 'Exame'
+        self.loan_request.save()
+        new_path, rendered = pdf_cache.get_or_render(self.loan_request)
+
+        # A versão anterior é apagada quando a nova é gravada
+        self.assertTrue(rendered)
+        self.assertEqual(list(new_path.parent.glob('*.pdf')), [new_path])
+        self.assertEqual(new_path.read_bytes(), b'%PDF-1.4')
+
+
+class LoanRequestPDFDownloadTests(TestCase):
+    """
+    Transferência do PDF pelo pool limitado, com 202 quando não está pronto
+    """
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        override = override_settings(LOAN_REQUEST_PDF_CACHE_DIR=directory)
+        override.enable()
+        self.addCleanup(override.disable)
+        coordenador = User.objects.create(email='coord@x.com', username='coord@x.com', name='Coord', role='coordenador')
+        self.loan_request = LoanRequest.objects.create(
+            user=coordenador, quantity=6, purpose='Aula', expected_return_date=timezone.now().date(),
+        )
+        self.url = f'/api/v1/loan-requests/{self.loan_request.pk}/download_pdf/'
+        self.client = APIClient()
+        self.client.force_authenticate(coordenador)
+
+    def test_saturated_pool_returns_202(self):
+        with patch.object(PDFRenderPool, 'render', side_effect=PoolSaturated()):
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response['Retry-After'], '5')
+
+    def test_render_timeout_returns_202(self):
+        with patch.object(PDFRenderPool, 'render', return_value=None):
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response['Retry-After'], '2')
+
+    @override_settings(PDF_RENDER_WORKERS=0)
+    @patch('loans.pdf_cache.render_document', return_value=b'%PDF-1.4')
+    def test_rendered_pdf_is_revalidated_with_etag(self, render):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), b'%PDF-1.4')
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(render.call_count, 1)
+
+    @override_settings(PDF_RENDER_WORKERS=1, PDF_RENDER_MAX_QUEUE=0)
+    def test_pool_rejects_jobs_past_the_limit(self):
+        with patch.dict(PDFRenderPool._inflight, {'outro-documento': object()}, clear=True):
+            with self.assertRaises(PoolSaturated):
+                PDFRenderPool.submit(self.loan_request)
+
+
+class StreamingExportTests(TestCase):
+    """
+    Exportação em blocos paginados pela chave primária
+    """
+
+    def setUp(self):
+        self.user = User.objects.create(email='utente@x.com', username='utente@x.com', name='Utente', role='docente')
+        self.equipment = Equipment.objects.create(brand='HP', model='X', type='notebook', serial_number='SN1')
+        today = timezone.now().date()
+        self.loans = [
+            Loan.objects.create(
+                user=self.user, equipment=self.equipment, start_date=today,
+                expected_return_date=today + timedelta(days=7), purpose=f'Aula {n}',
+            )
+            for n in range(5)
+        ]
+
+    def _lines(self, export):
+        return ''.join(export.lines()).lstrip('\ufeff').splitlines()
+
+    def test_chunks_cover_every_row_once_in_pk_order(self):
+        export = StreamingExport(Loan.objects.all(), [('id', 'id'), ('utente', 'user__name')])
+        with patch.object(StreamingExport, 'CHUNK_SIZE', 2), CaptureQueriesContext(connection) as captured:
+            lines = self._lines(export)
+
+        self.assertEqual(lines[0], 'id,utente')
+        self.assertEqual(lines[1:], [f'{loan.pk},Utente' for loan in self.loans])
+        # Três blocos (2 + 2 + 1), cada um uma consulta a partir do último id
+        self.assertEqual(len(captured.captured_queries), 3)
+
+    def test_jsonl_rows(self):
+        export = StreamingExport(Loan.objects.filter(pk=self.loans[0].pk), [('id', 'id'), ('finalidade', 'purpose')],
+                                 fmt='jsonl')
+        self.assertEqual(self._lines(export), [f'{{"id": {self.loans[0].pk}, "finalidade": "Aula 0"}}'])
+
+    def test_unknown_format_is_rejected(self):
+        with self.assertRaises(ValueError):
+            StreamingExport(Loan.objects.all(), [('id', 'id')], fmt='xlsx')
+
+    def test_created_range_filters_by_creation_date(self):
+        Loan.objects.filter(pk=self.loans[0].pk).update(created_at=timezone.now() - timedelta(days=30))
+        since = (timezone.localdate() - timedelta(days=1)).isoformat()
+
+        queryset = filter_created_range(Loan.objects.all(), {'created_from': since})
+
+        self.assertEqual(sorted(queryset.values_list('pk', flat=True)), [loan.pk for loan in self.loans[1:]])
+        with self.assertRaises(ValueError):
+            filter_created_range(Loan.objects.all(), {'created_to': '31/12/2024'})
+
+    def test_export_endpoint_streams_filtered_rows(self):
+        coordenador = User.objects.create(email='coord@x.com', username='coord@x.com', name='Coord', role='coordenador')
+        client = APIClient()
+        client.force_authenticate(coordenador)
+
+        response = client.get('/api/v1/loans/export/', {'fmt': 'jsonl', 'include_archived': 'false'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], StreamingExport.FORMATS['jsonl'])
+        rows = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(rows), 5)
+        self.assertEqual(client.get('/api/v1/loans/export/', {'fmt': 'xlsx'}).status_code, 400)
+
+
+class QueryPlanAuditTests(TestCase):
+    """
+    Catálogo de consultas críticas: nenhuma percorre uma tabela inteira
+    """
+
+    def test_catalogue_uses_indexes(self):
+        flagged = {result['name']: result['plan'] for result in query_plans.audit() if result['flagged']}
+        self.assertEqual(flagged, {})
+
+    def test_plan_details_are_classified(self):
+        plan = [
+            'SCAN loans',
+            'SCAN equipment USING COVERING INDEX equipment_status_type_idx',
+            'SEARCH users USING INTEGER PRIMARY KEY (rowid=?)',
+            'USE TEMP B-TREE FOR ORDER BY',
+        ]
+        self.assertEqual(query_plans.analyse(plan), (['loans'], ['equipment'], True))
+        self.assertEqual(query_plans.analyse(['SEARCH loans USING INDEX loan_user_created_idx (user_id=?)']),
+                         ([], [], False))
+
+    def test_command_fails_on_flagged_scans(self):
+        result = {
+            'name': 'loans.exemplo', 'source': 'teste', 'plan': ['SCAN loans'], 'full_scans': ['loans'],
+            'index_scans': [], 'temp_sort': False, 'allow_scan': False, 'flagged': True,
+        }
+        with patch('loans.management.commands.audit_query_plans.audit', return_value=[result]):
+            with self.assertRaises(CommandError):
+                call_command('audit_query_plans', stdout=io.StringIO())
+            call_command('audit_query_plans', '--no-fail', stdout=io.StringIO())
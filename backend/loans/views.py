@@ -2,33 +2,57 @@ from django.shortcuts import render
 from rest_framework import viewsets, status, permissions
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from django.db.models import Q, Count
+from collections import Counter
+from django.db.models import Q, Count, TextField
+from django.db.models.fields.json import KT
+from django.db.models.functions import Cast
 from django.utils import timezone
 from datetime import datetime, timedelta
 from django_filters.rest_framework import DjangoFilterBackend
-from rest_framework.filters import SearchFilter, OrderingFilter
+from rest_framework.filters import OrderingFilter
+from search.filters import FullTextSearchFilter
+from archive.history import ArchiveReadThroughMixin
+from equipment.models import Equipment
 from .models import Loan
 from .serializers import (
     LoanSerializer, LoanListSerializer, LoanReturnSerializer,
     LoanStatsSerializer, LoanConfirmPickupSerializer,
     LoanConfirmTecnicoSerializer, LoanConfirmUtenteSerializer,
-    LoanCancelSerializer
+    LoanCancelSerializer, LoanBulkConfirmTecnicoSerializer,
+    LoanBulkReturnSerializer, LoanBulkCancelSerializer
 )
 from .services import LoanNotificationService
+from .bulk_service import LoanBulkService
+from .work_queue import TechnicianWorkQueue
+from .monthly_report import MonthlyLoanReport
+from .export_service import StreamingExport, LOAN_COLUMNS, filter_created_range
+from .render_pool import PDFRenderPool, PoolSaturated
+from . import pdf_cache
+from django.http import FileResponse, HttpResponseNotModified
 
 
-class LoanViewSet(viewsets.ModelViewSet):
+class LoanViewSet(ArchiveReadThroughMixin, viewsets.ModelViewSet):
     """
     ViewSet para gerenciamento de empréstimos
     """
     queryset = Loan.objects.select_related('user', 'equipment').all()
     serializer_class = LoanSerializer
     permission_classes = [permissions.IsAuthenticated]
-    filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
+    filter_backends = [DjangoFilterBackend, OrderingFilter, FullTextSearchFilter]
     filterset_fields = ['status', 'user', 'equipment', 'equipment__type']
     search_fields = ['user__name', 'equipment__brand', 'equipment__model', 'purpose']
+    search_kind = 'loan'
     ordering_fields = ['start_date', 'expected_return_date', 'created_at']
     ordering = ['-created_at']
+    archive_kind = 'loan'
+    archive_filters = {
+        **ArchiveReadThroughMixin.archive_filters,
+        'equipment': 'data__equipment_id',
+        'start_date': 'data__start_date__gte',
+        'end_date': 'data__start_date__lte',
+        # Encerrados nunca estão em atraso
+        'overdue_only': lambda records, value: records.none() if value.lower() == 'true' else records,
+    }
     
     def get_serializer_class(self):
         if self.action == 'list':
@@ -41,13 +65,23 @@ class LoanViewSet(viewsets.ModelViewSet):
             return LoanConfirmUtenteSerializer
         elif self.action == 'cancelar':
             return LoanCancelSerializer
+        elif self.action == 'bulk_confirmar_tecnico':
+            return LoanBulkConfirmTecnicoSerializer
+        elif self.action == 'bulk_return':
+            return LoanBulkReturnSerializer
+        elif self.action == 'bulk_cancelar':
+            return LoanBulkCancelSerializer
         return LoanSerializer
     
     def get_queryset(self):
         """
         Filtra empréstimos baseado nos parâmetros de consulta e permissões
         """
-        queryset = Loan.objects.select_related('user', 'equipment').all()
+        if self.action == 'list':
+            # A listagem usa apenas os textos de apresentação: sem joins
+            queryset = Loan.objects.all()
+        else:
+            queryset = Loan.objects.select_related('user', 'equipment').all()
         
         # Apenas técnico e coordenador veem todos. Demais (docente, secretário) veem apenas os próprios
         if self.request.user.role not in ['tecnico', 'coordenador']:
@@ -225,38 +259,68 @@ class LoanViewSet(viewsets.ModelViewSet):
         Retorna estatísticas dos empréstimos
         """
         queryset = self.get_queryset()
+        # Os arquivados contam para o histórico (mesmos filtros do get_queryset)
+        archived = self.archived_matching({
+            param: request.query_params.get(param) for param in ('overdue_only', 'start_date', 'end_date')
+        })
         
         # Estatísticas básicas
-        total_loans = queryset.count()
         stats_by_status = queryset.values('status').annotate(count=Count('id'))
         
         # Organiza as estatísticas
-        status_counts = {item['status']: item['count'] for item in stats_by_status}
+        status_counts = Counter({item['status']: item['count'] for item in stats_by_status})
+        status_counts.update(archived.status_counts())
+        total_loans = sum(status_counts.values())
         
         # Estatísticas por período
         now = timezone.now().date()
         start_of_month = now.replace(day=1)
         start_of_week = now - timedelta(days=now.weekday())
+        archived_start = archived.alias(start=Cast(KT('data__start_date'), TextField()))
         
-        loans_this_month = queryset.filter(start_date__gte=start_of_month).count()
-        loans_this_week = queryset.filter(start_date__gte=start_of_week).count()
+        loans_this_month = (
+            queryset.filter(start_date__gte=start_of_month).count()
+            + archived_start.filter(start__gte=start_of_month.isoformat()).count()
+        )
+        loans_this_week = (
+            queryset.filter(start_date__gte=start_of_week).count()
+            + archived_start.filter(start__gte=start_of_week.isoformat()).count()
+        )
         
         # Top usuários (apenas para coordenadores e secretários)
         top_borrowers = []
         most_borrowed_equipment = []
         
         if request.user.role in ['coordenador', 'secretario']:
-            top_borrowers = list(
-                queryset.values('user__name')
-                .annotate(loan_count=Count('id'))
-                .order_by('-loan_count')[:5]
-            )
+            borrowers = Counter({
+                item['user__name']: item['loan_count']
+                for item in queryset.values('user__name').annotate(loan_count=Count('id'))
+            })
+            borrowers.update({
+                item['user__name']: item['loan_count']
+                for item in archived.values('user__name').annotate(loan_count=Count('id'))
+            })
+            top_borrowers = [
+                {'user__name': name, 'loan_count': count} for name, count in borrowers.most_common(5)
+            ]
             
-            most_borrowed_equipment = list(
-                queryset.values('equipment__brand', 'equipment__model')
-                .annotate(loan_count=Count('id'))
-                .order_by('-loan_count')[:5]
-            )
+            equipment = Counter({
+                (item['equipment__brand'], item['equipment__model']): item['loan_count']
+                for item in queryset.values('equipment__brand', 'equipment__model').annotate(loan_count=Count('id'))
+            })
+            archived_equipment = {
+                int(equipment_id): count
+                for equipment_id, count in archived.annotate(equipment_id=KT('data__equipment_id'))
+                .values('equipment_id').annotate(loan_count=Count('id'))
+                .values_list('equipment_id', 'loan_count')
+                if equipment_id is not None
+            }
+            for item in Equipment.objects.filter(pk__in=archived_equipment).values('pk', 'brand', 'model'):
+                equipment[(item['brand'], item['model'])] += archived_equipment[item['pk']]
+            most_borrowed_equipment = [
+                {'equipment__brand': brand, 'equipment__model': model, 'loan_count': count}
+                for (brand, model), count in equipment.most_common(5)
+            ]
         
         stats_data = {
             'total_loans': total_loans,
@@ -273,20 +337,120 @@ class LoanViewSet(viewsets.ModelViewSet):
         serializer = LoanStatsSerializer(stats_data)
         return Response(serializer.data)
     
+    @action(detail=False, methods=['get'])
+    def work_queue(self, request):
+        """
+        Fila de trabalho do técnico: atrasos, devoluções de hoje e levantamentos
+        por confirmar, ordenados por urgência.
+        Suporta polling incremental com ?since=<cursor da resposta anterior>;
+        com "truncated" na resposta, há mais itens a pedir com o novo cursor.
+        Um cursor de um dia anterior devolve a fila completa ("incremental": false).
+        """
+        # A fila mostra empréstimos e solicitações de todos os utentes
+        if request.user.role not in ['admin', 'tecnico', 'coordenador']:
+            return Response(
+                {'error': 'Apenas técnicos, coordenadores ou admin têm fila de trabalho.'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+
+        since = request.query_params.get('since')
+        if since:
+            try:
+                since = TechnicianWorkQueue.parse_cursor(since)
+            except ValueError:
+                return Response(
+                    {'error': 'Cursor inválido. Use o valor "cursor" da resposta anterior.'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+        try:
+            limit = int(request.query_params.get('limit', 200))
+        except ValueError:
+            limit = 200
+
+        return Response(TechnicianWorkQueue().snapshot(since=since or None, limit=max(1, min(limit, 1000))))
+    
+    @action(detail=False, methods=['get'])
+    def monthly_report(self, request):
+        """
+        Relatório mensal de atividade em PDF (?month=AAAA-MM, padrão: mês atual)
+        """
+        if request.user.role not in ['admin', 'coordenador']:
+            return Response(
+                {'error': 'Apenas coordenadores ou admin podem gerar o relatório mensal.'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+
+        month = request.query_params.get('month')
+        if month:
+            try:
+                year, month = MonthlyLoanReport.parse_month(month)
+            except ValueError:
+                return Response({'error': 'month deve estar no formato AAAA-MM, com um ano válido.'},
+                                status=status.HTTP_400_BAD_REQUEST)
+        else:
+            today = timezone.now().date()
+            year, month = today.year, today.month
+
+        # Gerado no pool de processos e servido da cache em disco, como os PDFs das solicitações
+        report = MonthlyLoanReport(year, month)
+        key = pdf_cache.cache_key(report, 'monthly_report')
+        etag = f'"{key}"'
+        if request.META.get('HTTP_IF_NONE_MATCH') == etag:
+            response = HttpResponseNotModified()
+            response['ETag'] = etag
+            return response
+
+        try:
+            path = PDFRenderPool.render(report, 'monthly_report')
+        except PoolSaturated:
+            return Response(
+                {'status': 'busy', 'message': 'Geração de PDFs ocupada. Tente novamente dentro de instantes.'},
+                status=status.HTTP_202_ACCEPTED,
+                headers={'Retry-After': '5'}
+            )
+        if path is None:
+            return Response(
+                {'status': 'rendering', 'message': 'O relatório está a ser gerado. Tente novamente dentro de instantes.'},
+                status=status.HTTP_202_ACCEPTED,
+                headers={'Retry-After': '2'}
+            )
+
+        response = FileResponse(
+            open(path, 'rb'),
+            content_type='application/pdf',
+            as_attachment=True,
+            filename=f'relatorio_emprestimos_{year}-{month:02d}.pdf'
+        )
+        response['ETag'] = etag
+        response['Cache-Control'] = 'private, no-cache'
+        return response
+    
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """
+        Exportação completa para auditoria em streaming (?fmt=csv|jsonl), incluindo
+        os arquivados (?include_archived=false exporta apenas os ativos).
+        Aceita os mesmos filtros da listagem e ?created_from / ?created_to.
+        """
+        try:
+            queryset = filter_created_range(self.filter_queryset(self.get_queryset()), request.query_params)
+            archived = filter_created_range(self.archived_matching(request.query_params), request.query_params)
+            export = StreamingExport(queryset, LOAN_COLUMNS, fmt=request.query_params.get('fmt', 'csv'),
+                                     archived=archived)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return export.response('emprestimos')
+    
     @action(detail=False, methods=['get'])
     def my_loans(self, request):
         """
-        Lista empréstimos do usuário autenticado
+        Lista empréstimos do usuário autenticado, incluindo os arquivados
+        (?include_archived=false lista apenas os ativos)
         """
         my_loans = self.get_queryset().filter(user=request.user)
-        
-        page = self.paginate_queryset(my_loans)
-        if page is not None:
-            serializer = LoanListSerializer(page, many=True)
-            return self.get_paginated_response(serializer.data)
-        
-        serializer = LoanListSerializer(my_loans, many=True)
-        return Response(serializer.data)
+        archived = self.archived_records().filter(user=request.user)
+        return self.history_response(my_loans, LoanListSerializer, archived)
     
     @action(detail=True, methods=['post'])
     def confirmar_levantamento(self, request, pk=None):
@@ -432,3 +596,72 @@ class LoanViewSet(viewsets.ModelViewSet):
             )
 
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    @action(detail=False, methods=['post'])
+    def bulk_confirmar_tecnico(self, request):
+        """
+        Confirmação técnica de vários levantamentos numa única chamada.
+        Aceita ids de empréstimo e/ou hashes de QR Code dos equipamentos.
+        """
+        if request.user.role not in ['tecnico', 'secretario', 'coordenador']:
+            return Response(
+                {'error': 'Apenas técnicos, secretários ou coordenadores podem confirmar como técnico.'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+
+        serializer = LoanBulkConfirmTecnicoSerializer(data=request.data)
+        if serializer.is_valid():
+            result = LoanBulkService.confirmar_tecnico(
+                request.user,
+                queryset=self.get_queryset(),
+                ids=serializer.validated_data['ids'],
+                qrcode_hashes=serializer.validated_data['qrcode_hashes'],
+                notes=serializer.validated_data.get('notes', ''),
+            )
+            result['message'] = (
+                f"{result['succeeded']} confirmação(ões) registada(s), "
+                f"{len(result['activated'])} empréstimo(s) ativado(s)."
+            )
+            return Response(result, status=status.HTTP_200_OK)
+
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    @action(detail=False, methods=['post'])
+    def bulk_return(self, request):
+        """
+        Devolução de vários empréstimos numa única chamada.
+        Aceita ids de empréstimo e/ou hashes de QR Code dos equipamentos.
+        """
+        serializer = LoanBulkReturnSerializer(data=request.data)
+        if serializer.is_valid():
+            result = LoanBulkService.return_equipment(
+                request.user,
+                queryset=self.get_queryset(),
+                ids=serializer.validated_data['ids'],
+                qrcode_hashes=serializer.validated_data['qrcode_hashes'],
+                return_date=serializer.validated_data.get('return_date'),
+                notes=serializer.validated_data.get('notes', ''),
+            )
+            result['message'] = f"{result['succeeded']} empréstimo(s) devolvido(s)."
+            return Response(result, status=status.HTTP_200_OK)
+
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    @action(detail=False, methods=['post'])
+    def bulk_cancelar(self, request):
+        """
+        Cancelamento de vários empréstimos pendentes numa única chamada.
+        """
+        serializer = LoanBulkCancelSerializer(data=request.data)
+        if serializer.is_valid():
+            result = LoanBulkService.cancelar(
+                request.user,
+                queryset=self.get_queryset(),
+                ids=serializer.validated_data['ids'],
+                qrcode_hashes=serializer.validated_data['qrcode_hashes'],
+                motivo=serializer.validated_data.get('motivo', ''),
+            )
+            result['message'] = f"{result['succeeded']} empréstimo(s) cancelado(s)."
+            return Response(result, status=status.HTTP_200_OK)
+
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
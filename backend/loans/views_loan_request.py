@@ -14,12 +14,19 @@ from .serializers import (
     LoanRequestCancelSerializer
 )
 from notifications.models import Notification
+from archive.history import ArchiveReadThroughMixin
 from .services import LoanNotificationService
-from .pdf_service import generate_loan_request_pdf
-from django.http import HttpResponse
+from . import pdf_cache
+from .render_pool import PDFRenderPool, PoolSaturated
+from .export_service import (
+    StreamingExport, LOAN_REQUEST_COLUMNS, add_request_equipments, add_archived_request_equipments,
+    filter_created_range
+)
+from django.db import transaction
+from django.http import FileResponse, HttpResponseNotModified
 
 
-class LoanRequestViewSet(viewsets.ModelViewSet):
+class LoanRequestViewSet(ArchiveReadThroughMixin, viewsets.ModelViewSet):
     """
     ViewSet para gerenciamento de solicitações de empréstimo
     """
@@ -33,6 +40,12 @@ class LoanRequestViewSet(viewsets.ModelViewSet):
     search_fields = ['user__name', 'purpose']
     ordering_fields = ['created_at', 'expected_return_date']
     ordering = ['-created_at']
+    archive_kind = 'loan_request'
+    archive_all_roles = ['admin', 'coordenador', 'tecnico']
+    archive_filters = {
+        **ArchiveReadThroughMixin.archive_filters,
+        'tecnico_responsavel': 'data__tecnico_responsavel_id',
+    }
     
     def get_serializer_class(self):
         if self.action == 'list':
@@ -49,9 +62,13 @@ class LoanRequestViewSet(viewsets.ModelViewSet):
         """
         Filtra solicitações baseado nas permissões do usuário
         """
-        queryset = LoanRequest.objects.select_related(
-            'user', 'tecnico_responsavel', 'aprovado_por'
-        ).prefetch_related('equipments').all()
+        if self.action == 'list':
+            # Utente e itens vêm dos textos de apresentação
+            queryset = LoanRequest.objects.select_related('tecnico_responsavel', 'aprovado_por').all()
+        else:
+            queryset = LoanRequest.objects.select_related(
+                'user', 'tecnico_responsavel', 'aprovado_por'
+            ).prefetch_related('equipments').all()
         
         user = self.request.user
         
@@ -88,6 +105,8 @@ class LoanRequestViewSet(viewsets.ModelViewSet):
                 self._send_new_request_notification(loan_request)
             except Exception as e:
                 print(f"Erro ao enviar notificação: {e}")
+
+        transaction.on_commit(lambda: pdf_cache.prerender(loan_request))
     
     def perform_update(self, serializer):
         """
@@ -191,6 +210,8 @@ class LoanRequestViewSet(viewsets.ModelViewSet):
                 self._send_approval_notification(loan_request)
             except Exception as e:
                 print(f"Erro ao enviar notificação de aprovação: {e}")
+
+            transaction.on_commit(lambda: pdf_cache.prerender(loan_request))
             
             return Response(
                 {
@@ -422,6 +443,23 @@ class LoanRequestViewSet(viewsets.ModelViewSet):
             'skipped': skipped,
         }, status=status.HTTP_200_OK)
     
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """
+        Exportação completa para auditoria em streaming (?fmt=csv|jsonl), incluindo
+        os arquivados (?include_archived=false exporta apenas os ativos).
+        Aceita os mesmos filtros da listagem e ?created_from / ?created_to.
+        """
+        try:
+            queryset = filter_created_range(self.filter_queryset(self.get_queryset()), request.query_params)
+            archived = filter_created_range(self.archived_matching(request.query_params), request.query_params)
+            export = StreamingExport(queryset, LOAN_REQUEST_COLUMNS, fmt=request.query_params.get('fmt', 'csv'),
+                                     extra=add_request_equipments, archived=archived,
+                                     archived_extra=add_archived_request_equipments)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return export.response('solicitacoes')
+    
     @action(detail=True, methods=['get'])
     def download_pdf(self, request, pk=None):
         """
@@ -437,13 +475,36 @@ class LoanRequestViewSet(viewsets.ModelViewSet):
             )
         
         try:
-            # Generate PDF
-            pdf_buffer = generate_loan_request_pdf(loan_request)
-            
-            # Create HTTP response with PDF
-            response = HttpResponse(pdf_buffer.read(), content_type='application/pdf')
-            response['Content-Disposition'] = f'attachment; filename="solicitacao_{loan_request.id}.pdf"'
-            
+            # Served from the on-disk cache; rendered in the bounded pool only when the request changed
+            etag = f'"{pdf_cache.cache_key(loan_request)}"'
+            if request.META.get('HTTP_IF_NONE_MATCH') == etag:
+                response = HttpResponseNotModified()
+                response['ETag'] = etag
+                return response
+
+            try:
+                path = PDFRenderPool.render(loan_request)
+            except PoolSaturated:
+                return Response(
+                    {'status': 'busy', 'message': 'PDF generation is busy. Try again shortly.'},
+                    status=status.HTTP_202_ACCEPTED,
+                    headers={'Retry-After': '5'}
+                )
+            if path is None:
+                return Response(
+                    {'status': 'rendering', 'message': 'PDF is being generated. Try again shortly.'},
+                    status=status.HTTP_202_ACCEPTED,
+                    headers={'Retry-After': '2'}
+                )
+
+            response = FileResponse(
+                open(path, 'rb'),
+                content_type='application/pdf',
+                as_attachment=True,
+                filename=f'solicitacao_{loan_request.id}.pdf'
+            )
+            response['ETag'] = etag
+            response['Cache-Control'] = 'private, no-cache'
             return response
             
         except Exception as e:
@@ -452,6 +513,15 @@ class LoanRequestViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
     
+    @action(detail=False, methods=['get'])
+    def pdf_metrics(self, request):
+        """
+        Métricas do pool de geração de PDFs deste processo
+        """
+        if request.user.role not in ['admin', 'tecnico']:
+            return Response({'error': 'Sem permissão.'}, status=status.HTTP_403_FORBIDDEN)
+        return Response(PDFRenderPool.metrics())
+    
     def _send_new_request_notification(self, loan_request):
         """
         Envia notificação para coordenadores sobre nova solicitação
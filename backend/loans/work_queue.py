@@ -0,0 +1,221 @@
+"""
+Fila de trabalho do técnico
+
+Junta numa única lista, ordenada por urgência, tudo o que o balcão precisa de
+tratar: empréstimos em atraso, devoluções previstas para hoje e levantamentos
+que aguardam a confirmação técnica (empréstimos e solicitações autorizadas).
+Cada origem é uma consulta estreita (apenas as colunas usadas pelo balcão)
+e as consultas são combinadas com UNION ALL numa só ida à base de dados.
+
+O polling incremental devolve os itens alterados depois do cursor por ordem
+de (alteração, tipo, id). Se a resposta for truncada por ``limit``, o cursor
+é o último item entregue e ``truncated`` indica que há mais a pedir; uma
+fila completa truncada não tem cursor (o próximo pedido é outra fila completa).
+
+Os atrasos e as devoluções de hoje dependem da data, não só das alterações:
+quando o dia muda, um empréstimo passa de "hoje" a "atrasado" sem que o
+registo mude. Um cursor de um dia anterior dá por isso uma fila completa
+(``incremental: false``), que o cliente usa para substituir a lista.
+"""
+
+from datetime import timezone as dt_timezone
+
+from django.db.models import Q, F, Value, CharField, IntegerField, TimeField
+from django.db.models.functions import Coalesce, Concat, TruncDate
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import Loan, LoanRequest
+
+
+class TechnicianWorkQueue:
+    """
+    Monta a fila de trabalho e suporta polling incremental por cursor
+    """
+
+    URGENCY_OVERDUE = 0
+    URGENCY_DUE_TODAY = 1
+    URGENCY_PICKUP = 2
+
+    def __init__(self, today=None):
+        self.today = today or timezone.now().date()
+
+    def _overdue_q(self):
+        return Q(status__in=['ativo', 'atrasado'], expected_return_date__lt=self.today)
+
+    def _due_today_q(self):
+        return Q(status__in=['ativo', 'atrasado'], expected_return_date=self.today)
+
+    @staticmethod
+    def _loan_pickup_q():
+        return Q(status='pendente', confirmado_tecnico=False)
+
+    @staticmethod
+    def _request_pickup_q():
+        return Q(status='autorizado', confirmado_pelo_tecnico=False)
+
+    @staticmethod
+    def _loan_rows(queryset, kind, urgency, due_date, due_time):
+        return queryset.order_by().annotate(
+            kind=Value(kind, output_field=CharField()),
+            urgency=Value(urgency, output_field=IntegerField()),
+            item_id=F('id'),
+            person=F('user__name'),
+            label=Coalesce(
+                Concat('equipment__brand', Value(' '), 'equipment__model', output_field=CharField()),
+                'pacote__name',
+                Value('—'),
+                output_field=CharField(),
+            ),
+            qrcode=F('equipment__qrcode_hash'),
+            due_date=due_date,
+            due_time=due_time,
+            changed_at=F('updated_at'),
+        ).values(
+            'kind', 'urgency', 'item_id', 'person', 'label', 'qrcode',
+            'due_date', 'due_time', 'changed_at',
+        )
+
+    def _request_rows(self, queryset):
+        return queryset.order_by().annotate(
+            kind=Value('loan_request', output_field=CharField()),
+            urgency=Value(self.URGENCY_PICKUP, output_field=IntegerField()),
+            item_id=F('id'),
+            person=F('user__name'),
+            label=Coalesce('pacote__name', Value('—'), output_field=CharField()),
+            qrcode=F('qrcode_hash'),
+            due_date=TruncDate('created_at'),
+            due_time=Value(None, output_field=TimeField()),
+            changed_at=F('updated_at'),
+        ).values(
+            'kind', 'urgency', 'item_id', 'person', 'label', 'qrcode',
+            'due_date', 'due_time', 'changed_at',
+        )
+
+    @staticmethod
+    def parse_cursor(value):
+        """
+        Converte o cursor de uma resposta anterior em (instante, tipo, id);
+        tipo e id só existem nos cursores de respostas truncadas.
+        Levanta ValueError se o cursor for inválido.
+        """
+        stamp, _, rest = value.partition('|')
+        since = parse_datetime(stamp.strip())
+        if since is None:
+            raise ValueError(value)
+        if timezone.is_naive(since):
+            since = timezone.make_aware(since)
+        if not rest:
+            return since, None, None
+        kind, _, item_id = rest.partition('|')
+        if not item_id.isdigit():
+            raise ValueError(value)
+        return since, kind, int(item_id)
+
+    @staticmethod
+    def format_cursor(item):
+        return f"{item['changed_at'].isoformat()}|{item['kind']}|{item['item_id']}"
+
+    @staticmethod
+    def _after(kind, cursor):
+        """Registos de ``kind`` com (updated_at, kind, id) depois do cursor"""
+        since, last_kind, last_id = cursor
+        q = Q(updated_at__gt=since)
+        if last_kind is not None:
+            if kind > last_kind:
+                q |= Q(updated_at=since)
+            elif kind == last_kind:
+                q |= Q(updated_at=since, id__gt=last_id)
+        return q
+
+    def queryset(self, since=None):
+        """
+        Consulta UNION ALL com os itens da fila ordenados por urgência.
+        Com ``since`` (cursor já convertido por ``parse_cursor``), apenas os
+        itens alterados depois do cursor, por ordem de alteração.
+        """
+        loans = Loan.objects.all()
+        requests = LoanRequest.objects.all()
+        if since is not None:
+            loans = loans.filter(self._after('loan', since))
+            requests = requests.filter(self._after('loan_request', since))
+
+        union = self._loan_rows(
+            loans.filter(self._overdue_q()), 'loan', self.URGENCY_OVERDUE,
+            F('expected_return_date'), F('expected_return_time'),
+        ).union(
+            self._loan_rows(
+                loans.filter(self._due_today_q()), 'loan', self.URGENCY_DUE_TODAY,
+                F('expected_return_date'), F('expected_return_time'),
+            ),
+            self._loan_rows(
+                loans.filter(self._loan_pickup_q()), 'loan', self.URGENCY_PICKUP,
+                F('start_date'), F('start_time'),
+            ),
+            self._request_rows(requests.filter(self._request_pickup_q())),
+            all=True,
+        )
+        if since is not None:
+            return union.order_by('changed_at', 'kind', 'item_id')
+        return union.order_by('urgency', 'due_date', 'item_id')
+
+    def items(self, since=None, limit=None):
+        """
+        Retorna os itens da fila (por urgência, ou por alteração com ``since``)
+        """
+        union = self.queryset(since=since)
+        if limit:
+            union = union[:limit]
+        return list(union)
+
+    def resolved(self, since):
+        """
+        Itens alterados desde ``since`` que já saíram da fila
+        (confirmados, devolvidos ou cancelados), para o cliente os remover.
+        """
+        queue_loans = self._overdue_q() | self._due_today_q() | self._loan_pickup_q()
+        loan_ids = (
+            Loan.objects.filter(updated_at__gte=since)
+            .exclude(queue_loans)
+            .order_by()
+            .values_list('id', flat=True)
+        )
+        request_ids = (
+            LoanRequest.objects.filter(updated_at__gte=since)
+            .exclude(self._request_pickup_q())
+            .order_by()
+            .values_list('id', flat=True)
+        )
+        return (
+            [{'kind': 'loan', 'item_id': pk} for pk in loan_ids]
+            + [{'kind': 'loan_request', 'item_id': pk} for pk in request_ids]
+        )
+
+    def snapshot(self, since=None, limit=None):
+        """
+        Resposta completa do endpoint: itens, removidos e o próximo cursor.
+        ``since`` é o cursor anterior, já convertido por ``parse_cursor``.
+        """
+        # Capturado antes das consultas: uma alteração concorrente volta a ser
+        # entregue no pedido seguinte em vez de se perder
+        now = timezone.now()
+        if since is not None and since[0].astimezone(dt_timezone.utc).date() < self.today:
+            since = None
+        items = self.items(since=since, limit=limit)
+        truncated = bool(limit) and len(items) >= limit
+        if not truncated:
+            cursor = now.isoformat()
+        elif since is not None:
+            cursor = self.format_cursor(items[-1])
+        else:
+            cursor = None
+        data = {
+            'cursor': cursor,
+            'incremental': since is not None,
+            'truncated': truncated,
+            'items': items,
+        }
+        if since is not None:
+            # Remoções são idempotentes: repetidas nas páginas seguintes
+            data['resolved'] = self.resolved(since[0])
+        return data
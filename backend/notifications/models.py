@@ -1,4 +1,6 @@
 from django.db import models
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
 from django.conf import settings
 
 
@@ -12,9 +14,12 @@ class Notification(models.Model):
     ]
 
     id = models.AutoField(primary_key=True)
+    # Sem restrição na BD: as notificações podem estar noutra base de dados
+    # (ver equipahub/db_router.py); a remoção em cascata é feita por signal
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
-        on_delete=models.CASCADE,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
         related_name='notifications'
     )
     type = models.CharField(max_length=20, choices=TYPE_CHOICES, default='info')
@@ -27,8 +32,14 @@ class Notification(models.Model):
     class Meta:
         db_table = 'notifications'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', 'read', 'created_at'], name='notification_user_read_idx'),
+        ]
 
     def __str__(self) -> str:
         return f"[{self.type}] {self.title} -> {self.user_id}"
 
 
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL, dispatch_uid='notifications_user_cascade')
+def delete_user_notifications(sender, instance, **kwargs):
+    Notification.objects.filter(user_id=instance.pk).delete()
@@ -1,15 +1,16 @@
 from django.contrib import admin
+from equipahub.pagination import EstimatedCountAdminMixin
 from django.utils import timezone
 from .models import Reservation
 
 
 @admin.register(Reservation)
-class ReservationAdmin(admin.ModelAdmin):
+class ReservationAdmin(EstimatedCountAdminMixin, admin.ModelAdmin):
     """
     Configuração do admin para o modelo Reservation
     """
     list_display = [
-        'equipment', 'user', 'reservation_date', 'expected_pickup_date',
+        'equipment_name', 'user_name', 'reservation_date', 'expected_pickup_date',
         'status', 'is_expired', 'days_until_pickup', 'created_at'
     ]
     list_filter = [
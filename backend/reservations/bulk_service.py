@@ -0,0 +1,236 @@
+"""
+Operações de reservas em lote
+
+Confirmação e conversão em empréstimos (usadas no início de cada período
+letivo, quando dezenas de reservas para o mesmo dia são processadas de uma
+só vez) e a expiração periódica de reservas não levantadas.
+"""
+
+import time
+
+from django.db import connections, router, transaction
+from django.db.models import Exists, OuterRef, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from equipment.models import Equipment
+from loans.models import Loan
+from search.index import SearchIndex
+from .models import Reservation
+
+
+class ReservationBulkService:
+    """
+    Confirma reservas e converte-as em empréstimos com escritas por conjunto
+    """
+
+    CONVERTIBLE_STATUSES = ['ativa', 'confirmada']
+    OPEN_LOAN_STATUSES = Loan.HOLDING_STATUSES
+
+    @staticmethod
+    def _select(queryset, ids=None, pickup_date=None):
+        queryset = Reservation.objects.all() if queryset is None else queryset
+        if ids:
+            queryset = queryset.filter(id__in=ids)
+        if pickup_date:
+            queryset = queryset.filter(expected_pickup_date=pickup_date)
+        return queryset
+
+    @staticmethod
+    def _missing(ids, found_ids):
+        return [
+            {'id': ref, 'success': False, 'error': 'Reserva não encontrada.'}
+            for ref in dict.fromkeys(ids or []) if ref not in found_ids
+        ]
+
+    @classmethod
+    def confirm(cls, queryset=None, ids=None, pickup_date=None):
+        """
+        Confirma todas as reservas ativas do conjunto com um único UPDATE
+        """
+        selected = list(
+            cls._select(queryset, ids, pickup_date).values_list('id', 'status')
+        )
+        confirmable = [pk for pk, status in selected if status == 'ativa']
+        results = []
+        for pk, status in selected:
+            item = {'id': pk, 'success': status == 'ativa'}
+            if status != 'ativa':
+                item['error'] = 'Apenas reservas ativas podem ser confirmadas.'
+            results.append(item)
+        results += cls._missing(ids, {pk for pk, _ in selected})
+
+        if confirmable:
+            now = timezone.now()
+            Reservation.objects.filter(id__in=confirmable, status='ativa').update(
+                status='confirmada', confirmed_at=now, updated_at=now
+            )
+
+        return {
+            'succeeded': len(confirmable),
+            'failed': len(results) - len(confirmable),
+            'results': results,
+        }
+
+    @classmethod
+    def convert_to_loans(cls, expected_return_date, queryset=None, ids=None,
+                         pickup_date=None, start_date=None, dry_run=False):
+        """
+        Converte as reservas do conjunto em empréstimos pendentes.
+
+        Os conflitos (reserva já processada, equipamento indisponível, com
+        empréstimo em aberto ou repetido no lote) são reportados juntos e não
+        impedem a conversão das restantes.
+        """
+        start_date = start_date or timezone.now().date()
+        # Leitura, verificações e escrita na mesma transação, com as reservas
+        # (e os equipamentos) bloqueados: dois pedidos concorrentes não
+        # convertem a mesma reserva nem entregam o mesmo equipamento
+        with transaction.atomic():
+            reservations = list(
+                cls._select(queryset, ids, pickup_date)
+                .select_related('equipment', 'user')
+                .select_for_update()
+                .order_by('expected_pickup_date', 'created_at')
+            )
+
+            equipment_ids = {r.equipment_id for r in reservations}
+            busy_equipment = set(
+                Loan.objects.filter(
+                    equipment_id__in=equipment_ids, status__in=cls.OPEN_LOAN_STATUSES
+                ).values_list('equipment_id', flat=True)
+            )
+
+            to_convert = []
+            results = []
+            claimed = set()
+            for reservation in reservations:
+                item = {'id': reservation.id, 'equipment_id': reservation.equipment_id, 'success': False}
+                equipment = reservation.equipment
+                if reservation.status not in cls.CONVERTIBLE_STATUSES:
+                    item['error'] = 'Apenas reservas ativas ou confirmadas podem ser convertidas em empréstimos.'
+                elif start_date < reservation.expected_pickup_date:
+                    item['error'] = 'Data de início não pode ser anterior à data prevista de retirada da reserva.'
+                elif equipment.status not in ['disponivel', 'reservado']:
+                    item['error'] = f'Equipamento não está disponível. Status atual: {equipment.get_status_display()}'
+                elif reservation.equipment_id in busy_equipment:
+                    item['error'] = 'Equipamento já tem um empréstimo em aberto.'
+                elif reservation.equipment_id in claimed:
+                    item['error'] = 'Equipamento repetido no lote.'
+                else:
+                    item['success'] = True
+                    claimed.add(reservation.equipment_id)
+                    to_convert.append(reservation)
+                results.append(item)
+            results += cls._missing(ids, {r.id for r in reservations})
+
+            if to_convert and not dry_run:
+                now = timezone.now()
+                reservation_ids = [r.id for r in to_convert]
+                # O critério repete-se no UPDATE; confirmed_at de reservas já confirmadas é mantido
+                updated = Reservation.objects.filter(
+                    id__in=reservation_ids, status__in=cls.CONVERTIBLE_STATUSES
+                ).update(status='confirmada', confirmed_at=Coalesce('confirmed_at', Value(now)), updated_at=now)
+                if updated != len(reservation_ids):
+                    # Alguma reserva mudou entre a leitura e a escrita (base sem bloqueio de linhas)
+                    transaction.set_rollback(True)
+                    for item in results:
+                        if item['success']:
+                            item['success'] = False
+                            item['error'] = 'Reserva alterada durante a conversão. Tente novamente.'
+                    return {'succeeded': 0, 'failed': len(results), 'results': results}
+
+                loans = [
+                    Loan(
+                        user=r.user,
+                        equipment=r.equipment,
+                        start_date=start_date,
+                        expected_return_date=expected_return_date,
+                        purpose=r.purpose,
+                        notes=f"Convertido da reserva {r.id}. {r.notes or ''}".strip(),
+                        created_by_id=r.created_by_id,
+                    )
+                    for r in to_convert
+                ]
+                # O bulk_create não chama save(): os textos de apresentação são
+                # preenchidos aqui, com o utente e o equipamento já carregados
+                for loan in loans:
+                    for field, value in loan.build_display_snapshot().items():
+                        setattr(loan, field, value)
+                if connections[router.db_for_write(Loan)].features.can_return_rows_from_bulk_insert:
+                    loans = Loan.objects.bulk_create(loans)
+                else:
+                    # Sem RETURNING (ex.: MySQL) o bulk_create não preenche as chaves
+                    # primárias, necessárias para loan_id e para o índice de pesquisa
+                    for loan in loans:
+                        loan.save(force_insert=True)
+                Equipment.objects.filter(id__in=claimed, status='disponivel').update(
+                    status='reservado', updated_at=now
+                )
+                SearchIndex.index_ids('loan', [loan.pk for loan in loans])
+
+                by_reservation = dict(zip(reservation_ids, loans))
+                for item in results:
+                    loan = by_reservation.get(item['id'])
+                    if loan is not None:
+                        item['loan_id'] = loan.pk
+
+        return {
+            'succeeded': len(to_convert),
+            'failed': len(results) - len(to_convert),
+            'results': results,
+        }
+
+    @classmethod
+    def expire_overdue(cls, today=None, dry_run=False):
+        """
+        Expira todas as reservas ativas cuja retirada já passou do prazo e
+        liberta os equipamentos que ficaram sem reservas nem empréstimos em
+        aberto. Usa um UPDATE por conjunto para cada tabela, na mesma transação.
+        """
+        timings = {}
+        cutoff = Reservation.expiry_cutoff(today)
+        overdue = Reservation.objects.filter(status='ativa', expected_pickup_date__lt=cutoff)
+
+        started = time.perf_counter()
+        with transaction.atomic():
+            equipment_ids = list(overdue.values_list('equipment_id', flat=True).distinct())
+            timings['select'] = time.perf_counter() - started
+
+            if dry_run:
+                return {
+                    'expired': overdue.count(),
+                    'released': len(equipment_ids),
+                    'cutoff': cutoff,
+                    'timings': timings,
+                }
+
+            now = timezone.now()
+            step = time.perf_counter()
+            expired = overdue.update(status='expirada', updated_at=now)
+            timings['expire'] = time.perf_counter() - step
+
+            step = time.perf_counter()
+            released = 0
+            if equipment_ids:
+                still_held = Reservation.objects.filter(
+                    equipment=OuterRef('pk'), status__in=cls.CONVERTIBLE_STATUSES
+                )
+                open_loans = Loan.objects.filter(
+                    equipment=OuterRef('pk'), status__in=cls.OPEN_LOAN_STATUSES
+                )
+                released = (
+                    Equipment.objects.filter(id__in=equipment_ids, status='reservado')
+                    .exclude(Exists(still_held))
+                    .exclude(Exists(open_loans))
+                    .update(status='disponivel', updated_at=now)
+                )
+            timings['release'] = time.perf_counter() - step
+
+        timings['total'] = time.perf_counter() - started
+        return {
+            'expired': expired,
+            'released': released,
+            'cutoff': cutoff,
+            'timings': timings,
+        }
@@ -0,0 +1,69 @@
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from reservations.bulk_service import ReservationBulkService
+
+
+class Command(BaseCommand):
+    help = 'Confirma e converte em lote reservas em empréstimos (por data de retirada ou lista de ids)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', help='Data prevista de retirada (YYYY-MM-DD, padrão: hoje)')
+        parser.add_argument('--ids', nargs='+', type=int, help='Ids das reservas (em vez de --date)')
+        parser.add_argument('--return-date', help='Data prevista de devolução dos empréstimos (YYYY-MM-DD)')
+        parser.add_argument('--days', type=int, default=1, help='Dias até à devolução, se --return-date não for indicado (padrão: 1)')
+        parser.add_argument('--confirm-only', action='store_true', help='Apenas confirma as reservas, sem criar empréstimos')
+        parser.add_argument('--dry-run', action='store_true', help='Apenas lista, sem executar')
+        parser.add_argument('--verbose', action='store_true', help='Mostra detalhes')
+
+    @staticmethod
+    def _parse_date(value, option):
+        try:
+            return datetime.strptime(value, '%Y-%m-%d').date()
+        except ValueError:
+            raise CommandError(f'{option} inválida: {value} (use YYYY-MM-DD)')
+
+    def handle(self, *args, **options):
+        ids = options['ids']
+        today = timezone.now().date()
+        pickup_date = None if ids else (
+            self._parse_date(options['date'], '--date') if options['date'] else today
+        )
+
+        if options['confirm_only']:
+            if options['dry_run']:
+                raise CommandError('--dry-run não é suportado com --confirm-only')
+            result = ReservationBulkService.confirm(ids=ids, pickup_date=pickup_date)
+            verb = 'confirmada(s)'
+        else:
+            if options['return_date']:
+                return_date = self._parse_date(options['return_date'], '--return-date')
+            else:
+                return_date = today + timedelta(days=options['days'])
+            if return_date <= today:
+                raise CommandError('A data de devolução deve ser posterior a hoje.')
+
+            if options['dry_run']:
+                self.stdout.write(self.style.WARNING("   Modo DRY-RUN — sem alterações"))
+            result = ReservationBulkService.convert_to_loans(
+                expected_return_date=return_date,
+                ids=ids,
+                pickup_date=pickup_date,
+                dry_run=options['dry_run'],
+            )
+            verb = 'seriam convertida(s)' if options['dry_run'] else 'convertida(s) em empréstimo'
+
+        if options['verbose']:
+            for item in result['results']:
+                if item['success']:
+                    loan = f" → Empréstimo #{item['loan_id']}" if item.get('loan_id') else ''
+                    self.stdout.write(f"  Reserva #{item['id']}{loan}")
+        for item in result['results']:
+            if not item['success']:
+                self.stdout.write(self.style.WARNING(f"  Reserva #{item['id']}: {item['error']}"))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {result['succeeded']} reserva(s) {verb}, {result['failed']} conflito(s)"
+        ))
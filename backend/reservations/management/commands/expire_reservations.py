@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+
+from reservations.bulk_service import ReservationBulkService
+
+
+class Command(BaseCommand):
+    help = 'Expira reservas ativas não levantadas no prazo e liberta os equipamentos'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Apenas conta, sem executar')
+        parser.add_argument('--verbose', action='store_true', help='Mostra os tempos de cada etapa')
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+
+        self.stdout.write("🔍 Expiração de reservas não levantadas")
+        if dry_run:
+            self.stdout.write(self.style.WARNING("   Modo DRY-RUN — sem alterações"))
+
+        result = ReservationBulkService.expire_overdue(dry_run=dry_run)
+
+        if options['verbose']:
+            self.stdout.write(f"📅 Retirada prevista anterior a {result['cutoff'].strftime('%d/%m/%Y')}")
+            for step, seconds in result['timings'].items():
+                self.stdout.write(f"⏱️  {step}: {seconds * 1000:.1f} ms")
+
+        if dry_run:
+            self.stdout.write(self.style.SUCCESS(
+                f"✅ {result['expired']} reserva(s) seriam expiradas "
+                f"({result['released']} equipamento(s) a verificar)"
+            ))
+        else:
+            self.stdout.write(self.style.SUCCESS(
+                f"✅ {result['expired']} reserva(s) expiradas, "
+                f"{result['released']} equipamento(s) libertados "
+                f"em {result['timings']['total']:.2f}s"
+            ))
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.9 on 2026-10-19 01:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reservations', '0002_alter_reservation_reservation_date'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='reservation',
+            index=models.Index(fields=['status', 'expected_pickup_date'], name='reservation_status_pickup_idx'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.9 on 2026-10-19 02:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reservations', '0003_reservation_status_pickup_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reservation',
+            name='item_label',
+            field=models.CharField(blank=True, default='', editable=False, max_length=255, verbose_name='Equipamento (apresentação)'),
+        ),
+        migrations.AddField(
+            model_name='reservation',
+            name='user_label',
+            field=models.CharField(blank=True, default='', editable=False, max_length=255, verbose_name='Utente (apresentação)'),
+        ),
+    ]
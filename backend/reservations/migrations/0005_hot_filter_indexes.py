@@ -0,0 +1,21 @@
+# Generated by Django 4.2.9 on 2026-10-19 02:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reservations', '0004_display_labels'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='reservation',
+            index=models.Index(fields=['equipment', 'expected_pickup_date'], name='reservation_equip_pickup_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reservation',
+            index=models.Index(fields=['user', 'created_at'], name='reservation_user_created_idx'),
+        ),
+    ]
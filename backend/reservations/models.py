@@ -2,6 +2,8 @@ from django.db import models
 from django.utils import timezone
 from django.conf import settings
 
+from loans.display import DisplaySnapshotMixin, LABEL_MAX_LENGTH
+
 
 def get_current_date():
     """Retorna a data atual (sem hora) para usar como default"""
@@ -11,7 +13,7 @@ def get_current_date():
 from datetime import timedelta
 
 
-class Reservation(models.Model):
+class Reservation(DisplaySnapshotMixin, models.Model):
     """
     Modelo de reserva baseado no interface TypeScript Reservation
     """
@@ -22,6 +24,8 @@ class Reservation(models.Model):
         ('expirada', 'Expirada'),
     ]
     
+    EXPIRY_GRACE_DAYS = 1
+    
     id = models.AutoField(primary_key=True)
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
@@ -72,12 +76,29 @@ class Reservation(models.Model):
         null=True,
         verbose_name='Confirmada em'
     )
+
+    # Textos de apresentação desnormalizados (ver loans/display.py)
+    user_label = models.CharField(
+        max_length=LABEL_MAX_LENGTH, blank=True, default='', editable=False,
+        verbose_name='Utente (apresentação)'
+    )
+    item_label = models.CharField(
+        max_length=LABEL_MAX_LENGTH, blank=True, default='', editable=False,
+        verbose_name='Equipamento (apresentação)'
+    )
+
+    DISPLAY_SOURCES = ('user_id', 'equipment_id')
     
     class Meta:
         db_table = 'reservations'
         verbose_name = 'Reserva'
         verbose_name_plural = 'Reservas'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'expected_pickup_date'], name='reservation_status_pickup_idx'),
+            models.Index(fields=['equipment', 'expected_pickup_date'], name='reservation_equip_pickup_idx'),
+            models.Index(fields=['user', 'created_at'], name='reservation_user_created_idx'),
+        ]
         constraints = [
             models.UniqueConstraint(
                 fields=['equipment', 'expected_pickup_date'],
@@ -87,15 +108,27 @@ class Reservation(models.Model):
         ]
         
     def __str__(self):
-        return f"Reserva: {self.equipment} para {self.user.name} em {self.expected_pickup_date}"
+        return f"Reserva: {self.equipment_name} para {self.user_name} em {self.expected_pickup_date}"
     
     @property
     def user_name(self):
-        return self.user.name
+        return self.user_label or self.user.name
     
     @property
     def equipment_name(self):
-        return str(self.equipment)
+        return self.item_label or str(self.equipment)[:LABEL_MAX_LENGTH]
+
+    def build_display_snapshot(self):
+        return {
+            'user_label': self.user.name[:LABEL_MAX_LENGTH],
+            'item_label': str(self.equipment)[:LABEL_MAX_LENGTH],
+        }
+    
+    @classmethod
+    def expiry_cutoff(cls, today=None):
+        """Reservas ativas com retirada prevista antes desta data estão expiradas"""
+        today = today or timezone.now().date()
+        return today - timedelta(days=cls.EXPIRY_GRACE_DAYS)
     
     @property
     def is_expired(self):
@@ -103,8 +136,7 @@ class Reservation(models.Model):
         if self.status in ['confirmada', 'cancelada', 'expirada']:
             return False
         # Reserva expira se passou 1 dia da data prevista de retirada
-        expiry_date = self.expected_pickup_date + timedelta(days=1)
-        return timezone.now().date() > expiry_date
+        return self.expected_pickup_date < self.expiry_cutoff()
     
     @property
     def days_until_pickup(self):
@@ -167,5 +199,6 @@ class Reservation(models.Model):
             if self.equipment.status == 'disponivel':
                 self.equipment.status = 'reservado'
                 self.equipment.save()
-            
+
+        self.prepare_display_snapshot(kwargs)
         super().save(*args, **kwargs)
@@ -208,6 +208,36 @@ class ReservationToLoanSerializer(serializers.Serializer):
         return loan
 
 
+class ReservationBulkSelectSerializer(serializers.Serializer):
+    """
+    Serializer para seleção de reservas em lote (lista de ids ou data de retirada)
+    """
+    ids = serializers.ListField(child=serializers.IntegerField(), required=False, default=list)
+    pickup_date = serializers.DateField(required=False)
+    
+    def validate(self, data):
+        if not data.get('ids') and not data.get('pickup_date'):
+            raise serializers.ValidationError('Informe a lista de ids ou a data de retirada.')
+        return data
+
+
+class ReservationBulkToLoanSerializer(ReservationBulkSelectSerializer):
+    """
+    Serializer para conversão de reservas em empréstimos em lote
+    """
+    expected_return_date = serializers.DateField()
+    start_date = serializers.DateField(required=False)
+    
+    def validate(self, data):
+        data = super().validate(data)
+        start_date = data.get('start_date') or timezone.now().date()
+        if data['expected_return_date'] <= start_date:
+            raise serializers.ValidationError({
+                'expected_return_date': 'Data de devolução deve ser posterior à data de início.'
+            })
+        return data
+
+
 class ReservationStatsSerializer(serializers.Serializer):
     """
     Serializer para estatísticas de reservas
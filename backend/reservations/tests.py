@@ -1,3 +1,127 @@
+from datetime import timedelta
+from unittest.mock import PropertyMock, patch
+
+from django.db import connection
 from django.test import TestCase
+from django.utils import timezone
+
+from accounts.models import User
+from equipment.models import Equipment
+from loans.models import Loan
+
+from .bulk_service import ReservationBulkService
+from .models import Reservation
+
+
+class ConvertToLoansTests(TestCase):
+    """
+    Conversão de reservas em empréstimos em lote
+    """
+
+    def setUp(self):
+        self.user = User.objects.create(email='u@x.com', username='u@x.com', name='U', role='docente')
+        self.today = timezone.now().date()
+        self.reservations = [
+            Reservation.objects.create(
+                user=self.user, expected_pickup_date=self.today, purpose='Aula',
+                equipment=Equipment.objects.create(brand='HP', model='X', type='notebook', serial_number=f'SN{n}'),
+            )
+            for n in range(2)
+        ]
+
+    def _convert(self):
+        return ReservationBulkService.convert_to_loans(
+            self.today + timedelta(days=7), ids=[r.pk for r in self.reservations]
+        )
+
+    def _assert_loan_ids(self, result):
+        self.assertEqual(result['succeeded'], 2)
+        loan_ids = {item['loan_id'] for item in result['results']}
+        self.assertNotIn(None, loan_ids)
+        self.assertEqual(loan_ids, set(Loan.objects.values_list('pk', flat=True)))
+
+    def test_loan_ids_are_returned(self):
+        self._assert_loan_ids(self._convert())
+
+    def test_existing_confirmation_time_is_kept(self):
+        confirmed_at = timezone.now() - timedelta(days=2)
+        Reservation.objects.filter(pk=self.reservations[0].pk).update(status='confirmada', confirmed_at=confirmed_at)
+
+        self._assert_loan_ids(self._convert())
+
+        self.assertEqual(Reservation.objects.get(pk=self.reservations[0].pk).confirmed_at, confirmed_at)
+        self.assertIsNotNone(Reservation.objects.get(pk=self.reservations[1].pk).confirmed_at)
+
+    def test_reservation_changed_before_the_update_rolls_back(self):
+        filter_loans = Loan.objects.filter
+
+        def cancel_during_checks(*args, **kwargs):
+            # Simula outra operação a cancelar a reserva depois da leitura
+            Reservation.objects.filter(pk=self.reservations[0].pk).update(status='cancelada')
+            return filter_loans(*args, **kwargs)
+
+        with patch.object(Loan.objects, 'filter', side_effect=cancel_during_checks):
+            result = self._convert()
+
+        self.assertEqual(result['succeeded'], 0)
+        self.assertFalse(Loan.objects.exists())
+        self.assertEqual(Reservation.objects.get(pk=self.reservations[1].pk).status, 'ativa')
+
+    def test_backend_without_returning_rows_still_reports_loan_ids(self):
+        features = type(connection.features)
+        with patch.object(features, 'can_return_rows_from_bulk_insert', new_callable=PropertyMock, return_value=False):
+            self._assert_loan_ids(self._convert())
+
+
+class ExpireOverdueTests(TestCase):
+    """
+    Expiração das reservas não levantadas e libertação dos equipamentos
+    """
+
+    def setUp(self):
+        self.user = User.objects.create(email='u@x.com', username='u@x.com', name='U', role='docente')
+        self.today = timezone.now().date()
+
+    def _reservation(self, serial, days_ago, equipment=None, **kwargs):
+        equipment = equipment or Equipment.objects.create(
+            brand='HP', model='X', type='notebook', serial_number=serial, status='reservado',
+        )
+        reservation = Reservation.objects.create(
+            user=self.user, equipment=equipment, purpose='Aula', expected_pickup_date=self.today, **kwargs,
+        )
+        # save() já expira reservas atrasadas: simula a passagem do tempo com update()
+        reservation.expected_pickup_date = self.today - timedelta(days=days_ago)
+        Reservation.objects.filter(pk=reservation.pk).update(expected_pickup_date=reservation.expected_pickup_date)
+        return reservation
+
+    def test_only_pickups_before_the_grace_period_expire(self):
+        overdue = self._reservation('SN1', days_ago=Reservation.EXPIRY_GRACE_DAYS + 1)
+        in_grace = self._reservation('SN2', days_ago=Reservation.EXPIRY_GRACE_DAYS)
+        confirmed = self._reservation('SN3', days_ago=10, status='confirmada')
+
+        result = ReservationBulkService.expire_overdue(today=self.today)
+
+        self.assertEqual(result['cutoff'], self.today - timedelta(days=Reservation.EXPIRY_GRACE_DAYS))
+        self.assertEqual((result['expired'], result['released']), (1, 1))
+        statuses = dict(Reservation.objects.values_list('pk', 'status'))
+        self.assertEqual(statuses, {overdue.pk: 'expirada', in_grace.pk: 'ativa', confirmed.pk: 'confirmada'})
+        self.assertEqual(Equipment.objects.get(pk=overdue.equipment_id).status, 'disponivel')
+        self.assertEqual(Equipment.objects.get(pk=in_grace.equipment_id).status, 'reservado')
+
+    def test_equipment_still_held_is_not_released(self):
+        overdue = self._reservation('SN1', days_ago=5)
+        self._reservation('SN1', days_ago=0, equipment=overdue.equipment)
+
+        result = ReservationBulkService.expire_overdue(today=self.today)
+
+        self.assertEqual((result['expired'], result['released']), (1, 0))
+        self.assertEqual(Equipment.objects.get(pk=overdue.equipment_id).status, 'reservado')
+
+    def test_dry_run_only_counts(self):
+        overdue = self._reservation('SN1', days_ago=5)
+
+        result = ReservationBulkService.expire_overdue(today=self.today, dry_run=True)
 
-# Create your tests here.
+        self.assertEqual((result['expired'], result['released']), (1, 1))
+        self.assertEqual(Reservation.objects.get(pk=overdue.pk).status, 'ativa')
+        self.assertEqual(Equipment.objects.get(pk=overdue.equipment_id).status, 'reservado')
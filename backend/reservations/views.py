@@ -11,12 +11,16 @@ from .models import Reservation
 from .serializers import (
     ReservationSerializer, ReservationListSerializer,
     ReservationConfirmSerializer, ReservationCancelSerializer,
-    ReservationToLoanSerializer, ReservationStatsSerializer
+    ReservationToLoanSerializer, ReservationStatsSerializer,
+    ReservationBulkSelectSerializer, ReservationBulkToLoanSerializer
 )
+from .bulk_service import ReservationBulkService
 from loans.serializers import LoanSerializer
+from archive.history import ArchiveReadThroughMixin
+from loans.export_service import StreamingExport, RESERVATION_COLUMNS, filter_created_range
 
 
-class ReservationViewSet(viewsets.ModelViewSet):
+class ReservationViewSet(ArchiveReadThroughMixin, viewsets.ModelViewSet):
     """
     ViewSet para gerenciamento de reservas
     """
@@ -28,6 +32,16 @@ class ReservationViewSet(viewsets.ModelViewSet):
     search_fields = ['user__name', 'equipment__brand', 'equipment__model', 'purpose']
     ordering_fields = ['reservation_date', 'expected_pickup_date', 'created_at']
     ordering = ['-created_at']
+    archive_kind = 'reservation'
+    archive_all_roles = ['admin', 'tecnico', 'coordenador']
+    archive_filters = {
+        **ArchiveReadThroughMixin.archive_filters,
+        'equipment': 'data__equipment_id',
+        'start_date': 'data__reservation_date__gte',
+        'end_date': 'data__reservation_date__lte',
+        # Reservas ativas nunca são arquivadas
+        'expiring_soon': lambda records, value: records.none() if value.lower() == 'true' else records,
+    }
     
     def get_serializer_class(self):
         """
@@ -41,13 +55,21 @@ class ReservationViewSet(viewsets.ModelViewSet):
             return ReservationCancelSerializer
         elif self.action == 'convert_to_loan':
             return ReservationToLoanSerializer
+        elif self.action == 'bulk_confirm':
+            return ReservationBulkSelectSerializer
+        elif self.action == 'bulk_convert_to_loan':
+            return ReservationBulkToLoanSerializer
         return ReservationSerializer
     
     def get_queryset(self):
         """
         Filtra reservas baseado nos parâmetros de consulta e permissões
         """
-        queryset = Reservation.objects.select_related('user', 'equipment').all()
+        if self.action == 'list':
+            # A listagem usa apenas os textos de apresentação: sem joins
+            queryset = Reservation.objects.all()
+        else:
+            queryset = Reservation.objects.select_related('user', 'equipment').all()
         
         # Apenas admin, técnico e coordenador veem todas.
         if self.request.user.role not in ['admin', 'tecnico', 'coordenador']:
@@ -158,6 +180,22 @@ class ReservationViewSet(viewsets.ModelViewSet):
         serializer = ReservationListSerializer(expiring_reservations, many=True)
         return Response(serializer.data)
     
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """
+        Exportação completa para auditoria em streaming (?fmt=csv|jsonl), incluindo
+        os arquivados (?include_archived=false exporta apenas os ativos).
+        Aceita os mesmos filtros da listagem e ?created_from / ?created_to.
+        """
+        try:
+            queryset = filter_created_range(self.filter_queryset(self.get_queryset()), request.query_params)
+            archived = filter_created_range(self.archived_matching(request.query_params), request.query_params)
+            export = StreamingExport(queryset, RESERVATION_COLUMNS, fmt=request.query_params.get('fmt', 'csv'),
+                                     archived=archived)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return export.response('reservas')
+    
     @action(detail=True, methods=['post'])
     def confirm(self, request, pk=None):
         """
@@ -272,6 +310,55 @@ class ReservationViewSet(viewsets.ModelViewSet):
         
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
+    @action(detail=False, methods=['post'])
+    def bulk_confirm(self, request):
+        """
+        Confirma em lote as reservas ativas (por ids ou data de retirada)
+        """
+        if request.user.role not in ['admin', 'tecnico', 'secretario', 'coordenador']:
+            return Response(
+                {'error': 'Apenas técnicos, secretários e coordenadores podem confirmar reservas.'}, 
+                status=status.HTTP_403_FORBIDDEN
+            )
+        
+        serializer = ReservationBulkSelectSerializer(data=request.data)
+        if serializer.is_valid():
+            result = ReservationBulkService.confirm(
+                queryset=self.get_queryset(),
+                ids=serializer.validated_data['ids'],
+                pickup_date=serializer.validated_data.get('pickup_date'),
+            )
+            result['message'] = f"{result['succeeded']} reserva(s) confirmada(s)."
+            return Response(result, status=status.HTTP_200_OK)
+        
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    
+    @action(detail=False, methods=['post'])
+    def bulk_convert_to_loan(self, request):
+        """
+        Converte em lote reservas em empréstimos (por ids ou data de retirada).
+        Os conflitos são reportados por item.
+        """
+        if request.user.role not in ['admin', 'tecnico', 'secretario', 'coordenador']:
+            return Response(
+                {'error': 'Apenas técnicos, secretários e coordenadores podem converter reservas em empréstimos.'}, 
+                status=status.HTTP_403_FORBIDDEN
+            )
+        
+        serializer = ReservationBulkToLoanSerializer(data=request.data)
+        if serializer.is_valid():
+            result = ReservationBulkService.convert_to_loans(
+                expected_return_date=serializer.validated_data['expected_return_date'],
+                queryset=self.get_queryset(),
+                ids=serializer.validated_data['ids'],
+                pickup_date=serializer.validated_data.get('pickup_date'),
+                start_date=serializer.validated_data.get('start_date'),
+            )
+            result['message'] = f"{result['succeeded']} reserva(s) convertida(s) em empréstimo."
+            return Response(result, status=status.HTTP_200_OK)
+        
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    
     @action(detail=False, methods=['get'])
     def stats(self, request):
         """
@@ -320,14 +407,9 @@ class ReservationViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'])
     def my_reservations(self, request):
         """
-        Lista reservas do usuário autenticado
+        Lista reservas do usuário autenticado, incluindo as arquivadas
+        (?include_archived=false lista apenas as ativas)
         """
         my_reservations = self.get_queryset().filter(user=request.user)
-        
-        page = self.paginate_queryset(my_reservations)
-        if page is not None:
-            serializer = ReservationListSerializer(page, many=True)
-            return self.get_paginated_response(serializer.data)
-        
-        serializer = ReservationListSerializer(my_reservations, many=True)
-        return Response(serializer.data)
+        archived = self.archived_records().filter(user=request.user)
+        return self.history_response(my_reservations, ReservationListSerializer, archived)
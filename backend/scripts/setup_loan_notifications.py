@@ -29,6 +29,10 @@ def create_cron_entry():
         f"*/30 8-18 * * * {django_cmd} check_loan_notifications --hours-before=2",
         # Verifica a cada hora fora do horário comercial
         f"0 0-7,19-23 * * * {django_cmd} check_loan_notifications --hours-before=2",
+        # Expira reservas não levantadas e liberta os equipamentos (diariamente)
+        f"15 0 * * * {django_cmd} expire_reservations",
+        # Corrige divergências do status dos equipamentos (diariamente)
+        f"0 2 * * * {django_cmd} reconcile_equipment_status",
     ]
     
     print("📋 Entradas para adicionar ao crontab (Linux/Mac):")
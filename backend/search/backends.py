@@ -0,0 +1,168 @@
+"""
+Backends de pesquisa de texto integral
+
+Um backend implementa ``available``, ``create``, ``upsert``, ``delete``,
+``clear``, ``search`` e ``match_ids``. O backend ativo é escolhido em
+``SEARCH_BACKEND``; ``SQLiteFTS5Backend`` usa uma tabela virtual FTS5.
+Para PostgreSQL basta uma classe com a mesma interface sobre uma tabela com
+``tsvector`` + índice GIN. Quando o backend não está disponível para a base
+de dados em uso, ``NullBackend`` faz as listagens voltarem ao ``icontains``.
+"""
+
+import re
+
+from django.db import connection
+
+KIND_CODES = {
+    'equipment': 1,
+    'user': 2,
+    'loan': 3,
+}
+KINDS_BY_CODE = {code: kind for kind, code in KIND_CODES.items()}
+ROWID_SLOTS = 16
+
+
+def build_match(query):
+    """
+    Converte o texto do utilizador numa expressão FTS5 segura: cada termo
+    entre aspas e com prefixo (pesquisa enquanto escreve), todos obrigatórios
+    """
+    terms = re.findall(r'\w+', query or '', re.UNICODE)
+    if not terms:
+        return None
+    return ' '.join(f'"{term.lower()}"*' for term in terms[:12])
+
+
+class NullBackend:
+    """
+    Sem índice: a pesquisa não está disponível e os filtros usam icontains
+    """
+
+    def available(self):
+        return False
+
+    def create(self, connection=connection):
+        pass
+
+    def upsert(self, kind, documents):
+        return 0
+
+    def delete(self, kind, ids):
+        pass
+
+    def clear(self, kind=None):
+        pass
+
+    def search(self, query, kinds=None, limit=20):
+        return []
+
+    def match_ids(self, kind, query, limit):
+        return None
+
+
+class SQLiteFTS5Backend:
+    """
+    Índice numa tabela virtual FTS5. O rowid codifica (tipo, id), pelo que
+    atualizar ou apagar um documento é uma operação por chave primária.
+    """
+
+    table = 'search_index'
+
+    def available(self):
+        return connection.vendor == 'sqlite'
+
+    @staticmethod
+    def rowid(kind, pk):
+        return pk * ROWID_SLOTS + KIND_CODES[kind]
+
+    def create(self, connection=connection):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {self.table} USING fts5("
+                "kind UNINDEXED, object_id UNINDEXED, title, body, "
+                "tokenize = 'unicode61 remove_diacritics 2')"
+            )
+
+    def upsert(self, kind, documents):
+        """
+        Grava os documentos [(id, título, corpo)] que mudaram.
+        Retorna os ids efetivamente alterados.
+        """
+        documents = {self.rowid(kind, pk): (pk, title, body) for pk, title, body in documents}
+        if not documents:
+            return []
+        changed = []
+        with connection.cursor() as cursor:
+            rowids = list(documents)
+            current = {}
+            for start in range(0, len(rowids), 500):
+                part = rowids[start:start + 500]
+                cursor.execute(
+                    f"SELECT rowid, title, body FROM {self.table} WHERE rowid IN ({','.join(['%s'] * len(part))})",
+                    part,
+                )
+                current.update({rowid: (title, body) for rowid, title, body in cursor.fetchall()})
+
+            rows = []
+            for rowid, (pk, title, body) in documents.items():
+                if current.get(rowid) == (title, body):
+                    continue
+                changed.append(pk)
+                rows.append((rowid, kind, pk, title, body))
+            stale = [row[0] for row in rows if row[0] in current]
+            for start in range(0, len(stale), 500):
+                part = stale[start:start + 500]
+                cursor.execute(f"DELETE FROM {self.table} WHERE rowid IN ({','.join(['%s'] * len(part))})", part)
+            if rows:
+                cursor.executemany(
+                    f"INSERT INTO {self.table} (rowid, kind, object_id, title, body) VALUES (%s, %s, %s, %s, %s)",
+                    rows,
+                )
+        return changed
+
+    def delete(self, kind, ids):
+        rowids = [self.rowid(kind, pk) for pk in ids]
+        with connection.cursor() as cursor:
+            for start in range(0, len(rowids), 500):
+                part = rowids[start:start + 500]
+                cursor.execute(f"DELETE FROM {self.table} WHERE rowid IN ({','.join(['%s'] * len(part))})", part)
+
+    def clear(self, kind=None):
+        with connection.cursor() as cursor:
+            if kind is None:
+                cursor.execute(f"DELETE FROM {self.table}")
+            else:
+                cursor.execute(f"DELETE FROM {self.table} WHERE kind = %s", [kind])
+
+    def search(self, query, kinds=None, limit=20):
+        """
+        Retorna [(tipo, id, rank, excerto)] ordenados por relevância (BM25,
+        título com peso 10)
+        """
+        match = build_match(query)
+        if match is None:
+            return []
+        sql = (
+            f"SELECT kind, object_id, bm25({self.table}, 0, 0, 10.0, 1.0) AS rank, "
+            f"snippet({self.table}, 3, '[', ']', '…', 10) "
+            f"FROM {self.table} WHERE {self.table} MATCH %s"
+        )
+        params = [match]
+        if kinds:
+            sql += f" AND kind IN ({','.join(['%s'] * len(kinds))})"
+            params.extend(kinds)
+        # rowid desempata: janelas maiores da mesma pesquisa mantêm a ordem
+        sql += " ORDER BY rank, rowid LIMIT %s"
+        params.append(limit)
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return [(kind, int(pk), rank, snippet) for kind, pk, rank, snippet in cursor.fetchall()]
+
+    def match_ids(self, kind, query, limit):
+        """
+        Ids do tipo indicado que correspondem à pesquisa, por relevância, ou
+        None se o texto não tiver termos pesquisáveis
+        """
+        if build_match(query) is None:
+            return None
+        return [pk for _, pk, _, _ in self.search(query, kinds=[kind], limit=limit)]
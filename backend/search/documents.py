@@ -0,0 +1,86 @@
+"""
+Documentos indexados pela pesquisa
+
+Cada tipo define o modelo de origem, as colunas lidas (um ``values()``
+estreito, com joins) e como montar o título e o corpo do documento.
+O título tem mais peso na ordenação dos resultados.
+"""
+
+from django.apps import apps as global_apps
+
+
+def _join(*parts):
+    return ' '.join(str(part) for part in parts if part)
+
+
+class Document:
+    """
+    Definição de um tipo de documento indexado
+    """
+
+    def __init__(self, kind, model_label, fields, build, dependents=None):
+        self.kind = kind
+        self.model_label = model_label
+        self.fields = fields
+        self._build = build
+        # (tipo dependente, lookup para o id deste objeto): documentos que
+        # incluem dados deste objeto e devem ser reindexados quando ele muda
+        self.dependents = dependents or []
+
+    def model(self, apps=None):
+        return (apps or global_apps).get_model(self.model_label)
+
+    def rows(self, queryset):
+        return queryset.values('pk', *self.fields)
+
+    def build(self, row, model):
+        return self._build(row, model)
+
+
+def _choices(model, field):
+    return dict(model._meta.get_field(field).choices)
+
+
+def _equipment(row, model):
+    title = _join(row['brand'], row['model'])
+    body = _join(
+        row['serial_number'], _choices(model, 'type').get(row['type'], row['type']),
+        row['location'], row['category'], row['color'], row['qrcode_hash'], row['description'],
+    )
+    return title, body
+
+
+def _user(row, model):
+    body = _join(
+        row['email'], row['username'], row['department'],
+        _choices(model, 'role').get(row['role'], row['role']),
+    )
+    return row['name'] or row['username'], body
+
+
+def _loan(row, model):
+    title = _join(row['user__name'], row['equipment__brand'], row['equipment__model'], row['pacote__name'])
+    body = _join(row['equipment__serial_number'], row['purpose'], row['notes'])
+    return title, body
+
+
+DOCUMENTS = {
+    'equipment': Document(
+        'equipment', 'equipment.Equipment',
+        ['brand', 'model', 'serial_number', 'type', 'location', 'category', 'color', 'qrcode_hash', 'description'],
+        _equipment,
+        dependents=[('loan', 'equipment_id')],
+    ),
+    'user': Document(
+        'user', 'accounts.User',
+        ['name', 'username', 'email', 'department', 'role'],
+        _user,
+        dependents=[('loan', 'user_id')],
+    ),
+    'loan': Document(
+        'loan', 'loans.Loan',
+        ['user__name', 'equipment__brand', 'equipment__model', 'equipment__serial_number',
+         'pacote__name', 'purpose', 'notes'],
+        _loan,
+    ),
+}
@@ -0,0 +1,42 @@
+from django.db.models import Case, IntegerField, Value, When
+from rest_framework.filters import SearchFilter
+from rest_framework.settings import api_settings
+
+from .index import SearchIndex
+
+
+class FullTextSearchFilter(SearchFilter):
+    """
+    SearchFilter que usa o índice de texto integral quando disponível.
+    A view indica o tipo de documento em ``search_kind``. O índice procura
+    por prefixo de palavra: o que ele não encontra não aparece na listagem.
+    Acima de ``max_matches`` correspondências ficam as ``max_matches`` mais
+    relevantes. Sem ``?ordering=`` explícito, os resultados saem por
+    relevância (BM25); por isso este filtro vem depois do OrderingFilter.
+    Volta ao icontains sobre ``search_fields`` quando não há índice ou o
+    texto não tem termos pesquisáveis.
+    """
+
+    max_matches = 2000
+
+    def filter_queryset(self, request, queryset, view):
+        kind = getattr(view, 'search_kind', None)
+        query = request.query_params.get(self.search_param, '').strip()
+        if not kind or not query:
+            return super().filter_queryset(request, queryset, view)
+
+        ids = SearchIndex.match_ids(kind, query, self.max_matches)
+        if ids is None:
+            return super().filter_queryset(request, queryset, view)
+        queryset = queryset.filter(pk__in=ids)
+        if ids and not request.query_params.get(api_settings.ORDERING_PARAM):
+            queryset = queryset.order_by(self.rank_order(ids))
+        return queryset
+
+    @staticmethod
+    def rank_order(ids):
+        """Expressão de ordenação pela posição de cada id em ``ids``"""
+        return Case(
+            *[When(pk=pk, then=Value(position)) for position, pk in enumerate(ids)],
+            output_field=IntegerField(),
+        )
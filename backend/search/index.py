@@ -0,0 +1,147 @@
+"""
+Índice de pesquisa de texto integral
+
+Fachada sobre o backend configurado em ``SEARCH_BACKEND``. Mantém o índice
+sincronizado por signals (gravação e remoção de cada objeto) e por chamadas
+explícitas a ``SearchIndex.index_ids`` depois de escritas em lote, que não
+disparam signals. Um documento só é regravado quando o texto muda; quando
+muda, os documentos que dependem dele (ex.: empréstimos de um utente
+renomeado) são reindexados.
+"""
+
+from django.conf import settings
+from django.db.models.signals import post_save, post_delete
+from django.utils.module_loading import import_string
+
+from .backends import NullBackend
+from .documents import DOCUMENTS
+
+_backend = None
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        backend = import_string(getattr(settings, 'SEARCH_BACKEND', 'search.backends.SQLiteFTS5Backend'))()
+        _backend = backend if backend.available() else NullBackend()
+    return _backend
+
+
+class SearchIndex:
+    """
+    Operações sobre o índice de pesquisa
+    """
+
+    BATCH_SIZE = 500
+
+    @classmethod
+    def enabled(cls):
+        return get_backend().available()
+
+    @classmethod
+    def _documents(cls, kind, ids, apps=None):
+        document = DOCUMENTS[kind]
+        model = document.model(apps)
+        rows = document.rows(model.objects.filter(pk__in=ids))
+        return [(row['pk'], *document.build(row, model)) for row in rows]
+
+    @classmethod
+    def index_ids(cls, kind, ids, apps=None, dependents=True):
+        """
+        (Re)indexa os objetos indicados; os que já não existem saem do índice.
+        Retorna o número de documentos alterados.
+        """
+        backend = get_backend()
+        if not backend.available():
+            return 0
+        ids = [pk for pk in ids if pk is not None]
+        changed_total = 0
+        for start in range(0, len(ids), cls.BATCH_SIZE):
+            chunk = ids[start:start + cls.BATCH_SIZE]
+            documents = cls._documents(kind, chunk, apps)
+            missing = set(chunk) - {pk for pk, _, _ in documents}
+            if missing:
+                backend.delete(kind, missing)
+            changed = backend.upsert(kind, documents)
+            changed_total += len(changed)
+
+            if changed and dependents:
+                for dependent_kind, lookup in DOCUMENTS[kind].dependents:
+                    dependent_ids = list(
+                        DOCUMENTS[dependent_kind].model(apps).objects
+                        .filter(**{f'{lookup}__in': changed}).values_list('pk', flat=True)
+                    )
+                    cls.index_ids(dependent_kind, dependent_ids, apps, dependents=False)
+        return changed_total
+
+    @classmethod
+    def remove(cls, kind, ids):
+        get_backend().delete(kind, list(ids))
+
+    @classmethod
+    def rebuild(cls, kind=None, apps=None):
+        """
+        Reconstrói o índice (todo ou de um tipo) percorrendo as tabelas por
+        blocos de chave primária. Retorna o número de documentos por tipo.
+        """
+        backend = get_backend()
+        if not backend.available():
+            return {}
+        kinds = [kind] if kind else list(DOCUMENTS)
+        counts = {}
+        for current in kinds:
+            backend.clear(current)
+            model = DOCUMENTS[current].model(apps)
+            ids = model.objects.order_by('pk').values_list('pk', flat=True)
+            last, total = None, 0
+            while True:
+                page = list((ids if last is None else ids.filter(pk__gt=last))[:cls.BATCH_SIZE])
+                if not page:
+                    break
+                backend.upsert(current, cls._documents(current, page, apps))
+                total += len(page)
+                last = page[-1]
+            counts[current] = total
+        return counts
+
+    @classmethod
+    def search(cls, query, kinds=None, limit=20):
+        return get_backend().search(query, kinds=kinds, limit=limit)
+
+    @classmethod
+    def match_ids(cls, kind, query, limit):
+        """
+        Ids correspondentes por relevância (no máximo ``limit``), ou None se
+        não houver índice ou o texto não tiver termos pesquisáveis
+        """
+        return get_backend().match_ids(kind, query, limit)
+
+
+def _connect(kind):
+    document = DOCUMENTS[kind]
+    model = document.model()
+    own_fields = {field for field in document.fields if '__' not in field}
+
+    def on_save(sender, instance, update_fields=None, raw=False, **kwargs):
+        if raw:
+            return
+        if update_fields is not None and not own_fields & set(update_fields):
+            return
+        try:
+            SearchIndex.index_ids(kind, [instance.pk])
+        except Exception as e:
+            print(f"Erro ao atualizar índice de pesquisa ({kind} #{instance.pk}): {e}")
+
+    def on_delete(sender, instance, **kwargs):
+        try:
+            SearchIndex.remove(kind, [instance.pk])
+        except Exception as e:
+            print(f"Erro ao remover do índice de pesquisa ({kind} #{instance.pk}): {e}")
+
+    post_save.connect(on_save, sender=model, weak=False, dispatch_uid=f'search_index_save_{kind}')
+    post_delete.connect(on_delete, sender=model, weak=False, dispatch_uid=f'search_index_delete_{kind}')
+
+
+def connect_signals():
+    for kind in DOCUMENTS:
+        _connect(kind)
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from search.documents import DOCUMENTS
+from search.index import SearchIndex, get_backend
+
+
+class Command(BaseCommand):
+    help = 'Reconstrói o índice de pesquisa de texto integral (equipamentos, utilizadores e empréstimos)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--kind', choices=sorted(DOCUMENTS), help='Reconstrói apenas um tipo')
+
+    def handle(self, *args, **options):
+        if not SearchIndex.enabled():
+            raise CommandError(f'O backend de pesquisa ({type(get_backend()).__name__}) não está disponível nesta base de dados.')
+
+        counts = SearchIndex.rebuild(kind=options['kind'])
+        for kind, count in counts.items():
+            self.stdout.write(f'  🔎 {kind}: {count} documento(s)')
+        self.stdout.write(self.style.SUCCESS('✅ Índice de pesquisa reconstruído.'))
@@ -0,0 +1,29 @@
+from django.db import migrations
+
+
+def create_index(apps, schema_editor):
+    from search.index import SearchIndex, get_backend
+
+    backend = get_backend()
+    if not backend.available():
+        return
+    backend.create(schema_editor.connection)
+    SearchIndex.rebuild(apps=apps)
+
+
+def drop_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE IF EXISTS search_index')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0003_alter_user_role_atribuidoreventual'),
+        ('equipment', '0005_scantoken'),
+        ('loans', '0011_add_qrcode_to_loanrequest'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
@@ -0,0 +1,99 @@
+from unittest.mock import patch
+
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from accounts.models import User
+from equipment.models import Equipment
+
+from .filters import FullTextSearchFilter
+from .index import SearchIndex
+
+
+class SearchIndexSyncTests(TestCase):
+    """
+    Índice sincronizado pelos signals de gravação e remoção
+    """
+
+    def test_saved_renamed_and_deleted_equipment(self):
+        equipment = Equipment.objects.create(brand='Dell', model='Latitude', type='notebook', serial_number='SN1')
+        self.assertEqual(SearchIndex.match_ids('equipment', 'latitude', 10), [equipment.pk])
+
+        equipment.model = 'Vostro'
+        equipment.save()
+        self.assertEqual(SearchIndex.match_ids('equipment', 'latitude', 10), [])
+        self.assertEqual(SearchIndex.match_ids('equipment', 'vos', 10), [equipment.pk])
+
+        equipment.delete()
+        self.assertEqual(SearchIndex.match_ids('equipment', 'vostro', 10), [])
+
+    def test_bulk_writes_are_indexed_explicitly(self):
+        equipment = Equipment.objects.create(brand='Dell', model='Latitude', type='notebook', serial_number='SN1')
+        Equipment.objects.filter(pk=equipment.pk).update(model='Precision')
+        self.assertEqual(SearchIndex.match_ids('equipment', 'precision', 10), [])
+
+        SearchIndex.index_ids('equipment', [equipment.pk])
+        self.assertEqual(SearchIndex.match_ids('equipment', 'precision', 10), [equipment.pk])
+
+
+class SearchTestMixin:
+
+    def setUp(self):
+        self.user = User.objects.create(email='tec@x.com', username='tec@x.com', name='Tec', role='tecnico')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        # 'Dell' no título (peso maior) do primeiro e só na descrição do segundo
+        self.in_body = Equipment.objects.create(
+            brand='HP', model='ProBook', type='notebook', serial_number='SN1', description='Substitui o Dell antigo',
+        )
+        self.in_title = Equipment.objects.create(brand='Dell', model='Latitude', type='notebook', serial_number='SN2')
+
+
+class GlobalSearchViewTests(SearchTestMixin, TestCase):
+    """
+    Pesquisa global (/search/) por relevância
+    """
+
+    url = '/api/v1/search/'
+
+    def test_results_are_ranked(self):
+        response = self.client.get(self.url, {'q': 'dell', 'types': 'equipment'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([item['id'] for item in response.data['results']], [self.in_title.pk, self.in_body.pk])
+        self.assertEqual(response.data['results'][0]['data']['full_name'], 'Dell Latitude')
+
+    def test_query_and_types_are_validated(self):
+        self.assertEqual(self.client.get(self.url).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'q': 'dell', 'types': 'planeta'}).status_code, 400)
+
+
+class FullTextSearchFilterTests(SearchTestMixin, TestCase):
+    """
+    Filtro ?search= das listagens sobre o índice
+    """
+
+    url = '/api/v1/equipment/'
+
+    def _ids(self, params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        results = response.data['results'] if isinstance(response.data, dict) else response.data
+        return [item['id'] for item in results]
+
+    def test_matches_keep_relevance_order(self):
+        self.assertEqual(self._ids({'search': 'dell'}), [self.in_title.pk, self.in_body.pk])
+        # Ordenação explícita prevalece sobre a relevância
+        self.assertEqual(self._ids({'search': 'dell', 'ordering': '-brand'}), [self.in_body.pk, self.in_title.pk])
+
+    def test_confirmed_miss_is_empty(self):
+        # O icontains encontraria 'book' em 'ProBook'; o índice procura por prefixo de palavra
+        self.assertEqual(self._ids({'search': 'book'}), [])
+
+    def test_too_many_matches_keep_the_most_relevant(self):
+        with patch.object(FullTextSearchFilter, 'max_matches', 1):
+            self.assertEqual(self._ids({'search': 'dell'}), [self.in_title.pk])
+
+    def test_text_without_terms_falls_back_to_icontains(self):
+        self.assertEqual(self._ids({'search': '-'}), [])
+        Equipment.objects.filter(pk=self.in_body.pk).update(serial_number='SN-1')
+        self.assertEqual(self._ids({'search': '-'}), [self.in_body.pk])
@@ -0,0 +1,120 @@
+from rest_framework import status
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+
+from equipment.models import Equipment
+from loans.models import Loan
+from accounts.models import User
+
+from .documents import DOCUMENTS
+from .index import SearchIndex
+
+STAFF_ROLES = ['admin', 'tecnico', 'coordenador', 'secretario']
+
+
+def _equipment_data(ids, user):
+    rows = Equipment.objects.filter(pk__in=ids).values('id', 'brand', 'model', 'serial_number', 'status', 'type')
+    return {
+        row['id']: {**row, 'full_name': f"{row['brand']} {row['model']}"}
+        for row in rows
+    }
+
+
+def _user_data(ids, user):
+    if user.role not in STAFF_ROLES:
+        return {}
+    rows = User.objects.filter(pk__in=ids).values('id', 'name', 'email', 'role', 'department')
+    return {row['id']: row for row in rows}
+
+
+def _loan_data(ids, user):
+    queryset = Loan.objects.filter(pk__in=ids)
+    if user.role not in ['tecnico', 'coordenador']:
+        queryset = queryset.filter(user=user)
+    rows = queryset.values(
+        'id', 'status', 'user__name', 'equipment__brand', 'equipment__model',
+        'pacote__name', 'start_date', 'expected_return_date',
+    )
+    return {
+        row['id']: {
+            'id': row['id'],
+            'status': row['status'],
+            'user_name': row['user__name'],
+            'equipment_name': (
+                f"{row['equipment__brand']} {row['equipment__model']}"
+                if row['equipment__brand'] else row['pacote__name']
+            ),
+            'start_date': row['start_date'],
+            'expected_return_date': row['expected_return_date'],
+        }
+        for row in rows
+    }
+
+
+HYDRATORS = {
+    'equipment': _equipment_data,
+    'user': _user_data,
+    'loan': _loan_data,
+}
+
+
+def _visible_matches(query, kinds, limit, user):
+    """
+    Primeiras ``limit`` correspondências que o utilizador pode ver, por
+    relevância. O índice não conhece as permissões: a janela de resultados
+    cresce (x4) até haver ``limit`` visíveis ou as correspondências acabarem.
+    """
+    visible = []
+    seen = 0
+    window = limit * 3
+    while True:
+        matches = SearchIndex.search(query, kinds=kinds, limit=window)
+        fresh = matches[seen:]
+
+        ids_by_kind = {}
+        for kind, pk, _, _ in fresh:
+            ids_by_kind.setdefault(kind, []).append(pk)
+        data = {kind: HYDRATORS[kind](ids, user) for kind, ids in ids_by_kind.items()}
+
+        for kind, pk, rank, snippet in fresh:
+            item = data[kind].get(pk)
+            if item is not None:
+                visible.append((kind, pk, rank, snippet, item))
+                if len(visible) >= limit:
+                    return visible
+        if len(matches) < window:
+            return visible
+        seen = len(matches)
+        window *= 4
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def global_search(request):
+    """
+    Pesquisa global ordenada por relevância.
+    Parâmetros: q (obrigatório), types=equipment,user,loan, limit (máx. 100)
+    """
+    query = request.query_params.get('q', '').strip()
+    if not query:
+        return Response({'error': 'Parâmetro q é obrigatório.'}, status=status.HTTP_400_BAD_REQUEST)
+    if not SearchIndex.enabled():
+        return Response({'error': 'Pesquisa indisponível nesta base de dados.'},
+                        status=status.HTTP_503_SERVICE_UNAVAILABLE)
+
+    kinds = [kind for kind in request.query_params.get('types', '').split(',') if kind]
+    invalid = [kind for kind in kinds if kind not in DOCUMENTS]
+    if invalid:
+        return Response({'error': f"Tipos inválidos: {', '.join(invalid)}."}, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        limit = max(1, min(int(request.query_params.get('limit', 20)), 100))
+    except ValueError:
+        limit = 20
+
+    results = []
+    for kind, pk, rank, snippet, item in _visible_matches(query, kinds or None, limit, request.user):
+        results.append({'type': kind, 'id': pk, 'rank': round(-rank, 6), 'snippet': snippet, 'data': item})
+
+    return Response({'query': query, 'count': len(results), 'results': results})